@@ -1,3 +1,4 @@
+import asyncio
 import contextlib
 import threading
 import time
@@ -7,10 +8,14 @@ import kiln_ai.datamodel.strict_mode as datamodel_strict_mode
 import kiln_server.server as kiln_server
 import uvicorn
 from fastapi import FastAPI
+from kiln_ai.adapters.eval.job_journal import set_shutting_down
 
 from app.desktop.log_config import log_config
 from app.desktop.studio_server.data_gen_api import connect_data_gen_api
-from app.desktop.studio_server.eval_api import connect_evals_api
+from app.desktop.studio_server.eval_api import (
+    connect_evals_api,
+    resume_interrupted_eval_runs,
+)
 from app.desktop.studio_server.finetune_api import connect_fine_tune_api
 from app.desktop.studio_server.prompt_api import connect_prompt_api
 from app.desktop.studio_server.provider_api import connect_provider_api
@@ -24,7 +29,16 @@ async def lifespan(app: FastAPI):
     # Set datamodel strict mode on startup
     original_strict_mode = datamodel_strict_mode.strict_mode()
     datamodel_strict_mode.set_strict_mode(True)
+    # Resume eval runs interrupted by a crash or restart, in the background
+    set_shutting_down(False)
+    resume_evals = asyncio.create_task(resume_interrupted_eval_runs())
     yield
+    # Eval runs cancelled from here on are interrupted, and resumed at next startup
+    set_shutting_down(True)
+    resume_evals.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await resume_evals
+    set_shutting_down(False)
     # Reset datamodel strict mode on shutdown
     datamodel_strict_mode.set_strict_mode(original_strict_mode)
 
@@ -58,6 +72,14 @@ class ThreadedServer(uvicorn.Server):
     def install_signal_handlers(self):
         pass
 
+    async def shutdown(self, sockets=None):
+        # Before open connections are closed: eval runs streaming to the app are interrupted by the shutdown, not stopped by their client
+        set_shutting_down(True)
+        try:
+            await super().shutdown(sockets)
+        finally:
+            set_shutting_down(False)
+
     @contextlib.contextmanager
     def run_in_thread(self):
         self.stopped = False
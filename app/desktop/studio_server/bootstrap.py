@@ -0,0 +1,169 @@
+"""
+Bootstrap confidence intervals for eval summaries.
+
+Percentile bootstrap: resample the items with replacement many times, compute the statistic (a mean score, a correlation) on each resample, and take the middle `confidence` share of the results as the interval.
+
+Resampling is vectorized: each batch of resamples is an index matrix (resamples x items), counted into a weight matrix: how many times each distinct item appears in each resample. Statistics are computed from the weights with matrix operations, not a Python loop per resample, and without materializing resampled copies of the data. Identical items (eg the same 1-5 rating) are counted together, so on rating scales statistics cost O(resamples x distinct values), not O(resamples x items). The work is capped by a budget (resamples x items), so summaries stay interactive on large eval sets.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Mapping, TypeVar
+
+import numpy as np
+
+K = TypeVar("K")
+
+DEFAULT_CONFIDENCE = 0.95
+MAX_RESAMPLES = 1000
+# Fewer resamples for large samples to stay in budget, but never fewer than this
+MIN_RESAMPLES = 200
+# Budget of resampled values (resamples x items) per sample
+MAX_RESAMPLED_VALUES = 2_000_000
+# Index matrices are generated in chunks of at most this many values, to bound memory
+CHUNK_VALUES = 1_000_000
+# Draw resample counts per distinct item (multinomial) rather than an index matrix, when items outnumber distinct items by this much
+MULTINOMIAL_GROUP_RATIO = 4
+# Fixed seed, so intervals don't jitter each time a summary is loaded
+DEFAULT_SEED = 0
+
+
+@dataclass
+class ConfidenceInterval:
+    low: float
+    high: float
+
+
+# A statistic maps distinct items (..., distinct items) and resample weights (resamples, distinct items) to values (resamples,). NaN where undefined.
+Statistic = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def resample_count(item_count: int) -> int:
+    return min(
+        MAX_RESAMPLES,
+        max(MIN_RESAMPLES, MAX_RESAMPLED_VALUES // max(item_count, 1)),
+    )
+
+
+def resample_indices(
+    item_count: int, resamples: int, rng: np.random.Generator
+) -> Iterator[np.ndarray]:
+    """
+    Index matrices of `resamples` total rows, each row a resample (with replacement) of item_count items.
+    """
+    chunk_rows = max(1, CHUNK_VALUES // item_count)
+    remaining = resamples
+    while remaining > 0:
+        rows = min(chunk_rows, remaining)
+        yield rng.integers(0, item_count, size=(rows, item_count))
+        remaining -= rows
+
+
+def resample_weights(
+    indices: np.ndarray, item_groups: np.ndarray, group_count: int
+) -> np.ndarray:
+    """
+    Count an index matrix (resamples x items) into weights (resamples x groups): weights[r, g] is the number of items of group g in resample r.
+
+    item_groups maps each item to its group (eg its distinct value).
+    """
+    rows = indices.shape[0]
+    # Offset each row's groups, so one bincount counts every row
+    offsets = np.arange(rows)[:, None] * group_count
+    counts = np.bincount(
+        (item_groups[indices] + offsets).ravel(), minlength=rows * group_count
+    )
+    return counts.reshape(rows, group_count).astype(np.float64)
+
+
+def percentile_interval(
+    statistics: np.ndarray, confidence: float
+) -> ConfidenceInterval | None:
+    """
+    The interval of the middle `confidence` share of the bootstrap statistics. None if the statistic is undefined (NaN) for most resamples.
+    """
+    defined = statistics[np.isfinite(statistics)]
+    if len(defined) == 0 or len(defined) * 2 < len(statistics):
+        return None
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(defined, [tail, 1 - tail])
+    return ConfidenceInterval(low=float(low), high=float(high))
+
+
+def bootstrap_intervals(
+    samples: Mapping[K, np.ndarray],
+    statistic: Statistic,
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = DEFAULT_SEED,
+) -> Dict[K, ConfidenceInterval | None]:
+    """
+    Bootstrap confidence intervals of a statistic, for several samples.
+
+    Args:
+        samples: key -> sample array, with items along the last axis. Eg (items,) of scores, or (2, items) of paired scores.
+        statistic: computes the statistic for each resample, from the sample's distinct items (..., distinct items) and the resample weights (resamples, distinct items).
+        confidence: confidence level of the intervals.
+        seed: seed for the resamples, for reproducible intervals.
+
+    Returns:
+        key -> interval. None for samples with fewer than 2 items.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+
+    intervals: Dict[K, ConfidenceInterval | None] = {}
+    for key, sample in samples.items():
+        item_count = sample.shape[-1]
+        if item_count < 2:
+            intervals[key] = None
+            continue
+        distinct, item_groups = np.unique(sample, axis=-1, return_inverse=True)
+        item_groups = item_groups.reshape(-1)
+        group_count = distinct.shape[-1]
+        rng = np.random.default_rng(seed)
+        statistics = np.concatenate(
+            [
+                statistic(distinct, weights)
+                for weights in _resample_weight_chunks(
+                    item_count, item_groups, group_count, rng
+                )
+            ]
+        )
+        intervals[key] = percentile_interval(statistics, confidence)
+    return intervals
+
+
+def _resample_weight_chunks(
+    item_count: int,
+    item_groups: np.ndarray,
+    group_count: int,
+    rng: np.random.Generator,
+) -> Iterator[np.ndarray]:
+    resamples = resample_count(item_count)
+    if group_count * MULTINOMIAL_GROUP_RATIO <= item_count:
+        # Few distinct items (eg ratings): draw each resample's counts directly. Same distribution as counting an index matrix, without building one.
+        group_probabilities = (
+            np.bincount(item_groups, minlength=group_count) / item_count
+        )
+        yield rng.multinomial(item_count, group_probabilities, size=resamples).astype(
+            np.float64
+        )
+        return
+    for indices in resample_indices(item_count, resamples, rng):
+        yield resample_weights(indices, item_groups, group_count)
+
+
+def bootstrap_mean_intervals(
+    samples: Mapping[K, np.ndarray | List[float]],
+    confidence: float = DEFAULT_CONFIDENCE,
+    seed: int = DEFAULT_SEED,
+) -> Dict[K, ConfidenceInterval | None]:
+    """
+    Bootstrap confidence intervals of the mean of each sample.
+    """
+    return bootstrap_intervals(
+        {key: np.asarray(sample, dtype=np.float64) for key, sample in samples.items()},
+        # Weighted means of every resample, as one matrix-vector product
+        lambda values, weights: weights @ values / weights.sum(axis=1),
+        confidence=confidence,
+        seed=seed,
+    )
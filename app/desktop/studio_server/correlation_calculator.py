@@ -1,9 +1,15 @@
 import math
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Mapping
 
+import numpy as np
 from scipy import stats
 
+from .bootstrap import ConfidenceInterval, bootstrap_intervals
+
+# Rows of CorrelationCalculator's score array
+MEASURED, HUMAN, NORMALIZED_MEASURED, NORMALIZED_HUMAN = range(4)
+
 
 @dataclass
 class CorrelationScore:
@@ -22,89 +28,329 @@ class CorrelationResult:
     spearman_correlation: float | None
     pearson_correlation: float | None
     kendalltau_correlation: float | None
+    # Bootstrap confidence intervals, when requested
+    spearman_correlation_ci: ConfidenceInterval | None = None
+    pearson_correlation_ci: ConfidenceInterval | None = None
 
 
 class CorrelationCalculator:
-    def __init__(self):
-        self.scores: List[CorrelationScore] = []
+    """
+    Collects (measured, human) score pairs and computes how well they agree.
 
-    def add_score(self, score: CorrelationScore):
-        self.scores.append(score)
+    Scores are stored in a preallocated float array (one row per value of CorrelationScore, grown by doubling), so metrics are vectorized numpy operations rather than Python loops over score objects.
+    """
 
-    def calculate_correlation(self) -> CorrelationResult:
-        if len(self.scores) == 0:
-            raise ValueError("No scores to calculate correlation")
+    def __init__(self, capacity: int = 64):
+        self._values = np.empty((4, max(capacity, 1)), dtype=np.float64)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def scores(self) -> List[CorrelationScore]:
+        return [
+            CorrelationScore(
+                measured_score=float(measured),
+                human_score=float(human),
+                normalized_measured_score=float(normalized_measured),
+                normalized_human_score=float(normalized_human),
+            )
+            for measured, human, normalized_measured, normalized_human in self.values.T
+        ]
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        The scores, as a (4, n) array. Rows are MEASURED, HUMAN, NORMALIZED_MEASURED and NORMALIZED_HUMAN.
+        """
+        return self._values[:, : self._count]
 
-        return CorrelationResult(
-            mean_absolute_error=self.calculate_mean_absolute_error(),
-            mean_normalized_absolute_error=self.calculate_mean_normalized_absolute_error(),
-            mean_squared_error=self.calculate_mean_squared_error(),
-            mean_normalized_squared_error=self.calculate_mean_normalized_squared_error(),
-            spearman_correlation=self.calculate_spearman_correlation(),
-            pearson_correlation=self.calculate_pearson_correlation(),
-            kendalltau_correlation=self.calculate_kendalltau_correlation(),
+    def _reserve(self, count: int):
+        capacity = self._values.shape[1]
+        if self._count + count <= capacity:
+            return
+        new_capacity = max(capacity * 2, self._count + count)
+        values = np.empty((4, new_capacity), dtype=np.float64)
+        values[:, : self._count] = self.values
+        self._values = values
+
+    def add_score(self, score: CorrelationScore):
+        self._reserve(1)
+        self._values[:, self._count] = (
+            score.measured_score,
+            score.human_score,
+            score.normalized_measured_score,
+            score.normalized_human_score,
         )
+        self._count += 1
+
+    def add_scores(
+        self,
+        measured_scores: np.ndarray | List[float],
+        human_scores: np.ndarray | List[float],
+        normalized_measured_scores: np.ndarray | List[float],
+        normalized_human_scores: np.ndarray | List[float],
+    ):
+        """
+        Add many scores at once. All arguments must have the same length.
+        """
+        rows = [
+            np.asarray(row, dtype=np.float64)
+            for row in (
+                measured_scores,
+                human_scores,
+                normalized_measured_scores,
+                normalized_human_scores,
+            )
+        ]
+        if any(row.shape != rows[0].shape or row.ndim != 1 for row in rows):
+            raise ValueError("All score arrays must have the same length")
+        values = np.stack(rows)
+        count = values.shape[1]
+        self._reserve(count)
+        self._values[:, self._count : self._count + count] = values
+        self._count += count
+
+    def calculate_correlation(self) -> CorrelationResult:
+        return calculate_correlations({"": self})[""]
 
     def calculate_mean_absolute_error(self) -> float:
-        total_absolute_error = sum(
-            abs(score.measured_score - score.human_score) for score in self.scores
-        )
-        return total_absolute_error / len(self.scores)
+        return self._mean_error(MEASURED, HUMAN, squared=False)
 
     def calculate_mean_normalized_absolute_error(self) -> float:
-        total_normalized_absolute_error = sum(
-            abs(score.normalized_measured_score - score.normalized_human_score)
-            for score in self.scores
-        )
-        return total_normalized_absolute_error / len(self.scores)
+        return self._mean_error(NORMALIZED_MEASURED, NORMALIZED_HUMAN, squared=False)
 
     def calculate_mean_squared_error(self) -> float:
-        total_squared_error = sum(
-            (score.measured_score - score.human_score) ** 2 for score in self.scores
-        )
-        return total_squared_error / len(self.scores)
+        return self._mean_error(MEASURED, HUMAN, squared=True)
 
     def calculate_mean_normalized_squared_error(self) -> float:
-        total_normalized_squared_error = sum(
-            (score.normalized_measured_score - score.normalized_human_score) ** 2
-            for score in self.scores
-        )
-        return total_normalized_squared_error / len(self.scores)
+        return self._mean_error(NORMALIZED_MEASURED, NORMALIZED_HUMAN, squared=True)
 
     def calculate_spearman_correlation(self) -> float | None:
-        if len(self.scores) < 2:
+        if self._count < 2:
             # If there is only one pair, no correlation
             return None
-        x = [score.measured_score for score in self.scores]
-        y = [score.human_score for score in self.scores]
-        result = stats.spearmanr(x, y)
-        # library doesn't support proper types
-        correlation = result.__getattribute__("correlation")
-        if math.isnan(correlation) or not isinstance(correlation, float):
-            # Very small samples may have a NaN result (unknown correlation)
-            return None
-        return correlation
+        return _correlation_or_none(
+            spearman_correlations(self.values[MEASURED], self.values[HUMAN])
+        )
 
     def calculate_pearson_correlation(self) -> float | None:
-        if len(self.scores) < 2:
-            # If there is only one pair,  no correlation
-            return None
-        x = [score.measured_score for score in self.scores]
-        y = [score.human_score for score in self.scores]
-        result = stats.pearsonr(x, y)
-        if math.isnan(result.correlation):
-            # Very small samples may have a NaN result (unknown correlation)
+        if self._count < 2:
+            # If there is only one pair, no correlation
             return None
-        return result.correlation
+        return _correlation_or_none(
+            pearson_correlations(self.values[MEASURED], self.values[HUMAN])
+        )
 
     def calculate_kendalltau_correlation(self) -> float | None:
-        if len(self.scores) < 2:
+        if self._count < 2:
             # If there is only one pair, no correlation
             return None
-        x = [score.measured_score for score in self.scores]
-        y = [score.human_score for score in self.scores]
-        result = stats.kendalltau(x, y)
-        if math.isnan(result.correlation):
-            # Very small samples may have a NaN result (unknown correlation)
-            return None
-        return result.correlation
+        result = stats.kendalltau(self.values[MEASURED], self.values[HUMAN])
+        return _correlation_or_none(result.correlation)
+
+    def _mean_error(self, measured_row: int, human_row: int, squared: bool) -> float:
+        if self._count == 0:
+            raise ValueError("No scores to calculate correlation")
+        errors = self.values[measured_row] - self.values[human_row]
+        if squared:
+            return float(np.mean(errors * errors))
+        return float(np.mean(np.abs(errors)))
+
+
+def calculate_correlations(
+    calculators: Mapping[str, CorrelationCalculator],
+    confidence: float | None = None,
+) -> Dict[str, CorrelationResult]:
+    """
+    Calculate the correlation results of several calculators (typically one per score key) in one pass.
+
+    Calculators with the same number of scores are stacked into a matrix, so error metrics, Pearson, and Spearman (rank) correlations are computed for all of them with a few vectorized operations. Kendall's tau has no batched form, and is computed per calculator.
+
+    If confidence is set, also adds bootstrap confidence intervals (at that level) for the Pearson and Spearman correlations.
+    """
+    for calculator in calculators.values():
+        if len(calculator) == 0:
+            raise ValueError("No scores to calculate correlation")
+
+    by_count: Dict[int, List[str]] = {}
+    for key, calculator in calculators.items():
+        by_count.setdefault(len(calculator), []).append(key)
+
+    results: Dict[str, CorrelationResult] = {}
+    for count, keys in by_count.items():
+        # (calculators, 4, count)
+        values = np.stack([calculators[key].values for key in keys])
+        errors = values[:, MEASURED] - values[:, HUMAN]
+        normalized_errors = values[:, NORMALIZED_MEASURED] - values[:, NORMALIZED_HUMAN]
+        mean_absolute_errors = np.mean(np.abs(errors), axis=1)
+        mean_normalized_absolute_errors = np.mean(np.abs(normalized_errors), axis=1)
+        mean_squared_errors = np.mean(errors * errors, axis=1)
+        mean_normalized_squared_errors = np.mean(
+            normalized_errors * normalized_errors, axis=1
+        )
+
+        if count < 2:
+            # If there is only one pair, no correlation
+            pearson = spearman = [None] * len(keys)
+        else:
+            pearson = [
+                _correlation_or_none(correlation)
+                for correlation in pearson_correlations(
+                    values[:, MEASURED], values[:, HUMAN]
+                )
+            ]
+            spearman = [
+                _correlation_or_none(correlation)
+                for correlation in spearman_correlations(
+                    values[:, MEASURED], values[:, HUMAN]
+                )
+            ]
+
+        for i, key in enumerate(keys):
+            results[key] = CorrelationResult(
+                mean_absolute_error=float(mean_absolute_errors[i]),
+                mean_normalized_absolute_error=float(
+                    mean_normalized_absolute_errors[i]
+                ),
+                mean_squared_error=float(mean_squared_errors[i]),
+                mean_normalized_squared_error=float(mean_normalized_squared_errors[i]),
+                spearman_correlation=spearman[i],
+                pearson_correlation=pearson[i],
+                kendalltau_correlation=calculators[
+                    key
+                ].calculate_kendalltau_correlation(),
+            )
+
+    if confidence is not None:
+        paired_scores = {
+            key: calculator.values[[MEASURED, HUMAN]]
+            for key, calculator in calculators.items()
+        }
+        pearson_intervals = bootstrap_intervals(
+            paired_scores,
+            lambda pairs, weights: weighted_pearson_correlations(
+                pairs[0], pairs[1], weights
+            ),
+            confidence=confidence,
+        )
+        spearman_intervals = bootstrap_intervals(
+            paired_scores,
+            lambda pairs, weights: weighted_spearman_correlations(
+                pairs[0], pairs[1], weights
+            ),
+            confidence=confidence,
+        )
+        for key, result in results.items():
+            result.pearson_correlation_ci = pearson_intervals[key]
+            result.spearman_correlation_ci = spearman_intervals[key]
+
+    # Same order as calculators
+    return {key: results[key] for key in calculators}
+
+
+def spearman_correlations(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Spearman correlation of x and y along the last axis: the Pearson correlation of the ranks (average rank for ties). NaN where undefined.
+    """
+    return pearson_correlations(stats.rankdata(x, axis=-1), stats.rankdata(y, axis=-1))
+
+
+def pearson_correlations(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Pearson correlation of x and y along the last axis. NaN where undefined (a constant input).
+    """
+    constant = (x.max(axis=-1) == x.min(axis=-1)) | (y.max(axis=-1) == y.min(axis=-1))
+    x_centered = x - x.mean(axis=-1, keepdims=True)
+    y_centered = y - y.mean(axis=-1, keepdims=True)
+    covariance = np.sum(x_centered * y_centered, axis=-1)
+    norms = np.sqrt(
+        np.sum(x_centered * x_centered, axis=-1)
+        * np.sum(y_centered * y_centered, axis=-1)
+    )
+    undefined = constant | (norms == 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlations = np.clip(covariance / norms, -1.0, 1.0)
+    return np.where(undefined, np.nan, correlations)
+
+
+def weighted_pearson_correlations(
+    x: np.ndarray, y: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """
+    Pearson correlation of paired values x and y (items,), once per row of weights (resamples, items), where item i is counted weights[r, i] times. Returns (resamples,), NaN where undefined.
+
+    x and y may also be per resample (resamples, items), eg ranks within each resample.
+    """
+    total_weight = weights.sum(axis=-1)
+
+    def weighted_mean(values: np.ndarray) -> np.ndarray:
+        if values.ndim == 1:
+            # Every resample at once, as a matrix-vector product
+            return weights @ values / total_weight
+        return np.einsum("ri,ri->r", weights, values) / total_weight
+
+    # Center first, so the moments below don't lose precision to large offsets
+    x = x - x.mean(axis=-1, keepdims=True)
+    y = y - y.mean(axis=-1, keepdims=True)
+    mean_x = weighted_mean(x)
+    mean_y = weighted_mean(y)
+    second_x = weighted_mean(x * x)
+    second_y = weighted_mean(y * y)
+    variance_x = second_x - mean_x * mean_x
+    variance_y = second_y - mean_y * mean_y
+    covariance = weighted_mean(x * y) - mean_x * mean_y
+    # A resample of equal values (eg one item repeated) has no correlation. Relative to the scale, to ignore rounding error.
+    undefined = (variance_x <= 1e-9 * second_x) | (variance_y <= 1e-9 * second_y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlations = np.clip(covariance / np.sqrt(variance_x * variance_y), -1.0, 1.0)
+    return np.where(undefined, np.nan, correlations)
+
+
+def weighted_spearman_correlations(
+    x: np.ndarray, y: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """
+    Spearman correlation of paired values x and y (items,), once per row of weights (resamples, items). Returns (resamples,), NaN where undefined.
+    """
+    return weighted_pearson_correlations(
+        weighted_ranks(x, weights), weighted_ranks(y, weights), weights
+    )
+
+
+def weighted_ranks(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    The rank of each item (items,) within each resample (resamples, items), with the average rank for ties. An item counted w times is w tied values.
+
+    Values are sorted once. Each resample's ranks are then cumulative sums of its weights in sorted order, without sorting the resample.
+    """
+    count = len(values)
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    positions = np.arange(count)
+    differs = sorted_values[1:] != sorted_values[:-1]
+    # The first and last sorted position of each item's group of ties
+    group_starts = np.maximum.accumulate(
+        np.where(np.concatenate([[True], differs]), positions, 0)
+    )
+    group_ends = np.minimum.accumulate(
+        np.where(np.concatenate([differs, [True]]), positions, count)[::-1]
+    )[::-1]
+
+    # cumulative[:, p] is the weight of the first p sorted items
+    cumulative = np.zeros((weights.shape[0], count + 1))
+    np.cumsum(weights[:, order], axis=1, out=cumulative[:, 1:])
+    weight_before = cumulative[:, group_starts]
+    group_weight = cumulative[:, group_ends + 1] - weight_before
+    ranks = np.empty_like(weights)
+    ranks[:, order] = weight_before + (group_weight + 1) / 2
+    return ranks
+
+
+def _correlation_or_none(correlation: float | np.ndarray) -> float | None:
+    # Very small samples may have a NaN result (unknown correlation)
+    correlation = float(correlation)
+    if math.isnan(correlation):
+        return None
+    return correlation
@@ -1,21 +1,34 @@
+import asyncio
 import json
-from typing import Any, Dict, List, Set, Tuple
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Set, Tuple
 
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from kiln_ai.adapters.eval.eval_runner import EvalRunner
+from fastapi.responses import JSONResponse, StreamingResponse
+from kiln_ai.adapters.eval.eval_runner import EvalBatchRunner, EvalRunner
+from kiln_ai.adapters.eval.job_journal import (
+    EvalJobJournal,
+    JobState,
+    JournaledJob,
+    RunState,
+)
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.adapters.eval.sequential import SequentialStopping
+from kiln_ai.adapters.eval.telemetry import EvalConfigTelemetry
 from kiln_ai.adapters.ml_model_list import ModelProviderName
 from kiln_ai.adapters.prompt_builders import prompt_builder_from_id
 from kiln_ai.datamodel import (
     BasePrompt,
     DataSource,
     DataSourceType,
+    Project,
     PromptId,
     Task,
-    TaskRun,
 )
 from kiln_ai.datamodel.basemodel import ID_TYPE
-from kiln_ai.datamodel.dataset_filters import DatasetFilterId, dataset_filter_from_id
+from kiln_ai.datamodel.dataset_filters import DatasetFilterId
 from kiln_ai.datamodel.eval import (
     Eval,
     EvalConfig,
@@ -24,21 +37,74 @@ from kiln_ai.datamodel.eval import (
     EvalRun,
     EvalTemplateId,
 )
+from kiln_ai.datamodel.eval_score_summary import EvalScoreSummary
 from kiln_ai.datamodel.json_schema import string_to_json_key
 from kiln_ai.datamodel.prompt_id import is_frozen_prompt
 from kiln_ai.datamodel.task import RunConfigProperties, TaskRunConfig
-from kiln_ai.datamodel.task_output import normalize_rating
+from kiln_ai.datamodel.task_output import TaskOutputRating, normalize_rating
+from kiln_ai.datamodel.task_run_index import TaskRunIndex
+from kiln_ai.utils.config import Config
 from kiln_ai.utils.name_generator import generate_memorable_name
+from kiln_server.run_api import FIELDS_QUERY, parse_fields_param
 from kiln_server.task_api import task_from_id
 from pydantic import BaseModel
 
+from .bootstrap import (
+    DEFAULT_CONFIDENCE,
+    ConfidenceInterval,
+    bootstrap_mean_intervals,
+)
 from .correlation_calculator import (
     CorrelationCalculator,
     CorrelationResult,
     CorrelationScore,
+    calculate_correlations,
+)
+
+logger = logging.getLogger(__name__)
+
+# Attempts at each job of runs started from the app (and resumed runs): transient provider errors shouldn't leave gaps in results
+EVAL_MAX_JOB_ATTEMPTS = 3
+
+# eval config id -> lock held by the run of it in progress (and kept while runs wait for it)
+_eval_config_run_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
 )
 
 
+def eval_configs_running(eval_config_ids: Iterable[ID_TYPE]) -> bool:
+    """
+    Whether any of the eval configs has a run in progress in this process (including a run resumed at startup).
+    """
+    return any(
+        (lock := _eval_config_run_locks.get(str(id))) is not None and lock.locked()
+        for id in eval_config_ids
+    )
+
+
+@asynccontextmanager
+async def running_eval_configs(
+    eval_config_ids: Iterable[ID_TYPE],
+) -> AsyncIterator[None]:
+    """
+    Hold the eval configs for a run, waiting for runs of them in progress to finish first. Overlapping runs would run the same jobs at once, saving duplicate results.
+    """
+    # Locked in a consistent order, so runs can't deadlock
+    locks = [
+        _eval_config_run_locks.setdefault(id, asyncio.Lock())
+        for id in sorted({str(id) for id in eval_config_ids})
+    ]
+    acquired: List[asyncio.Lock] = []
+    try:
+        for lock in locks:
+            await lock.acquire()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+
 def eval_from_id(project_id: str, task_id: str, eval_id: str) -> Eval:
     task = task_from_id(project_id, task_id)
     for eval in task.evals():
@@ -79,17 +145,51 @@ def task_run_config_from_id(
     )
 
 
-async def run_eval_runner_with_status(eval_runner: EvalRunner) -> StreamingResponse:
+def eval_sample_from_params(
+    sample_size: int | None, sample_seed: int
+) -> EvalSample | None:
+    if sample_size is None:
+        return None
+    try:
+        return EvalSample(size=sample_size, seed=sample_seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def run_eval_runner_with_status(
+    eval_runner: EvalRunner,
+    sequential_stopping: SequentialStopping | None = None,
+    use_judge_cache: bool = True,
+) -> StreamingResponse:
+    eval_config_ids = [eval_config.id for eval_config in eval_runner.eval_configs]
+    if eval_configs_running(eval_config_ids):
+        raise HTTPException(
+            status_code=409,
+            detail="This eval is already running (it may be resuming a run interrupted by a restart). Try again once it finishes.",
+        )
+
     # Yields async messages designed to be used with server sent events (SSE)
     # https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events
     async def event_generator():
-        async for progress in eval_runner.run():
-            data = {
-                "progress": progress.complete,
-                "total": progress.total,
-                "errors": progress.errors,
-            }
-            yield f"data: {json.dumps(data)}\n\n"
+        # Held for the whole run. Only waits if another run started since the check above.
+        async with running_eval_configs(eval_config_ids):
+            # The runner coalesces progress (at most 10 updates a second), so fast runs don't flood the client
+            async for progress in eval_runner.run(
+                sequential_stopping=sequential_stopping,
+                max_job_attempts=EVAL_MAX_JOB_ATTEMPTS,
+                use_judge_cache=use_judge_cache,
+            ):
+                data: Dict[str, Any] = {
+                    "progress": progress.complete,
+                    "total": progress.total,
+                    "errors": progress.errors,
+                }
+                if progress.stopped_early:
+                    data["stopped_early"] = True
+                if progress.telemetry is not None:
+                    # Job timings, model latency and token usage so far, per eval config and run config. Every few seconds, and in the final update.
+                    data["telemetry"] = progress.telemetry.model_dump()
+                yield f"data: {json.dumps(data)}\n\n"
 
         # Send the final complete message the app expects, and uses to stop listening
         yield "data: complete\n\n"
@@ -100,6 +200,51 @@ async def run_eval_runner_with_status(eval_runner: EvalRunner) -> StreamingRespo
     )
 
 
+async def resume_interrupted_eval_runs() -> None:
+    """
+    Resume eval runs interrupted by a crash or restart, as recorded in each task's job journal. Call at startup, before any runs start.
+
+    Jobs completed before the interruption aren't redone. Distributed runs still in progress (leased by processes on this or another machine sharing the project) aren't resumed. Results are saved as they complete, so nothing listens to the progress. Runs started from the app for the same eval configs are refused (or wait) while a resumed run is in progress.
+    """
+    projects = Config.shared().projects
+    if not isinstance(projects, list):
+        return
+    for project_path in projects:
+        try:
+            tasks = Project.load_from_file(project_path).tasks()
+        except Exception as e:
+            logger.warning(f"Skipping project {project_path} resuming evals: {e}")
+            continue
+        for task in tasks:
+            journal_path = EvalJobJournal.journal_path(task)
+            if journal_path is None or not journal_path.exists():
+                continue
+            journal = EvalJobJournal(journal_path)
+            try:
+                interrupted_runs = journal.interrupted_runs()
+                for run in interrupted_runs:
+                    journal.end_run(run.id, RunState.resumed)
+            finally:
+                journal.close()
+
+            for run in interrupted_runs:
+                try:
+                    eval_runner = EvalRunner.from_run_spec(task, run.spec)
+                    logger.info(
+                        f"Resuming interrupted eval run {run.id} of task {task.id}"
+                    )
+                    async with running_eval_configs(run.spec.eval_config_ids):
+                        async for _ in eval_runner.run(
+                            max_job_attempts=EVAL_MAX_JOB_ATTEMPTS
+                        ):
+                            pass
+                except Exception as e:
+                    logger.error(
+                        f"Error resuming eval run {run.id} of task {task.id}: {e}",
+                        exc_info=True,
+                    )
+
+
 class CreateEvaluatorRequest(BaseModel):
     name: str
     description: str
@@ -131,6 +276,8 @@ class RunEvalConfigRequest(BaseModel):
 
 class ScoreSummary(BaseModel):
     mean_score: float
+    # Bootstrap confidence interval of the mean, when requested
+    mean_score_ci: ConfidenceInterval | None = None
 
 
 class EvalRunResult(BaseModel):
@@ -168,27 +315,27 @@ class UpdateEvalRequest(BaseModel):
 
 
 def dataset_ids_in_filter(task: Task, filter_id: DatasetFilterId) -> Set[ID_TYPE]:
-    # Fetch all the dataset items IDs in a filter
-    filter = dataset_filter_from_id(filter_id)
-    return {run.id for run in task.runs() if filter(run)}
+    # Fetch all the dataset items IDs in a filter, from the task's run index instead of loading every run
+    with TaskRunIndex.for_task(task) as index:
+        return index.run_ids(filter_id)
 
 
-def human_score_from_task_run(
-    task_run: TaskRun,
+def human_score_from_rating(
+    rating: TaskOutputRating | None,
     score_key: str,
     score_key_to_task_requirement_id: Dict[str, ID_TYPE],
 ) -> float | None:
-    if not task_run.output.rating:
+    if not rating:
         return None
 
     human_score: float | None = None
     if score_key == "overall_rating":
-        human_score = task_run.output.rating.value
+        human_score = rating.value
     else:
         req_id = score_key_to_task_requirement_id.get(score_key, None)
         if req_id is None:
             return None
-        req_rating = task_run.output.rating.requirement_ratings.get(req_id, None)
+        req_rating = rating.requirement_ratings.get(req_id, None)
         if req_rating is not None:
             human_score = req_rating.value
 
@@ -196,7 +343,7 @@ def human_score_from_task_run(
 
 
 def count_human_evals(
-    items: List[TaskRun],
+    ratings: List[TaskOutputRating | None],
     eval: Eval,
     score_key_to_task_requirement_id: Dict[str, ID_TYPE],
 ) -> Tuple[int, int, int]:
@@ -204,13 +351,13 @@ def count_human_evals(
     fully_rated_count: int = 0
     partially_rated_count: int = 0
     not_rated_count: int = 0
-    for dataset_item in items:
+    for rating in ratings:
         has_all_scores = True
         has_any_scores = False
         for output_score in eval.output_scores:
             score_key = output_score.json_key()
-            score = human_score_from_task_run(
-                dataset_item, score_key, score_key_to_task_requirement_id
+            score = human_score_from_rating(
+                rating, score_key, score_key_to_task_requirement_id
             )
             if score is None:
                 has_all_scores = False
@@ -377,6 +524,14 @@ def connect_evals_api(app: FastAPI):
         eval_config_id: str,
         run_config_ids: list[str] = Query([]),
         all_run_configs: bool = Query(False),
+        # Compare run configs sequentially, stopping once their ranking is settled (or CIs are at most target_ci_width wide)
+        early_stopping: bool = Query(False),
+        target_ci_width: float | None = Query(None),
+        # Only run a stratified sample of this many items of the eval set (see EvalSample). Running the full set later skips them.
+        sample_size: int | None = Query(None),
+        sample_seed: int = Query(0),
+        # False for a fresh judge pass, instead of reusing judge results for identical judge requests (see JudgeCache)
+        use_judge_cache: bool = Query(True),
     ) -> StreamingResponse:
         eval_config = eval_config_from_id(project_id, task_id, eval_id, eval_config_id)
 
@@ -399,9 +554,21 @@ def connect_evals_api(app: FastAPI):
             eval_configs=[eval_config],
             run_configs=run_configs,
             eval_run_type="task_run_eval",
+            sample=eval_sample_from_params(sample_size, sample_seed),
         )
 
-        return await run_eval_runner_with_status(eval_runner)
+        sequential_stopping = None
+        if early_stopping:
+            try:
+                sequential_stopping = SequentialStopping(
+                    target_ci_width=target_ci_width
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        return await run_eval_runner_with_status(
+            eval_runner, sequential_stopping, use_judge_cache=use_judge_cache
+        )
 
     @app.post(
         "/api/projects/{project_id}/tasks/{task_id}/eval/{eval_id}/set_current_eval_config/{eval_config_id}"
@@ -426,6 +593,8 @@ def connect_evals_api(app: FastAPI):
         project_id: str,
         task_id: str,
         eval_id: str,
+        # False for a fresh judge pass, instead of reusing judge results for identical judge requests (see JudgeCache)
+        use_judge_cache: bool = Query(True),
     ) -> StreamingResponse:
         eval = eval_from_id(project_id, task_id, eval_id)
         eval_configs = eval.configs()
@@ -435,10 +604,89 @@ def connect_evals_api(app: FastAPI):
             eval_run_type="eval_config_eval",
         )
 
-        return await run_eval_runner_with_status(eval_runner)
+        return await run_eval_runner_with_status(
+            eval_runner, use_judge_cache=use_judge_cache
+        )
+
+    # JS SSE client (EventSource) doesn't work with POST requests, so we use GET, even though post would be better
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/run_evals")
+    async def run_evals(
+        project_id: str,
+        task_id: str,
+        eval_ids: list[str] = Query([]),
+        run_config_ids: list[str] = Query([]),
+        all_run_configs: bool = Query(False),
+        # Only run a stratified sample of this many items of each eval's eval set
+        sample_size: int | None = Query(None),
+        sample_seed: int = Query(0),
+        # False for a fresh judge pass, instead of reusing judge results for identical judge requests (see JudgeCache)
+        use_judge_cache: bool = Query(True),
+    ) -> StreamingResponse:
+        # Runs several evals (all of the task's, if no eval ids) as one batch, each with its current eval config, sharing one dataset scan, task output and worker pool
+        task = task_from_id(project_id, task_id)
+        if len(eval_ids) == 0:
+            evals = task.evals()
+        else:
+            evals = [eval_from_id(project_id, task_id, eval_id) for eval_id in eval_ids]
+
+        run_configs: list[TaskRunConfig] = []
+        if all_run_configs:
+            run_configs = task.run_configs()
+        else:
+            if len(run_config_ids) == 0:
+                raise HTTPException(
+                    status_code=400,
+                    detail="No run config ids provided. At least one run config id is required.",
+                )
+            run_configs = [
+                task_run_config_from_id(project_id, task_id, run_config_id)
+                for run_config_id in run_config_ids
+            ]
+
+        try:
+            eval_runner = EvalBatchRunner.for_evals(
+                evals,
+                run_configs=run_configs,
+                eval_run_type="task_run_eval",
+                sample=eval_sample_from_params(sample_size, sample_seed),
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await run_eval_runner_with_status(
+            eval_runner, use_judge_cache=use_judge_cache
+        )
+
+    @app.get(
+        "/api/projects/{project_id}/tasks/{task_id}/eval/{eval_id}/eval_config/{eval_config_id}/failed_jobs"
+    )
+    async def get_failed_eval_jobs(
+        project_id: str, task_id: str, eval_id: str, eval_config_id: str
+    ) -> list[JournaledJob]:
+        # Jobs whose last attempt failed, with the error. Rerunning the eval config retries them.
+        eval_config = eval_config_from_id(project_id, task_id, eval_id, eval_config_id)
+        task = task_from_id(project_id, task_id)
+        journal = EvalJobJournal.for_task(task)
+        if journal is None or not journal.path.exists():
+            return []
+        try:
+            return journal.jobs(eval_config.id, JobState.failed)
+        finally:
+            journal.close()
 
     @app.get(
-        "/api/projects/{project_id}/tasks/{task_id}/eval/{eval_id}/eval_config/{eval_config_id}/run_config/{run_config_id}/results"
+        "/api/projects/{project_id}/tasks/{task_id}/eval/{eval_id}/eval_config/{eval_config_id}/telemetry"
+    )
+    async def get_eval_config_telemetry(
+        project_id: str, task_id: str, eval_id: str, eval_config_id: str
+    ) -> EvalConfigTelemetry:
+        # Job timings, model latency and token usage, totalled over every run of the eval config
+        eval_config = eval_config_from_id(project_id, task_id, eval_id, eval_config_id)
+        return EvalConfigTelemetry.for_eval_config(eval_config)
+
+    @app.get(
+        "/api/projects/{project_id}/tasks/{task_id}/eval/{eval_id}/eval_config/{eval_config_id}/run_config/{run_config_id}/results",
+        response_model=EvalRunResult,
     )
     async def get_eval_run_results(
         project_id: str,
@@ -446,10 +694,32 @@ def connect_evals_api(app: FastAPI):
         eval_id: str,
         eval_config_id: str,
         run_config_id: str,
-    ) -> EvalRunResult:
+        fields: str | None = FIELDS_QUERY,
+    ) -> EvalRunResult | JSONResponse:
         eval = eval_from_id(project_id, task_id, eval_id)
         eval_config = eval_config_from_id(project_id, task_id, eval_id, eval_config_id)
         run_config = task_run_config_from_id(project_id, task_id, run_config_id)
+        if fields is not None:
+            # Partial eval runs don't match the EvalRun model, so return them directly
+            requested_fields = parse_fields_param(EvalRun, fields)
+            partial_results = [
+                partial_result
+                for partial_result in EvalRun.all_children_fields_of_parent_path(
+                    eval_config.path, requested_fields | {"task_run_config_id"}
+                )
+                if partial_result["task_run_config_id"] == run_config_id
+            ]
+            if "task_run_config_id" not in requested_fields:
+                for partial_result in partial_results:
+                    del partial_result["task_run_config_id"]
+            return JSONResponse(
+                {
+                    "results": partial_results,
+                    "eval": eval.model_dump(mode="json"),
+                    "eval_config": eval_config.model_dump(mode="json"),
+                    "run_config": run_config.model_dump(mode="json"),
+                }
+            )
         results = [
             run_result
             for run_result in eval_config.runs(readonly=True)
@@ -471,6 +741,7 @@ def connect_evals_api(app: FastAPI):
         task_id: str,
         eval_id: str,
         eval_config_id: str,
+        confidence_intervals: bool = False,
     ) -> EvalResultSummary:
         task = task_from_id(project_id, task_id)
         eval = eval_from_id(project_id, task_id, eval_id)
@@ -485,77 +756,40 @@ def connect_evals_api(app: FastAPI):
                 detail="No dataset ids in eval set filter. Add items to your dataset matching the eval set filter.",
             )
 
-        # save a copy of the expected dataset ids for each run config, we'll update each as we process each eval run
-        remaining_expected_dataset_ids: Dict[ID_TYPE, Set[ID_TYPE]] = {
-            run_config.id: set(expected_dataset_ids) for run_config in task_runs_configs
-        }
-        # Track how often we are missing scores in a eval_config. Should be 0 for a complete eval_config
-        partial_incomplete_counts: Dict[ID_TYPE, int] = {
-            run_config.id: 0 for run_config in task_runs_configs
-        }
-
-        # task_run_config_id -> output_score_json_key -> score/total for calculating the mean score
-        total_scores: Dict[ID_TYPE, Dict[str, float]] = {}
-        score_counts: Dict[ID_TYPE, Dict[str, int]] = {}
-
-        for eval_run in eval_config.runs(readonly=True):
-            if eval_run.task_run_config_id is None:
-                # This eval_run is not associated with a run_config, so we should not count it
-                continue
-            run_config_id = eval_run.task_run_config_id
-
-            # Check if we should count this eval_run. Not every eval_run has to go into the stats:
-            # - a dataset_id can be removed from the dataset filter (removed a tag)
-            # - this dataset_id was already counted (not great there are dupes, but shouldn't be double counted if there are)
-            if run_config_id not in remaining_expected_dataset_ids:
-                # This run_config is not in the eval config, so we should not count it
-                continue
-            if eval_run.dataset_id not in remaining_expected_dataset_ids[run_config_id]:
-                continue
-            else:
-                remaining_expected_dataset_ids[run_config_id].remove(
-                    eval_run.dataset_id
-                )
+        # The eval config's materialized scores (running totals per run config and score), instead of loading every eval run
+        score_keys = [output_score.json_key() for output_score in eval.output_scores]
+        with EvalScoreSummary.for_eval_config(eval_config) as score_summary:
+            run_config_scores = score_summary.run_config_scores(
+                expected_dataset_ids, score_keys
+            )
 
-            incomplete = False
-            for output_score in eval.output_scores:
-                score_key = output_score.json_key()
-                if run_config_id not in total_scores:
-                    total_scores[run_config_id] = {}
-                    score_counts[run_config_id] = {}
-                if score_key not in total_scores[run_config_id]:
-                    total_scores[run_config_id][score_key] = 0
-                    score_counts[run_config_id][score_key] = 0
-                if score_key in eval_run.scores:
-                    total_scores[run_config_id][score_key] += eval_run.scores[score_key]
-                    score_counts[run_config_id][score_key] += 1
-                else:
-                    # We're missing a required score, so this eval_run is incomplete
-                    incomplete = True
-
-            if incomplete:
-                partial_incomplete_counts[run_config_id] += 1
-
-        # Convert to score summaries
-        results: Dict[ID_TYPE, Dict[str, ScoreSummary]] = {}
-        for run_config_id, output_scores in total_scores.items():
-            results[run_config_id] = {}
-            for output_score_id, score in output_scores.items():
-                count = score_counts[run_config_id][output_score_id]
-                if count > 0:
-                    results[run_config_id][output_score_id] = ScoreSummary(
-                        mean_score=score / count
+            results: Dict[ID_TYPE, Dict[str, ScoreSummary]] = {}
+            run_config_percent_complete: Dict[ID_TYPE, float] = {}
+            for run_config in task_runs_configs:
+                scores = run_config_scores.get(run_config.id)  # type: ignore
+                if scores is None or scores.dataset_item_count == 0:
+                    run_config_percent_complete[run_config.id] = 0.0
+                    continue
+                results[run_config.id] = {
+                    score_key: ScoreSummary(mean_score=mean_score)
+                    for score_key, mean_score in scores.mean_scores.items()
+                }
+                if confidence_intervals:
+                    # Bootstrap from the per-item scores, all score keys in one batch
+                    intervals = bootstrap_mean_intervals(
+                        score_summary.run_config_item_scores(
+                            run_config.id,  # type: ignore
+                            expected_dataset_ids,
+                            list(results[run_config.id].keys()),
+                        )
                     )
-
-        # Calculate the percent of the dataset that has been processed
-        run_config_percent_complete: Dict[ID_TYPE, float] = {}
-        for run_config in task_runs_configs:
-            # Partial incomplete (missing scores), and fully incomplete (no eval_run)
-            incomplete_count = partial_incomplete_counts[run_config.id] + len(
-                remaining_expected_dataset_ids[run_config.id]
-            )
-            percent_incomplete = incomplete_count / len(expected_dataset_ids)
-            run_config_percent_complete[run_config.id] = 1 - percent_incomplete
+                    for score_key, interval in intervals.items():
+                        results[run_config.id][score_key].mean_score_ci = interval
+                # Partial incomplete (missing scores), and fully incomplete (no eval_run)
+                complete_count = scores.dataset_item_count - scores.incomplete_count
+                run_config_percent_complete[run_config.id] = complete_count / len(
+                    expected_dataset_ids
+                )
 
         return EvalResultSummary(
             results=results,
@@ -571,6 +805,7 @@ def connect_evals_api(app: FastAPI):
         project_id: str,
         task_id: str,
         eval_id: str,
+        confidence_intervals: bool = False,
     ) -> EvalConfigCompareSummary:
         task = task_from_id(project_id, task_id)
         eval = eval_from_id(project_id, task_id, eval_id)
@@ -582,11 +817,13 @@ def connect_evals_api(app: FastAPI):
             score_key = string_to_json_key(task_requirement.name)
             score_key_to_task_requirement_id[score_key] = task_requirement.id
 
-        # Build a set of all the dataset items IDs we expect to have scores for
-        # Fetch all the dataset items in a filter, and return a map of dataset_id -> TaskRun
-        filter = dataset_filter_from_id(eval.eval_configs_filter_id)
-        expected_dataset_items = {run.id: run for run in task.runs() if filter(run)}
-        expected_dataset_ids = set(expected_dataset_items.keys())
+        # Build a set of all the dataset items IDs we expect to have scores for, and their human ratings (dataset_id -> rating)
+        # From the task's run index, instead of loading every run
+        with TaskRunIndex.for_task(task) as index:
+            expected_dataset_ratings = index.ratings(
+                index.run_ids(eval.eval_configs_filter_id)
+            )
+        expected_dataset_ids = set(expected_dataset_ratings.keys())
         if len(expected_dataset_ids) == 0:
             return EvalConfigCompareSummary(
                 results={},
@@ -606,32 +843,25 @@ def connect_evals_api(app: FastAPI):
         correlation_calculators: Dict[ID_TYPE, Dict[str, CorrelationCalculator]] = {}
 
         for eval_config in eval_configs:
-            for eval_run in eval_config.runs(readonly=True):
-                dataset_item = expected_dataset_items.get(eval_run.dataset_id, None)
-                if dataset_item is None:
+            # The eval config's materialized scores, instead of loading every eval run. One set of scores per dataset item.
+            with EvalScoreSummary.for_eval_config(eval_config) as score_summary:
+                scores_by_dataset_id = score_summary.scores_by_dataset_id()
+            for dataset_id, eval_scores in scores_by_dataset_id.items():
+                if dataset_id not in expected_dataset_ratings:
                     # A dataset_id can be removed from the dataset filter (ran previously, then removed the tag to remove it from the eval config set filter)
                     # A dataset_id could be for an run_config, not for comparing eval at all
                     continue
-
-                # Check if we should count this eval_run. Not every eval_run has to go into the stats:
-                # Example: this dataset_id was already counted (not great there are dupes, but shouldn't be double counted if there are)
-                if (
-                    eval_run.dataset_id
-                    not in remaining_expected_dataset_ids[eval_config.id]
-                ):
-                    continue
-                else:
-                    remaining_expected_dataset_ids[eval_config.id].remove(
-                        eval_run.dataset_id
-                    )
+                remaining_expected_dataset_ids[eval_config.id].discard(dataset_id)
 
                 for output_score in eval.output_scores:
                     score_key = output_score.json_key()
-                    eval_score: float | None = eval_run.scores.get(score_key, None)
+                    eval_score: float | None = eval_scores.get(score_key, None)
 
                     # Fetch the human eval score from the dataset item
-                    human_score = human_score_from_task_run(
-                        dataset_item, score_key, score_key_to_task_requirement_id
+                    human_score = human_score_from_rating(
+                        expected_dataset_ratings[dataset_id],
+                        score_key,
+                        score_key_to_task_requirement_id,
                     )
 
                     if human_score is None or eval_score is None:
@@ -663,20 +893,14 @@ def connect_evals_api(app: FastAPI):
                         )
                     )
 
-        # Convert to score summaries
-        results: Dict[ID_TYPE, Dict[str, CorrelationResult]] = {}
-        for eval_config_id in correlation_calculators.keys():
-            results[eval_config_id] = {}
-            for score_key in correlation_calculators[eval_config_id].keys():
-                calculator = correlation_calculators[eval_config_id].get(
-                    score_key, None
-                )
-                if calculator is None:
-                    # No scores to calculate correlation for this pair
-                    continue
-
-                correlation_result = calculator.calculate_correlation()
-                results[eval_config_id][score_key] = correlation_result
+        # Convert to score summaries, all of an eval config's scores in one batch
+        results: Dict[ID_TYPE, Dict[str, CorrelationResult]] = {
+            eval_config_id: calculate_correlations(
+                calculators,
+                confidence=DEFAULT_CONFIDENCE if confidence_intervals else None,
+            )
+            for eval_config_id, calculators in correlation_calculators.items()
+        }
 
         # Calculate the percent of the dataset that has been processed
         eval_config_percent_complete: Dict[ID_TYPE, float] = {}
@@ -687,7 +911,7 @@ def connect_evals_api(app: FastAPI):
 
         # Count how many dataset items have human evals
         fully_rated_count, partially_rated_count, not_rated_count = count_human_evals(
-            list(expected_dataset_items.values()),
+            list(expected_dataset_ratings.values()),
             eval,
             score_key_to_task_requirement_id,
         )
@@ -35,7 +35,7 @@ from kiln_ai.datamodel.dataset_split import (
 )
 from kiln_ai.utils.name_generator import generate_memorable_name
 from kiln_server.task_api import task_from_id
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class FinetuneProviderModel(BaseModel):
@@ -78,6 +78,8 @@ class CreateDatasetSplitRequest(BaseModel):
     filter_id: DatasetFilterId
     name: str | None = None
     description: str | None = None
+    # If set, keep runs with near-duplicate inputs in the same split (MinHash Jaccard similarity, 0-1)
+    near_duplicate_threshold: float | None = Field(default=None, gt=0.0, le=1.0)
 
 
 class CreateFinetuneRequest(BaseModel):
@@ -235,6 +237,7 @@ def connect_fine_tune_api(app: FastAPI):
             split_definitions,
             filter_id=request.filter_id,
             description=request.description,
+            near_duplicate_threshold=request.near_duplicate_threshold,
         )
         dataset_split.save_to_file()
         return dataset_split
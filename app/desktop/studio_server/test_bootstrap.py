@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from app.desktop.studio_server import bootstrap
+from app.desktop.studio_server.bootstrap import (
+    ConfidenceInterval,
+    bootstrap_intervals,
+    bootstrap_mean_intervals,
+    percentile_interval,
+    resample_count,
+    resample_indices,
+    resample_weights,
+)
+from app.desktop.studio_server.correlation_calculator import (
+    CorrelationCalculator,
+    calculate_correlations,
+)
+
+
+def test_resample_count_budget():
+    assert resample_count(10) == bootstrap.MAX_RESAMPLES
+    assert resample_count(10_000) == 200
+    assert resample_count(1_000_000) == bootstrap.MIN_RESAMPLES
+
+
+def test_resample_indices_chunks():
+    rng = np.random.default_rng(0)
+    item_count = bootstrap.CHUNK_VALUES // 3
+    chunks = list(resample_indices(item_count, 7, rng))
+    # Chunked to bound memory, covering every resample
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(chunk.shape[1] == item_count for chunk in chunks)
+    assert all(chunk.min() >= 0 and chunk.max() < item_count for chunk in chunks)
+
+
+def test_resample_weights():
+    indices = np.array([[0, 0, 1, 3], [2, 3, 3, 3]])
+    # Items 0 and 1 are the same value (group 0)
+    item_groups = np.array([0, 0, 1, 2])
+    weights = resample_weights(indices, item_groups, 3)
+    assert weights.tolist() == [[3, 0, 1], [0, 1, 3]]
+
+
+def test_percentile_interval():
+    statistics = np.arange(1001, dtype=np.float64)
+    interval = percentile_interval(statistics, 0.9)
+    assert interval is not None
+    assert interval.low == pytest.approx(50.0)
+    assert interval.high == pytest.approx(950.0)
+
+    # Mostly undefined statistics have no interval
+    statistics[:600] = np.nan
+    assert percentile_interval(statistics, 0.9) is None
+    assert percentile_interval(np.array([]), 0.9) is None
+
+
+def test_mean_intervals_cover_mean():
+    rng = np.random.default_rng(1)
+    samples = {
+        "narrow": rng.normal(3.0, 0.1, size=200),
+        "wide": rng.normal(3.0, 2.0, size=200),
+        "small": rng.normal(3.0, 1.0, size=30),
+        # Few distinct values, resampled per distinct value
+        "ratings": rng.integers(1, 6, size=200).astype(np.float64),
+        "single": [4.0],
+    }
+    intervals = bootstrap_mean_intervals(samples)
+    assert list(intervals.keys()) == list(samples.keys())
+    assert intervals["single"] is None
+    for key in ["narrow", "wide", "small", "ratings"]:
+        interval = intervals[key]
+        assert interval is not None
+        assert interval.low < np.mean(samples[key]) < interval.high
+    narrow, wide = intervals["narrow"], intervals["wide"]
+    assert narrow is not None and wide is not None
+    assert narrow.high - narrow.low < wide.high - wide.low
+
+    # Close to the normal approximation: mean +/- 1.96 standard errors
+    for key in ["wide", "ratings"]:
+        interval = intervals[key]
+        assert interval is not None
+        standard_error = np.std(samples[key], ddof=1) / np.sqrt(200)
+        assert interval.high - interval.low == pytest.approx(
+            2 * 1.96 * standard_error, rel=0.15
+        )
+
+
+def test_intervals_reproducible():
+    rng = np.random.default_rng(2)
+    samples = {key: rng.normal(0, 1, size=50) for key in ["a", "b", "c"]}
+    intervals = bootstrap_mean_intervals(samples, seed=5)
+    assert intervals == bootstrap_mean_intervals(samples, seed=5)
+    assert intervals != bootstrap_mean_intervals(samples, seed=6)
+
+
+def test_bootstrap_intervals_paired_samples():
+    x = np.arange(20, dtype=np.float64)
+
+    def max_pair_difference(pairs, weights):
+        # Resampling keeps pairs together: y - 2x is 0 for every pair in every resample
+        differences = pairs[1] - 2 * pairs[0]
+        return np.where(weights > 0, differences, -np.inf).max(axis=1)
+
+    intervals = bootstrap_intervals(
+        {"paired": np.stack([x, x * 2])}, max_pair_difference
+    )
+    assert intervals["paired"] == ConfidenceInterval(low=0.0, high=0.0)
+
+    with pytest.raises(ValueError, match="confidence"):
+        bootstrap_mean_intervals({"a": x}, confidence=1.0)
+
+
+@pytest.mark.benchmark
+def test_benchmark_correlation_intervals(benchmark):
+    rng = np.random.default_rng(0)
+    calculators = {}
+    for score_key in ["overall_rating", "accuracy", "relevance"]:
+        measured = rng.integers(1, 6, size=10_000).astype(np.float64)
+        human = np.clip(measured + rng.integers(-1, 2, size=10_000), 1, 5)
+        calculator = CorrelationCalculator()
+        calculator.add_scores(measured, human, (measured - 1) / 4, (human - 1) / 4)
+        calculators[score_key] = calculator
+
+    start_time = benchmark._timer()
+    results = calculate_correlations(calculators, confidence=0.95)
+    elapsed = benchmark._timer() - start_time
+    assert all(result.pearson_correlation_ci for result in results.values())
+
+    # ~0.1s for 3 keys of 10k ratings on a MBP. Lower bar here for CI.
+    if elapsed > 2:
+        pytest.fail(f"Took {elapsed:.2f}s, expected less than 2s")
@@ -1,8 +1,11 @@
+import numpy as np
 import pytest
+from scipy import stats
 
 from app.desktop.studio_server.correlation_calculator import (
     CorrelationCalculator,
     CorrelationScore,
+    calculate_correlations,
 )
 
 
@@ -244,3 +247,163 @@ class TestCorrelationCalculator:
         assert result.spearman_correlation == spearman
         assert result.pearson_correlation == pearson
         assert result.kendalltau_correlation == kendall
+
+    def test_add_scores_grows_storage(self, high_correlation_data):
+        """Test adding scores in bulk, past the initial capacity"""
+        calculator = CorrelationCalculator(capacity=2)
+        for score in high_correlation_data[:3]:
+            calculator.add_score(score)
+        rest = high_correlation_data[3:]
+        calculator.add_scores(
+            [score.measured_score for score in rest],
+            [score.human_score for score in rest],
+            [score.normalized_measured_score for score in rest],
+            [score.normalized_human_score for score in rest],
+        )
+        assert len(calculator) == 10
+        assert calculator.scores == high_correlation_data
+
+        with pytest.raises(ValueError, match="same length"):
+            calculator.add_scores([1.0], [1.0, 2.0], [0.0], [0.0])
+
+    def test_matches_scipy(self):
+        """Test the vectorized metrics match scipy and the plain formulas, with ties"""
+        rng = np.random.default_rng(0)
+        measured = rng.integers(1, 6, size=200).astype(float)
+        human = np.clip(measured + rng.normal(0, 1, size=200).round(), 1, 5)
+        calculator = CorrelationCalculator()
+        calculator.add_scores(measured, human, (measured - 1) / 4, (human - 1) / 4)
+
+        result = calculator.calculate_correlation()
+        assert result.mean_absolute_error == pytest.approx(
+            np.mean(np.abs(measured - human))
+        )
+        assert result.mean_normalized_squared_error == pytest.approx(
+            np.mean(((measured - human) / 4) ** 2)
+        )
+        assert result.pearson_correlation == pytest.approx(
+            stats.pearsonr(measured, human).correlation
+        )
+        assert result.spearman_correlation == pytest.approx(
+            stats.spearmanr(measured, human).correlation
+        )
+        assert result.kendalltau_correlation == pytest.approx(
+            stats.kendalltau(measured, human).correlation
+        )
+
+    def test_constant_input_has_no_correlation(self):
+        """Test that a constant input gives no correlation, rather than NaN"""
+        calculator = CorrelationCalculator()
+        calculator.add_scores([0.1] * 3, [1.0, 2.0, 3.0], [0.5] * 3, [0.0, 0.5, 1.0])
+        result = calculator.calculate_correlation()
+        assert result.pearson_correlation is None
+        assert result.spearman_correlation is None
+        assert result.kendalltau_correlation is None
+        assert result.mean_absolute_error == pytest.approx(1.9)
+
+    def test_calculate_correlations_batch(
+        self, high_correlation_data, inverse_correlation_data, two_data_points
+    ):
+        """Test batched results match each calculator's own results"""
+        calculators = {
+            "high": self.setup_calculator_with_data(high_correlation_data),
+            "inverse": self.setup_calculator_with_data(inverse_correlation_data),
+            # Different length, computed in its own batch
+            "two": self.setup_calculator_with_data(two_data_points),
+        }
+        results = calculate_correlations(calculators)
+        assert results.keys() == calculators.keys()
+        for key, calculator in calculators.items():
+            expected = calculator.calculate_correlation()
+            assert results[key] == pytest.approx(expected)
+            assert results[key].spearman_correlation == pytest.approx(
+                calculator.calculate_spearman_correlation()
+            )
+            assert results[key].pearson_correlation == pytest.approx(
+                calculator.calculate_pearson_correlation()
+            )
+
+        with pytest.raises(ValueError, match="No scores"):
+            calculate_correlations({"empty": CorrelationCalculator()})
+
+
+@pytest.mark.benchmark
+def test_benchmark_correlation_100k(benchmark):
+    rng = np.random.default_rng(0)
+    count = 100_000
+    score_keys = ["overall_rating", "accuracy", "relevance"]
+    data = {}
+    for score_key in score_keys:
+        measured = rng.integers(1, 6, size=count).astype(float)
+        human = np.clip(measured + rng.normal(0, 1, size=count).round(), 1, 5)
+        data[score_key] = (measured, human, (measured - 1) / 4, (human - 1) / 4)
+
+    def add_and_calculate():
+        calculators = {}
+        for score_key, (measured, human, norm_measured, norm_human) in data.items():
+            calculator = CorrelationCalculator()
+            for i in range(count):
+                calculator.add_score(
+                    CorrelationScore(
+                        measured_score=measured[i],
+                        human_score=human[i],
+                        normalized_measured_score=norm_measured[i],
+                        normalized_human_score=norm_human[i],
+                    )
+                )
+            calculators[score_key] = calculator
+        return calculate_correlations(calculators)
+
+    start_time = benchmark._timer()
+    results = add_and_calculate()
+    elapsed = benchmark._timer() - start_time
+    assert results["overall_rating"].pearson_correlation > 0.5
+
+    # About 1s for 300k scores (3 keys of 100k), mostly adding scores one at a time. The list
+    # based calculator took ~1.7s, ~0.8s of it computing metrics (now ~0.15s). Lower bar here for CI.
+    if elapsed > 10:
+        pytest.fail(
+            f"Took {elapsed:.2f}s, expected less than 10s for 100k scores x 3 keys"
+        )
+
+
+def test_correlation_confidence_intervals():
+    rng = np.random.default_rng(0)
+    measured = rng.normal(3, 1, size=300)
+    human = measured + rng.normal(0, 1, size=300)
+    calculator = CorrelationCalculator()
+    calculator.add_scores(measured, human, measured / 5, human / 5)
+    constant = CorrelationCalculator()
+    constant.add_scores([3.0] * 10, range(10), [0.5] * 10, range(10))
+
+    results = calculate_correlations(
+        {"score": calculator, "constant": constant}, confidence=0.95
+    )
+    result = results["score"]
+    assert result.pearson_correlation_ci is not None
+    assert result.spearman_correlation_ci is not None
+    assert (
+        result.pearson_correlation_ci.low
+        < result.pearson_correlation
+        < result.pearson_correlation_ci.high
+    )
+    assert (
+        result.spearman_correlation_ci.low
+        < result.spearman_correlation
+        < result.spearman_correlation_ci.high
+    )
+    # Roughly the Fisher z interval width for r~0.7, n=300
+    assert (
+        0.05
+        < result.pearson_correlation_ci.high - result.pearson_correlation_ci.low
+        < 0.2
+    )
+    # Undefined correlations have no interval
+    assert results["constant"].pearson_correlation_ci is None
+    assert results["constant"].spearman_correlation_ci is None
+
+    # Not computed unless requested
+    assert (
+        calculate_correlations({"score": calculator})["score"].pearson_correlation_ci
+        is None
+    )
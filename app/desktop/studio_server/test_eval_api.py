@@ -1,3 +1,4 @@
+import asyncio
 import json
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
@@ -7,6 +8,16 @@ import pytest
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
+from kiln_ai.adapters.eval.eval_runner import EvalBatchRunner, EvalProgress
+from kiln_ai.adapters.eval.job_journal import (
+    EvalJobJournal,
+    EvalRunSpec,
+    RunState,
+    job_key,
+)
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.adapters.eval.sequential import SequentialStopping
+from kiln_ai.adapters.eval.telemetry import EvalRunTelemetry
 from kiln_ai.adapters.ml_model_list import ModelProviderName
 from kiln_ai.datamodel import (
     BasePrompt,
@@ -29,13 +40,18 @@ from kiln_ai.datamodel.eval import (
     EvalRun,
     EvalTemplateId,
 )
+from kiln_ai.datamodel.eval_score_summary import EvalScoreSummary, SummarizedEvalRun
 from kiln_ai.datamodel.task import RunConfigProperties, TaskRunConfig
 
 from app.desktop.studio_server.eval_api import (
+    EVAL_MAX_JOB_ATTEMPTS,
     CreateEvalConfigRequest,
     CreateEvaluatorRequest,
     connect_evals_api,
     eval_config_from_id,
+    eval_configs_running,
+    resume_interrupted_eval_runs,
+    running_eval_configs,
     task_run_config_from_id,
 )
 
@@ -405,9 +421,9 @@ async def test_run_eval_config(
 
     # Mock progress updates
     progress_updates = [
-        Mock(complete=1, total=3, errors=0),
-        Mock(complete=2, total=3, errors=0),
-        Mock(complete=3, total=3, errors=0),
+        EvalProgress(complete=1, total=3, errors=0),
+        EvalProgress(complete=2, total=3, errors=0),
+        EvalProgress(complete=3, total=3, errors=0),
     ]
 
     # Create async generator for mock progress
@@ -423,6 +439,7 @@ async def test_run_eval_config(
     ):
         mock_run_config_from_id.return_value = mock_run_config
         mock_eval_runner = Mock()
+        mock_eval_runner.eval_configs = [mock_eval_config]
         mock_eval_runner.run.return_value = mock_run()
         MockEvalRunner.return_value = mock_eval_runner
 
@@ -452,6 +469,102 @@ async def test_run_eval_config(
         assert messages[-1] == "data: complete"
 
 
+@pytest.mark.asyncio
+async def test_run_eval_config_early_stopping(
+    client, mock_task_from_id, mock_task, mock_eval, mock_eval_config, mock_run_config
+):
+    mock_task_from_id.return_value = mock_task
+
+    async def mock_run():
+        yield EvalProgress(complete=0, total=10, errors=0)
+        yield EvalProgress(complete=4, total=4, errors=0, stopped_early=True)
+
+    with (
+        patch(
+            "app.desktop.studio_server.eval_api.task_run_config_from_id"
+        ) as mock_run_config_from_id,
+        patch("app.desktop.studio_server.eval_api.EvalRunner") as MockEvalRunner,
+    ):
+        mock_run_config_from_id.return_value = mock_run_config
+        mock_eval_runner = Mock()
+        mock_eval_runner.eval_configs = [mock_eval_config]
+        mock_eval_runner.run.return_value = mock_run()
+        MockEvalRunner.return_value = mock_eval_runner
+
+        response = client.get(
+            "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/run_task_run_eval",
+            params={
+                "run_config_ids": ["run_config1", "run_config2"],
+                "early_stopping": True,
+                "target_ci_width": 0.5,
+            },
+        )
+        assert response.status_code == 200
+        messages = [msg for msg in response.iter_lines() if msg]
+        assert json.loads(messages[0].split("data: ")[1]) == {
+            "progress": 0,
+            "total": 10,
+            "errors": 0,
+        }
+        assert json.loads(messages[1].split("data: ")[1])["stopped_early"] is True
+        assert messages[-1] == "data: complete"
+
+        mock_eval_runner.run.assert_called_once_with(
+            sequential_stopping=SequentialStopping(target_ci_width=0.5),
+            max_job_attempts=EVAL_MAX_JOB_ATTEMPTS,
+            use_judge_cache=True,
+        )
+
+
+@pytest.mark.asyncio
+async def test_run_eval_config_streams_telemetry(
+    client, mock_task_from_id, mock_task, mock_eval, mock_eval_config, mock_run_config
+):
+    mock_task_from_id.return_value = mock_task
+    run_telemetry = EvalRunTelemetry()
+    run_telemetry.record_job("eval_config1", "run_config1", True, 2.0, 0.5)
+
+    async def mock_run():
+        yield EvalProgress(
+            complete=1, total=1, errors=0, telemetry=run_telemetry.snapshot()
+        )
+
+    with (
+        patch(
+            "app.desktop.studio_server.eval_api.task_run_config_from_id"
+        ) as mock_run_config_from_id,
+        patch("app.desktop.studio_server.eval_api.EvalRunner") as MockEvalRunner,
+    ):
+        mock_run_config_from_id.return_value = mock_run_config
+        mock_eval_runner = Mock()
+        mock_eval_runner.eval_configs = [mock_eval_config]
+        mock_eval_runner.run.return_value = mock_run()
+        MockEvalRunner.return_value = mock_eval_runner
+
+        response = client.get(
+            "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/run_task_run_eval",
+            params={"run_config_ids": ["run_config1"]},
+        )
+        assert response.status_code == 200
+        messages = [msg for msg in response.iter_lines() if msg]
+        telemetry = json.loads(messages[0].split("data: ")[1])["telemetry"]
+        run_config_telemetry = telemetry["run_configs"]["run_config1"]
+        assert run_config_telemetry["jobs"] == 1
+        assert run_config_telemetry["wall_time"]["sum"] == 2.0
+        assert telemetry["eval_configs"]["eval_config1"]["queue_wait"]["max"] == 0.5
+
+        # Invalid settings are a bad request
+        response = client.get(
+            "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/run_task_run_eval",
+            params={
+                "run_config_ids": ["run_config1"],
+                "early_stopping": True,
+                "target_ci_width": -1,
+            },
+        )
+        assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_run_eval_config_no_run_configs_error(
     client, mock_task_from_id, mock_task, mock_eval, mock_eval_config
@@ -562,11 +675,30 @@ def mock_eval_config_for_score_summary():
     return config
 
 
+def summary_from_runs(eval_config) -> EvalScoreSummary:
+    # Build the score summary from an eval config's runs, as a full scan would
+    summary = EvalScoreSummary()
+    for eval_run in eval_config.runs(readonly=True):
+        summary.add(
+            eval_run.id,
+            SummarizedEvalRun(
+                dataset_id=eval_run.dataset_id,
+                task_run_config_id=eval_run.task_run_config_id,
+                scores=eval_run.scores,
+            ),
+        )
+    return summary
+
+
 @pytest.mark.asyncio
 async def test_get_eval_config_score_summary(
     client, mock_eval_for_score_summary, mock_eval_config_for_score_summary
 ):
     with (
+        patch(
+            "app.desktop.studio_server.eval_api.EvalScoreSummary.for_eval_config",
+            side_effect=summary_from_runs,
+        ),
         patch("app.desktop.studio_server.eval_api.eval_from_id") as mock_eval_from_id,
         patch(
             "app.desktop.studio_server.eval_api.dataset_ids_in_filter"
@@ -640,6 +772,23 @@ async def test_get_eval_config_score_summary(
         mock_eval_config_for_score_summary.runs.assert_called_once_with(readonly=True)
         mock_dataset_ids_in_filter.assert_called_once_with(mock_task, "tag::eval_set")
 
+        # Confidence intervals are only computed when requested
+        assert results["run1"]["accuracy"]["mean_score_ci"] is None
+        response = client.get(
+            "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/score_summary?confidence_intervals=true"
+        )
+        assert response.status_code == 200
+        ci_results = response.json()["results"]
+        assert ci_results["run1"]["accuracy"]["mean_score"] == 0.7
+        # Resampled means of (0.8, 0.6) are 0.6, 0.7 or 0.8
+        assert ci_results["run1"]["accuracy"]["mean_score_ci"] == {
+            "low": pytest.approx(0.6),
+            "high": pytest.approx(0.8),
+        }
+        # A single item has no interval
+        assert ci_results["run2"]["accuracy"]["mean_score_ci"] is None
+        assert ci_results["run3"] == {}
+
 
 @pytest.mark.asyncio
 async def test_get_eval_run_results(
@@ -705,6 +854,63 @@ async def test_get_eval_run_results(
     assert response.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_get_eval_run_results_with_fields(
+    client,
+    mock_task_from_id,
+    mock_task,
+    mock_eval,
+    mock_eval_config,
+    mock_run_config,
+):
+    mock_task_from_id.return_value = mock_task
+
+    eval_run = EvalRun(
+        task_run_config_id="run_config1",
+        scores={"score1": 3.0, "overall_rating": 1.0},
+        input="input",
+        output="output",
+        dataset_id="dataset_id1",
+        parent=mock_eval_config,
+    )
+    eval_run.save_to_file()
+    # A run for another run config, which should be filtered out
+    EvalRun(
+        task_run_config_id="other_run_config",
+        scores={"score1": 3.0, "overall_rating": 1.0},
+        input="input",
+        output="output",
+        dataset_id="dataset_id2",
+        parent=mock_eval_config,
+    ).save_to_file()
+
+    response = client.get(
+        "/api/projects/project1/tasks/task1/eval/eval1"
+        "/eval_config/eval_config1/run_config/run_config1/results",
+        params={"fields": "scores,dataset_id"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["results"] == [
+        {
+            "id": eval_run.id,
+            "dataset_id": "dataset_id1",
+            "scores": {"score1": 3.0, "overall_rating": 1.0},
+        }
+    ]
+    assert data["eval"]["id"] == mock_eval.id
+    assert data["eval_config"]["id"] == mock_eval_config.id
+    assert data["run_config"]["id"] == mock_run_config.id
+
+    response = client.get(
+        "/api/projects/project1/tasks/task1/eval/eval1"
+        "/eval_config/eval_config1/run_config/run_config1/results",
+        params={"fields": "scores,bogus"},
+    )
+    assert response.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_get_eval_config_compare_summary(
     client,
@@ -906,6 +1112,8 @@ async def test_get_eval_config_compare_summary(
             "spearman_correlation": None,  # Not enough data
             "pearson_correlation": None,
             "kendalltau_correlation": None,
+            "spearman_correlation_ci": None,
+            "pearson_correlation_ci": None,
         },
         "score1": {
             "mean_squared_error": 2.25,  # error (3.5-5.0)^2
@@ -915,6 +1123,8 @@ async def test_get_eval_config_compare_summary(
             "spearman_correlation": None,  # Not enough data
             "pearson_correlation": None,  # Not enough data
             "kendalltau_correlation": None,  # Not enough data
+            "spearman_correlation_ci": None,
+            "pearson_correlation_ci": None,
         },
     }
     # 1 of total_in_dataset eval configs are are in ec1 test
@@ -930,15 +1140,19 @@ async def test_get_eval_config_compare_summary(
             "spearman_correlation": None,
             "pearson_correlation": None,
             "kendalltau_correlation": None,
+            "spearman_correlation_ci": None,
+            "pearson_correlation_ci": None,
         },
         "score1": {
             "mean_squared_error": 2.5,  # (1^2+2^2)/2
             "mean_absolute_error": 1.5,  # (1+2)/2
             "mean_normalized_squared_error": 0.15625,  # (0.25^2 + 0.5^2) / 2
             "mean_normalized_absolute_error": 0.375,  # (0.25 + 0.5) / 2
-            "spearman_correlation": 0.9999999999999999,
+            "spearman_correlation": 1,
             "pearson_correlation": 1,
             "kendalltau_correlation": 1,
+            "spearman_correlation_ci": None,
+            "pearson_correlation_ci": None,
         },
     }
     # 2 of total_in_dataset eval configs are are in ec2 test
@@ -954,6 +1168,8 @@ async def test_get_eval_config_compare_summary(
             "spearman_correlation": None,
             "pearson_correlation": None,
             "kendalltau_correlation": None,
+            "spearman_correlation_ci": None,
+            "pearson_correlation_ci": None,
         },
     }
     # 2 of total_in_dataset eval configs are are in ec2 test
@@ -966,6 +1182,23 @@ async def test_get_eval_config_compare_summary(
     # Test case 5: Check skipping eval run lowers the percent complete
     assert eval_config_percent_complete["ec5"] == pytest.approx(0 / total_in_dataset)
 
+    # With confidence intervals, point estimates are unchanged
+    response = client.get(
+        "/api/projects/project1/tasks/task1/eval/eval1/eval_configs_score_summary?confidence_intervals=true"
+    )
+    assert response.status_code == 200
+    ci_results = response.json()["results"]
+    assert ci_results.keys() == results.keys()
+    for eval_config_id, scores in ci_results.items():
+        for score_key, result in scores.items():
+            expected = results[eval_config_id][score_key]
+            for key, value in result.items():
+                if not key.endswith("_ci"):
+                    assert value == expected[key]
+    # Too few items for an interval
+    assert ci_results["ec1"]["overall_rating"]["pearson_correlation_ci"] is None
+    assert ci_results["ec3"]["overall_rating"]["spearman_correlation_ci"] is None
+
 
 @pytest.mark.asyncio
 async def test_run_eval_config_eval(
@@ -984,9 +1217,10 @@ async def test_run_eval_config_eval(
         # Set up the mock to return our mock response
         mock_run_eval.return_value = mock_response
 
-        # Call the endpoint
+        # Call the endpoint, asking for a fresh judge pass
         response = client.get(
-            "/api/projects/project1/tasks/task1/eval/eval1/run_eval_config_eval"
+            "/api/projects/project1/tasks/task1/eval/eval1/run_eval_config_eval",
+            params={"use_judge_cache": False},
         )
 
         # Verify the response
@@ -1003,6 +1237,81 @@ async def test_run_eval_config_eval(
         assert eval_runner.eval_configs[0].id == mock_eval_config.id
         assert eval_runner.run_configs is None
         assert eval_runner.eval_run_type == "eval_config_eval"
+        assert mock_run_eval.call_args.kwargs["use_judge_cache"] is False
+
+
+@pytest.mark.asyncio
+async def test_run_evals(
+    client, mock_task_from_id, mock_task, mock_eval, mock_eval_config, mock_run_config
+):
+    mock_eval.current_config_id = mock_eval_config.id
+    mock_eval.save_to_file()
+    eval2 = Eval(
+        id="eval2",
+        name="Second Eval",
+        output_scores=[EvalOutputScore(name="score1", type="five_star")],
+        eval_set_filter_id="tag::eval_set_2",
+        eval_configs_filter_id="tag::golden_2",
+        current_config_id="eval2_config",
+        parent=mock_task,
+    )
+    eval2.save_to_file()
+    EvalConfig(
+        id="eval2_config",
+        name="Second Eval Config",
+        config_type=EvalConfigType.g_eval,
+        properties={"eval_steps": ["step1"]},
+        parent=eval2,
+        model_name="gpt-4",
+        model_provider="openai",
+    ).save_to_file()
+    # No current eval config: skipped
+    Eval(
+        id="eval3",
+        name="Third Eval",
+        output_scores=[EvalOutputScore(name="score1", type="five_star")],
+        eval_set_filter_id="tag::eval_set",
+        eval_configs_filter_id="tag::golden",
+        parent=mock_task,
+    ).save_to_file()
+
+    mock_response = StreamingResponse(
+        content=iter([b"data: test\n\n"]), media_type="text/event-stream"
+    )
+    with patch(
+        "app.desktop.studio_server.eval_api.run_eval_runner_with_status"
+    ) as mock_run_eval:
+        mock_run_eval.return_value = mock_response
+        response = client.get(
+            "/api/projects/project1/tasks/task1/run_evals",
+            params={"all_run_configs": True},
+        )
+        assert response.status_code == 200
+
+        eval_runner = mock_run_eval.call_args[0][0]
+        assert isinstance(eval_runner, EvalBatchRunner)
+        assert [eval.id for eval in eval_runner.evals] == ["eval1", "eval2"]
+        assert sorted(config.id for config in eval_runner.eval_configs) == [
+            "eval2_config",
+            "eval_config1",
+        ]
+        assert [config.id for config in eval_runner.run_configs] == ["run_config1"]
+        assert eval_runner.eval_run_type == "task_run_eval"
+        assert mock_run_eval.call_args.kwargs["use_judge_cache"] is True
+
+        # Only the eval without a current config: nothing to run
+        response = client.get(
+            "/api/projects/project1/tasks/task1/run_evals",
+            params={"eval_ids": ["eval3"], "run_config_ids": ["run_config1"]},
+        )
+        assert response.status_code == 400
+        assert "No eval configs" in response.json()["detail"]
+
+        response = client.get(
+            "/api/projects/project1/tasks/task1/run_evals",
+            params={"eval_ids": ["eval1"]},
+        )
+        assert response.status_code == 400
 
 
 @pytest.mark.asyncio
@@ -1113,3 +1422,248 @@ def test_delete_eval_not_found(client):
     # Verify the response
     assert response.status_code == 404
     assert response.json()["detail"] == "Eval not found. ID: nonexistent_eval"
+
+
+def test_get_failed_eval_jobs(
+    client, mock_task_from_id, mock_task, mock_eval, mock_eval_config
+):
+    url = f"/api/projects/project1/tasks/task1/eval/{mock_eval.id}/eval_config/{mock_eval_config.id}/failed_jobs"
+    with patch(
+        "app.desktop.studio_server.eval_api.eval_config_from_id",
+        return_value=mock_eval_config,
+    ):
+        # No journal yet
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json() == []
+
+        journal = EvalJobJournal.for_task(mock_task)
+        assert journal is not None
+        run_id = journal.start_run(
+            EvalRunSpec(
+                eval_config_ids=[str(mock_eval_config.id)],
+                run_config_ids=["run_config1"],
+                eval_run_type="task_run_eval",
+            )
+        )
+        keys = [job_key(mock_eval_config.id, "run_config1", item) for item in "ab"]
+        journal.mark_in_flight(keys, run_id)
+        journal.mark_done(keys[:1])
+        journal.mark_failed(keys[1:], "Rate limited")
+        journal.close()
+
+        response = client.get(url)
+        assert response.status_code == 200
+        [failed_job] = response.json()
+        assert failed_job["dataset_id"] == "b"
+        assert failed_job["run_config_id"] == "run_config1"
+        assert failed_job["state"] == "failed"
+        assert failed_job["attempts"] == 1
+        assert failed_job["last_error"] == "Rate limited"
+
+
+def test_get_eval_config_telemetry(client, mock_eval, mock_eval_config):
+    url = f"/api/projects/project1/tasks/task1/eval/{mock_eval.id}/eval_config/{mock_eval_config.id}/telemetry"
+    with patch(
+        "app.desktop.studio_server.eval_api.eval_config_from_id",
+        return_value=mock_eval_config,
+    ):
+        # No runs yet
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.json()["totals"]["jobs"] == 0
+        assert response.json()["run_configs"] == {}
+
+        run_telemetry = EvalRunTelemetry()
+        run_telemetry.record_job(mock_eval_config.id, "run_config1", True, 2.0, 0.5)
+        run_telemetry.record_job(mock_eval_config.id, "run_config1", False, 1.0, 0.1)
+        run_telemetry.save([mock_eval_config])
+
+        response = client.get(url)
+        assert response.status_code == 200
+        telemetry = response.json()
+        assert telemetry["totals"]["jobs"] == 2
+        assert telemetry["totals"]["errors"] == 1
+        assert telemetry["run_configs"]["run_config1"]["wall_time"]["sum"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_resume_interrupted_eval_runs(mock_task, mock_eval_config):
+    spec = EvalRunSpec(
+        eval_config_ids=[str(mock_eval_config.id)],
+        run_config_ids=None,
+        eval_run_type="eval_config_eval",
+    )
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    finished_run = journal.start_run(spec)
+    journal.end_run(finished_run, RunState.finished)
+    interrupted_run = journal.start_run(spec)
+    journal.close()
+
+    resumed_progress = []
+
+    async def run(**kwargs):
+        assert kwargs == {"max_job_attempts": EVAL_MAX_JOB_ATTEMPTS}
+        for complete in range(3):
+            resumed_progress.append(complete)
+            yield EvalProgress(complete=complete, total=2, errors=0)
+
+    mock_runner = Mock()
+    mock_runner.run = run
+    project = Mock()
+    project.tasks.return_value = [mock_task, Task(name="unsaved", instruction="x")]
+
+    def load_project(path):
+        if path == "missing":
+            raise FileNotFoundError(path)
+        return project
+
+    with (
+        patch("app.desktop.studio_server.eval_api.Config.shared") as mock_config,
+        patch(
+            "app.desktop.studio_server.eval_api.Project.load_from_file",
+            side_effect=load_project,
+        ),
+        patch(
+            "app.desktop.studio_server.eval_api.EvalRunner.from_run_spec",
+            return_value=mock_runner,
+        ) as mock_from_run_spec,
+    ):
+        mock_config.return_value.projects = ["missing", "project"]
+        await resume_interrupted_eval_runs()
+
+    mock_from_run_spec.assert_called_once_with(mock_task, spec)
+    assert resumed_progress == [0, 1, 2]
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    states = {run.id: run.state for run in journal.runs()}
+    journal.close()
+    assert states == {
+        finished_run: RunState.finished,
+        interrupted_run: RunState.resumed,
+    }
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_runs_in_progress_elsewhere(mock_task, mock_eval_config):
+    spec = EvalRunSpec(
+        eval_config_ids=[str(mock_eval_config.id)],
+        run_config_ids=["run_config1"],
+        eval_run_type="task_run_eval",
+    )
+    # A distributed run, in progress on another machine sharing the project
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    leased_run = journal.start_run(spec, lease_seconds=60)
+    keys = [job_key(mock_eval_config.id, "run_config1", item) for item in "ab"]
+    journal.mark_pending(keys, leased_run)
+    journal.claim(keys, leased_run, "worker1", 60)
+    journal.close()
+
+    project = Mock()
+    project.tasks.return_value = [mock_task]
+    with (
+        patch("app.desktop.studio_server.eval_api.Config.shared") as mock_config,
+        patch(
+            "app.desktop.studio_server.eval_api.Project.load_from_file",
+            return_value=project,
+        ),
+        patch(
+            "app.desktop.studio_server.eval_api.EvalRunner.from_run_spec"
+        ) as mock_from_run_spec,
+    ):
+        mock_config.return_value.projects = ["project"]
+        await resume_interrupted_eval_runs()
+
+    mock_from_run_spec.assert_not_called()
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        assert journal.run(leased_run).state == RunState.running
+        # Its workers keep their jobs
+        assert journal.claim(keys, leased_run, "worker2", 60) == ([], keys)
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_overlapping_runs_refused(
+    client, mock_task_from_id, mock_eval, mock_eval_config, mock_run_config
+):
+    url = "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/run_task_run_eval"
+    with (
+        patch(
+            "app.desktop.studio_server.eval_api.task_run_config_from_id",
+            return_value=mock_run_config,
+        ),
+        patch(
+            "app.desktop.studio_server.eval_api.eval_config_from_id",
+            return_value=mock_eval_config,
+        ),
+    ):
+        # Eg a run resumed at startup
+        async with running_eval_configs([mock_eval_config.id]):
+            assert eval_configs_running([mock_eval_config.id, "other"])
+            response = client.get(url, params={"run_config_ids": ["run_config1"]})
+            assert response.status_code == 409
+            assert "already running" in response.json()["detail"]
+    assert not eval_configs_running([mock_eval_config.id])
+
+
+@pytest.mark.asyncio
+async def test_running_eval_configs_waits():
+    order = []
+
+    async def run(name):
+        async with running_eval_configs(["b", "a"]):
+            order.append(f"{name} started")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} finished")
+
+    await asyncio.gather(run("first"), run("second"))
+    assert order == [
+        "first started",
+        "first finished",
+        "second started",
+        "second finished",
+    ]
+    assert not eval_configs_running(["a", "b"])
+
+
+@pytest.mark.asyncio
+async def test_run_eval_config_sample(
+    client, mock_task_from_id, mock_task, mock_eval, mock_eval_config, mock_run_config
+):
+    async def mock_run():
+        yield EvalProgress(complete=0, total=5, errors=0)
+
+    url = "/api/projects/project1/tasks/task1/eval/eval1/eval_config/eval_config1/run_task_run_eval"
+    with (
+        patch(
+            "app.desktop.studio_server.eval_api.task_run_config_from_id",
+            return_value=mock_run_config,
+        ),
+        patch(
+            "app.desktop.studio_server.eval_api.eval_config_from_id",
+            return_value=mock_eval_config,
+        ),
+        patch("app.desktop.studio_server.eval_api.EvalRunner") as MockEvalRunner,
+    ):
+        MockEvalRunner.return_value.run.return_value = mock_run()
+        response = client.get(
+            url,
+            params={
+                "run_config_ids": ["run_config1"],
+                "sample_size": 5,
+                "sample_seed": 3,
+            },
+        )
+        assert response.status_code == 200
+        assert MockEvalRunner.call_args.kwargs["sample"] == EvalSample(size=5, seed=3)
+
+        response = client.get(
+            url, params={"run_config_ids": ["run_config1"], "sample_size": 0}
+        )
+        assert response.status_code == 400
+        assert "size" in response.json()["detail"]
@@ -361,6 +361,7 @@ def test_create_dataset_split(
         from_task_mock.assert_called_once()
         args, kwargs = from_task_mock.call_args
         assert kwargs["filter_id"] == "high_rating"
+        assert kwargs["near_duplicate_threshold"] is None
         save_mock.assert_called_once()
 
 
@@ -1,6 +1,10 @@
+import asyncio
 import random
+from unittest.mock import patch
 
 import requests
+import uvicorn
+from kiln_ai.adapters.eval.job_journal import shutting_down
 
 import app.desktop.desktop_server as desktop_server
 
@@ -13,3 +17,17 @@ def test_desktop_app_server():
     with uni_server.run_in_thread():
         r = requests.get("http://127.0.0.1:{}/ping".format(port))
         assert r.status_code == 200
+
+
+def test_shutdown_interrupts_eval_runs():
+    seen = []
+
+    async def shutdown(self, sockets=None):
+        # Eval runs cancelled while the server shuts down are interrupted, not stopped
+        seen.append(shutting_down())
+
+    server = desktop_server.ThreadedServer(config=desktop_server.server_config())
+    with patch.object(uvicorn.Server, "shutdown", shutdown):
+        asyncio.run(server.shutdown())
+    assert seen == [True]
+    assert not shutting_down()
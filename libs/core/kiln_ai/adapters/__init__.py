@@ -14,9 +14,12 @@ The repair submodule contains an adapter for the repair task.
 The parser submodule contains parsers for the output of the AI models.
 
 The eval submodule contains the code for evaluating the performance of a model.
+
+The batch submodule contains batch execution mode: sending model calls to a provider's batch API instead of calling them live.
 """
 
 from . import (
+    batch,
     data_gen,
     eval,
     fine_tune,
@@ -34,4 +37,5 @@ __all__ = [
     "prompt_builders",
     "repair",
     "eval",
+    "batch",
 ]
@@ -0,0 +1,206 @@
+"""
+Adaptive concurrency for calling rate limited model providers.
+
+A fixed number of parallel requests either leaves throughput on the table, or triggers a storm of rate limit errors. Instead we use AIMD (additive increase, multiplicative decrease), like TCP congestion control:
+
+- Each success grows the limit by 1/limit (so roughly +1 per "window" of successful requests).
+- A rate limit or timeout error halves the limit (once per wave of in-flight requests), and pauses new requests for the provider's Retry-After period if it sent one.
+
+The limit is kept within per-provider min/max bounds.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, Dict, Mapping
+
+from kiln_ai.adapters.ml_model_list import ModelProviderName
+
+# HTTP status codes meaning "slow down": too many requests, service unavailable, and Anthropic's overloaded
+RATE_LIMIT_STATUS_CODES = {429, 503, 529}
+
+
+class RateLimitedError(Exception):
+    """
+    A request was rejected by a provider for rate limiting, overload, or timed out. Safe to retry after backing off.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(headers: Mapping[str, str] | None) -> float | None:
+    """
+    Parse Retry-After style headers into seconds to wait. Supports retry-after-ms, and retry-after as seconds or an HTTP date.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def rate_limit_error_from_exception(e: BaseException) -> RateLimitedError | None:
+    """
+    If the exception (or one it was raised from) is a rate limit, overload or timeout error, return it as a RateLimitedError. Otherwise None.
+
+    Duck typed, so it works for litellm, openai and httpx errors.
+    """
+    seen: set[int] = set()
+    error: BaseException | None = e
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, RateLimitedError):
+            return error
+        status_code = getattr(error, "status_code", None)
+        response: Any = getattr(error, "response", None)
+        if status_code is None and response is not None:
+            status_code = getattr(response, "status_code", None)
+        if status_code in RATE_LIMIT_STATUS_CODES:
+            headers = getattr(response, "headers", None)
+            return RateLimitedError(str(error), retry_after_seconds(headers))
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or (
+            "timeout" in type(error).__name__.lower()
+        ):
+            return RateLimitedError(str(error))
+        error = error.__cause__ or error.__context__
+    return None
+
+
+@dataclass
+class ConcurrencyBounds:
+    """
+    The range the adaptive concurrency limit can move within.
+    """
+
+    min: int = 1
+    max: int = 64
+
+    def __post_init__(self):
+        if self.min < 1 or self.max < self.min:
+            raise ValueError("Concurrency bounds require 1 <= min <= max")
+
+
+DEFAULT_CONCURRENCY_BOUNDS = ConcurrencyBounds(min=1, max=64)
+
+# Providers which need different bounds than the default
+PROVIDER_CONCURRENCY_BOUNDS: Dict[str, ConcurrencyBounds] = {
+    # Local models: a single GPU doesn't benefit from many parallel requests
+    ModelProviderName.ollama: ConcurrencyBounds(min=1, max=4),
+}
+
+
+def concurrency_bounds_for_provider(provider: str) -> ConcurrencyBounds:
+    return PROVIDER_CONCURRENCY_BOUNDS.get(provider, DEFAULT_CONCURRENCY_BOUNDS)
+
+
+class RequestOutcome(str, Enum):
+    success = "success"
+    # A rate limit, overload or timeout error. Backs off.
+    rate_limited = "rate_limited"
+    # Any other error. Doesn't change the limit.
+    error = "error"
+
+
+class AIMDConcurrencyLimiter:
+    """
+    Limits the number of concurrent requests, adapting the limit to what the provider allows.
+
+    Usage:
+        epoch = await limiter.acquire()
+        ... make request ...
+        await limiter.release(epoch, RequestOutcome.success)
+    """
+
+    def __init__(
+        self,
+        bounds: ConcurrencyBounds = DEFAULT_CONCURRENCY_BOUNDS,
+        initial: int | None = None,
+        decrease_factor: float = 0.5,
+        adaptive: bool = True,
+    ):
+        if decrease_factor <= 0.0 or decrease_factor >= 1.0:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self.bounds = bounds
+        self.limit: float = float(
+            min(bounds.max, max(bounds.min, initial or bounds.min))
+        )
+        self.decrease_factor = decrease_factor
+        self.adaptive = adaptive
+        self.in_flight = 0
+        # Monotonic time before which no new requests start (from Retry-After)
+        self.paused_until = 0.0
+        # Incremented on each decrease. Requests started before a decrease don't trigger another one.
+        self.epoch = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.bounds.min, math.floor(self.limit))
+
+    async def acquire(self) -> int:
+        """
+        Wait for a free slot. Returns the epoch to pass to release.
+        """
+        async with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=pause)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < self.concurrency:
+                    self.in_flight += 1
+                    return self.epoch
+                else:
+                    await self._condition.wait()
+
+    async def release(
+        self,
+        epoch: int,
+        outcome: RequestOutcome,
+        retry_after: float | None = None,
+    ) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if self.adaptive:
+                match outcome:
+                    case RequestOutcome.success:
+                        self.limit = min(
+                            float(self.bounds.max), self.limit + 1.0 / self.limit
+                        )
+                    case RequestOutcome.rate_limited:
+                        # Only back off once per wave: requests in flight during the last decrease were sent at the old rate
+                        if epoch == self.epoch:
+                            self.limit = max(
+                                float(self.bounds.min),
+                                self.limit * self.decrease_factor,
+                            )
+                            self.epoch += 1
+                    case RequestOutcome.error:
+                        pass
+            if outcome == RequestOutcome.rate_limited and retry_after:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + retry_after
+                )
+            self._condition.notify_all()
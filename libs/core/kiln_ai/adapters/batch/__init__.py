@@ -0,0 +1,21 @@
+"""
+# Batch APIs
+
+Batch execution mode: send model calls to a provider's batch API (cheaper, slower), instead of calling them live.
+
+The submodules contain:
+
+- BatchSession: collects model calls into batches, submits and polls them, and returns each caller its response. Used with EvalRunner.run(batch=...), or invoke_batch() for bulk adapter runs.
+- BaseBatchTransport: the interface for a provider's batch API, and the JSONL batch file format.
+- OpenAIBatchTransport: the OpenAI Batch API.
+- LocalBatchTransport: a local file-based stand-in, for running offline.
+"""
+
+from . import base_transport, batch_session, local_transport, openai_transport
+
+__all__ = [
+    "base_transport",
+    "batch_session",
+    "local_transport",
+    "openai_transport",
+]
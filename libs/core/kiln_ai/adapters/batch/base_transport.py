@@ -0,0 +1,158 @@
+import json
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any, Dict, Iterable, List
+
+from pydantic import BaseModel
+
+# Batch requests are chat completions, in the OpenAI batch file format (which other providers' batch APIs also accept)
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+class BatchStatusType(str, Enum):
+    """
+    The status of a submitted batch. Provider statuses (validating, finalizing, expired, etc) are mapped to these.
+    """
+
+    in_progress = "in_progress"
+    # Results are available. Some requests may still have failed (or be missing, if the batch expired part way).
+    completed = "completed"
+    # No results: the batch failed, or was cancelled
+    failed = "failed"
+
+
+class BatchStatus(BaseModel):
+    status: BatchStatusType
+    message: str | None = None
+
+
+class BatchRequest(BaseModel):
+    """
+    A request in a batch: the body of a chat completion request, and an ID to match its result to it.
+    """
+
+    custom_id: str
+    body: Dict[str, Any]
+
+
+class BatchResult(BaseModel):
+    """
+    The result of a batch request: the chat completion response body, or an error.
+    """
+
+    custom_id: str
+    body: Dict[str, Any] | None = None
+    error: str | None = None
+
+
+class BaseBatchTransport(ABC):
+    """
+    Submits batches of chat completion requests to a provider's batch API, and fetches their results.
+
+    Implementations handle the provider specifics (uploading the JSONL file, batch endpoints, status names). The BatchSession handles collecting requests into batches, polling and matching results back to callers.
+    """
+
+    @abstractmethod
+    def supports_provider(self, provider_name: str) -> bool:
+        """
+        Whether requests for this model provider (a ModelProviderName) can be sent through this transport.
+        """
+        pass
+
+    @abstractmethod
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        """
+        Submit a batch. Returns the batch ID.
+        """
+        pass
+
+    @abstractmethod
+    async def status(self, batch_id: str) -> BatchStatus:
+        pass
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Dict[str, BatchResult]:
+        """
+        The results of a completed batch, by custom_id. Requests without a result are missing.
+        """
+        pass
+
+
+def requests_to_jsonl(requests: Iterable[BatchRequest]) -> str:
+    """
+    Serialize requests to a batch input file: one request per line.
+    """
+    lines = [
+        json.dumps(
+            {
+                "custom_id": request.custom_id,
+                "method": "POST",
+                "url": CHAT_COMPLETIONS_URL,
+                "body": request.body,
+            }
+        )
+        for request in requests
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def requests_from_jsonl(content: str) -> List[BatchRequest]:
+    return [
+        BatchRequest(custom_id=line["custom_id"], body=line["body"])
+        for line in _jsonl_lines(content)
+    ]
+
+
+def result_to_json_line(result: BatchResult) -> str:
+    """
+    Serialize a result to a line of a batch output file.
+    """
+    if result.error is not None:
+        line: Dict[str, Any] = {
+            "custom_id": result.custom_id,
+            "response": None,
+            "error": {"message": result.error},
+        }
+    else:
+        line = {
+            "custom_id": result.custom_id,
+            "response": {"status_code": 200, "body": result.body},
+            "error": None,
+        }
+    return json.dumps(line)
+
+
+def results_from_jsonl(content: str) -> Dict[str, BatchResult]:
+    """
+    Parse a batch output (or error) file into results by custom_id. Requests the provider failed (an error, or a non-200 response) are results with an error.
+    """
+    results: Dict[str, BatchResult] = {}
+    for line in _jsonl_lines(content):
+        custom_id = line["custom_id"]
+        response = line.get("response") or {}
+        body = response.get("body")
+        error = line.get("error")
+        if error:
+            message = error.get("message") if isinstance(error, dict) else str(error)
+            results[custom_id] = BatchResult(
+                custom_id=custom_id, error=message or "Unknown error"
+            )
+        elif response.get("status_code") != 200 or not isinstance(body, dict):
+            body_error = body.get("error") if isinstance(body, dict) else None
+            message = (
+                body_error.get("message") if isinstance(body_error, dict) else None
+            )
+            results[custom_id] = BatchResult(
+                custom_id=custom_id,
+                error=message
+                or f"Request failed with status {response.get('status_code')}",
+            )
+        else:
+            results[custom_id] = BatchResult(custom_id=custom_id, body=body)
+    return results
+
+
+def _jsonl_lines(content: str) -> Iterable[Dict[str, Any]]:
+    for line in content.splitlines():
+        if line.strip():
+            yield json.loads(line)
@@ -0,0 +1,245 @@
+"""
+Batch execution mode: model calls are queued and sent to a provider's batch API, instead of called live.
+
+Batch APIs are much cheaper per token, at the cost of latency (results can take hours). Good for large offline evals and bulk runs.
+
+Rather than a separate code path, batch mode plugs in beneath the adapters: inside a using_batch_session() block, LiteLlmAdapter sends chat completions to the session instead of calling the provider. The session collects requests from all concurrent callers into batches (up to max_batch_size requests, or whatever has arrived after flush_interval), submits them through a transport, polls until they complete, and returns each caller the response as if it had been called live. Prompt building, output parsing, evals and saving TaskRuns/EvalRuns are all unchanged: the caller just waits longer. Multi-step callers (eg chain of thought, then a judge) take one batch round trip per step.
+
+Transports are pluggable (see BaseBatchTransport), with a local file-based stand-in (LocalBatchTransport) for running offline.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Sequence, Set
+
+from litellm.types.utils import ModelResponse
+
+from kiln_ai.adapters.batch.base_transport import (
+    BaseBatchTransport,
+    BatchRequest,
+    BatchStatusType,
+)
+from kiln_ai.datamodel import TaskRun
+
+if TYPE_CHECKING:
+    # The model adapters import this module
+    from kiln_ai.adapters.model_adapters.base_adapter import BaseAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL_SECONDS = 30.0
+
+# litellm connection settings passed with completion kwargs. They aren't part of the request body, and keys must never be written into batch files.
+CONNECTION_KWARGS = {
+    "api_base",
+    "api_key",
+    "headers",
+    "aws_access_key_id",
+    "aws_secret_access_key",
+    "aws_region_name",
+}
+
+
+class BatchSession:
+    """
+    Collects model calls into batches for a batch API transport. See the module docs.
+
+    Use as an async context manager, or call aclose(), to stop polling when done. Requests still waiting then fail.
+    """
+
+    def __init__(
+        self,
+        transport: BaseBatchTransport,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.transport = transport
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        # IDs of the batches submitted, in order
+        self.batch_ids: List[str] = []
+
+        self._pending: List[tuple[BatchRequest, asyncio.Future]] = []
+        self._request_count = 0
+        self._flush_timer: asyncio.Task | None = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    async def __aenter__(self) -> "BatchSession":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    def accepts(self, provider_name: str) -> bool:
+        """
+        Whether calls to this model provider go through the session. Others are called live.
+        """
+        return self.transport.supports_provider(provider_name)
+
+    async def complete(self, completion_kwargs: Dict[str, Any]) -> ModelResponse:
+        """
+        Run a chat completion (litellm completion kwargs) in the next batch, and wait for its response.
+        """
+        if self._closed:
+            raise RuntimeError("Batch session is closed")
+        self._request_count += 1
+        request = BatchRequest(
+            custom_id=f"request-{self._request_count}",
+            body=batch_request_body(completion_kwargs),
+        )
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._flush_after_interval())
+
+        body = await future
+        return ModelResponse(**body)
+
+    def flush(self) -> None:
+        """
+        Submit the requests waiting for a batch now, without waiting for the flush interval.
+        """
+        if self._flush_timer is not None:
+            if self._flush_timer is not asyncio.current_task():
+                self._flush_timer.cancel()
+            self._flush_timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def aclose(self) -> None:
+        """
+        Stop submitting and polling. Requests still waiting on a batch fail.
+        """
+        self._closed = True
+        tasks = list(self._batch_tasks)
+        if self._flush_timer is not None:
+            tasks.append(self._flush_timer)
+            self._flush_timer = None
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+        _fail_requests(self._pending, RuntimeError("Batch session closed"))
+        self._pending = []
+
+    async def _flush_after_interval(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self.flush()
+
+    async def _run_batch(
+        self, batch: Sequence[tuple[BatchRequest, asyncio.Future]]
+    ) -> None:
+        try:
+            batch_id = await self.transport.submit([request for request, _ in batch])
+            self.batch_ids.append(batch_id)
+            while True:
+                status = await self.transport.status(batch_id)
+                if status.status == BatchStatusType.completed:
+                    break
+                if status.status == BatchStatusType.failed:
+                    raise RuntimeError(
+                        f"Batch {batch_id} failed: {status.message or 'unknown error'}"
+                    )
+                await asyncio.sleep(self.poll_interval)
+
+            results = await self.transport.results(batch_id)
+            for request, future in batch:
+                if future.done():
+                    continue
+                result = results.get(request.custom_id)
+                if result is None:
+                    future.set_exception(
+                        RuntimeError(f"No result for request in batch {batch_id}")
+                    )
+                elif result.error is not None or result.body is None:
+                    future.set_exception(
+                        RuntimeError(f"Batch request failed: {result.error}")
+                    )
+                else:
+                    future.set_result(result.body)
+        except asyncio.CancelledError:
+            _fail_requests(batch, RuntimeError("Batch session closed"))
+            raise
+        except Exception as e:
+            logger.error(f"Error running batch: {e}")
+            _fail_requests(batch, e)
+
+
+def batch_request_body(completion_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The chat completion request body for litellm completion kwargs: without connection settings, and with the provider's own model ID (litellm IDs are prefixed with the provider, eg "openai/gpt-4o").
+    """
+    body = {
+        key: value
+        for key, value in completion_kwargs.items()
+        if key not in CONNECTION_KWARGS and value is not None
+    }
+    model = body.get("model")
+    if isinstance(model, str) and "/" in model:
+        body["model"] = model.split("/", 1)[1]
+    return body
+
+
+# The batch session for model calls in the current context, if any
+_current_session: ContextVar[BatchSession | None] = ContextVar(
+    "kiln_batch_session", default=None
+)
+
+
+def current_batch_session() -> BatchSession | None:
+    return _current_session.get()
+
+
+@contextmanager
+def using_batch_session(session: BatchSession | None) -> Iterator[None]:
+    """
+    Send model calls made within the block (in the same async task, or tasks started from it) through the batch session. None to call models live.
+    """
+    token = _current_session.set(session)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+async def invoke_batch(
+    adapter: "BaseAdapter",
+    inputs: Sequence[Dict | str],
+    session: BatchSession,
+) -> List[TaskRun | BaseException]:
+    """
+    Run an adapter on many inputs through batches. Returns the TaskRun for each input (saved, if the adapter is configured to save runs), or the error it failed with.
+    """
+
+    async def invoke(input: Dict | str) -> TaskRun:
+        with using_batch_session(session):
+            return await adapter.invoke(input)
+
+    return list(
+        await asyncio.gather(
+            *[invoke(input) for input in inputs], return_exceptions=True
+        )
+    )
+
+
+def _fail_requests(
+    batch: Sequence[tuple[BatchRequest, asyncio.Future]], error: BaseException
+) -> None:
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
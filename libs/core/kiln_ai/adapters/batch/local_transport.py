@@ -0,0 +1,108 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+from kiln_ai.adapters.batch.base_transport import (
+    BaseBatchTransport,
+    BatchRequest,
+    BatchResult,
+    BatchStatus,
+    BatchStatusType,
+    requests_from_jsonl,
+    requests_to_jsonl,
+    result_to_json_line,
+    results_from_jsonl,
+)
+
+# Takes a chat completion request body, returns the response body. Raise to fail the request.
+BatchResponder = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class LocalBatchTransport(BaseBatchTransport):
+    """
+    A local, file-based stand-in for a provider's batch API, for running batches offline (tests, development).
+
+    Each batch is a folder in the directory, with the same files a provider uses:
+    - input.jsonl: the requests, written on submit.
+    - output.jsonl: the results. The batch is complete once it exists.
+    - error.txt: if it exists, the batch failed, with this message.
+
+    With a responder, output.jsonl is written by calling it for each request, once the batch has been polled polls_until_complete times. Without one, something else (another process, or a test) must write output.jsonl or error.txt.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        responder: BatchResponder | None = None,
+        polls_until_complete: int = 0,
+        providers: List[str] | None = None,
+    ):
+        self.directory = Path(directory)
+        self.responder = responder
+        self.polls_until_complete = polls_until_complete
+        # Providers to accept requests for. None for any.
+        self.providers = providers
+        self._polls: Dict[str, int] = {}
+
+    def supports_provider(self, provider_name: str) -> bool:
+        return self.providers is None or provider_name in self.providers
+
+    def batch_path(self, batch_id: str) -> Path:
+        return self.directory / batch_id
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        path = self.batch_path(batch_id)
+        await asyncio.to_thread(
+            _write_file, path / "input.jsonl", requests_to_jsonl(requests)
+        )
+        return batch_id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        path = self.batch_path(batch_id)
+        if not (path / "input.jsonl").exists():
+            raise ValueError(f"Batch not found. ID: {batch_id}")
+        if (path / "error.txt").exists():
+            message = (path / "error.txt").read_text().strip()
+            return BatchStatus(status=BatchStatusType.failed, message=message or None)
+        if (path / "output.jsonl").exists():
+            return BatchStatus(status=BatchStatusType.completed)
+
+        if self.responder is not None:
+            self._polls[batch_id] = self._polls.get(batch_id, 0) + 1
+            if self._polls[batch_id] > self.polls_until_complete:
+                await self._respond(path)
+                return BatchStatus(status=BatchStatusType.completed)
+        return BatchStatus(status=BatchStatusType.in_progress)
+
+    async def results(self, batch_id: str) -> Dict[str, BatchResult]:
+        path = self.batch_path(batch_id) / "output.jsonl"
+        if not path.exists():
+            raise ValueError(f"Batch has no results. ID: {batch_id}")
+        return results_from_jsonl(path.read_text())
+
+    async def _respond(self, path: Path) -> None:
+        if self.responder is None:
+            return
+        requests = requests_from_jsonl((path / "input.jsonl").read_text())
+        lines = []
+        for request in requests:
+            try:
+                body = await self.responder(request.body)
+                result = BatchResult(custom_id=request.custom_id, body=body)
+            except Exception as e:
+                result = BatchResult(custom_id=request.custom_id, error=str(e))
+            lines.append(result_to_json_line(result))
+        await asyncio.to_thread(
+            _write_file, path / "output.jsonl", "\n".join(lines) + "\n"
+        )
+
+
+def _write_file(path: Path, content: str) -> None:
+    # Write then rename, so a reader never sees a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
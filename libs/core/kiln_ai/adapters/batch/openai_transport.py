@@ -0,0 +1,85 @@
+from typing import Dict, List
+
+import openai
+
+from kiln_ai.adapters.batch.base_transport import (
+    CHAT_COMPLETIONS_URL,
+    BaseBatchTransport,
+    BatchRequest,
+    BatchResult,
+    BatchStatus,
+    BatchStatusType,
+    requests_to_jsonl,
+    results_from_jsonl,
+)
+from kiln_ai.adapters.ml_model_list import ModelProviderName
+from kiln_ai.utils.config import Config
+
+
+class OpenAIBatchTransport(BaseBatchTransport):
+    """
+    Sends batches to the OpenAI Batch API: https://platform.openai.com/docs/guides/batch
+
+    Other providers with an OpenAI compatible batch API can use it with their own client (base URL and key) and provider names.
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncOpenAI | None = None,
+        completion_window: str = "24h",
+        providers: List[str] | None = None,
+    ):
+        self.client = client or openai.AsyncOpenAI(
+            api_key=Config.shared().open_ai_api_key or "",
+        )
+        self.completion_window = completion_window
+        self.providers = providers or [ModelProviderName.openai]
+
+    def supports_provider(self, provider_name: str) -> bool:
+        return provider_name in self.providers
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", requests_to_jsonl(requests).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,  # type: ignore
+            metadata={"source": "kiln"},
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> BatchStatus:
+        batch = await self.client.batches.retrieve(batch_id)
+        status = batch.status
+        if status in ["validating", "in_progress", "finalizing"]:
+            return BatchStatus(status=BatchStatusType.in_progress)
+        if status == "completed":
+            return BatchStatus(status=BatchStatusType.completed)
+        if status == "expired":
+            # Requests completed before it expired have results, the rest are missing
+            return BatchStatus(
+                status=BatchStatusType.completed,
+                message="Batch expired before all requests completed.",
+            )
+
+        # failed, cancelling, cancelled
+        message = f"Batch {status}."
+        if batch.errors and batch.errors.data:
+            message += " " + "; ".join(
+                error.message for error in batch.errors.data if error.message
+            )
+        return BatchStatus(status=BatchStatusType.failed, message=message)
+
+    async def results(self, batch_id: str) -> Dict[str, BatchResult]:
+        batch = await self.client.batches.retrieve(batch_id)
+        results: Dict[str, BatchResult] = {}
+        # Failed requests are in a separate error file
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            results.update(results_from_jsonl(content.text))
+        return results
@@ -0,0 +1,233 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.adapters.batch.base_transport import BatchStatus, BatchStatusType
+from kiln_ai.adapters.batch.batch_session import (
+    BatchSession,
+    batch_request_body,
+    current_batch_session,
+    invoke_batch,
+    using_batch_session,
+)
+from kiln_ai.adapters.batch.local_transport import LocalBatchTransport
+from kiln_ai.adapters.model_adapters.base_adapter import AdapterConfig
+from kiln_ai.adapters.model_adapters.litellm_adapter import LiteLlmAdapter
+from kiln_ai.adapters.model_adapters.litellm_config import LiteLlmConfig
+from kiln_ai.datamodel import Project, Task
+
+
+def chat_response(content: str, prompt_tokens: int = 10) -> dict:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 1,
+        "model": "gpt-4o-mini",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 2,
+            "total_tokens": prompt_tokens + 2,
+        },
+    }
+
+
+async def echo_responder(body):
+    if body.get("fail"):
+        raise ValueError("invalid request")
+    # The last line of the user message: the input, for adapter calls
+    content = body["messages"][-1]["content"].splitlines()[-1]
+    return chat_response(f"echo {content}")
+
+
+def completion_kwargs(content: str, **kwargs) -> dict:
+    return {
+        "model": "openai/gpt-4o-mini",
+        "messages": [{"role": "user", "content": content}],
+        **kwargs,
+    }
+
+
+@pytest.fixture
+def transport(tmp_path):
+    return LocalBatchTransport(tmp_path / "batches", responder=echo_responder)
+
+
+def test_batch_request_body():
+    body = batch_request_body(
+        {
+            "model": "openrouter/anthropic/claude-3.5-sonnet",
+            "messages": [],
+            "api_base": None,
+            "api_key": "secret",
+            "headers": {"X-Title": "Kiln"},
+            "logprobs": True,
+            "top_logprobs": 5,
+        }
+    )
+    assert body == {
+        "model": "anthropic/claude-3.5-sonnet",
+        "messages": [],
+        "logprobs": True,
+        "top_logprobs": 5,
+    }
+    assert batch_request_body({"model": "ft:gpt-4o:org::id"})["model"] == (
+        "ft:gpt-4o:org::id"
+    )
+
+
+def test_validation(transport):
+    with pytest.raises(ValueError, match="max_batch_size"):
+        BatchSession(transport, max_batch_size=0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_a_batch(transport):
+    async with BatchSession(transport, flush_interval=0.01, poll_interval=0) as session:
+        responses = await asyncio.gather(
+            *[session.complete(completion_kwargs(f"input {i}")) for i in range(5)]
+        )
+    assert [response.choices[0].message.content for response in responses] == [
+        f"echo input {i}" for i in range(5)
+    ]
+    assert responses[0].usage.prompt_tokens == 10
+    assert len(session.batch_ids) == 1
+
+
+@pytest.mark.asyncio
+async def test_full_batches_submitted_without_waiting(transport):
+    async with BatchSession(
+        transport, max_batch_size=2, flush_interval=60, poll_interval=0
+    ) as session:
+        responses = await asyncio.wait_for(
+            asyncio.gather(
+                *[session.complete(completion_kwargs(f"input {i}")) for i in range(4)]
+            ),
+            timeout=5,
+        )
+    assert len(responses) == 4
+    assert len(session.batch_ids) == 2
+
+
+@pytest.mark.asyncio
+async def test_request_errors(transport):
+    async with BatchSession(transport, flush_interval=0.01, poll_interval=0) as session:
+        ok, failed = await asyncio.gather(
+            session.complete(completion_kwargs("ok")),
+            session.complete(completion_kwargs("bad", fail=True)),
+            return_exceptions=True,
+        )
+    assert not isinstance(ok, BaseException)
+    assert isinstance(failed, RuntimeError)
+    assert "invalid request" in str(failed)
+
+
+@pytest.mark.asyncio
+async def test_polls_until_complete(tmp_path):
+    transport = LocalBatchTransport(
+        tmp_path, responder=echo_responder, polls_until_complete=2
+    )
+    async with BatchSession(
+        transport, flush_interval=0.01, poll_interval=0.01
+    ) as session:
+        response = await session.complete(completion_kwargs("slow"))
+    assert response.choices[0].message.content == "echo slow"
+
+
+class FailingTransport(LocalBatchTransport):
+    async def status(self, batch_id):
+        return BatchStatus(status=BatchStatusType.failed, message="quota exceeded")
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_its_requests(tmp_path):
+    async with BatchSession(
+        FailingTransport(tmp_path), flush_interval=0.01, poll_interval=0
+    ) as session:
+        results = await asyncio.gather(
+            session.complete(completion_kwargs("a")),
+            session.complete(completion_kwargs("b")),
+            return_exceptions=True,
+        )
+    for result in results:
+        assert isinstance(result, RuntimeError)
+        assert "quota exceeded" in str(result)
+
+
+@pytest.mark.asyncio
+async def test_close_fails_waiting_requests(tmp_path):
+    # No responder: the batch never completes
+    session = BatchSession(
+        LocalBatchTransport(tmp_path), flush_interval=0.01, poll_interval=0.01
+    )
+    waiting = asyncio.create_task(session.complete(completion_kwargs("a")))
+    unsubmitted = BatchSession(LocalBatchTransport(tmp_path), flush_interval=60)
+    not_flushed = asyncio.create_task(unsubmitted.complete(completion_kwargs("b")))
+    await asyncio.sleep(0.05)
+
+    await session.aclose()
+    await unsubmitted.aclose()
+    for task in [waiting, not_flushed]:
+        with pytest.raises(RuntimeError, match="closed"):
+            await task
+    with pytest.raises(RuntimeError, match="closed"):
+        await session.complete(completion_kwargs("c"))
+
+
+def test_using_batch_session(transport):
+    session = BatchSession(transport)
+    assert current_batch_session() is None
+    with using_batch_session(session):
+        assert current_batch_session() is session
+        with using_batch_session(None):
+            assert current_batch_session() is None
+        assert current_batch_session() is session
+    assert current_batch_session() is None
+
+
+@pytest.mark.asyncio
+async def test_invoke_batch(tmp_path, transport):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Repeat the input", parent=project)
+    task.save_to_file()
+    adapter = LiteLlmAdapter(
+        config=LiteLlmConfig(
+            model_name="gpt_4o_mini",
+            provider_name="openai",
+            additional_body_options={"api_key": "secret"},
+        ),
+        kiln_task=task,
+        base_adapter_config=AdapterConfig(allow_saving=True),
+    )
+
+    with patch(
+        "kiln_ai.adapters.provider_tools.get_config_value", return_value="secret"
+    ):
+        async with BatchSession(
+            transport, flush_interval=0.01, poll_interval=0
+        ) as session:
+            runs = await invoke_batch(adapter, ["one", "two", "three"], session)
+
+    assert len(session.batch_ids) == 1
+    outputs = []
+    for run in runs:
+        assert not isinstance(run, BaseException)
+        outputs.append(run.output.output)
+    assert outputs == ["echo one", "echo two", "echo three"]
+    # Saved like a live run
+    assert len(task.runs()) == 3
+
+    # The API key isn't written into the batch file
+    batch_input = (
+        transport.batch_path(session.batch_ids[0]) / "input.jsonl"
+    ).read_text()
+    assert "secret" not in batch_input
+    assert '"model": "gpt-4o-mini"' in batch_input
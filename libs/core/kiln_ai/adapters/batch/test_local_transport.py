@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from kiln_ai.adapters.batch.base_transport import (
+    BatchRequest,
+    BatchResult,
+    BatchStatusType,
+    requests_from_jsonl,
+    requests_to_jsonl,
+    result_to_json_line,
+    results_from_jsonl,
+)
+from kiln_ai.adapters.batch.local_transport import LocalBatchTransport
+
+
+def test_requests_jsonl_round_trip():
+    requests = [
+        BatchRequest(custom_id="1", body={"model": "gpt-4o", "messages": []}),
+        BatchRequest(custom_id="2", body={"model": "gpt-4o", "temperature": 0}),
+    ]
+    content = requests_to_jsonl(requests)
+    first_line = json.loads(content.splitlines()[0])
+    assert first_line["method"] == "POST"
+    assert first_line["url"] == "/v1/chat/completions"
+    assert requests_from_jsonl(content) == requests
+
+
+def test_results_from_jsonl():
+    lines = [
+        result_to_json_line(BatchResult(custom_id="ok", body={"id": "x"})),
+        result_to_json_line(BatchResult(custom_id="error", error="invalid model")),
+        # A provider error response
+        json.dumps(
+            {
+                "custom_id": "rate_limited",
+                "response": {
+                    "status_code": 429,
+                    "body": {"error": {"message": "Too many requests"}},
+                },
+                "error": None,
+            }
+        ),
+        json.dumps(
+            {"custom_id": "no_body", "response": {"status_code": 500}, "error": None}
+        ),
+    ]
+    results = results_from_jsonl("\n".join(lines) + "\n\n")
+    assert results["ok"].body == {"id": "x"}
+    assert results["ok"].error is None
+    assert results["error"].error == "invalid model"
+    assert results["rate_limited"].error == "Too many requests"
+    assert results["no_body"].error == "Request failed with status 500"
+
+
+@pytest.mark.asyncio
+async def test_local_transport_with_responder(tmp_path):
+    async def responder(body):
+        if body.get("fail"):
+            raise ValueError("bad request")
+        return {"echo": body["messages"]}
+
+    transport = LocalBatchTransport(
+        tmp_path, responder=responder, polls_until_complete=1
+    )
+    batch_id = await transport.submit(
+        [
+            BatchRequest(custom_id="a", body={"messages": ["hi"]}),
+            BatchRequest(custom_id="b", body={"messages": [], "fail": True}),
+        ]
+    )
+    assert (tmp_path / batch_id / "input.jsonl").exists()
+
+    # Completes after the first poll
+    assert (await transport.status(batch_id)).status == BatchStatusType.in_progress
+    assert (await transport.status(batch_id)).status == BatchStatusType.completed
+    assert (await transport.status(batch_id)).status == BatchStatusType.completed
+
+    results = await transport.results(batch_id)
+    assert results["a"].body == {"echo": ["hi"]}
+    assert results["b"].error == "bad request"
+
+
+@pytest.mark.asyncio
+async def test_local_transport_files_written_externally(tmp_path):
+    transport = LocalBatchTransport(tmp_path, providers=["openai"])
+    assert transport.supports_provider("openai")
+    assert not transport.supports_provider("groq")
+
+    batch_id = await transport.submit([BatchRequest(custom_id="a", body={})])
+    assert (await transport.status(batch_id)).status == BatchStatusType.in_progress
+    with pytest.raises(ValueError, match="no results"):
+        await transport.results(batch_id)
+
+    # Something else processes the batch
+    (tmp_path / batch_id / "output.jsonl").write_text(
+        result_to_json_line(BatchResult(custom_id="a", body={"id": "done"}))
+    )
+    assert (await transport.status(batch_id)).status == BatchStatusType.completed
+    assert (await transport.results(batch_id))["a"].body == {"id": "done"}
+
+    failed_id = await transport.submit([BatchRequest(custom_id="a", body={})])
+    (tmp_path / failed_id / "error.txt").write_text("quota exceeded\n")
+    status = await transport.status(failed_id)
+    assert status.status == BatchStatusType.failed
+    assert status.message == "quota exceeded"
+
+    with pytest.raises(ValueError, match="not found"):
+        await transport.status("missing")
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from kiln_ai.adapters.batch.base_transport import (
+    BatchRequest,
+    BatchResult,
+    BatchStatusType,
+    requests_from_jsonl,
+    result_to_json_line,
+)
+from kiln_ai.adapters.batch.openai_transport import OpenAIBatchTransport
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.files.create = AsyncMock(return_value=SimpleNamespace(id="file-in"))
+    client.batches.create = AsyncMock(return_value=SimpleNamespace(id="batch-1"))
+    client.batches.retrieve = AsyncMock()
+    client.files.content = AsyncMock()
+    return client
+
+
+def batch(status, output_file_id=None, error_file_id=None, errors=None):
+    return SimpleNamespace(
+        id="batch-1",
+        status=status,
+        output_file_id=output_file_id,
+        error_file_id=error_file_id,
+        errors=errors,
+    )
+
+
+def test_supports_provider(client):
+    assert OpenAIBatchTransport(client).supports_provider("openai")
+    assert not OpenAIBatchTransport(client).supports_provider("anthropic")
+    compatible = OpenAIBatchTransport(client, providers=["together_ai"])
+    assert compatible.supports_provider("together_ai")
+
+
+@pytest.mark.asyncio
+async def test_submit(client):
+    transport = OpenAIBatchTransport(client)
+    requests = [BatchRequest(custom_id="1", body={"model": "gpt-4o"})]
+    assert await transport.submit(requests) == "batch-1"
+
+    file_name, content = client.files.create.call_args.kwargs["file"]
+    assert file_name == "batch.jsonl"
+    assert requests_from_jsonl(content.decode("utf-8")) == requests
+    assert client.files.create.call_args.kwargs["purpose"] == "batch"
+    create_kwargs = client.batches.create.call_args.kwargs
+    assert create_kwargs["input_file_id"] == "file-in"
+    assert create_kwargs["endpoint"] == "/v1/chat/completions"
+    assert create_kwargs["completion_window"] == "24h"
+
+
+@pytest.mark.parametrize(
+    "status,expected",
+    [
+        ("validating", BatchStatusType.in_progress),
+        ("in_progress", BatchStatusType.in_progress),
+        ("finalizing", BatchStatusType.in_progress),
+        ("completed", BatchStatusType.completed),
+        ("expired", BatchStatusType.completed),
+        ("failed", BatchStatusType.failed),
+        ("cancelled", BatchStatusType.failed),
+    ],
+)
+@pytest.mark.asyncio
+async def test_status(client, status, expected):
+    client.batches.retrieve.return_value = batch(status)
+    assert (await OpenAIBatchTransport(client).status("batch-1")).status == expected
+
+
+@pytest.mark.asyncio
+async def test_failed_status_message(client):
+    client.batches.retrieve.return_value = batch(
+        "failed",
+        errors=SimpleNamespace(data=[SimpleNamespace(message="invalid input file")]),
+    )
+    status = await OpenAIBatchTransport(client).status("batch-1")
+    assert status.message == "Batch failed. invalid input file"
+
+
+@pytest.mark.asyncio
+async def test_results_from_output_and_error_files(client):
+    client.batches.retrieve.return_value = batch(
+        "completed", output_file_id="file-out", error_file_id="file-err"
+    )
+    files = {
+        "file-out": result_to_json_line(BatchResult(custom_id="1", body={"id": "x"})),
+        "file-err": result_to_json_line(BatchResult(custom_id="2", error="too long")),
+    }
+    client.files.content.side_effect = lambda file_id: SimpleNamespace(
+        text=files[file_id]
+    )
+
+    results = await OpenAIBatchTransport(client).results("batch-1")
+    assert results["1"].body == {"id": "x"}
+    assert results["2"].error == "too long"
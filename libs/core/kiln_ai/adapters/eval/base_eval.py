@@ -1,10 +1,13 @@
+import asyncio
 import json
 from abc import abstractmethod
 from typing import Dict
 
 from kiln_ai.adapters.adapter_registry import adapter_for_task
+from kiln_ai.adapters.eval.judge_cache import JudgeCache
+from kiln_ai.adapters.eval.telemetry import measure_model_call, record_judge_cache_hit
 from kiln_ai.adapters.ml_model_list import ModelProviderName
-from kiln_ai.adapters.model_adapters.base_adapter import AdapterConfig
+from kiln_ai.adapters.model_adapters.base_adapter import AdapterConfig, BaseAdapter
 from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalScores
 from kiln_ai.datamodel.json_schema import validate_schema
 from kiln_ai.datamodel.task import RunConfig, TaskOutputRatingType, TaskRun
@@ -30,6 +33,9 @@ class BaseEval:
         self.target_task = task
         self.score_schema = BaseEval.build_score_schema(eval, allow_float_scores=True)
         self.run_config = run_config
+        self._run_adapter: BaseAdapter | None = None
+        # Optional cache of judge results, used by run_eval_cached. Set by the caller (for example the eval runner).
+        self.judge_cache: JudgeCache | None = None
 
     def model_and_provider(self) -> tuple[str, ModelProviderName]:
         model_name = self.eval_config.model_name
@@ -53,15 +59,17 @@ class BaseEval:
         """
         Runs the task on the provided run_config to generate fresh output, then runs the eval on that output.
         """
-        if self.run_config is None:
-            raise ValueError("Run config is required for run_task_and_eval")
+        run_output = await self.run_task(input)
 
-        run_adapter = adapter_for_task(
-            self.target_task,
-            self.run_config.model_name,
-            ModelProviderName(self.run_config.model_provider_name),
-            base_adapter_config=AdapterConfig(allow_saving=False),
-        )
+        eval_output, intermediate_outputs = await self.run_eval_cached(run_output)
+
+        return run_output, eval_output, intermediate_outputs
+
+    async def run_task(self, input: str) -> TaskRun:
+        """
+        Runs the task on the provided run_config to generate fresh output, without saving it or running the eval.
+        """
+        run_adapter = self.run_adapter()
 
         # Parse structured input if needed
         parsed_input = input
@@ -69,12 +77,56 @@ class BaseEval:
             parsed_input = json.loads(input)
 
         # we don't save by default here. We'll save manually after validating the output
-        run_output = await run_adapter.invoke(parsed_input)
+        with measure_model_call("task"):
+            return await run_adapter.invoke(parsed_input)
+
+    def run_adapter(self) -> BaseAdapter:
+        """
+        The adapter for running the task on the run_config. Built on first use, then reused for every task run this evaluator makes.
+        """
+        if self._run_adapter is not None:
+            return self._run_adapter
+        if self.run_config is None:
+            raise ValueError("Run config is required for run_task")
 
-        eval_output, intermediate_outputs = await self.run_eval(run_output)
-        validate_schema(eval_output, self.score_schema)
+        self._run_adapter = adapter_for_task(
+            self.target_task,
+            self.run_config.model_name,
+            ModelProviderName(self.run_config.model_provider_name),
+            base_adapter_config=AdapterConfig(allow_saving=False),
+        )
+        return self._run_adapter
 
-        return run_output, eval_output, intermediate_outputs
+    async def run_eval_cached(
+        self, task_run: TaskRun
+    ) -> tuple[EvalScores, Dict[str, str] | None]:
+        """
+        Runs the eval on the given task run and validates the scores, returning the cached result instead if this exact judge request was already run.
+
+        Only cached when judge_cache is set and the evaluator provides a judge_cache_key.
+        """
+        cache = self.judge_cache
+        key = self.judge_cache_key(task_run) if cache is not None else None
+        if cache is not None and key is not None:
+            # Cache IO is blocking (SQLite), keep it off the event loop
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                record_judge_cache_hit()
+                return cached
+
+        with measure_model_call("judge"):
+            scores, intermediate_outputs = await self.run_eval(task_run)
+        validate_schema(scores, self.score_schema)
+
+        if cache is not None and key is not None:
+            await asyncio.to_thread(cache.put, key, scores, intermediate_outputs)
+        return scores, intermediate_outputs
+
+    def judge_cache_key(self, task_run: TaskRun) -> str | None:
+        """
+        The judge cache key for evaluating this task run: a hash of everything which determines the judge's result. None if results from this evaluator can't be cached (the default).
+        """
+        return None
 
     @abstractmethod
     async def run_eval(
@@ -0,0 +1,153 @@
+"""
+Multi-process eval runs.
+
+A single process runs jobs on one event loop, and CPU-bound work (pydantic validation, JSON parsing, loading dataset items) caps its throughput. run_distributed() runs an eval run with several worker processes instead: each runs the same run with a lease (see JobLease), claiming each job from the task's job journal before running it, so every job runs once.
+
+Machines sharing the project directory can add workers to a run with join_distributed_run(). Workers coordinate through the journal's SQLite database, so a shared filesystem needs working file locks, and machines roughly synchronized clocks (leases expire by wall clock).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict
+
+from kiln_ai.adapters.eval.eval_runner import EvalProgress, EvalRunner
+from kiln_ai.adapters.eval.job_journal import (
+    DEFAULT_LEASE_SECONDS,
+    EvalJobJournal,
+    JobLease,
+    JobState,
+    RunState,
+)
+from kiln_ai.datamodel.task import Task
+
+# Progress is read from the journal this often
+DEFAULT_DISTRIBUTED_PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+def default_worker_processes() -> int:
+    return os.cpu_count() or 1
+
+
+async def run_distributed(
+    runner: EvalRunner,
+    processes: int | None = None,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    progress_interval: float = DEFAULT_DISTRIBUTED_PROGRESS_INTERVAL_SECONDS,
+    **run_kwargs: Any,
+) -> AsyncGenerator[EvalProgress, None]:
+    """
+    Run an eval run with several worker processes, and yield progress updates for the whole run.
+
+    Args:
+        runner: the run. Its task must be saved.
+        processes: the number of worker processes. None for one per CPU.
+        lease_seconds: how long a worker holds a job without renewing its lease. A worker which dies holds its jobs this long.
+        progress_interval: seconds between progress updates.
+        run_kwargs: passed to each worker's EvalRunner.run() (eg concurrency, max_job_attempts). Must be picklable.
+    """
+    if processes is None:
+        processes = default_worker_processes()
+    if processes < 1:
+        raise ValueError("processes must be at least 1")
+    journal = EvalJobJournal.for_task(runner.task)
+    if journal is None or runner.task.path is None:
+        raise ValueError("Distributed eval runs require a saved task")
+
+    total = runner.plan_tasks().total
+    # Leased while the coordinator runs, so startup doesn't resume it (on this machine, or another sharing the project)
+    run_id = journal.start_run(runner.run_spec(), lease_seconds=lease_seconds)
+    run_state = RunState.stopped
+    # Spawned, not forked: a fork would copy the parent's event loop and threads
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=run_worker_process,
+            args=(str(runner.task.path), run_id, lease_seconds, run_kwargs),
+            daemon=True,
+        )
+        for _ in range(processes)
+    ]
+    try:
+        for worker in workers:
+            worker.start()
+
+        last_sent: tuple[int, int] | None = None
+        last_renewed = time.monotonic()
+        while True:
+            if time.monotonic() - last_renewed >= lease_seconds / 3:
+                journal.renew_run_lease(run_id, lease_seconds)
+                last_renewed = time.monotonic()
+            running = any(worker.is_alive() for worker in workers)
+            counts = journal.run_job_counts(run_id)
+            progress = (counts.get(JobState.done, 0), counts.get(JobState.failed, 0))
+            if progress != last_sent or not running:
+                last_sent = progress
+                yield EvalProgress(
+                    complete=progress[0], total=total, errors=progress[1]
+                )
+            if not running:
+                break
+            await asyncio.sleep(progress_interval)
+
+        failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+        if failed:
+            run_state = RunState.failed
+            raise RuntimeError(
+                f"{len(failed)} eval worker process(es) failed. Exit codes: {', '.join(str(code) for code in failed)}"
+            )
+        run_state = RunState.finished
+    finally:
+        # Closed early, or failed: stop the workers still running. Their unfinished jobs go back to pending when the run ends.
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            if worker.pid is not None:
+                await asyncio.to_thread(worker.join)
+        journal.end_run(run_id, run_state)
+        journal.close()
+
+
+async def join_distributed_run(
+    task: Task,
+    run_id: str,
+    lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    **run_kwargs: Any,
+) -> AsyncGenerator[EvalProgress, None]:
+    """
+    Add a worker to a distributed run (started by run_distributed(), possibly on another machine sharing the project). Yields this worker's progress, ending when every job of the run is done or failed.
+    """
+    journal = EvalJobJournal.for_task(task)
+    if journal is None:
+        raise ValueError("Distributed eval runs require a saved task")
+    try:
+        run = journal.run(run_id)
+    finally:
+        journal.close()
+    if run is None:
+        raise ValueError(f"Eval run not found in the job journal. ID: {run_id}")
+
+    runner = EvalRunner.from_run_spec(task, run.spec)
+    lease = JobLease(run_id=run_id, lease_seconds=lease_seconds)
+    async for progress in runner.run(lease=lease, **run_kwargs):
+        yield progress
+
+
+def run_worker_process(
+    task_path: str, run_id: str, lease_seconds: float, run_kwargs: Dict[str, Any]
+) -> None:
+    """
+    The entry point of a worker process.
+    """
+    asyncio.run(_run_worker(Path(task_path), run_id, lease_seconds, run_kwargs))
+
+
+async def _run_worker(
+    task_path: Path, run_id: str, lease_seconds: float, run_kwargs: Dict[str, Any]
+) -> None:
+    task = Task.load_from_file(task_path)
+    async for _ in join_distributed_run(task, run_id, lease_seconds, **run_kwargs):
+        pass
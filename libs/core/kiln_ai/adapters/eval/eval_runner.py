@@ -1,18 +1,80 @@
 import asyncio
 import logging
+import random
+import time
 from dataclasses import dataclass
-from typing import AsyncGenerator, Dict, List, Literal, Set
+from pathlib import Path
+from typing import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Set,
+    TypeVar,
+)
 
+from kiln_ai.adapters.adaptive_concurrency import (
+    AIMDConcurrencyLimiter,
+    ConcurrencyBounds,
+    RateLimitedError,
+    RequestOutcome,
+    concurrency_bounds_for_provider,
+    rate_limit_error_from_exception,
+)
+from kiln_ai.adapters.batch.batch_session import BatchSession, using_batch_session
 from kiln_ai.adapters.eval.base_eval import BaseEval
+from kiln_ai.adapters.eval.job_journal import (
+    EvalJobJournal,
+    EvalRunSpec,
+    JobKey,
+    JobLease,
+    JournalWriter,
+    RunState,
+    job_key,
+    shutting_down,
+)
+from kiln_ai.adapters.eval.judge_cache import JudgeCache
 from kiln_ai.adapters.eval.registry import eval_adapter_from_type
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.adapters.eval.scheduler import FairJobScheduler, ScheduledJob
+from kiln_ai.adapters.eval.sequential import SequentialStopping, SequentialTracker
+from kiln_ai.adapters.eval.telemetry import (
+    EvalRunTelemetry,
+    EvalTelemetry,
+    JobModelCalls,
+    recording_model_calls,
+)
 from kiln_ai.datamodel.basemodel import ID_TYPE
-from kiln_ai.datamodel.dataset_filters import dataset_filter_from_id
-from kiln_ai.datamodel.eval import EvalConfig, EvalRun, EvalScores
-from kiln_ai.datamodel.task import TaskRunConfig
+from kiln_ai.datamodel.dataset_filters import DatasetFilter, dataset_filter_from_id
+from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalRun, EvalScores
+from kiln_ai.datamodel.eval_score_summary import EvalScoreSummary
+from kiln_ai.datamodel.task import Task, TaskRunConfig
 from kiln_ai.datamodel.task_run import TaskRun
+from kiln_ai.datamodel.write_behind import WriteBehindWriter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Rate limited jobs are retried this many times before being counted as an error
+DEFAULT_MAX_RATE_LIMIT_RETRIES = 6
+# Backoff before retrying a rate limited job, if the provider didn't send a Retry-After. Doubles each attempt.
+RATE_LIMIT_BASE_BACKOFF_SECONDS = 1.0
+RATE_LIMIT_MAX_BACKOFF_SECONDS = 60.0
+# Jobs are generated lazily into bounded buffers, holding this many per worker
+JOB_QUEUE_SIZE_PER_WORKER = 2
+# Progress updates are sent at most this often (10 Hz)
+DEFAULT_PROGRESS_INTERVAL_SECONDS = 0.1
+# Telemetry is included in a progress update at most this often (and always in the final update), keeping most updates small
+DEFAULT_TELEMETRY_INTERVAL_SECONDS = 5.0
+# Backoff before retrying a failed job (with max_job_attempts > 1). Doubles each attempt.
+JOB_RETRY_BASE_BACKOFF_SECONDS = 2.0
+JOB_RETRY_MAX_BACKOFF_SECONDS = 120.0
+
 
 @dataclass
 class EvalJob:
@@ -23,11 +85,40 @@ class EvalJob:
     task_run_config: TaskRunConfig | None = None
 
 
+@dataclass
+class EvalJobGroup:
+    """
+    The task_run_eval jobs for one run config and dataset item. The task output is generated once, then judged by each eval config.
+    """
+
+    item: TaskRun
+    task_run_config: TaskRunConfig
+    jobs: List[EvalJob]
+
+
+@dataclass
+class EvalJobPlan:
+    """
+    The result of the count pass over the dataset: the items with jobs left to run, and how many jobs. Jobs themselves are generated lazily from this.
+    """
+
+    total: int
+    item_paths: List[Path]
+    # already_run[(eval_config_id, run_config_id)] = dataset ids
+    already_run: Dict[tuple[ID_TYPE, ID_TYPE], Set[ID_TYPE]]
+    # The dataset filter of each eval (by eval id), limited to the sample for a sample run
+    filters: Dict[ID_TYPE, DatasetFilter]
+
+
 @dataclass
 class EvalProgress:
     complete: int | None = None
     total: int | None = None
     errors: int | None = None
+    # Sequential mode: True once the comparison settled and the run stopped before evaluating every item
+    stopped_early: bool | None = None
+    # Telemetry of the run so far: job timings, model latency and token usage, per eval config and run config. Only in some updates, see telemetry_interval.
+    telemetry: EvalTelemetry | None = None
 
 
 class EvalRunner:
@@ -36,7 +127,9 @@ class EvalRunner:
 
     Can run an eval in 2 modes:
     1) eval_config_eval: evaluate an eval config using existing dataset items.
-    2) task_run_eval: evaluate a range of task run configs, generating new run output using existing dataset item input.
+    2) task_run_eval: evaluate a range of task run configs, generating new run output using existing dataset item input. Output is generated once per run config and dataset item, then judged by every eval config.
+
+    With a sample, only a stratified sample of each eval's dataset is run (see EvalSample).
     """
 
     def __init__(
@@ -44,22 +137,19 @@ class EvalRunner:
         eval_configs: List[EvalConfig],
         run_configs: List[TaskRunConfig] | None,
         eval_run_type: Literal["eval_config_eval", "task_run_eval"],
+        sample: EvalSample | None = None,
     ):
         if len(eval_configs) == 0:
             raise ValueError("Eval runner requires at least one eval config")
-        target_eval = eval_configs[0].parent_eval()
-        if target_eval is None:
-            raise ValueError("Eval config requires a parent eval")
-        for eval_config in eval_configs:
-            parent_eval = eval_config.parent_eval()
-            if parent_eval is None:
-                raise ValueError("Eval config requires a parent eval")
-            if parent_eval.id != target_eval.id:
-                raise ValueError("All eval configs must have the same parent eval")
-
+        evals = self.parent_evals(eval_configs)
+        target_eval = evals[0]
         target_task = target_eval.parent_task()
         if target_task is None:
             raise ValueError("Eval config requires a (grand)parent task")
+        for eval in evals[1:]:
+            parent_task = eval.parent_task()
+            if parent_task is None or parent_task.id != target_task.id:
+                raise ValueError("All evals must be for the same task")
 
         # Check that run_configs is compatible
         if eval_run_type == "task_run_eval":
@@ -80,166 +170,1120 @@ class EvalRunner:
         self.eval_run_type = eval_run_type
         self.eval_configs = eval_configs
         self.run_configs = run_configs
+        self.sample = sample
         self.task = target_task
+        # The first eval. Only eval of a run, except for batch runs (EvalBatchRunner).
         self.eval = target_eval
+        self.evals = evals
+        # eval config id -> its eval
+        evals_by_id = {eval.id: eval for eval in evals}
+        self.evals_by_eval_config: Dict[ID_TYPE, Eval] = {}
+        for eval_config in eval_configs:
+            parent_eval = eval_config.parent_eval()
+            if parent_eval is not None:
+                self.evals_by_eval_config[eval_config.id] = evals_by_id[parent_eval.id]
+        # Evaluators (and the adapters they hold) are reused for all jobs of a run: evaluators[(eval_config_id, run_config_id)]
+        self.evaluators: Dict[tuple[ID_TYPE, ID_TYPE | None], BaseEval] = {}
+        # Set while running: results are saved in the background by this writer, instead of inline
+        self.eval_run_writer: WriteBehindWriter | None = None
+        # Set while running, unless disabled: judge results are cached, so identical judge requests are only sent once
+        self.judge_cache: JudgeCache | None = None
+        # Set by a sequential run (and kept after it ends, for reading the final means and intervals)
+        self.sequential_tracker: SequentialTracker | None = None
+        # Set by a run (and kept after it ends): job timings, model latency and token usage
+        self.telemetry: EvalRunTelemetry | None = None
+        # Set while running, unless disabled: the durable journal of job states, the writer jobs are journaled through (off the event loop), and this run's ID in it
+        self.journal: EvalJobJournal | None = None
+        self.journal_writer: JournalWriter | None = None
+        self.journal_run_id: str | None = None
+        # Set while running: the error each failed job last failed with, until it's journaled
+        self.job_errors: Dict[JobKey, str] = {}
+        self.max_job_attempts = 1
+        self.job_retry_backoff = JOB_RETRY_BASE_BACKOFF_SECONDS
+        # Set while running a shared run with other workers: this worker's lease, and jobs other workers held when we reached them
+        self.lease: JobLease | None = None
+        self.deferred_jobs: List[List[EvalJob]] = []
+
+    @classmethod
+    def parent_evals(cls, eval_configs: List[EvalConfig]) -> List[Eval]:
+        """
+        The evals the eval configs belong to, validating they can be run together: all from the same eval.
+        """
+        target_eval = eval_configs[0].parent_eval()
+        if target_eval is None:
+            raise ValueError("Eval config requires a parent eval")
+        for eval_config in eval_configs:
+            parent_eval = eval_config.parent_eval()
+            if parent_eval is None:
+                raise ValueError("Eval config requires a parent eval")
+            if parent_eval.id != target_eval.id:
+                raise ValueError("All eval configs must have the same parent eval")
+        return [target_eval]
+
+    @classmethod
+    def from_run_spec(cls, task: Task, spec: EvalRunSpec) -> "EvalRunner":
+        """
+        Rebuild the runner of a journaled run (see EvalJobJournal), to resume it.
+        """
+        eval_configs_by_id = {
+            eval_config.id: eval_config
+            for eval in task.evals()
+            for eval_config in eval.configs()
+        }
+        missing = [id for id in spec.eval_config_ids if id not in eval_configs_by_id]
+        if missing:
+            raise ValueError(f"Eval configs not found: {', '.join(missing)}")
+        eval_configs = [eval_configs_by_id[id] for id in spec.eval_config_ids]
+
+        run_configs: List[TaskRunConfig] | None = None
+        if spec.run_config_ids is not None:
+            run_configs_by_id = {
+                run_config.id: run_config for run_config in task.run_configs()
+            }
+            missing = [id for id in spec.run_config_ids if id not in run_configs_by_id]
+            if missing:
+                raise ValueError(f"Run configs not found: {', '.join(missing)}")
+            run_configs = [run_configs_by_id[id] for id in spec.run_config_ids]
+
+        evals = {eval_config.parent_eval().id for eval_config in eval_configs}  # type: ignore
+        runner_class = EvalBatchRunner if len(evals) > 1 else cls
+        return runner_class(
+            eval_configs, run_configs, spec.eval_run_type, sample=spec.sample
+        )
+
+    def run_spec(self) -> EvalRunSpec:
+        return EvalRunSpec(
+            eval_config_ids=[str(eval_config.id) for eval_config in self.eval_configs],
+            run_config_ids=[str(run_config.id) for run_config in self.run_configs]
+            if self.run_configs is not None
+            else None,
+            eval_run_type=self.eval_run_type,
+            sample=self.sample,
+        )
 
     def collect_tasks(self) -> List[EvalJob]:
+        """
+        All jobs for this run, excluding any that have already been run. Materializes every job: run() streams them with job_source() instead.
+        """
+        return list(self.iter_tasks())
+
+    def job_configs(self) -> List[tuple[EvalConfig, TaskRunConfig | None]]:
+        """
+        The (eval config, run config) pairs each dataset item is run with. Run config is None for mode "eval_config_eval".
+        """
         if self.eval_run_type == "eval_config_eval":
-            return self.collect_tasks_for_eval_config_eval()
-        else:
-            return self.collect_tasks_for_task_run_eval()
+            return [(eval_config, None) for eval_config in self.eval_configs]
+        return [
+            (eval_config, run_config)
+            for eval_config in self.eval_configs
+            for run_config in self.run_configs or []
+        ]
 
-    def collect_tasks_for_eval_config_eval(self) -> List[EvalJob]:
+    def already_run(self) -> Dict[tuple[ID_TYPE, ID_TYPE], Set[ID_TYPE]]:
         """
-        Collect all jobs for this run, excluding any that have already been run.
+        The dataset items already run, keyed by (eval config id, run config id).
 
-        This variant is used for mode "eval_config_eval", using existing dataset run data (input/output).
+        For mode "eval_config_eval" the run config id is None, and any existing eval run for the item counts. For mode "task_run_eval" only eval runs for our run configs count.
 
-        The tasks:
-        - should be in the eval config set filter
-        - should not have already been run for this eval config + dataset item pair
+        Read from each eval config's score summary, rather than loading all of its eval runs.
         """
-        filter = dataset_filter_from_id(self.eval.eval_configs_filter_id)
-
-        # already_run[eval_config_id][dataset_id]
-        already_run: Dict[ID_TYPE, Set[ID_TYPE]] = {}
+        already_run: Dict[tuple[ID_TYPE, ID_TYPE], Set[ID_TYPE]] = {}
+        for eval_config, run_config in self.job_configs():
+            already_run[(eval_config.id, run_config.id if run_config else None)] = set()
         for eval_config in self.eval_configs:
-            already_run[eval_config.id] = set()
-            for run in eval_config.runs(readonly=True):
-                already_run[eval_config.id].add(run.dataset_id)
+            with EvalScoreSummary.for_eval_config(eval_config) as summary:
+                dataset_ids_by_run_config = summary.dataset_ids_by_run_config()
+            for run_config_id, dataset_ids in dataset_ids_by_run_config.items():
+                if self.eval_run_type == "eval_config_eval":
+                    key = (eval_config.id, None)
+                else:
+                    key = (eval_config.id, run_config_id)
+                if key in already_run:
+                    already_run[key].update(dataset_ids)
+        return already_run
 
-        return [
-            EvalJob(
-                item=task_run,
-                eval_config=eval_config,
-                type="eval_config_eval",
+    def plan_tasks(self) -> EvalJobPlan:
+        """
+        The count pass: find the dataset items with jobs left to run, and count those jobs, without building them.
+
+        Dataset items:
+        - should be in the filter of the eval config's eval: eval_configs_filter_id for mode "eval_config_eval", eval_set_filter_id for mode "task_run_eval"
+        - have a job for each eval config (+ run config) pair they haven't already been run for
+
+        The dataset is scanned once for all evals of the run (twice for a sample run: once to sample it).
+        """
+        already_run = self.already_run()
+        configs = self.job_configs()
+        filters = self.dataset_filters()
+        paths: Iterable[Path] = TaskRun.iterate_children_paths_of_parent_path(
+            self.task.path
+        )
+        if self.sample is not None:
+            filters, paths = self.sampled_filters(self.sample, filters)
+
+        total = 0
+        item_paths: List[Path] = []
+        for path in paths:
+            task_run = TaskRun.load_from_file(path, readonly=True)
+            pending = sum(
+                1 for _ in self.pending_configs(task_run, configs, filters, already_run)
             )
-            for task_run in self.task.runs(readonly=True)
-            if filter(task_run)
-            for eval_config in self.eval_configs
-            if task_run.id not in already_run[eval_config.id]
-        ]
+            if pending > 0:
+                total += pending
+                item_paths.append(path)
+        return EvalJobPlan(
+            total=total,
+            item_paths=item_paths,
+            already_run=already_run,
+            filters=filters,
+        )
 
-    def collect_tasks_for_task_run_eval(self) -> List[EvalJob]:
+    def iter_tasks(self, plan: EvalJobPlan | None = None) -> Iterator[EvalJob]:
         """
-        Collect all jobs for this run, excluding any that have already been run.
+        Lazily generate the jobs for this run, loading one dataset item at a time. Jobs for the same item are adjacent.
+        """
+        if plan is None:
+            plan = self.plan_tasks()
+        configs = self.job_configs()
+        for path in plan.item_paths:
+            task_run = TaskRun.load_from_file(path, readonly=True)
+            for eval_config, run_config in self.pending_configs(
+                task_run, configs, plan.filters, plan.already_run
+            ):
+                yield EvalJob(
+                    item=task_run,
+                    type=self.eval_run_type,
+                    eval_config=eval_config,
+                    task_run_config=run_config,
+                )
 
-        This variant is used for mode "task_run_eval", generating new run output using existing dataset item input.
+    def dataset_filters(self) -> Dict[ID_TYPE, DatasetFilter]:
+        """
+        The dataset filter of each eval in the run (by eval id), for the run's mode.
+        """
+        return {
+            eval.id: dataset_filter_from_id(
+                eval.eval_configs_filter_id
+                if self.eval_run_type == "eval_config_eval"
+                else eval.eval_set_filter_id
+            )
+            for eval in self.evals
+        }
 
-        The tasks:
-        - should be in the eval set filter
-        - should not have already been run for this eval config + run config + dataset item
+    def sampled_filters(
+        self, sample: EvalSample, filters: Dict[ID_TYPE, DatasetFilter]
+    ) -> tuple[Dict[ID_TYPE, DatasetFilter], List[Path]]:
         """
-        filter = dataset_filter_from_id(self.eval.eval_set_filter_id)
+        Sample each eval's dataset: the eval's filter limited to its sampled items, and the paths of items sampled by any eval.
 
-        # already_run[eval_config_id][run_config_id][dataset_id]
-        already_run: Dict[ID_TYPE, Dict[ID_TYPE, Set[ID_TYPE]]] = {}
+        Samples the whole filtered dataset, including items already run, so the sample doesn't change as it's run.
+        """
+        candidates: Dict[ID_TYPE, List[tuple[ID_TYPE, tuple]]] = {
+            eval_id: [] for eval_id in filters
+        }
+        paths: Dict[ID_TYPE, Path] = {}
+        for path in TaskRun.iterate_children_paths_of_parent_path(self.task.path):
+            task_run = TaskRun.load_from_file(path, readonly=True)
+            stratum = sample.stratum_of(task_run)
+            for eval_id, dataset_filter in filters.items():
+                if dataset_filter(task_run):
+                    candidates[eval_id].append((task_run.id, stratum))
+                    paths[task_run.id] = path
+
+        sampled_filters: Dict[ID_TYPE, DatasetFilter] = {}
+        sampled_paths: Dict[ID_TYPE, Path] = {}
+        for eval_id, eval_candidates in candidates.items():
+            sampled_ids = sample.sample(eval_candidates)
+            sampled_filters[eval_id] = _sample_filter(sampled_ids)
+            for item_id in sampled_ids:
+                sampled_paths[item_id] = paths[item_id]
+        return sampled_filters, sorted(sampled_paths.values())
+
+    def pending_configs(
+        self,
+        task_run: TaskRun,
+        configs: List[tuple[EvalConfig, TaskRunConfig | None]],
+        filters: Dict[ID_TYPE, DatasetFilter],
+        already_run: Dict[tuple[ID_TYPE, ID_TYPE], Set[ID_TYPE]],
+    ) -> Iterator[tuple[EvalConfig, TaskRunConfig | None]]:
+        """
+        The (eval config, run config) pairs a dataset item still needs a job for: it's in the filter of the eval config's eval, and hasn't already been run.
+        """
+        in_filter: Dict[ID_TYPE, bool] = {}
+        for eval_config, run_config in configs:
+            eval_id = self.evals_by_eval_config[eval_config.id].id
+            if eval_id not in in_filter:
+                in_filter[eval_id] = filters[eval_id](task_run)
+            if not in_filter[eval_id]:
+                continue
+            key = (eval_config.id, run_config.id if run_config else None)
+            if task_run.id not in already_run[key]:
+                yield eval_config, run_config
+
+    def job_source(self) -> tuple[int, Iterator[EvalJob]]:
+        """
+        The total number of jobs (from a cheap count pass), and a lazy iterator over them.
+        """
+        plan = self.plan_tasks()
+        return plan.total, self.iter_tasks(plan)
+
+    def sequential_job_source(
+        self, settings: SequentialStopping
+    ) -> tuple[int, Iterator[EvalJob]]:
+        """
+        Like job_source(), but with dataset items in a random order for sequential early stopping. Also starts the tracker, including the results of items already run.
+        """
+        if self.eval_run_type != "task_run_eval":
+            raise ValueError("Sequential stopping requires mode 'task_run_eval'")
+        if len(self.evals) > 1:
+            raise ValueError("Sequential stopping requires a single eval")
+        run_config_ids = [run_config.id for run_config in self.run_configs or []]
+        tracker = SequentialTracker(
+            settings,
+            eval_config_ids=[eval_config.id for eval_config in self.eval_configs],
+            run_config_ids=run_config_ids,
+            score_keys=[score.json_key() for score in self.eval.output_scores],
+        )
         for eval_config in self.eval_configs:
-            already_run[eval_config.id] = {}
-            for run_config in self.run_configs or []:
-                already_run[eval_config.id][run_config.id] = set()
-            for run in eval_config.runs(readonly=True):
-                if (
-                    run.task_run_config_id is not None
-                    and run.task_run_config_id in already_run[eval_config.id]
-                ):
-                    already_run[eval_config.id][run.task_run_config_id].add(
-                        run.dataset_id
+            for eval_run in eval_config.runs(readonly=True):
+                if eval_run.task_run_config_id in run_config_ids:
+                    tracker.record(
+                        eval_config.id, eval_run.task_run_config_id, eval_run.scores
                     )
+        self.sequential_tracker = tracker
 
-        return [
-            EvalJob(
-                item=task_run,
-                task_run_config=run_config,
-                type="task_run_eval",
-                eval_config=eval_config,
+        plan = self.plan_tasks()
+        plan.item_paths = settings.shuffled(plan.item_paths)
+        return plan.total, self.iter_tasks(plan)
+
+    def group_jobs(self, jobs: Iterable[EvalJob]) -> Iterator[EvalJob | EvalJobGroup]:
+        """
+        Group task_run_eval jobs sharing a run config and dataset item, so the task output is generated once for all eval configs. Other jobs are passed through, in their original order.
+
+        Works on a stream: jobs for the same dataset item must be adjacent (as iter_tasks yields them), and each item's groups are yielded when the next item starts.
+        """
+        groups: Dict[tuple[ID_TYPE, ID_TYPE], EvalJobGroup] = {}
+        for job in jobs:
+            if job.type != "task_run_eval" or job.task_run_config is None:
+                yield from _finished_groups(groups)
+                yield job
+                continue
+            if groups and next(iter(groups.values())).item.id != job.item.id:
+                yield from _finished_groups(groups)
+            key = (job.task_run_config.id, job.item.id)
+            group = groups.get(key)
+            if group is None:
+                group = EvalJobGroup(
+                    item=job.item, task_run_config=job.task_run_config, jobs=[]
+                )
+                groups[key] = group
+            group.jobs.append(job)
+        yield from _finished_groups(groups)
+
+    def job_providers(self, job: EvalJob) -> List[str]:
+        """
+        The model providers a job calls: the eval config's judge, and the task run config's model if we're running the task.
+        """
+        providers = {job.eval_config.model_provider}
+        if job.task_run_config is not None:
+            providers.add(job.task_run_config.run_config_properties.model_provider_name)
+        return sorted(providers)
+
+    def build_concurrency_limiters(
+        self,
+        concurrency: int,
+        adaptive_concurrency: bool,
+        provider_concurrency_bounds: Dict[str, ConcurrencyBounds] | None,
+        batch: BatchSession | None = None,
+    ) -> Dict[str, AIMDConcurrencyLimiter]:
+        """
+        One concurrency limiter per model provider used by this run.
+
+        Providers called through a batch session get a fixed limit of a full batch: their jobs only wait on the batch, so enough of them run at once to fill one.
+        """
+        providers = {eval_config.model_provider for eval_config in self.eval_configs}
+        if self.eval_run_type == "task_run_eval":
+            for run_config in self.run_configs or []:
+                providers.add(run_config.run_config_properties.model_provider_name)
+
+        limiters: Dict[str, AIMDConcurrencyLimiter] = {}
+        for provider in providers:
+            if batch is not None and batch.accepts(provider):
+                limiters[provider] = AIMDConcurrencyLimiter(
+                    bounds=ConcurrencyBounds(
+                        min=batch.max_batch_size, max=batch.max_batch_size
+                    ),
+                    initial=batch.max_batch_size,
+                    adaptive=False,
+                )
+                continue
+            if adaptive_concurrency:
+                bounds = (provider_concurrency_bounds or {}).get(
+                    provider
+                ) or concurrency_bounds_for_provider(provider)
+            else:
+                bounds = ConcurrencyBounds(min=concurrency, max=concurrency)
+            limiters[provider] = AIMDConcurrencyLimiter(
+                bounds=bounds, initial=concurrency, adaptive=adaptive_concurrency
             )
-            for task_run in self.task.runs(readonly=True)
-            if filter(task_run)
-            for eval_config in self.eval_configs
-            for run_config in self.run_configs or []
-            if task_run.id not in already_run[eval_config.id][run_config.id]
-        ]
+        return limiters
 
-    async def run(self, concurrency: int = 25) -> AsyncGenerator[EvalProgress, None]:
+    async def run(
+        self,
+        concurrency: int = 25,
+        adaptive_concurrency: bool = True,
+        provider_concurrency_bounds: Dict[str, ConcurrencyBounds] | None = None,
+        max_rate_limit_retries: int = DEFAULT_MAX_RATE_LIMIT_RETRIES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL_SECONDS,
+        telemetry_interval: float = DEFAULT_TELEMETRY_INTERVAL_SECONDS,
+        use_judge_cache: bool = True,
+        sequential_stopping: SequentialStopping | None = None,
+        max_concurrency_per_config: int | None = None,
+        max_config_lead: int | None = None,
+        batch: BatchSession | None = None,
+        use_journal: bool = True,
+        max_job_attempts: int = 1,
+        job_retry_backoff: float = JOB_RETRY_BASE_BACKOFF_SECONDS,
+        lease: JobLease | None = None,
+    ) -> AsyncGenerator[EvalProgress, None]:
         """
         Runs the configured eval run with parallel workers and yields progress updates.
+
+        Jobs are scheduled fairly across configs (run configs, or eval configs for mode "eval_config_eval"), so a slow config can't hold every worker, and results stay balanced across configs if the run is stopped part way. See FairJobScheduler.
+
+        Progress updates include the run's telemetry so far (see EvalTelemetry) every telemetry_interval, and the final update always does. When the run ends, its telemetry is added to the telemetry persisted beside each eval config.
+
+        Args:
+            concurrency: the number of parallel jobs per model provider. With adaptive_concurrency this is the starting point: it grows while requests succeed and backs off on rate limit/timeout errors, within the provider's bounds.
+            adaptive_concurrency: adapt concurrency to the provider's rate limits (AIMD). If false, concurrency is fixed.
+            provider_concurrency_bounds: override the min/max concurrency for providers (ModelProviderName -> bounds).
+            max_rate_limit_retries: rate limited jobs are retried (after Retry-After, or an exponential backoff) up to this many times before counting as an error.
+            progress_interval: minimum seconds between progress updates. Completions in between are coalesced into one update, and a final update always has the exact count. 0 sends an update for every completed job.
+            telemetry_interval: minimum seconds between progress updates including telemetry. The final update always includes it.
+            use_judge_cache: reuse cached judge results for judge requests identical to ones already run (same judge, prompts, input and output). Disable to always call the judge, for example when measuring judge variance.
+            sequential_stopping: compare run configs sequentially: evaluate items in a random order, and stop once the ranking of run configs is settled (or the confidence intervals are narrow enough). Only for mode "task_run_eval". Jobs already queued when it settles still run, so a run overshoots by up to a few jobs per worker.
+            max_concurrency_per_config: the most jobs running at once for each config. None for an equal share of the workers among configs with jobs left.
+            max_config_lead: the most jobs a config can have started beyond the config furthest behind. None for the number of workers.
+            batch: run in batch mode: model calls to providers the session's transport supports are sent to their batch API (cheaper, but results can take hours), others are called live. Up to a full batch of jobs for those providers run at once. The caller owns the session, and closes it after the run.
+            use_journal: record the run and the state of each job (pending, in flight, failed with its error, done) in the task's job journal, so interrupted runs can be found and resumed. See EvalJobJournal.
+            max_job_attempts: attempts at a failed job (an error other than rate limiting, which is retried separately) before it counts as an error. Retries wait job_retry_backoff seconds, doubling each attempt.
+            lease: run a journaled run together with other workers (processes, or machines sharing the project): each job is claimed with a lease before it's run, and skipped if another worker holds it. Jobs held by a worker which stops without finishing them are run once released (or their lease expires), so the run ends when all of its jobs are done or failed. Progress counts this worker's jobs. See run_distributed().
         """
-        jobs = self.collect_tasks()
+        if max_job_attempts < 1:
+            raise ValueError("max_job_attempts must be at least 1")
+        if lease is not None:
+            self.validate_lease(lease, use_journal, sequential_stopping)
+        self.sequential_tracker = None
+        if sequential_stopping is not None:
+            total, jobs = self.sequential_job_source(sequential_stopping)
+        else:
+            total, jobs = self.job_source()
+        # Fresh evaluators for each run, so changes to configs between runs are picked up
+        self.evaluators = {}
+        self.judge_cache = JudgeCache.shared() if use_judge_cache else None
+        telemetry = EvalRunTelemetry()
+        self.telemetry = telemetry
+        self.max_job_attempts = max_job_attempts
+        self.job_retry_backoff = job_retry_backoff
+        self.job_errors = {}
+        self.lease = lease
+        self.deferred_jobs = []
 
         complete = 0
         errors = 0
-        total = len(jobs)
 
         # Send initial status
-        yield EvalProgress(complete=complete, total=total, errors=errors)
+        yield EvalProgress(
+            complete=complete,
+            total=total,
+            errors=errors,
+        )
 
-        worker_queue: asyncio.Queue[EvalJob] = asyncio.Queue()
-        for job in jobs:
-            worker_queue.put_nowait(job)
+        # Journaled once the run starts: it's ended in the finally below. A shared run is started and ended by its coordinator.
+        journal = EvalJobJournal.for_task(self.task) if use_journal else None
+        self.journal = journal
+        journal_writer = JournalWriter(journal) if journal is not None else None
+        self.journal_writer = journal_writer
+        if lease is not None:
+            self.journal_run_id = lease.run_id
+        elif journal is not None:
+            self.journal_run_id = journal.start_run(self.run_spec())
+        else:
+            self.journal_run_id = None
+        run_state = RunState.stopped
+        lease_renewal = (
+            asyncio.create_task(self.renew_leases(journal_writer, lease))
+            if journal_writer is not None and lease is not None
+            else None
+        )
 
-        # simple status queue to return progress. True=success, False=error
-        status_queue: asyncio.Queue[bool] = asyncio.Queue()
+        # Results are saved on a writer thread, so workers never block the event loop on disk writes
+        writer = WriteBehindWriter()
+        self.eval_run_writer = writer
+        workers: List[asyncio.Task] = []
+        finished: asyncio.Task | None = None
+        try:
+            # simple status queue to return progress. True=success, False=error, None=all workers done
+            status_queue: asyncio.Queue[bool | None] = asyncio.Queue()
 
-        workers = []
-        for i in range(concurrency):
-            task = asyncio.create_task(self.run_worker(worker_queue, status_queue))
-            workers.append(task)
+            limiters = self.build_concurrency_limiters(
+                concurrency, adaptive_concurrency, provider_concurrency_bounds, batch
+            )
+            # Limiters gate how many jobs run at once, so start enough workers for the highest limit they can reach
+            worker_count = max(
+                [concurrency] + [limiter.bounds.max for limiter in limiters.values()]
+            )
+            worker_count = max(1, min(worker_count, total))
 
-        # Send status updates until workers are done, and they are all sent
-        while not status_queue.empty() or not all(worker.done() for worker in workers):
+            # Jobs are generated (and dataset items loaded) only as workers are ready for them, into bounded buffers
+            tracker = self.sequential_tracker
+            scheduler = FairJobScheduler(
+                self.group_jobs(self.journal_queued(jobs)),
+                key=schedule_key,
+                worker_count=worker_count,
+                max_lead=max_config_lead or worker_count,
+                max_concurrency_per_key=max_concurrency_per_config,
+                buffer_size=worker_count * JOB_QUEUE_SIZE_PER_WORKER,
+                should_stop=tracker.settled if tracker is not None else None,
+                item_id=lambda job: job.item.id,
+            )
+
+            for i in range(worker_count):
+                task = asyncio.create_task(
+                    self.run_worker(
+                        scheduler, status_queue, limiters, max_rate_limit_retries, batch
+                    )
+                )
+                workers.append(task)
+
+            # Workers report each completed job on the status queue. None marks that all workers are done.
+            async def wait_for_workers():
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    status_queue.put_nowait(None)
+
+            finished = asyncio.create_task(wait_for_workers())
+
+            # Coalesce completions into at most one progress update per progress_interval, so fast runs don't flood the client
+            last_sent = (complete, errors)
+            last_sent_time = time.monotonic()
+            # Telemetry is larger than the counts, so it's sent less often: when due, and with the last job
+            last_telemetry_time = last_sent_time
+            last_sent_telemetry = False
+            next_status: asyncio.Task[bool | None] | None = None
             try:
-                # Use timeout to prevent hanging if all workers complete
-                # between our while condition check and get()
-                success = await asyncio.wait_for(status_queue.get(), timeout=0.1)
-                if success:
-                    complete += 1
-                else:
-                    errors += 1
+                while True:
+                    if next_status is None:
+                        next_status = asyncio.ensure_future(status_queue.get())
+                    unsent = (complete, errors) != last_sent
+                    timeout = (
+                        max(0.0, last_sent_time + progress_interval - time.monotonic())
+                        if unsent
+                        else None
+                    )
+                    # Only waits with a timeout when there is unsent progress: no polling while idle
+                    done, _ = await asyncio.wait({next_status}, timeout=timeout)
+                    if next_status in done:
+                        success = next_status.result()
+                        next_status = None
+                        if success is None:
+                            break
+                        if success:
+                            complete += 1
+                        else:
+                            errors += 1
 
-                yield EvalProgress(complete=complete, total=total, errors=errors)
-            except asyncio.TimeoutError:
-                # Timeout is expected, just continue to recheck worker status
-                # Don't love this but beats sentinels for reliability
-                continue
+                    now = time.monotonic()
+                    if (complete, errors) != last_sent and (
+                        now - last_sent_time >= progress_interval
+                    ):
+                        last_sent = (complete, errors)
+                        last_sent_time = now
+                        last_sent_telemetry = (
+                            now - last_telemetry_time >= telemetry_interval
+                            or complete + errors >= total
+                        )
+                        if last_sent_telemetry:
+                            last_telemetry_time = now
+                        yield EvalProgress(
+                            complete=complete,
+                            total=total,
+                            errors=errors,
+                            telemetry=telemetry.snapshot()
+                            if last_sent_telemetry
+                            else None,
+                        )
+            finally:
+                if next_status is not None:
+                    next_status.cancel()
+
+            await asyncio.wait({finished})
+            if finished.exception() is not None:
+                # A worker or job generation failed: stop the rest
+                for worker in workers:
+                    worker.cancel()
+
+            # Wait for all results to be written. Results which failed to save are errors, not complete.
+            await asyncio.to_thread(writer.close)
+            if journal_writer is not None:
+                await asyncio.to_thread(journal_writer.close)
+            complete -= writer.failed
+            errors += writer.failed
 
-        # These are redundant, but keeping them will catch async errors
-        await asyncio.gather(*workers)
-        await worker_queue.join()
+            # Final exact count and telemetry, if the last completions were coalesced or sent without telemetry
+            if tracker is not None and complete + errors < total:
+                # Stopped early: the jobs we skipped won't run, so they aren't part of the total
+                yield EvalProgress(
+                    complete=complete,
+                    total=complete + errors,
+                    errors=errors,
+                    stopped_early=True,
+                    telemetry=telemetry.snapshot(),
+                )
+            elif (complete, errors) != last_sent or not last_sent_telemetry:
+                yield EvalProgress(
+                    complete=complete,
+                    total=total,
+                    errors=errors,
+                    telemetry=telemetry.snapshot(),
+                )
+
+            # Raise the error if a worker or job generation failed
+            finished.result()
+            run_state = RunState.finished
+        except Exception:
+            run_state = RunState.failed
+            raise
+        finally:
+            try:
+                # Stop workers still running if we're closed early (eg the client went away), and let them unwind
+                running = [
+                    task for task in [*workers, finished] if task and not task.done()
+                ]
+                if lease_renewal is not None:
+                    running.append(lease_renewal)
+                for task in running:
+                    task.cancel()
+                if running:
+                    await asyncio.wait(running)
+            finally:
+                # On completion, error or cancellation: write everything submitted (blocking, so it happens even if we're being cancelled). Saved jobs are journaled as done by the writer, so it's closed before the journal writer.
+                self.eval_run_writer = None
+                writer.close()
+                self.evaluators = {}
+                self.judge_cache = None
+                if journal_writer is not None:
+                    journal_writer.close()
+                if run_state == RunState.stopped and shutting_down():
+                    # Cancelled by a shutdown, not the client: resume it at next startup
+                    run_state = RunState.interrupted
+                if journal is not None and lease is not None:
+                    # Hand jobs we didn't finish to the other workers
+                    journal.release_leases(lease.owner)
+                    journal.close()
+                elif journal is not None and self.journal_run_id is not None:
+                    journal.end_run(self.journal_run_id, run_state)
+                    journal.close()
+                self.journal = None
+                self.journal_writer = None
+                self.lease = None
+                try:
+                    telemetry.save(self.eval_configs)
+                except Exception as e:
+                    # Telemetry is informational, don't fail the run over it
+                    logger.warning(f"Failed to save eval telemetry: {e}")
 
     async def run_worker(
-        self, worker_queue: asyncio.Queue[EvalJob], status_queue: asyncio.Queue[bool]
+        self,
+        scheduler: FairJobScheduler[EvalJob | EvalJobGroup],
+        status_queue: asyncio.Queue[bool | None],
+        limiters: Dict[str, AIMDConcurrencyLimiter] | None = None,
+        max_rate_limit_retries: int = DEFAULT_MAX_RATE_LIMIT_RETRIES,
+        batch: BatchSession | None = None,
+    ):
+        # Set in the worker's own task, so model calls in its jobs go through the batch session
+        with using_batch_session(batch):
+            await self._run_worker(
+                scheduler, status_queue, limiters, max_rate_limit_retries
+            )
+
+    async def _run_worker(
+        self,
+        scheduler: FairJobScheduler[EvalJob | EvalJobGroup],
+        status_queue: asyncio.Queue[bool | None],
+        limiters: Dict[str, AIMDConcurrencyLimiter] | None,
+        max_rate_limit_retries: int,
     ):
         while True:
-            try:
-                job = worker_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                # worker can end when the queue is empty
+            queued: ScheduledJob[EvalJob | EvalJobGroup] | None = await scheduler.next()
+            if queued is None:
+                # No more jobs, worker can end
                 break
             try:
-                success = await self.run_job(job)
-                await status_queue.put(success)
+                job = await self.start_job(queued.job)
+                if job is not None:
+                    await self.run_started_job(
+                        job,
+                        queued.queued_at,
+                        status_queue,
+                        limiters,
+                        max_rate_limit_retries,
+                    )
             finally:
-                # Always mark the dequeued task as done, even on exceptions
-                worker_queue.task_done()
+                # Always release the job's config, even on exceptions
+                scheduler.done(queued)
+
+        if self.lease is not None:
+            await self.run_deferred_jobs(
+                self.lease, status_queue, limiters, max_rate_limit_retries
+            )
+
+    async def run_started_job(
+        self,
+        job: EvalJob | EvalJobGroup,
+        queued_at: float,
+        status_queue: asyncio.Queue[bool | None],
+        limiters: Dict[str, AIMDConcurrencyLimiter] | None,
+        max_rate_limit_retries: int,
+    ) -> None:
+        started_at = time.monotonic()
+        if isinstance(job, EvalJobGroup):
+            jobs = job.jobs
+            results = await self.run_job_group(
+                job, limiters or {}, max_rate_limit_retries
+            )
+        else:
+            jobs = [job]
+            results = [
+                await self.run_job_recording_calls(
+                    job, limiters or {}, max_rate_limit_retries
+                )
+            ]
+        # Recorded before reporting progress, so progress updates include these jobs
+        wall_time = time.monotonic() - started_at
+        for finished_job, success in zip(jobs, results):
+            self.record_job_telemetry(
+                finished_job,
+                success,
+                wall_time,
+                started_at - queued_at,
+            )
+            self.journal_finished(finished_job, success)
+        for success in results:
+            await status_queue.put(success)
+
+    async def start_job(
+        self, job: EvalJob | EvalJobGroup
+    ) -> EvalJob | EvalJobGroup | None:
+        """
+        Journal the start of a job. With a lease, claim it first: returns the part of it this worker claimed (None if none), and defers jobs other workers hold.
+        """
+        jobs = job.jobs if isinstance(job, EvalJobGroup) else [job]
+        if self.lease is None or self.journal_writer is None:
+            self.journal_started(jobs)
+            return job
+
+        claimed_keys, held_keys = await self.journal_writer.claim(
+            [journal_key(job) for job in jobs],
+            self.lease.run_id,
+            self.lease.owner,
+            self.lease.lease_seconds,
+        )
+        held = [job for job in jobs if journal_key(job) in held_keys]
+        if held:
+            self.deferred_jobs.append(held)
+        claimed = [job for job in jobs if journal_key(job) in claimed_keys]
+        if not claimed:
+            return None
+        if isinstance(job, EvalJobGroup):
+            return EvalJobGroup(
+                item=job.item, task_run_config=job.task_run_config, jobs=claimed
+            )
+        return job
+
+    async def run_deferred_jobs(
+        self,
+        lease: JobLease,
+        status_queue: asyncio.Queue[bool | None],
+        limiters: Dict[str, AIMDConcurrencyLimiter] | None,
+        max_rate_limit_retries: int,
+    ) -> None:
+        """
+        Run the jobs other workers held when we reached them, if they become claimable: their worker stopped without finishing them, releasing them or letting their lease expire. Returns once every deferred job is settled (done, or failed for good).
+        """
+        while self.deferred_jobs:
+            deferred, self.deferred_jobs = self.deferred_jobs, []
+            claimed_any = False
+            for jobs in deferred:
+                for job in self.group_jobs(jobs):
+                    started = await self.start_job(job)
+                    if started is not None:
+                        claimed_any = True
+                        await self.run_started_job(
+                            started,
+                            time.monotonic(),
+                            status_queue,
+                            limiters,
+                            max_rate_limit_retries,
+                        )
+            if self.deferred_jobs and not claimed_any:
+                await asyncio.sleep(lease.poll_interval)
+
+    def validate_lease(
+        self,
+        lease: JobLease,
+        use_journal: bool,
+        sequential_stopping: SequentialStopping | None,
+    ) -> None:
+        if not use_journal:
+            raise ValueError("Running with a lease requires the job journal")
+        if sequential_stopping is not None:
+            raise ValueError("Sequential stopping can't be used with a lease")
+        journal = EvalJobJournal.for_task(self.task)
+        if journal is None:
+            raise ValueError("Running with a lease requires a saved task")
+        try:
+            if journal.run(lease.run_id) is None:
+                raise ValueError(
+                    f"Eval run not found in the job journal. ID: {lease.run_id}"
+                )
+        finally:
+            journal.close()
+
+    async def renew_leases(self, journal: JournalWriter, lease: JobLease) -> None:
+        # Renew well before leases expire, so a slow job isn't claimed by another worker
+        while True:
+            await asyncio.sleep(lease.lease_seconds / 3)
+            journal.renew_leases(lease.owner, lease.lease_seconds)
+            # The run is in progress while any of its workers is: don't resume it elsewhere
+            journal.renew_run_lease(lease.run_id, lease.lease_seconds)
+
+    def journal_queued(self, jobs: Iterable[EvalJob]) -> Iterator[EvalJob]:
+        """
+        Pass jobs through, journaling them as pending as they're pulled. Jobs for the same dataset item are journaled together.
+        """
+        item_jobs: List[EvalJob] = []
+        for job in jobs:
+            if item_jobs and job.item.id != item_jobs[0].item.id:
+                self._journal_pending(item_jobs)
+                yield from item_jobs
+                item_jobs = []
+            item_jobs.append(job)
+        self._journal_pending(item_jobs)
+        yield from item_jobs
+
+    def _journal_pending(self, jobs: List[EvalJob]) -> None:
+        if self.journal_writer is not None and self.journal_run_id is not None and jobs:
+            self.journal_writer.mark_pending(
+                [journal_key(job) for job in jobs], self.journal_run_id
+            )
 
-    async def run_job(self, job: EvalJob) -> bool:
+    def journal_started(self, jobs: List[EvalJob]) -> None:
+        if self.journal_writer is None or self.journal_run_id is None:
+            return
+        self.journal_writer.mark_in_flight(
+            [journal_key(job) for job in jobs], self.journal_run_id
+        )
+
+    def journal_finished(
+        self, job: EvalJob, success: bool, retry_at: float | None = None
+    ) -> None:
+        """
+        Journal the outcome of an attempt at a job, if it failed: with the error it failed with, and retry_at, when it will be retried (if it will be). Successful jobs are journaled as done once their result is saved (see save_eval_run).
+        """
+        key = journal_key(job)
+        error = self.job_errors.pop(key, None)
+        if success or self.journal_writer is None:
+            return
+        self.journal_writer.mark_failed([key], error or "Unknown error", retry_at)
+
+    def save_eval_run(self, job: EvalJob, eval_run: EvalRun) -> None:
+        """
+        Save a job's result: in the background while running. The job is journaled as done once its result is on disk, so a result lost before then (a failed save, or a crash) leaves the job to run again.
+        """
+        key = journal_key(job)
+        journal_writer = self.journal_writer
+
+        def on_saved(error: Exception | None) -> None:
+            if journal_writer is None:
+                return
+            if error is None:
+                journal_writer.mark_done([key])
+            else:
+                journal_writer.mark_failed([key], f"Failed to save eval run: {error}")
+
+        if self.eval_run_writer is not None:
+            self.eval_run_writer.submit(eval_run, on_saved=on_saved)
+        else:
+            eval_run.save_to_file()
+            on_saved(None)
+
+    async def run_job_group(
+        self,
+        group: EvalJobGroup,
+        limiters: Dict[str, AIMDConcurrencyLimiter],
+        max_rate_limit_retries: int,
+    ) -> List[bool]:
+        """
+        Generate the task output for a group once, then run each eval config's job on it concurrently. Returns the success of each job.
+        """
+        run_provider = group.task_run_config.run_config_properties.model_provider_name
+        generation_calls = JobModelCalls()
+        attempt = 1
         try:
-            # Create the evaluator for this eval config/run config pair
-            evaluator = eval_adapter_from_type(job.eval_config.config_type)(
-                job.eval_config,
-                job.task_run_config.run_config() if job.task_run_config else None,
+            while True:
+                try:
+                    with recording_model_calls(generation_calls):
+                        generated_run = await self.call_with_rate_limit_retries(
+                            lambda: self.generate_run(group.jobs[0]),
+                            [limiters[run_provider]]
+                            if run_provider in limiters
+                            else [],
+                            max_rate_limit_retries,
+                        )
+                    break
+                except Exception as e:
+                    logger.error(
+                        f"Error generating task output for dataset item {group.item.id}: {e}"
+                    )
+                    for job in group.jobs:
+                        self.job_errors[journal_key(job)] = (
+                            f"Error generating task output: {e}"
+                        )
+                    if attempt >= self.max_job_attempts:
+                        return [False] * len(group.jobs)
+                    await self.wait_to_retry(group.jobs, attempt)
+                    attempt += 1
+        finally:
+            # The generation is shared by the group's jobs: counted once, for the first
+            self.record_model_calls(group.jobs[0], generation_calls)
+
+        results = await asyncio.gather(
+            *[
+                self.run_job_recording_calls(
+                    job, limiters, max_rate_limit_retries, generated_run
+                )
+                for job in group.jobs
+            ]
+        )
+        return list(results)
+
+    async def run_job_recording_calls(
+        self,
+        job: EvalJob,
+        limiters: Dict[str, AIMDConcurrencyLimiter],
+        max_rate_limit_retries: int,
+        generated_run: TaskRun | None = None,
+    ) -> bool:
+        """
+        run_job_with_retries, recording the latency and token usage of the model calls it makes into the run's telemetry.
+        """
+        calls = JobModelCalls()
+        with recording_model_calls(calls):
+            success = await self.run_job_with_retries(
+                job, limiters, max_rate_limit_retries, generated_run
+            )
+        self.record_model_calls(job, calls)
+        return success
+
+    def record_model_calls(self, job: EvalJob, calls: JobModelCalls) -> None:
+        if self.telemetry is None:
+            return
+        self.telemetry.record_model_calls(
+            job.eval_config.id,
+            job.task_run_config.id if job.task_run_config else None,
+            calls,
+        )
+
+    def record_job_telemetry(
+        self, job: EvalJob, success: bool, wall_time: float, queue_wait: float
+    ) -> None:
+        if self.telemetry is None:
+            return
+        self.telemetry.record_job(
+            job.eval_config.id,
+            job.task_run_config.id if job.task_run_config else None,
+            success,
+            wall_time,
+            queue_wait,
+        )
+
+    async def run_job_with_retries(
+        self,
+        job: EvalJob,
+        limiters: Dict[str, AIMDConcurrencyLimiter],
+        max_rate_limit_retries: int,
+        generated_run: TaskRun | None = None,
+    ) -> bool:
+        """
+        Run a job within the concurrency limits of the providers it calls, retrying it if rate limited, and if it fails (up to max_job_attempts).
+
+        If generated_run is provided (already generated for this job's run config and item), only the eval is run.
+        """
+        attempt = 1
+        while True:
+            success = await self.run_job_attempt(
+                job, limiters, max_rate_limit_retries, generated_run
             )
-            if not isinstance(evaluator, BaseEval):
-                raise ValueError("Not able to create evaluator from eval config")
+            if success or attempt >= self.max_job_attempts:
+                return success
+            await self.wait_to_retry([job], attempt)
+            attempt += 1
+
+    async def wait_to_retry(self, jobs: List[EvalJob], attempt: int) -> None:
+        """
+        Back off before retrying failed jobs, journaling them as failed until then.
+        """
+        backoff = min(
+            JOB_RETRY_MAX_BACKOFF_SECONDS,
+            self.job_retry_backoff * 2 ** (attempt - 1),
+        ) * random.uniform(0.5, 1.0)
+        for job in jobs:
+            self.journal_finished(job, False, retry_at=time.time() + backoff)
+        await asyncio.sleep(backoff)
+        self.journal_started(jobs)
+
+    async def run_job_attempt(
+        self,
+        job: EvalJob,
+        limiters: Dict[str, AIMDConcurrencyLimiter],
+        max_rate_limit_retries: int,
+        generated_run: TaskRun | None = None,
+    ) -> bool:
+        if generated_run is not None:
+            providers = [job.eval_config.model_provider]
+        else:
+            providers = self.job_providers(job)
+        job_limiters = [
+            limiters[provider] for provider in providers if provider in limiters
+        ]
+
+        try:
+            if generated_run is None:
+                return await self.call_with_rate_limit_retries(
+                    lambda: self.run_job(job), job_limiters, max_rate_limit_retries
+                )
+            return await self.call_with_rate_limit_retries(
+                lambda: self.run_job(job, generated_run),
+                job_limiters,
+                max_rate_limit_retries,
+            )
+        except RateLimitedError as e:
+            logger.error(
+                f"Eval job for dataset item {job.item.id} still rate limited after {max_rate_limit_retries} retries: {e}"
+            )
+            self.job_errors[journal_key(job)] = (
+                f"Rate limited after {max_rate_limit_retries} retries: {e}"
+            )
+            return False
+
+    async def call_with_rate_limit_retries(
+        self,
+        call: Callable[[], Awaitable[T]],
+        limiters: List[AIMDConcurrencyLimiter],
+        max_rate_limit_retries: int,
+    ) -> T:
+        """
+        Await call() within the given concurrency limiters, retrying with backoff if it raises RateLimitedError. Raises the last RateLimitedError if retries run out.
+
+        A result of False counts as an error outcome for the limiters, any other result as a success.
+        """
+        attempt = 0
+        while True:
+            acquired: List[tuple[AIMDConcurrencyLimiter, int]] = []
+            outcome = RequestOutcome.error
+            retry_after: float | None = None
+            try:
+                # Acquire in a consistent (sorted provider) order, so workers can't deadlock. Slots are released even if we're cancelled waiting for the next limiter.
+                for limiter in limiters:
+                    acquired.append((limiter, await limiter.acquire()))
+                result = await call()
+                outcome = (
+                    RequestOutcome.error if result is False else RequestOutcome.success
+                )
+                return result
+            except RateLimitedError as e:
+                outcome = RequestOutcome.rate_limited
+                retry_after = e.retry_after
+                attempt += 1
+                if attempt > max_rate_limit_retries:
+                    raise
+            finally:
+                for limiter, epoch in acquired:
+                    await limiter.release(epoch, outcome, retry_after)
+
+            # Back off before retrying. Limiters also pause new requests for Retry-After.
+            backoff = retry_after
+            if backoff is None:
+                backoff = min(
+                    RATE_LIMIT_MAX_BACKOFF_SECONDS,
+                    RATE_LIMIT_BASE_BACKOFF_SECONDS * 2 ** (attempt - 1),
+                )
+                # Jitter, so retries don't arrive in lockstep
+                backoff *= random.uniform(0.5, 1.0)
+            await asyncio.sleep(backoff)
+
+    def evaluator_for_job(self, job: EvalJob) -> BaseEval:
+        """
+        The evaluator for this job's eval config/run config pair. Created on first use, then shared by every job with the same pair.
+        """
+        key = (
+            job.eval_config.id,
+            job.task_run_config.id if job.task_run_config else None,
+        )
+        evaluator = self.evaluators.get(key)
+        if evaluator is not None:
+            return evaluator
+
+        evaluator = eval_adapter_from_type(job.eval_config.config_type)(
+            job.eval_config,
+            job.task_run_config.run_config() if job.task_run_config else None,
+        )
+        if not isinstance(evaluator, BaseEval):
+            raise ValueError("Not able to create evaluator from eval config")
+        evaluator.judge_cache = self.judge_cache
+        self.evaluators[key] = evaluator
+        return evaluator
+
+    async def generate_run(self, job: EvalJob) -> TaskRun:
+        """
+        Run the task on the job's run config to generate fresh output for the job's dataset item.
+
+        Raises RateLimitedError for rate limit, overload and timeout errors.
+        """
+        try:
+            return await self.evaluator_for_job(job).run_task(job.item.input)
+        except Exception as e:
+            rate_limit_error = rate_limit_error_from_exception(e)
+            if rate_limit_error is not None:
+                raise rate_limit_error from e
+            raise
+
+    async def run_job(self, job: EvalJob, generated_run: TaskRun | None = None) -> bool:
+        """
+        Run a single job and save the result. Returns True on success, False on error.
+
+        For task_run_eval jobs, generated_run can be passed when it was already generated for this run config and dataset item (shared across eval configs). Otherwise the task is run to generate it.
+
+        Raises RateLimitedError for rate limit, overload and timeout errors, so the caller can back off and retry instead of counting an error.
+        """
+        try:
+            evaluator = self.evaluator_for_job(job)
 
             task_output: str | None = None
             scores: EvalScores | None = None
             intermediate_outputs: Dict[str, str] | None = None
             if job.type == "eval_config_eval":
                 # Eval config eval, we use the saved input from the task run, not invoking the task again
-                scores, intermediate_outputs = await evaluator.run_eval(job.item)
+                scores, intermediate_outputs = await evaluator.run_eval_cached(job.item)
                 task_output = job.item.output.output
+            elif generated_run is not None:
+                # Task run eval with output already generated, only run the eval
+                scores, intermediate_outputs = await evaluator.run_eval_cached(
+                    generated_run
+                )
+                task_output = generated_run.output.output
             else:
                 # Task run eval, we invoke the task again to get a fresh output
                 (
@@ -262,9 +1306,94 @@ class EvalRunner:
                 output=task_output,
                 intermediate_outputs=intermediate_outputs,
             )
-            eval_run.save_to_file()
+            self.save_eval_run(job, eval_run)
+            if self.sequential_tracker is not None and job.task_run_config is not None:
+                self.sequential_tracker.record(
+                    job.eval_config.id, job.task_run_config.id, scores
+                )
 
             return True
         except Exception as e:
+            rate_limit_error = rate_limit_error_from_exception(e)
+            if rate_limit_error is not None:
+                raise rate_limit_error from e
             logger.error(f"Error running eval job for dataset item {job.item.id}: {e}")
+            self.job_errors[journal_key(job)] = str(e)
             return False
+
+
+class EvalBatchRunner(EvalRunner):
+    """
+    Runs several evals of the same task as one run, instead of an EvalRunner per eval.
+
+    The dataset is scanned once for every eval (each with its own dataset filter), task output is generated once per run config and dataset item and judged by the eval configs of every eval that includes the item, and all jobs share one pool of workers and rate limits. Progress is reported for the batch as a whole.
+    """
+
+    @classmethod
+    def parent_evals(cls, eval_configs: List[EvalConfig]) -> List[Eval]:
+        """
+        The distinct evals the eval configs belong to, in order of first seen. They must all be for the same task (checked in __init__).
+        """
+        evals: Dict[ID_TYPE, Eval] = {}
+        for eval_config in eval_configs:
+            parent_eval = eval_config.parent_eval()
+            if parent_eval is None:
+                raise ValueError("Eval config requires a parent eval")
+            evals.setdefault(parent_eval.id, parent_eval)
+        return list(evals.values())
+
+    @classmethod
+    def for_evals(
+        cls,
+        evals: List[Eval],
+        run_configs: List[TaskRunConfig] | None,
+        eval_run_type: Literal["eval_config_eval", "task_run_eval"],
+        sample: EvalSample | None = None,
+    ) -> "EvalBatchRunner":
+        """
+        A batch run of several evals. For mode "task_run_eval" each eval is judged by its current (default) eval config, and evals without one are skipped. For mode "eval_config_eval" all eval configs of each eval are run.
+        """
+        eval_configs: List[EvalConfig] = []
+        for eval in evals:
+            configs = eval.configs(readonly=True)
+            if eval_run_type == "task_run_eval":
+                configs = [
+                    config for config in configs if config.id == eval.current_config_id
+                ]
+            eval_configs.extend(configs)
+        if len(eval_configs) == 0:
+            raise ValueError("No eval configs to run for these evals")
+        return cls(eval_configs, run_configs, eval_run_type, sample=sample)
+
+
+def _sample_filter(sampled_ids: Set[ID_TYPE]) -> DatasetFilter:
+    # Sampled items passed their eval's filter when sampled
+    return lambda task_run: task_run.id in sampled_ids
+
+
+def journal_key(job: EvalJob) -> JobKey:
+    return job_key(
+        job.eval_config.id,
+        job.task_run_config.id if job.task_run_config else None,
+        job.item.id,
+    )
+
+
+def schedule_key(job: EvalJob | EvalJobGroup) -> tuple[str, ID_TYPE]:
+    """
+    The config a job is scheduled fairly by: its run config (shared by a group's jobs), or its eval config for mode "eval_config_eval".
+    """
+    if isinstance(job, EvalJobGroup):
+        return ("run_config", job.task_run_config.id)
+    if job.task_run_config is not None:
+        return ("run_config", job.task_run_config.id)
+    return ("eval_config", job.eval_config.id)
+
+
+def _finished_groups(
+    groups: Dict[tuple[ID_TYPE, ID_TYPE], EvalJobGroup],
+) -> Iterator[EvalJob | EvalJobGroup]:
+    # A group of one is just a job
+    for group in groups.values():
+        yield group.jobs[0] if len(group.jobs) == 1 else group
+    groups.clear()
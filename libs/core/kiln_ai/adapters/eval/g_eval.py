@@ -1,11 +1,17 @@
-import math
+import re
 from typing import Dict, List, Tuple
 
+import numpy as np
 from litellm.types.utils import ChatCompletionTokenLogprob
 
 from kiln_ai.adapters.adapter_registry import adapter_for_task
 from kiln_ai.adapters.eval.base_eval import BaseEval
-from kiln_ai.adapters.model_adapters.base_adapter import AdapterConfig, RunOutput
+from kiln_ai.adapters.eval.judge_cache import judge_cache_key
+from kiln_ai.adapters.model_adapters.base_adapter import (
+    AdapterConfig,
+    BaseAdapter,
+    RunOutput,
+)
 from kiln_ai.adapters.prompt_builders import PromptGenerators
 from kiln_ai.datamodel import Project, Task, TaskRun
 from kiln_ai.datamodel.eval import EvalConfig, EvalConfigType, EvalScores
@@ -98,13 +104,14 @@ class GEval(BaseEval):
         super().__init__(eval_config, run_config)
 
         self.geval_task = GEvalTask(eval_config)
+        self._judge_adapter: BaseAdapter | None = None
 
-    async def run_eval(
-        self, task_run: TaskRun
-    ) -> tuple[EvalScores, Dict[str, str] | None]:
+    def judge_adapter(self) -> BaseAdapter:
         """
-        Run this eval on the given task run.
+        The adapter for calling the judge model. Built on first use, then reused for every eval this evaluator runs.
         """
+        if self._judge_adapter is not None:
+            return self._judge_adapter
 
         model_name, provider = self.model_and_provider()
 
@@ -114,7 +121,7 @@ class GEval(BaseEval):
             10 if self.eval_config.config_type == EvalConfigType.g_eval else None
         )
 
-        adapter = adapter_for_task(
+        self._judge_adapter = adapter_for_task(
             self.geval_task,
             model_name,
             provider,
@@ -126,20 +133,20 @@ class GEval(BaseEval):
                 top_logprobs=top_logprobs,
             ),
         )
+        return self._judge_adapter
 
-        input = f"""The model was given the following input for the task: 
-<eval_data>
-{task_run.input}
-</eval_data>
-
-The model produced the following output for the task:
-<eval_data>
-{task_run.output}
-</eval_data>
-"""
+    async def run_eval(
+        self, task_run: TaskRun
+    ) -> tuple[EvalScores, Dict[str, str] | None]:
+        """
+        Run this eval on the given task run.
+        """
+        adapter = self.judge_adapter()
 
         # We don't need the run, but invoke_returning_run_output() runs validations for us over _run()
-        _, run_output = await adapter.invoke_returning_run_output(input)
+        _, run_output = await adapter.invoke_returning_run_output(
+            self.judge_input(task_run)
+        )
 
         if self.eval_config.config_type == EvalConfigType.llm_as_judge:
             return self.build_llm_as_judge_score(
@@ -148,6 +155,45 @@ The model produced the following output for the task:
         else:
             return self.build_g_eval_score(run_output), run_output.intermediate_outputs
 
+    def judge_input(self, task_run: TaskRun) -> str:
+        """
+        The input message for the judge model, for evaluating the given task run.
+
+        Only the output text is included (not the output's id, timestamps or source), so identical outputs make identical judge requests.
+        """
+        return f"""The model was given the following input for the task: 
+<eval_data>
+{task_run.input}
+</eval_data>
+
+The model produced the following output for the task:
+<eval_data>
+{task_run.output.output}
+</eval_data>
+"""
+
+    def judge_cache_key(self, task_run: TaskRun) -> str | None:
+        """
+        Hash of the fully rendered judge request: the judge model and its provider settings (structured output mode, reasoning and routing options, logprobs, endpoint), scoring method, prompts, output schema and input message. Anything not changing the request (eval config name, ids, credentials, etc) doesn't change the key, so re-running an unchanged judge on identical output is a cache hit.
+        """
+        adapter = self.judge_adapter()
+        model_name, provider = self.model_and_provider()
+        _, cot_prompt = adapter.run_strategy()
+        return judge_cache_key(
+            {
+                "config_type": self.eval_config.config_type,
+                "model_name": model_name,
+                "model_provider": provider,
+                "request_settings": adapter.request_settings(),
+                "system_prompt": adapter.build_prompt(),
+                "cot_prompt": cot_prompt,
+                "output_schema": self.geval_task.output_json_schema,
+                "user_message": adapter.prompt_builder.build_user_message(
+                    self.judge_input(task_run)
+                ),
+            }
+        )
+
     def build_llm_as_judge_score(self, run_output: RunOutput) -> EvalScores:
         """
         Build the LLM as Judge score for the given run and run output.
@@ -188,15 +234,18 @@ The model produced the following output for the task:
 
         # Build raw string output from the logprobs, which is easier to work with than Dict for the next bit
         raw_output = self.raw_output_from_logprobs(run_output)
+        # The offset of the start of each token in the raw output, computed once for all metrics
+        token_starts = self.token_start_offsets(run_output)
 
-        # find the offset the start of each metric in the raw output json
+        # find the offset the start of each metric in the raw output json, and the range to search for its rating
         metrics: List[str] = list(outputs.keys())
         metric_offsets = self.metric_offsets(raw_output, metrics)
+        search_ranges = self.metric_search_ranges(raw_output, metric_offsets)
 
         final_scores: EvalScores = {}
         for metric in metrics:
             score = self.g_eval_single_metric(
-                run_output, metric, metric_offsets, raw_output
+                run_output, token_starts, search_ranges[metric]
             )
             if score is None:
                 raise ValueError(
@@ -209,39 +258,23 @@ The model produced the following output for the task:
     def g_eval_single_metric(
         self,
         run_output: RunOutput,
-        metric: str,
-        metric_offsets: Dict[str, int],
-        raw_output: str,
+        token_starts: np.ndarray,
+        search_range: Tuple[int, int],
     ) -> float | None:
         """
         Run the G-Eval for a single metric.
 
-        Scan the logprobs for the metric and return the weighted score of the rating token.
+        Scan the logprobs of the tokens starting in the metric's search range, and return the weighted score of the rating token.
         """
+        logprobs = self._logprobs_content(run_output)
 
-        start_offset, end_offset = self.token_search_range(
-            raw_output, metric, metric_offsets
-        )
-
-        offset = 0
-
-        if (
-            run_output.output_logprobs is None
-            or run_output.output_logprobs.content is None
-        ):
-            raise RuntimeError(
-                "No logprobs found for output - can not calculate g-eval"
-            )
-
-        # scan the tokens in the range, looking for the rating token
-        for _, chat_logprob in enumerate(run_output.output_logprobs.content):
-            if offset >= end_offset:
-                break
-            if offset >= start_offset:
-                score = self.rating_token_to_score(chat_logprob)
-                if score is not None:
-                    return score
-            offset += len(chat_logprob.token)
+        # Binary search for the tokens starting in the range, instead of scanning from the first token for every metric
+        start_offset, end_offset = search_range
+        first, last = np.searchsorted(token_starts, [start_offset, end_offset])
+        for chat_logprob in logprobs[first:last]:
+            score = self.rating_token_to_score(chat_logprob)
+            if score is not None:
+                return score
 
         return None
 
@@ -249,6 +282,29 @@ The model produced the following output for the task:
         """
         Build the raw output string from the logprobs. Generate from logprobs so it's guaranteed to match the logprobs offsets
         """
+        return "".join(
+            chat_logprob.token for chat_logprob in self._logprobs_content(run_output)
+        )
+
+    def token_start_offsets(self, run_output: RunOutput) -> np.ndarray:
+        """
+        The offset of the start of each logprob token in the raw output string (see raw_output_from_logprobs).
+        """
+        lengths = np.fromiter(
+            (
+                len(chat_logprob.token)
+                for chat_logprob in self._logprobs_content(run_output)
+            ),
+            dtype=np.int64,
+        )
+        # Exclusive cumulative sum: each token starts where the previous ones end
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        return starts
+
+    def _logprobs_content(
+        self, run_output: RunOutput
+    ) -> List[ChatCompletionTokenLogprob]:
         if (
             run_output.output_logprobs is None
             or run_output.output_logprobs.content is None
@@ -256,11 +312,7 @@ The model produced the following output for the task:
             raise RuntimeError(
                 "No logprobs found for output - can not calculate g-eval"
             )
-
-        raw = ""
-        for chat_logprob in run_output.output_logprobs.content:
-            raw += chat_logprob.token
-        return raw
+        return run_output.output_logprobs.content
 
     def token_search_range(
         self, raw_output: str, metric: str, metric_offsets: Dict[str, int]
@@ -270,15 +322,21 @@ The model produced the following output for the task:
 
         Start searching after the end of the target metric json entry ("overall_rating":), and before the start of the next metric ("some_other_score").
         """
-        start_offset = metric_offsets[metric] + len(metric)
+        return self.metric_search_ranges(raw_output, metric_offsets)[metric]
 
-        # Find the lowest end offset that is greater than the start offset
-        end_offset = len(raw_output)
-        for v in list(metric_offsets.values()):
-            if v < end_offset and v > start_offset:
-                end_offset = v
-
-        return start_offset, end_offset
+    def metric_search_ranges(
+        self, raw_output: str, metric_offsets: Dict[str, int]
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        The search range (see token_search_range) of every metric, from one pass over the metrics sorted by offset.
+        """
+        ordered = sorted(metric_offsets.items(), key=lambda item: item[1])
+        ranges: Dict[str, Tuple[int, int]] = {}
+        for i, (metric, offset) in enumerate(ordered):
+            # Ends at the start of the next metric in the output, or the end of the output
+            end_offset = ordered[i + 1][1] if i + 1 < len(ordered) else len(raw_output)
+            ranges[metric] = (offset + len(metric), end_offset)
+        return ranges
 
     def rating_token_to_score(
         self, token_logprob: ChatCompletionTokenLogprob
@@ -295,17 +353,17 @@ The model produced the following output for the task:
         if not primary_token_score:
             return None
 
-        total_score = 0.0
-        total_probability = 0.0
-
         # Process all valid scoring tokens
-        for top_logprob in token_logprob.top_logprobs:
-            token_score = self.score_from_token_string(top_logprob.token)
-            if token_score is not None:
-                # Convert logprob to probability
-                probability = math.exp(top_logprob.logprob)
-                total_score += token_score * probability
-                total_probability += probability
+        scored = [
+            (token_score, top_logprob.logprob)
+            for top_logprob in token_logprob.top_logprobs
+            if (token_score := self.score_from_token_string(top_logprob.token))
+            is not None
+        ]
+        scores = np.array([score for score, _ in scored], dtype=np.float64)
+        # Convert logprobs to probabilities
+        probabilities = np.exp(np.array([lp for _, lp in scored], dtype=np.float64))
+        total_probability = float(probabilities.sum())
 
         if total_probability <= 0.0:
             raise RuntimeError(
@@ -313,7 +371,7 @@ The model produced the following output for the task:
             )
 
         # Normalize by total probability of valid tokens (LLM may have wanted to generate other non-rating tokens, these shouldn't lower score of rating tokens)
-        weighted_score = total_score / total_probability
+        weighted_score = float(np.dot(scores, probabilities)) / total_probability
 
         return weighted_score
 
@@ -349,20 +407,26 @@ The model produced the following output for the task:
             "overall_rating": 1 # it's 1 character into the json string
         }
         """
+        if not metrics:
+            return {}
+
+        # the quoted metric name is expected in the json: `{"overall_rating": 1}` == 1
+        # One scan of the output for all metrics. Longest names first, so a name which prefixes another doesn't match early.
+        metric_names = sorted(
+            {f'"{metric}"' for metric in metrics}, key=len, reverse=True
+        )
+        pattern = re.compile("|".join(re.escape(name) for name in metric_names))
+        found: Dict[str, List[int]] = {}
+        for match in pattern.finditer(raw_output):
+            found.setdefault(match.group(0)[1:-1], []).append(match.start())
+
         metric_offsets: Dict[str, int] = {}
         for metric in metrics:
-            # the quoted metric name is expected in the json: `{"overall_rating": 1}` == 1
-            metric_name = f'"{metric}"'
-
             # we expect it exactly once
-            count = raw_output.count(metric_name)
-            if count != 1:
+            offsets = found.get(metric, [])
+            if len(offsets) != 1:
                 raise ValueError(
-                    f"Metric {metric} should appear exactly once in the output. Found {count} times"
+                    f"Metric {metric} should appear exactly once in the output. Found {len(offsets)} times"
                 )
-
-            offset = raw_output.find(metric_name)
-            if offset == -1:
-                raise ValueError(f"Metric {metric} not found in raw output")
-            metric_offsets[metric] = offset
+            metric_offsets[metric] = offsets[0]
         return metric_offsets
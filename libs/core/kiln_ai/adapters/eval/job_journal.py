@@ -0,0 +1,711 @@
+"""
+A durable journal of eval jobs, so long eval runs survive crashes and restarts.
+
+Completed jobs are already durable (their EvalRun is saved, and the next run skips them), but nothing recorded which jobs were in flight, how many times they were tried, or why they failed. The journal records the state of every job a run pulls:
+
+- pending: queued by a run, not yet started (or waiting to retry)
+- in_flight: started, not finished
+- failed: the last attempt failed, with its error and attempt count
+- done: finished, and its EvalRun saved
+
+It also records each run (its eval configs, run configs and mode) with its state: running until it ends as finished, stopped (closed early), failed, or interrupted (cancelled as the process shut down). A run interrupted, or still "running" when no process is running it (a crash), can be resumed: EvalRunner.from_run_spec() rebuilds the runner, and the new run skips completed jobs as any run does.
+
+Stored in SQLite beside the task (one journal per task, covering all of its evals), so it's shared by every process using the project. Journal failures never fail an eval: they're logged, and the run continues without it. A run writes to the journal through a JournalWriter, on a background thread, so its workers never wait on the database.
+
+Several workers (processes, or machines sharing the project directory) can run one run together, claiming its jobs with leases (see JobLease and claim()). A worker renews the leases of its jobs while it runs them, so if it dies its jobs are claimed by another once their leases expire. Claiming relies on the journal, so its errors do fail the worker. The run itself is leased too, renewed by its coordinator and workers: a shared run isn't resumed at startup while it's leased, as it's still running elsewhere.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Literal, Tuple
+
+from pydantic import BaseModel
+
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.datamodel.basemodel import ID_TYPE
+
+if TYPE_CHECKING:
+    from kiln_ai.datamodel import Task
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = "eval_job_journal.sqlite"
+# A claimed job is held this long without its worker renewing the lease before another worker can claim it
+DEFAULT_LEASE_SECONDS = 300.0
+# How often a worker checks on jobs other workers hold, once it has no others left
+DEFAULT_CLAIM_POLL_SECONDS = 5.0
+
+# (eval config id, run config id, dataset item id). The run config id is "" for mode "eval_config_eval".
+JobKey = Tuple[str, str, str]
+
+# Set while the process shuts down: runs cancelled then are interrupted (resumed at next startup), not stopped
+_shutting_down = False
+
+
+def shutting_down() -> bool:
+    return _shutting_down
+
+
+def set_shutting_down(value: bool) -> None:
+    global _shutting_down
+    _shutting_down = value
+
+
+def job_key(
+    eval_config_id: ID_TYPE, run_config_id: ID_TYPE, dataset_id: ID_TYPE
+) -> JobKey:
+    return (str(eval_config_id), str(run_config_id or ""), str(dataset_id))
+
+
+class JobState(str, Enum):
+    pending = "pending"
+    in_flight = "in_flight"
+    failed = "failed"
+    done = "done"
+
+
+class RunState(str, Enum):
+    running = "running"
+    finished = "finished"
+    # Closed before all jobs ran, eg the client went away
+    stopped = "stopped"
+    # Ended by an error
+    failed = "failed"
+    # Cancelled as the process shut down: resumed at next startup
+    interrupted = "interrupted"
+    # Interrupted, then resumed by a later run
+    resumed = "resumed"
+
+
+class EvalRunSpec(BaseModel):
+    """
+    What a run evaluates: enough to rebuild its runner to resume it.
+    """
+
+    eval_config_ids: List[str]
+    run_config_ids: List[str] | None
+    eval_run_type: Literal["eval_config_eval", "task_run_eval"]
+    sample: EvalSample | None = None
+
+
+@dataclass
+class JobLease:
+    """
+    Claim the jobs of a shared run with leases, to run it with other workers. See EvalRunner.run().
+    """
+
+    # The journaled run the workers share
+    run_id: str
+    # This worker. Unique per worker.
+    owner: str = field(default_factory=lambda: uuid.uuid4().hex)
+    lease_seconds: float = DEFAULT_LEASE_SECONDS
+    poll_interval: float = DEFAULT_CLAIM_POLL_SECONDS
+
+
+@dataclass
+class JournaledJob:
+    eval_config_id: str
+    # None for mode "eval_config_eval"
+    run_config_id: str | None
+    dataset_id: str
+    state: JobState
+    attempts: int
+    last_error: str | None
+    # When a failed job is next retried (epoch seconds), if it's waiting to retry
+    retry_at: float | None
+    run_id: str | None
+    updated_at: float
+
+
+@dataclass
+class JournaledRun:
+    id: str
+    spec: EvalRunSpec
+    state: RunState
+    started_at: float
+    updated_at: float
+    # For shared runs: the run is in progress (on some machine) until this time (epoch seconds), unless renewed
+    lease_expires: float | None = None
+
+
+class EvalJobJournal:
+    """
+    The job journal of a task's eval runs. Safe to share across threads and processes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    @classmethod
+    def journal_path(cls, task: "Task") -> Path | None:
+        if task.path is None:
+            return None
+        return task.path.parent / JOURNAL_FILE_NAME
+
+    @classmethod
+    def for_task(cls, task: "Task") -> "EvalJobJournal | None":
+        """
+        The journal for a task's eval runs. None if the task isn't saved.
+        """
+        path = cls.journal_path(task)
+        if path is None:
+            return None
+        return cls(path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Must hold the lock. Opened on first use.
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # WAL: cheap commits (we write on every job start and finish), and readers don't block writers
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS eval_runs (
+                    id TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS eval_jobs (
+                    eval_config_id TEXT NOT NULL,
+                    run_config_id TEXT NOT NULL,
+                    dataset_id TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    retry_at REAL,
+                    run_id TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (eval_config_id, run_config_id, dataset_id)
+                )
+                """
+            )
+            # Added with leases: journals created before them lack them
+            for table, column, column_type in [
+                ("eval_jobs", "lease_owner", "TEXT"),
+                ("eval_jobs", "lease_expires", "REAL"),
+                ("eval_runs", "lease_expires", "REAL"),
+            ]:
+                columns = {
+                    row[1] for row in connection.execute(f"PRAGMA table_info({table})")
+                }
+                if column not in columns:
+                    connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"
+                    )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS eval_jobs_state ON eval_jobs (eval_config_id, state)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS eval_jobs_run ON eval_jobs (run_id, state)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _write(self, description: str, sql: str, rows: Iterable[tuple]) -> None:
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.executemany(sql, rows)
+                connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Eval job journal write failed ({description}): {e}")
+
+    def start_run(self, spec: EvalRunSpec, lease_seconds: float | None = None) -> str:
+        """
+        Record the start of a run. Returns its ID.
+
+        A shared run (see JobLease) is leased for lease_seconds, and its coordinator and workers renew the lease while it runs (see renew_run_lease).
+        """
+        run_id = uuid.uuid4().hex
+        now = time.time()
+        lease_expires = now + lease_seconds if lease_seconds is not None else None
+        self._write(
+            "start run",
+            "INSERT INTO eval_runs (id, spec, state, started_at, updated_at, lease_expires) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    spec.model_dump_json(),
+                    RunState.running.value,
+                    now,
+                    now,
+                    lease_expires,
+                )
+            ],
+        )
+        return run_id
+
+    def renew_run_lease(self, run_id: str, lease_seconds: float) -> None:
+        """
+        Extend the lease of a shared run, while it runs.
+        """
+        self._write(
+            "renew run lease",
+            "UPDATE eval_runs SET lease_expires = ? WHERE id = ? AND state = ?",
+            [(time.time() + lease_seconds, run_id, RunState.running.value)],
+        )
+
+    def end_run(self, run_id: str, state: RunState) -> None:
+        """
+        Record the end of a run. Its jobs still pending or in flight go back to pending: nothing is running them.
+        """
+        now = time.time()
+        self._write(
+            "end run",
+            "UPDATE eval_runs SET state = ?, updated_at = ? WHERE id = ?",
+            [(state.value, now, run_id)],
+        )
+        self._write(
+            "release jobs",
+            "UPDATE eval_jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE run_id = ? AND state = ?",
+            [(JobState.pending.value, now, run_id, JobState.in_flight.value)],
+        )
+
+    def interrupted_runs(self) -> List[JournaledRun]:
+        """
+        Runs recorded as interrupted, or as running: those are only interrupted if no process is running them, so call at startup, before starting runs.
+
+        Shared runs still leased, or with jobs still leased, are running on another machine (or in other processes), so aren't interrupted.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                leased_run_ids = {
+                    row[0]
+                    for row in self._connect().execute(
+                        "SELECT DISTINCT run_id FROM eval_jobs WHERE lease_expires > ?",
+                        (now,),
+                    )
+                }
+        except sqlite3.Error as e:
+            logger.warning(f"Eval job journal read failed: {e}")
+            return []
+        return [
+            run
+            for run in self.runs()
+            if run.state == RunState.interrupted
+            or (
+                run.state == RunState.running
+                and run.id not in leased_run_ids
+                and (run.lease_expires is None or run.lease_expires <= now)
+            )
+        ]
+
+    def run(self, run_id: str) -> JournaledRun | None:
+        runs = self.runs(run_id)
+        return runs[0] if runs else None
+
+    def runs(self, run_id: str | None = None) -> List[JournaledRun]:
+        """
+        The journaled runs, oldest first. Only the run with run_id, if provided.
+        """
+        sql = "SELECT id, spec, state, started_at, updated_at, lease_expires FROM eval_runs"
+        params: List[str] = []
+        if run_id is not None:
+            sql += " WHERE id = ?"
+            params.append(run_id)
+        try:
+            with self._lock:
+                rows = (
+                    self._connect()
+                    .execute(sql + " ORDER BY started_at", params)
+                    .fetchall()
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Eval job journal read failed: {e}")
+            return []
+        runs = []
+        for id, spec, state, started_at, updated_at, lease_expires in rows:
+            try:
+                runs.append(
+                    JournaledRun(
+                        id=id,
+                        spec=EvalRunSpec.model_validate(json.loads(spec)),
+                        state=RunState(state),
+                        started_at=started_at,
+                        updated_at=updated_at,
+                        lease_expires=lease_expires,
+                    )
+                )
+            except ValueError as e:
+                logger.warning(f"Skipping invalid eval run in journal: {e}")
+        return runs
+
+    def mark_pending(self, keys: Iterable[JobKey], run_id: str) -> None:
+        """
+        Record jobs queued by a run. Keeps their attempt count and last error from earlier runs, and leaves jobs already in the run (queued by another of its workers) as they are.
+        """
+        now = time.time()
+        self._write(
+            "queue jobs",
+            """
+            INSERT INTO eval_jobs (eval_config_id, run_config_id, dataset_id, state, run_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (eval_config_id, run_config_id, dataset_id) DO UPDATE SET
+                state = excluded.state, run_id = excluded.run_id, retry_at = NULL, lease_owner = NULL, lease_expires = NULL, updated_at = excluded.updated_at
+            WHERE eval_jobs.run_id IS NOT excluded.run_id
+            """,
+            [(*key, JobState.pending.value, run_id, now) for key in keys],
+        )
+
+    def mark_in_flight(self, keys: Iterable[JobKey], run_id: str) -> None:
+        """
+        Record the start of an attempt at jobs.
+        """
+        now = time.time()
+        self._write(
+            "start jobs",
+            """
+            INSERT INTO eval_jobs (eval_config_id, run_config_id, dataset_id, state, attempts, run_id, updated_at)
+            VALUES (?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT (eval_config_id, run_config_id, dataset_id) DO UPDATE SET
+                state = excluded.state, attempts = attempts + 1, run_id = excluded.run_id, retry_at = NULL, updated_at = excluded.updated_at
+            """,
+            [(*key, JobState.in_flight.value, run_id, now) for key in keys],
+        )
+
+    def mark_done(self, keys: Iterable[JobKey]) -> None:
+        now = time.time()
+        self._write(
+            "finish jobs",
+            """
+            UPDATE eval_jobs SET state = ?, last_error = NULL, retry_at = NULL, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE eval_config_id = ? AND run_config_id = ? AND dataset_id = ?
+            """,
+            [(JobState.done.value, now, *key) for key in keys],
+        )
+
+    def mark_failed(
+        self, keys: Iterable[JobKey], error: str, retry_at: float | None = None
+    ) -> None:
+        """
+        Record a failed attempt at jobs. retry_at is when it will be retried, if it will be: until then the worker keeps its lease, if claimed.
+        """
+        now = time.time()
+        self._write(
+            "fail jobs",
+            """
+            UPDATE eval_jobs SET state = ?, last_error = ?, retry_at = ?, updated_at = ?,
+                lease_owner = CASE WHEN ? IS NULL THEN NULL ELSE lease_owner END
+            WHERE eval_config_id = ? AND run_config_id = ? AND dataset_id = ?
+            """,
+            [
+                (JobState.failed.value, error, retry_at, now, retry_at, *key)
+                for key in keys
+            ],
+        )
+
+    def claim(
+        self, keys: List[JobKey], run_id: str, owner: str, lease_seconds: float
+    ) -> Tuple[List[JobKey], List[JobKey]]:
+        """
+        Claim jobs of a shared run for a worker, leasing them for lease_seconds, and starting an attempt at them. Atomic across processes.
+
+        Returns the jobs claimed, and the jobs held by another worker (with an unexpired lease). The rest are settled: done, or failed for good, in this run.
+        """
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                claimed: List[JobKey] = []
+                held: List[JobKey] = []
+                for key in keys:
+                    row = connection.execute(
+                        """
+                        SELECT state, run_id, lease_owner, lease_expires FROM eval_jobs
+                        WHERE eval_config_id = ? AND run_config_id = ? AND dataset_id = ?
+                        """,
+                        key,
+                    ).fetchone()
+                    if row is not None:
+                        state, job_run_id, lease_owner, lease_expires = row
+                        if lease_owner is not None and lease_owner != owner:
+                            if (lease_expires or 0) > now:
+                                held.append(key)
+                                continue
+                        elif job_run_id == run_id and state in (
+                            JobState.done.value,
+                            JobState.failed.value,
+                        ):
+                            continue
+                    claimed.append(key)
+                connection.executemany(
+                    """
+                    INSERT INTO eval_jobs (eval_config_id, run_config_id, dataset_id, state, attempts, run_id, lease_owner, lease_expires, updated_at)
+                    VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                    ON CONFLICT (eval_config_id, run_config_id, dataset_id) DO UPDATE SET
+                        state = excluded.state, attempts = attempts + 1, run_id = excluded.run_id, retry_at = NULL,
+                        lease_owner = excluded.lease_owner, lease_expires = excluded.lease_expires, updated_at = excluded.updated_at
+                    """,
+                    [
+                        (
+                            *key,
+                            JobState.in_flight.value,
+                            run_id,
+                            owner,
+                            now + lease_seconds,
+                            now,
+                        )
+                        for key in claimed
+                    ],
+                )
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        return claimed, held
+
+    def renew_leases(self, owner: str, lease_seconds: float) -> None:
+        """
+        Extend the leases of a worker's jobs, while it runs them.
+        """
+        now = time.time()
+        self._write(
+            "renew leases",
+            "UPDATE eval_jobs SET lease_expires = ? WHERE lease_owner = ?",
+            [(now + lease_seconds, owner)],
+        )
+
+    def release_leases(self, owner: str) -> None:
+        """
+        Release a worker's jobs as it stops: any it hadn't finished go back to pending, for other workers to claim.
+        """
+        now = time.time()
+        self._write(
+            "release leases",
+            """
+            UPDATE eval_jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, retry_at = NULL, updated_at = ?
+            WHERE lease_owner = ?
+            """,
+            [(JobState.pending.value, now, owner)],
+        )
+
+    def run_job_counts(self, run_id: str) -> Dict[JobState, int]:
+        """
+        The number of a run's jobs in each state. Jobs waiting to retry count as in flight.
+        """
+        try:
+            with self._lock:
+                rows = (
+                    self._connect()
+                    .execute(
+                        """
+                        SELECT CASE WHEN state = ? AND retry_at IS NOT NULL THEN ? ELSE state END AS job_state, COUNT(*)
+                        FROM eval_jobs WHERE run_id = ? GROUP BY job_state
+                        """,
+                        (JobState.failed.value, JobState.in_flight.value, run_id),
+                    )
+                    .fetchall()
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Eval job journal read failed: {e}")
+            return {}
+        return {JobState(state): count for state, count in rows}
+
+    def jobs(
+        self, eval_config_id: ID_TYPE, state: JobState | None = None
+    ) -> List[JournaledJob]:
+        """
+        The journaled jobs of an eval config, optionally only those in a state.
+        """
+        sql = """
+            SELECT eval_config_id, run_config_id, dataset_id, state, attempts, last_error, retry_at, run_id, updated_at
+            FROM eval_jobs WHERE eval_config_id = ?
+        """
+        params: List[str] = [str(eval_config_id)]
+        if state is not None:
+            sql += " AND state = ?"
+            params.append(state.value)
+        try:
+            with self._lock:
+                rows = self._connect().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Eval job journal read failed: {e}")
+            return []
+        return [
+            JournaledJob(
+                eval_config_id=row[0],
+                run_config_id=row[1] or None,
+                dataset_id=row[2],
+                state=JobState(row[3]),
+                attempts=row[4],
+                last_error=row[5],
+                retry_at=row[6],
+                run_id=row[7],
+                updated_at=row[8],
+            )
+            for row in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+@dataclass
+class _JournalWrite:
+    # The EvalJobJournal method to call
+    method: str
+    args: Tuple[Any, ...]
+    # For writes of jobs: consecutive writes with the same method and args are merged into one, with all their keys
+    keys: List[JobKey] | None = None
+    # For calls with a result (claims): set once called
+    result: "concurrent.futures.Future[Any] | None" = None
+
+
+class JournalWriter:
+    """
+    Writes to a journal on a background thread, so async code never blocks on SQLite.
+
+    Writes are applied in order. Consecutive writes of jobs in the same state are batched into one transaction, so a busy run commits far less often than once per job start and finish.
+
+    Usage:
+        writer = JournalWriter(journal)
+        writer.mark_in_flight(keys, run_id)
+        claimed, held = await writer.claim(keys, run_id, owner, lease_seconds)
+        writer.close()  # Applies everything submitted
+    """
+
+    def __init__(self, journal: EvalJobJournal):
+        self.journal = journal
+        self._queue: queue.Queue[_JournalWrite | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="kiln-eval-journal", daemon=True
+        )
+        self._thread.start()
+
+    def mark_pending(self, keys: Iterable[JobKey], run_id: str) -> None:
+        self._submit(_JournalWrite("mark_pending", (run_id,), list(keys)))
+
+    def mark_in_flight(self, keys: Iterable[JobKey], run_id: str) -> None:
+        self._submit(_JournalWrite("mark_in_flight", (run_id,), list(keys)))
+
+    def mark_done(self, keys: Iterable[JobKey]) -> None:
+        self._submit(_JournalWrite("mark_done", (), list(keys)))
+
+    def mark_failed(
+        self, keys: Iterable[JobKey], error: str, retry_at: float | None = None
+    ) -> None:
+        self._submit(_JournalWrite("mark_failed", (error, retry_at), list(keys)))
+
+    def renew_leases(self, owner: str, lease_seconds: float) -> None:
+        self._submit(_JournalWrite("renew_leases", (owner, lease_seconds)))
+
+    def renew_run_lease(self, run_id: str, lease_seconds: float) -> None:
+        self._submit(_JournalWrite("renew_run_lease", (run_id, lease_seconds)))
+
+    async def claim(
+        self, keys: List[JobKey], run_id: str, owner: str, lease_seconds: float
+    ) -> Tuple[List[JobKey], List[JobKey]]:
+        """
+        EvalJobJournal.claim(), after the writes submitted before it.
+        """
+        result: concurrent.futures.Future[Tuple[List[JobKey], List[JobKey]]] = (
+            concurrent.futures.Future()
+        )
+        self._submit(
+            _JournalWrite("claim", (keys, run_id, owner, lease_seconds), result=result)
+        )
+        return await asyncio.wrap_future(result)
+
+    def flush(self) -> None:
+        """
+        Block until everything submitted so far is applied.
+        """
+        self._queue.join()
+
+    def close(self) -> None:
+        """
+        Apply everything submitted, and stop the writer thread. Later writes are applied immediately. Safe to call more than once.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _submit(self, write: _JournalWrite) -> None:
+        with self._lock:
+            if not self._closed:
+                self._queue.put(write)
+                return
+        self._apply([write])
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            # Block for the first write, then take whatever else is waiting, to batch it
+            writes: List[_JournalWrite] = []
+            item = self._queue.get()
+            taken = 1
+            while item is not None:
+                writes.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+            stopping = item is None
+            try:
+                self._apply(writes)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+    def _apply(self, writes: List[_JournalWrite]) -> None:
+        i = 0
+        while i < len(writes):
+            write = writes[i]
+            i += 1
+            keys = write.keys
+            if keys is not None:
+                keys = list(keys)
+                while (
+                    i < len(writes)
+                    and writes[i].keys is not None
+                    and writes[i].method == write.method
+                    and writes[i].args == write.args
+                ):
+                    keys.extend(writes[i].keys or [])
+                    i += 1
+            try:
+                method = getattr(self.journal, write.method)
+                result = (
+                    method(*write.args) if keys is None else method(keys, *write.args)
+                )
+                if write.result is not None:
+                    write.result.set_result(result)
+            except Exception as e:
+                if write.result is not None:
+                    write.result.set_exception(e)
+                else:
+                    logger.warning(
+                        f"Eval job journal write failed ({write.method}): {e}"
+                    )
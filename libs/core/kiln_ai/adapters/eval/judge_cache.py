@@ -0,0 +1,207 @@
+"""
+A persistent cache of judge results.
+
+Re-running an eval after a tweak, or judging byte-identical outputs from several run configs, sends the judge model identical requests. The cache stores the scores and intermediate outputs for each judge request, keyed by a hash of the fully rendered request (judge model, prompts, output schema, scoring method and the eval input), so identical requests are only ever sent once.
+
+Stored in SQLite in the Kiln settings folder. The cache is bounded in size: when it grows past max_bytes, the least recently used results are evicted.
+
+A cache failure (locked, corrupt or unwritable database) never fails an eval: it's logged, and the judge is called as if there was no cache.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Tuple
+
+from kiln_ai.datamodel.eval import EvalScores
+from kiln_ai.utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate all cached results, if how we score changes
+JUDGE_CACHE_VERSION = 1
+DEFAULT_JUDGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# When evicting, evict down to this fraction of max_bytes, so we don't evict on every write
+EVICT_TO_FRACTION = 0.9
+
+JudgeResult = Tuple[EvalScores, Dict[str, str] | None]
+
+
+def judge_cache_key(request: Mapping[str, Any]) -> str:
+    """
+    Content address for a judge request: a SHA-256 of its canonical JSON.
+    """
+    canonical = json.dumps(
+        {"judge_cache_version": JUDGE_CACHE_VERSION, **request},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JudgeCache:
+    """
+    Disk backed, size bounded cache of judge results. Safe to share across threads and processes.
+    """
+
+    _shared_instance: "JudgeCache | None" = None
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_JUDGE_CACHE_MAX_BYTES):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._size: int | None = None
+
+    @classmethod
+    def shared(cls) -> "JudgeCache":
+        if cls._shared_instance is None:
+            cls._shared_instance = cls(cls.default_path())
+        return cls._shared_instance
+
+    @classmethod
+    def default_path(cls) -> Path:
+        # Next to the settings file
+        return Path(Config.settings_path()).parent / "cache" / "judge_cache.sqlite"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Must hold the lock. Opened on first use, so creating a cache is free if it's never used.
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS judge_results (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS judge_results_last_used ON judge_results (last_used)"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> JudgeResult | None:
+        """
+        The cached scores and intermediate outputs for a request key, or None on a miss.
+        """
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT result FROM judge_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                connection.execute(
+                    "UPDATE judge_results SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                connection.commit()
+            result = json.loads(row[0])
+            return result["scores"], result["intermediate_outputs"]
+        except (sqlite3.Error, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Judge cache read failed, ignoring cache: {e}")
+            return None
+
+    def put(
+        self,
+        key: str,
+        scores: EvalScores,
+        intermediate_outputs: Dict[str, str] | None,
+    ) -> None:
+        """
+        Store the result for a request key, evicting the least recently used results if the cache is over its size limit.
+        """
+        result = json.dumps(
+            {"scores": scores, "intermediate_outputs": intermediate_outputs},
+            ensure_ascii=False,
+        )
+        size = len(key) + len(result.encode("utf-8"))
+        try:
+            with self._lock:
+                connection = self._connect()
+                previous = connection.execute(
+                    "SELECT size FROM judge_results WHERE key = ?", (key,)
+                ).fetchone()
+                connection.execute(
+                    "INSERT OR REPLACE INTO judge_results (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, result, size, time.time()),
+                )
+                connection.commit()
+                if self._size is not None:
+                    self._size += size - (previous[0] if previous else 0)
+                if self._current_size(connection) > self.max_bytes:
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Judge cache write failed, ignoring cache: {e}")
+
+    def _current_size(self, connection: sqlite3.Connection) -> int:
+        # Must hold the lock. Tracked in memory after the first count. Other processes writing to the same cache are only seen on the next eviction.
+        if self._size is None:
+            row = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM judge_results"
+            ).fetchone()
+            self._size = int(row[0])
+        return self._size
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        # Must hold the lock. Delete least recently used results until under the low watermark.
+        self._size = None
+        to_free = self._current_size(connection) - int(
+            self.max_bytes * EVICT_TO_FRACTION
+        )
+        if to_free <= 0:
+            return
+        evict_keys = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM judge_results ORDER BY last_used ASC"
+        ):
+            evict_keys.append((key,))
+            to_free -= size
+            if to_free <= 0:
+                break
+        connection.executemany("DELETE FROM judge_results WHERE key = ?", evict_keys)
+        connection.commit()
+        self._size = None
+
+    @property
+    def size_bytes(self) -> int:
+        """
+        Approximate size of the cached results.
+        """
+        with self._lock:
+            return self._current_size(self._connect())
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = (
+                self._connect().execute("SELECT COUNT(*) FROM judge_results").fetchone()
+            )
+            return int(row[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM judge_results")
+            connection.commit()
+            self._size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._size = None
@@ -0,0 +1,98 @@
+"""
+Stratified sub-sample evals, for fast iteration.
+
+Running the full eval set for every prompt tweak is slow. A sample run evaluates a deterministic, stratified sample of the eval set instead: items are grouped into strata (by tags, rating and input length), each stratum gets a share of the sample in proportion to its size (at least one item, while the sample size allows), and the items within a stratum are picked in a seeded order. The same seed and size pick the same items, so sample runs of different prompts are comparable.
+
+A sample run saves its results as usual. Running the full eval set (or a larger sample) later only runs the items not yet run: the sampled items aren't redone.
+"""
+
+import hashlib
+import math
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Literal, Set, Tuple
+
+from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.task_run import TaskRun
+
+Stratum = Literal["tag", "rating", "input_length"]
+
+
+@dataclass(frozen=True)
+class EvalSample:
+    """
+    Settings for a stratified sample of an eval set.
+
+    Args:
+        size: the number of dataset items to sample, per eval.
+        seed: the seed of the sample. Change it for a different sample of the same size.
+        strata: what items are stratified by: their tags, their rating (type and value), and their input length (in powers of 2 of characters).
+    """
+
+    size: int
+    seed: int = 0
+    strata: Tuple[Stratum, ...] = ("tag", "rating", "input_length")
+
+    def __post_init__(self):
+        if self.size < 1:
+            raise ValueError("size must be at least 1")
+
+    def stratum_of(self, task_run: TaskRun) -> Tuple[Hashable, ...]:
+        key: List[Hashable] = []
+        for stratum in self.strata:
+            if stratum == "tag":
+                key.append(tuple(sorted(task_run.tags)))
+            elif stratum == "rating":
+                rating = task_run.output.rating
+                key.append(
+                    (rating.type.value, rating.value)
+                    if rating is not None and rating.value is not None
+                    else None
+                )
+            elif stratum == "input_length":
+                key.append(int(math.log2(len(task_run.input) + 1)))
+        return tuple(key)
+
+    def sample(self, items: List[Tuple[ID_TYPE, Tuple[Hashable, ...]]]) -> Set[ID_TYPE]:
+        """
+        The IDs of the sampled items, from (item ID, stratum) pairs. All of them if there are no more than size.
+        """
+        if len(items) <= self.size:
+            return {item_id for item_id, _ in items}
+
+        strata: Dict[Tuple[Hashable, ...], List[ID_TYPE]] = {}
+        for item_id, stratum in items:
+            strata.setdefault(stratum, []).append(item_id)
+        for item_ids in strata.values():
+            item_ids.sort(key=self._rank)
+        # Larger strata first, then in a seeded order, for who gets a share when there are more strata than the sample size
+        ordered = sorted(
+            strata.keys(), key=lambda key: (-len(strata[key]), self._rank(repr(key)))
+        )
+
+        allocation = {key: 0 for key in ordered}
+        remaining = self.size
+        # Every stratum is represented, while the sample size allows
+        for key in ordered[:remaining]:
+            allocation[key] = 1
+        remaining -= min(remaining, len(ordered))
+        if remaining > 0:
+            # The rest in proportion to the items each stratum has left (largest remainder method)
+            left = {key: len(strata[key]) - allocation[key] for key in ordered}
+            total_left = sum(left.values())
+            quotas = {key: remaining * left[key] / total_left for key in ordered}
+            for key in ordered:
+                allocation[key] += math.floor(quotas[key])
+            leftover = self.size - sum(allocation.values())
+            by_remainder = sorted(
+                ordered, key=lambda key: -(quotas[key] - math.floor(quotas[key]))
+            )
+            for key in by_remainder[:leftover]:
+                allocation[key] += 1
+
+        return {
+            item_id for key in ordered for item_id in strata[key][: allocation[key]]
+        }
+
+    def _rank(self, value: object) -> str:
+        # A stable hash (unlike hash(), the same in every process)
+        return hashlib.sha256(f"{self.seed}:{value}".encode("utf-8")).hexdigest()
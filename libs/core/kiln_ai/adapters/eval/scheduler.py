@@ -0,0 +1,200 @@
+"""
+Fair scheduling of eval jobs across configs.
+
+Jobs are generated item-major: each dataset item's jobs for every config are adjacent. Handed to workers in that order (FIFO), a slow config (say, a run config on a slow provider) holds workers while it waits on its provider, and fast configs race ahead. An interrupted run is then left with nearly complete results for some configs and few for others, which can't be compared.
+
+The scheduler instead keeps a small buffer of jobs per config (keyed by the caller, eg per run config), and hands a worker the next job of the config which has had the fewest jobs started, subject to:
+
+- a concurrency cap per config: by default an equal share of the workers among the configs with work left, so no config can hold every worker,
+- a lead limit: no config can have more than max_lead jobs started beyond the config furthest behind, so results stay balanced at any point in the run.
+
+Jobs are still pulled lazily from the source, only as workers need them, and the buffers are bounded.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Generic, Hashable, Iterator, List, TypeVar
+
+U = TypeVar("U")
+
+
+@dataclass
+class ScheduledJob(Generic[U]):
+    job: U
+    key: Hashable
+    # When the job was buffered (monotonic clock), for measuring queue wait
+    queued_at: float = 0.0
+
+
+class FairJobScheduler(Generic[U]):
+    """
+    Hands out jobs to workers fairly across keys (configs). Workers call next() for a job, and done() when it finishes.
+
+    Args:
+        jobs: the jobs, pulled lazily.
+        key: the key (config) of a job.
+        worker_count: the number of workers. Sets the default concurrency cap per key (an equal share of them).
+        max_lead: the most jobs a key can have started beyond the key with the fewest, among keys with jobs buffered.
+        max_concurrency_per_key: cap on running jobs per key. None for an equal share of the workers among keys with work left.
+        buffer_size: the most jobs buffered (pulled but not started) at once, across keys.
+        should_stop: checked before pulling each new dataset item's jobs (see item_id). Once it returns True no more jobs are pulled, and buffered jobs still run.
+        item_id: the dataset item of a job, for should_stop.
+    """
+
+    def __init__(
+        self,
+        jobs: Iterator[U],
+        key: Callable[[U], Hashable],
+        worker_count: int,
+        max_lead: int,
+        max_concurrency_per_key: int | None = None,
+        buffer_size: int | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        item_id: Callable[[U], Hashable] | None = None,
+    ):
+        if worker_count < 1:
+            raise ValueError("worker_count must be at least 1")
+        if max_lead < 1:
+            raise ValueError("max_lead must be at least 1")
+        if max_concurrency_per_key is not None and max_concurrency_per_key < 1:
+            raise ValueError("max_concurrency_per_key must be at least 1")
+        if should_stop is not None and item_id is None:
+            raise ValueError("item_id is required with should_stop")
+
+        self.jobs = jobs
+        self.key = key
+        self.worker_count = worker_count
+        self.max_lead = max_lead
+        self.max_concurrency_per_key = max_concurrency_per_key
+        self.buffer_size = buffer_size or worker_count
+        self.should_stop = should_stop
+        self.item_id = item_id
+
+        self.exhausted = False
+        self._last_item_id: Hashable = None
+        # Per key, in order of first seen: buffered jobs, running jobs, jobs started, and when it last had a job started (for round-robin between ties)
+        self.buffers: Dict[Hashable, List[ScheduledJob[U]]] = {}
+        self.running: Dict[Hashable, int] = {}
+        self.started: Dict[Hashable, int] = {}
+        self._last_started: Dict[Hashable, int] = {}
+        self._start_count = 0
+        self._changed = asyncio.Event()
+
+    async def next(self) -> ScheduledJob[U] | None:
+        """
+        The next job to run, waiting until one is available. None once every job has been handed out.
+        """
+        while True:
+            job = self._pick()
+            if job is not None:
+                return job
+            if self._should_pull():
+                self._pull()
+                continue
+            if self.exhausted and self.buffered_count() == 0:
+                return None
+            # Wait for a running job to finish (freeing capacity), or another worker to pull jobs
+            self._changed.clear()
+            await self._changed.wait()
+
+    def done(self, job: ScheduledJob[U]) -> None:
+        """
+        Mark a job from next() as finished.
+        """
+        self.running[job.key] -= 1
+        self._changed.set()
+
+    def buffered_count(self) -> int:
+        return sum(len(buffer) for buffer in self.buffers.values())
+
+    def concurrency_cap(self) -> int:
+        if self.max_concurrency_per_key is not None:
+            return self.max_concurrency_per_key
+        # An equal share of the workers among keys with work left. Until the source is exhausted, keys without buffered jobs may have more coming.
+        active = sum(
+            1
+            for key, buffer in self.buffers.items()
+            if buffer or self.running[key] > 0 or not self.exhausted
+        )
+        return max(1, math.ceil(self.worker_count / max(1, active)))
+
+    def _min_started(self) -> int | None:
+        # Keys without buffered jobs don't hold others back: they may have no jobs left
+        started = [self.started[key] for key, buffer in self.buffers.items() if buffer]
+        return min(started) if started else None
+
+    def _eligible(self, key: Hashable, cap: int, min_started: int | None) -> bool:
+        if self.running[key] >= cap:
+            return False
+        return min_started is None or self.started[key] - min_started < self.max_lead
+
+    def _pick(self) -> ScheduledJob[U] | None:
+        cap = self.concurrency_cap()
+        min_started = self._min_started()
+        candidates = [
+            key
+            for key, buffer in self.buffers.items()
+            if buffer and self._eligible(key, cap, min_started)
+        ]
+        if not candidates:
+            return None
+        # Fewest started first, then least recently started (round-robin)
+        key = min(
+            candidates, key=lambda key: (self.started[key], self._last_started[key])
+        )
+        job = self.buffers[key].pop(0)
+        self.running[key] += 1
+        self.started[key] += 1
+        self._start_count += 1
+        self._last_started[key] = self._start_count
+        return job
+
+    def _should_pull(self) -> bool:
+        """
+        Pull more jobs when a worker could run a job we haven't pulled yet: no keys known yet, or a key with capacity has nothing buffered.
+        """
+        if self.exhausted or self.buffered_count() >= self.buffer_size:
+            return False
+        if not self.buffers:
+            return True
+        cap = self.concurrency_cap()
+        min_started = self._min_started()
+        return any(
+            not buffer and self._eligible(key, cap, min_started)
+            for key, buffer in self.buffers.items()
+        )
+
+    def _pull(self) -> None:
+        try:
+            job = next(self.jobs)
+        except StopIteration:
+            self.exhausted = True
+            self._changed.set()
+            return
+        except Exception:
+            # The source failed: hand out what's buffered, and raise the error to the worker which pulled
+            self.exhausted = True
+            self._changed.set()
+            raise
+
+        if self.should_stop is not None and self.item_id is not None:
+            item_id = self.item_id(job)
+            if item_id != self._last_item_id and self.should_stop():
+                self.exhausted = True
+                self._changed.set()
+                return
+            self._last_item_id = item_id
+
+        key = self.key(job)
+        if key not in self.buffers:
+            self.buffers[key] = []
+            self.running[key] = 0
+            self.started[key] = 0
+            self._last_started[key] = 0
+        self.buffers[key].append(
+            ScheduledJob(job=job, key=key, queued_at=time.monotonic())
+        )
+        # Other workers may be able to run it
+        self._changed.set()
@@ -0,0 +1,219 @@
+"""
+Sequential early stopping for comparing run configs.
+
+When comparing run configs we usually only need to know which is better, with confidence, not each one's mean over the full dataset. In sequential mode the eval runner evaluates dataset items in a random order, tracks a running mean and confidence interval (CI) for each run config and score, and stops once the answer is settled:
+
+- the ranking is settled: for every score, the run configs' CIs don't overlap, so their order is known, or
+- the CIs are narrow enough: for every score, every run config's CI is at most target_ci_width wide.
+
+On large eval sets this usually needs a fraction of the items. Results for items evaluated before stopping are saved as usual, and a later run continues with the remaining items.
+
+We check for a settled answer after every result. Fixed-sample CIs checked that often would eventually separate by chance (optional stopping), so the error rate would be far above 1 - confidence. Instead the CIs are confidence sequences: intervals valid at every item count at once, so stopping whenever they separate is safe (the asymptotic confidence sequences of Waudby-Smith et al. 2021, https://arxiv.org/abs/2103.06476). The error budget 1 - confidence is split evenly across every CI being tracked (each eval config, score and run config). The guarantee: with probability at least confidence, every CI covers its run config's true mean (over the eval set) at every point of the run, so a settled ranking is the true ranking, and the final CIs hold. This relies on the CLT, like normal approximation CIs, so min_items (per run config) should not be too small.
+"""
+
+import math
+import random
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple, TypeVar
+
+from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.eval import EvalScores
+
+T = TypeVar("T")
+
+# Confidence sequences are tightest around this many items per run config (or min_items, if more)
+CS_TUNED_COUNT = 100
+
+
+@dataclass(frozen=True)
+class SequentialStopping:
+    """
+    Settings for sequential early stopping.
+
+    Args:
+        confidence: probability that every CI covers its true mean, throughout the run (0.95 = 95%). See the module docstring.
+        target_ci_width: also stop once every CI is at most this wide (in score units). None to only stop when the ranking is settled.
+        min_items: don't stop until every run config has at least this many results, for every score.
+        score_keys: the score JSON keys to compare on. None for all of the eval's scores.
+        seed: seed for the random order of dataset items. None for a new order each run.
+    """
+
+    confidence: float = 0.95
+    target_ci_width: float | None = None
+    min_items: int = 10
+    score_keys: Tuple[str, ...] | None = None
+    seed: int | None = None
+
+    def __post_init__(self):
+        if not 0 < self.confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if self.target_ci_width is not None and self.target_ci_width <= 0:
+            raise ValueError("target_ci_width must be greater than 0")
+        if self.min_items < 2:
+            raise ValueError("min_items must be at least 2")
+
+    def shuffled(self, items: List[T]) -> List[T]:
+        """
+        The items in a random order (reproducible when seed is set).
+        """
+        shuffled = list(items)
+        random.Random(self.seed).shuffle(shuffled)
+        return shuffled
+
+
+class RunningStats:
+    """
+    Running mean and variance of a stream of values (Welford's algorithm): numerically stable, O(1) memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        # Sample variance
+        if self.count < 2:
+            return math.inf
+        return self._m2 / (self.count - 1)
+
+    def cs_half_width(self, alpha: float, rho: float) -> float:
+        """
+        Half width of a two-sided asymptotic confidence sequence: covers the mean at every count at once, with probability 1 - alpha. rho tunes which counts it's tightest around (see cs_rho).
+        """
+        if self.count < 2:
+            return math.inf
+        n_rho2 = self.count * rho * rho
+        return math.sqrt(self.variance) * math.sqrt(
+            2
+            * (n_rho2 + 1)
+            / (self.count * n_rho2)
+            * math.log(math.sqrt(n_rho2 + 1) / alpha)
+        )
+
+
+def cs_rho(alpha: float, tuned_count: int) -> float:
+    """
+    The confidence sequence parameter making it tightest at tuned_count items (Waudby-Smith et al. 2021).
+    """
+    log_term = -2 * math.log(alpha)
+    return math.sqrt((log_term + math.log(log_term + 1)) / tuned_count)
+
+
+@dataclass
+class ScoreInterval:
+    mean: float
+    low: float
+    high: float
+    count: int
+
+    @property
+    def width(self) -> float:
+        return self.high - self.low
+
+
+class SequentialTracker:
+    """
+    Tracks running means and CIs per eval config, score and run config, and decides when a comparison is settled.
+
+    Scores from different eval configs (judges) are tracked separately: each must be settled.
+    """
+
+    def __init__(
+        self,
+        settings: SequentialStopping,
+        eval_config_ids: Iterable[ID_TYPE],
+        run_config_ids: Iterable[ID_TYPE],
+        score_keys: Iterable[str],
+    ):
+        self.settings = settings
+        self.run_config_ids = list(run_config_ids)
+        self.score_keys = list(settings.score_keys or score_keys)
+        if len(self.run_config_ids) == 0:
+            raise ValueError("Sequential stopping requires at least one run config")
+        if len(self.score_keys) == 0:
+            raise ValueError("Sequential stopping requires at least one score")
+        # stats[(eval_config_id, score_key)][run_config_id]
+        self.stats: Dict[Tuple[ID_TYPE, str], Dict[ID_TYPE, RunningStats]] = {
+            (eval_config_id, score_key): {
+                run_config_id: RunningStats() for run_config_id in self.run_config_ids
+            }
+            for eval_config_id in eval_config_ids
+            for score_key in self.score_keys
+        }
+        # Bonferroni: split the error budget across every CI, so they all hold at once
+        interval_count = len(self.stats) * len(self.run_config_ids)
+        self.alpha = (1 - settings.confidence) / max(interval_count, 1)
+        self.rho = cs_rho(self.alpha, max(settings.min_items, CS_TUNED_COUNT))
+
+    def record(
+        self, eval_config_id: ID_TYPE, run_config_id: ID_TYPE, scores: EvalScores
+    ) -> None:
+        """
+        Add one eval result. Results for configs or scores not being compared are ignored.
+        """
+        for score_key in self.score_keys:
+            by_run_config = self.stats.get((eval_config_id, score_key))
+            if by_run_config is None or run_config_id not in by_run_config:
+                continue
+            value = scores.get(score_key)
+            if value is not None:
+                by_run_config[run_config_id].add(float(value))
+
+    def interval(
+        self, eval_config_id: ID_TYPE, score_key: str, run_config_id: ID_TYPE
+    ) -> ScoreInterval:
+        stats = self.stats[(eval_config_id, score_key)][run_config_id]
+        half_width = stats.cs_half_width(self.alpha, self.rho)
+        return ScoreInterval(
+            mean=stats.mean,
+            low=stats.mean - half_width,
+            high=stats.mean + half_width,
+            count=stats.count,
+        )
+
+    def ranking(self, eval_config_id: ID_TYPE, score_key: str) -> List[ID_TYPE]:
+        """
+        Run config ids, best (highest mean) first.
+        """
+        by_run_config = self.stats[(eval_config_id, score_key)]
+        return sorted(
+            by_run_config, key=lambda run_config_id: -by_run_config[run_config_id].mean
+        )
+
+    def score_settled(self, eval_config_id: ID_TYPE, score_key: str) -> bool:
+        intervals = [
+            self.interval(eval_config_id, score_key, run_config_id)
+            for run_config_id in self.ranking(eval_config_id, score_key)
+        ]
+        if any(interval.count < self.settings.min_items for interval in intervals):
+            return False
+
+        target_width = self.settings.target_ci_width
+        if target_width is not None and all(
+            interval.width <= target_width for interval in intervals
+        ):
+            return True
+
+        # Ranking is settled when each run config's CI is entirely above the next one's
+        if len(intervals) < 2:
+            return False
+        return all(
+            better.low > worse.high for better, worse in zip(intervals, intervals[1:])
+        )
+
+    def settled(self) -> bool:
+        """
+        True once every score (for every eval config) is settled, and evaluating more items isn't needed.
+        """
+        return all(
+            self.score_settled(eval_config_id, score_key)
+            for eval_config_id, score_key in self.stats
+        )
@@ -0,0 +1,418 @@
+"""
+Telemetry of eval runs: how long jobs take, where the time goes, and how many tokens they spend.
+
+For each job the eval runner records its wall time (from a worker picking it up to finishing it, including retries and backoff), its queue wait (from being queued to being picked up), the latency of the task model and judge calls, and their prompt/completion tokens (from the `usage` the provider reports). These are aggregated into fixed-bucket histograms per (eval config, run config) pair, which merge cheaply into totals per eval config and per run config.
+
+Running totals are streamed in progress updates (every few seconds, and in the final update), so throughput, spend and slow providers are visible while a run is in progress. When a run ends its telemetry is added to a small JSON file beside each eval config (under a file lock, so processes sharing the project don't lose each other's totals), so totals accumulate across runs, served by the eval config telemetry endpoint.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Literal, Sequence
+
+from pydantic import BaseModel, Field
+
+from kiln_ai.adapters.token_usage import TokenUsage, track_token_usage
+from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.eval import EvalConfig
+from kiln_ai.utils.file_lock import exclusive_file_lock
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds. Values above the last bound go in an overflow bucket.
+DURATION_BUCKETS_SECONDS = [
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    25.0,
+    60.0,
+    120.0,
+    300.0,
+]
+TOKEN_BUCKETS = [2**exponent for exponent in range(5, 18)]
+
+# Read-modify-write of telemetry files must not interleave within this process. The file lock excludes other processes.
+_telemetry_lock = threading.Lock()
+
+
+class Histogram(BaseModel):
+    """
+    Counts of values in fixed buckets, plus their count, sum, min and max. Histograms with the same bounds are merged by adding counts.
+    """
+
+    bounds: List[float] = Field(
+        description="Upper bound (inclusive) of each bucket, ascending."
+    )
+    counts: List[int] = Field(
+        description="Values in each bucket. One more than bounds: the last bucket counts values above the last bound."
+    )
+    count: int = 0
+    sum: float = 0.0
+    min: float | None = None
+    max: float | None = None
+
+    @classmethod
+    def with_bounds(cls, bounds: Sequence[float]) -> "Histogram":
+        return cls(bounds=list(bounds), counts=[0] * (len(bounds) + 1))
+
+    def record(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        if other.bounds != self.bounds:
+            raise ValueError("Can't merge histograms with different bounds")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count > 0 else None
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Estimate a quantile (0-1) of the recorded values, interpolating linearly within the bucket it falls in. Bucket edges are clamped to the min and max seen. None if empty.
+        """
+        if self.count == 0 or self.min is None or self.max is None:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            if bucket_count > 0 and seen + bucket_count >= rank:
+                lower = self.bounds[bucket - 1] if bucket > 0 else self.min
+                upper = self.bounds[bucket] if bucket < len(self.bounds) else self.max
+                lower = min(max(lower, self.min), self.max)
+                upper = min(max(upper, self.min), self.max)
+                fraction = max(0.0, rank - seen) / bucket_count
+                return lower + (upper - lower) * fraction
+            seen += bucket_count
+        return self.max
+
+
+def duration_histogram() -> Histogram:
+    return Histogram.with_bounds(DURATION_BUCKETS_SECONDS)
+
+
+def token_histogram() -> Histogram:
+    return Histogram.with_bounds(TOKEN_BUCKETS)
+
+
+class ModelCallStats(BaseModel):
+    """
+    Latency and token usage of one kind of model call (task or judge), one value per job.
+    """
+
+    latency: Histogram = Field(
+        default_factory=duration_histogram,
+        description="Seconds for the call, for calls which succeeded. Includes parsing and validating the output, and any wait for the shared rate limiter.",
+    )
+    prompt_tokens: Histogram = Field(
+        default_factory=token_histogram,
+        description="Prompt tokens used, for calls where the provider reported usage.",
+    )
+    completion_tokens: Histogram = Field(
+        default_factory=token_histogram,
+        description="Completion tokens used, for calls where the provider reported usage.",
+    )
+
+    def record(self, latency: float | None, usage: TokenUsage) -> None:
+        if latency is not None:
+            self.latency.record(latency)
+        if usage.reported_calls > 0:
+            self.prompt_tokens.record(usage.prompt_tokens)
+            self.completion_tokens.record(usage.completion_tokens)
+
+    def merge(self, other: "ModelCallStats") -> None:
+        self.latency.merge(other.latency)
+        self.prompt_tokens.merge(other.prompt_tokens)
+        self.completion_tokens.merge(other.completion_tokens)
+
+
+class ConfigTelemetry(BaseModel):
+    """
+    Telemetry of the jobs for an eval config, run config, or pair of them.
+    """
+
+    jobs: int = Field(default=0, description="Jobs finished, including errors.")
+    errors: int = 0
+    judge_cache_hits: int = Field(
+        default=0,
+        description="Jobs whose judge result came from the judge cache, without calling the judge.",
+    )
+    wall_time: Histogram = Field(
+        default_factory=duration_histogram,
+        description="Seconds from a worker picking up the job to finishing it, including retries and rate limit backoff.",
+    )
+    queue_wait: Histogram = Field(
+        default_factory=duration_histogram,
+        description="Seconds from the job being queued to a worker picking it up.",
+    )
+    task: ModelCallStats = Field(
+        default_factory=ModelCallStats,
+        description="Calls to the task model, generating output to evaluate. When several eval configs judge the same output, the generation is counted once, for the first eval config.",
+    )
+    judge: ModelCallStats = Field(
+        default_factory=ModelCallStats,
+        description="Calls to the judge model.",
+    )
+
+    def merge(self, other: "ConfigTelemetry") -> None:
+        self.jobs += other.jobs
+        self.errors += other.errors
+        self.judge_cache_hits += other.judge_cache_hits
+        self.wall_time.merge(other.wall_time)
+        self.queue_wait.merge(other.queue_wait)
+        self.task.merge(other.task)
+        self.judge.merge(other.judge)
+
+
+class EvalTelemetry(BaseModel):
+    """
+    Telemetry of an eval run so far, as streamed in progress updates.
+    """
+
+    elapsed_seconds: float = Field(description="Seconds since the run started.")
+    eval_configs: Dict[str, ConfigTelemetry] = Field(
+        default_factory=dict, description="eval config id -> telemetry of its jobs."
+    )
+    run_configs: Dict[str, ConfigTelemetry] = Field(
+        default_factory=dict,
+        description="task run config id -> telemetry of its jobs. Empty for mode 'eval_config_eval'.",
+    )
+
+
+@dataclass
+class JobModelCalls:
+    """
+    The model calls made for a job, recorded by the evaluator while the job runs (see recording_model_calls).
+    """
+
+    task_latency: float | None = None
+    task_usage: TokenUsage = field(default_factory=TokenUsage)
+    judge_latency: float | None = None
+    judge_usage: TokenUsage = field(default_factory=TokenUsage)
+    judge_cache_hits: int = 0
+
+
+# The model calls of the job running in the current context, if any
+_current_job_calls: ContextVar[JobModelCalls | None] = ContextVar(
+    "kiln_eval_job_calls", default=None
+)
+
+
+@contextmanager
+def recording_model_calls(calls: JobModelCalls) -> Iterator[JobModelCalls]:
+    """
+    Record the model calls made within the block (measured with measure_model_call) into calls.
+    """
+    token = _current_job_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _current_job_calls.reset(token)
+
+
+@contextmanager
+def measure_model_call(kind: Literal["task", "judge"]) -> Iterator[None]:
+    """
+    Measure a task or judge model call, for the job being recorded (if any). Tokens are counted even if the call fails, latency only if it succeeds. If a job makes the call more than once (retries), tokens add up and the last latency is kept.
+    """
+    calls = _current_job_calls.get()
+    if calls is None:
+        yield
+        return
+
+    start = time.monotonic()
+    with track_token_usage() as usage:
+        try:
+            yield
+        finally:
+            if kind == "task":
+                calls.task_usage.add(usage)
+            else:
+                calls.judge_usage.add(usage)
+    latency = time.monotonic() - start
+    if kind == "task":
+        calls.task_latency = latency
+    else:
+        calls.judge_latency = latency
+
+
+def record_judge_cache_hit() -> None:
+    calls = _current_job_calls.get()
+    if calls is not None:
+        calls.judge_cache_hits += 1
+
+
+class EvalRunTelemetry:
+    """
+    Collects the telemetry of an eval run, per (eval config, run config) pair.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.pairs: Dict[tuple[ID_TYPE, ID_TYPE], ConfigTelemetry] = {}
+
+    def pair(self, eval_config_id: ID_TYPE, run_config_id: ID_TYPE) -> ConfigTelemetry:
+        key = (eval_config_id, run_config_id)
+        telemetry = self.pairs.get(key)
+        if telemetry is None:
+            telemetry = ConfigTelemetry()
+            self.pairs[key] = telemetry
+        return telemetry
+
+    def record_job(
+        self,
+        eval_config_id: ID_TYPE,
+        run_config_id: ID_TYPE,
+        success: bool,
+        wall_time: float,
+        queue_wait: float,
+    ) -> None:
+        telemetry = self.pair(eval_config_id, run_config_id)
+        telemetry.jobs += 1
+        if not success:
+            telemetry.errors += 1
+        telemetry.wall_time.record(wall_time)
+        telemetry.queue_wait.record(queue_wait)
+
+    def record_model_calls(
+        self, eval_config_id: ID_TYPE, run_config_id: ID_TYPE, calls: JobModelCalls
+    ) -> None:
+        telemetry = self.pair(eval_config_id, run_config_id)
+        if calls.task_latency is not None or calls.task_usage.calls > 0:
+            telemetry.task.record(calls.task_latency, calls.task_usage)
+        if calls.judge_latency is not None or calls.judge_usage.calls > 0:
+            telemetry.judge.record(calls.judge_latency, calls.judge_usage)
+        telemetry.judge_cache_hits += calls.judge_cache_hits
+
+    def snapshot(self) -> EvalTelemetry:
+        """
+        The telemetry so far, totalled per eval config and per run config. A copy: later jobs don't change it.
+        """
+        snapshot = EvalTelemetry(elapsed_seconds=time.monotonic() - self.started_at)
+        for (eval_config_id, run_config_id), telemetry in self.pairs.items():
+            snapshot.eval_configs.setdefault(
+                str(eval_config_id), ConfigTelemetry()
+            ).merge(telemetry)
+            if run_config_id is not None:
+                snapshot.run_configs.setdefault(
+                    str(run_config_id), ConfigTelemetry()
+                ).merge(telemetry)
+        return snapshot
+
+    def save(self, eval_configs: Sequence[EvalConfig]) -> None:
+        """
+        Add this run's telemetry to the persisted telemetry of each eval config.
+        """
+        for eval_config in eval_configs:
+            pairs = {
+                run_config_id: telemetry
+                for (eval_config_id, run_config_id), telemetry in self.pairs.items()
+                if eval_config_id == eval_config.id
+            }
+            if pairs:
+                EvalConfigTelemetry.add_run(eval_config, pairs)
+
+
+class EvalConfigTelemetry(BaseModel):
+    """
+    The telemetry of every run of an eval config, persisted beside it.
+    """
+
+    v: int = Field(default=1, description="Schema version of the telemetry file.")
+    totals: ConfigTelemetry = Field(
+        default_factory=ConfigTelemetry, description="Telemetry of all jobs."
+    )
+    run_configs: Dict[str, ConfigTelemetry] = Field(
+        default_factory=dict,
+        description="task run config id -> telemetry of its jobs. Empty for mode 'eval_config_eval'.",
+    )
+
+    @classmethod
+    def telemetry_path(cls, eval_config: EvalConfig) -> Path | None:
+        if eval_config.path is None:
+            return None
+        return eval_config.path.parent / "eval_telemetry.json"
+
+    @classmethod
+    def for_eval_config(cls, eval_config: EvalConfig) -> "EvalConfigTelemetry":
+        """
+        The persisted telemetry of an eval config. Empty if it has none (or it's unreadable).
+        """
+        path = cls.telemetry_path(eval_config)
+        if path is None:
+            return cls()
+        return cls._load(path) or cls()
+
+    @classmethod
+    def add_run(
+        cls,
+        eval_config: EvalConfig,
+        pairs: Dict[ID_TYPE, ConfigTelemetry],
+    ) -> None:
+        """
+        Add a run's telemetry (run config id -> telemetry) to the eval config's persisted telemetry.
+        """
+        path = cls.telemetry_path(eval_config)
+        if path is None:
+            return
+        # Several processes (eg distributed eval workers) may add runs to one eval config
+        with _telemetry_lock, exclusive_file_lock(path.with_suffix(".lock")):
+            persisted = cls._load(path) or cls()
+            try:
+                persisted.merge_run(pairs)
+            except ValueError as e:
+                # Bucket bounds changed since it was written: start over
+                logger.warning(f"Resetting eval telemetry, can't merge: {e}")
+                persisted = cls()
+                persisted.merge_run(pairs)
+            persisted._save(path)
+
+    def merge_run(self, pairs: Dict[ID_TYPE, ConfigTelemetry]) -> None:
+        for run_config_id, telemetry in pairs.items():
+            self.totals.merge(telemetry)
+            if run_config_id is not None:
+                self.run_configs.setdefault(
+                    str(run_config_id), ConfigTelemetry()
+                ).merge(telemetry)
+
+    @classmethod
+    def _load(cls, path: Path) -> "EvalConfigTelemetry | None":
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return cls.model_validate(json.load(file))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Invalid eval telemetry file, ignoring it: {e}")
+            return None
+
+    def _save(self, path: Path) -> None:
+        # Write and rename, so readers never see a partial file
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.model_dump_json(indent=2))
+        os.replace(tmp_path, path)
@@ -0,0 +1,91 @@
+import pytest
+
+from kiln_ai.adapters.eval.distributed import join_distributed_run, run_distributed
+from kiln_ai.adapters.eval.eval_runner import EvalRunner
+from kiln_ai.adapters.eval.job_journal import EvalJobJournal, RunState
+from kiln_ai.datamodel import Task
+from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalOutputScore
+from kiln_ai.datamodel.task import RunConfigProperties, TaskRunConfig
+
+
+@pytest.fixture
+def runner(tmp_path):
+    task = Task(name="test", instruction="do the thing", path=tmp_path / "task.kiln")
+    task.save_to_file()
+    eval = Eval(
+        name="test",
+        eval_set_filter_id="all",
+        eval_configs_filter_id="all",
+        output_scores=[EvalOutputScore(name="Accuracy", type="pass_fail")],
+        parent=task,
+    )
+    eval.save_to_file()
+    eval_config = EvalConfig(
+        name="test",
+        model_name="gpt-4",
+        model_provider="openai",
+        parent=eval,
+        properties={"eval_steps": ["step1"]},
+    )
+    eval_config.save_to_file()
+    run_config = TaskRunConfig(
+        name="test",
+        run_config_properties=RunConfigProperties(
+            model_name="gpt-4",
+            model_provider_name="openai",
+            prompt_id="simple_prompt_builder",
+        ),
+        parent=task,
+    )
+    run_config.save_to_file()
+    # No dataset items: the workers start, find nothing to run, and exit
+    return EvalRunner([eval_config], [run_config], "task_run_eval")
+
+
+def journal_runs(runner):
+    journal = EvalJobJournal.for_task(runner.task)
+    assert journal is not None
+    try:
+        return journal.runs()
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_distributed(runner):
+    progress = [
+        p async for p in run_distributed(runner, processes=2, progress_interval=0.05)
+    ]
+    assert progress[-1].complete == 0
+    assert progress[-1].total == 0
+    assert progress[-1].errors == 0
+    assert [run.state for run in journal_runs(runner)] == [RunState.finished]
+
+
+@pytest.mark.asyncio
+async def test_run_distributed_worker_failure(runner):
+    # Invalid in the workers: they exit with an error
+    with pytest.raises(RuntimeError, match="1 eval worker process"):
+        async for _ in run_distributed(
+            runner, processes=1, progress_interval=0.05, max_job_attempts=0
+        ):
+            pass
+    assert [run.state for run in journal_runs(runner)] == [RunState.failed]
+
+
+@pytest.mark.asyncio
+async def test_run_distributed_validation(runner):
+    with pytest.raises(ValueError, match="processes"):
+        async for _ in run_distributed(runner, processes=0):
+            pass
+    runner.task.path = None
+    with pytest.raises(ValueError, match="saved task"):
+        async for _ in run_distributed(runner, processes=1):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_join_missing_run(runner):
+    with pytest.raises(ValueError, match="not found"):
+        async for _ in join_distributed_run(runner.task, "missing"):
+            pass
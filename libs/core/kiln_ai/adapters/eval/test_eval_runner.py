@@ -1,10 +1,43 @@
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
 from typing import Dict
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
+import litellm
 import pytest
 
+from kiln_ai.adapters.adaptive_concurrency import (
+    AIMDConcurrencyLimiter,
+    ConcurrencyBounds,
+    RateLimitedError,
+    RequestOutcome,
+)
+from kiln_ai.adapters.batch.batch_session import BatchSession, current_batch_session
+from kiln_ai.adapters.batch.local_transport import LocalBatchTransport
 from kiln_ai.adapters.eval.base_eval import BaseEval
-from kiln_ai.adapters.eval.eval_runner import EvalJob, EvalRunner
+from kiln_ai.adapters.eval.eval_runner import (
+    EvalBatchRunner,
+    EvalJob,
+    EvalJobGroup,
+    EvalProgress,
+    EvalRunner,
+)
+from kiln_ai.adapters.eval.job_journal import (
+    EvalJobJournal,
+    EvalRunSpec,
+    JobLease,
+    JobState,
+    RunState,
+    job_key,
+    set_shutting_down,
+)
+from kiln_ai.adapters.eval.judge_cache import JudgeCache
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.adapters.eval.sequential import SequentialStopping
+from kiln_ai.adapters.eval.telemetry import EvalConfigTelemetry
+from kiln_ai.adapters.token_usage import record_response_usage
 from kiln_ai.datamodel import (
     DataSource,
     DataSourceType,
@@ -13,6 +46,7 @@ from kiln_ai.datamodel import (
     TaskOutputRatingType,
     TaskRun,
 )
+from kiln_ai.datamodel.basemodel import KilnBaseModel
 from kiln_ai.datamodel.eval import (
     Eval,
     EvalConfig,
@@ -110,25 +144,49 @@ def mock_eval_runner(mock_eval, mock_task, mock_eval_config, mock_run_config):
     )
 
 
+@pytest.fixture
+def make_jobs(mock_task, mock_eval_config, mock_run_config, data_source):
+    def make_jobs(count, type="task_run_eval"):
+        return [
+            EvalJob(
+                item=TaskRun(
+                    parent=mock_task,
+                    input=f"input {i}",
+                    input_source=data_source,
+                    output=TaskOutput(output=f"output {i}"),
+                ),
+                type=type,
+                eval_config=mock_eval_config,
+                task_run_config=mock_run_config if type == "task_run_eval" else None,
+            )
+            for i in range(count)
+        ]
+
+    return make_jobs
+
+
 # Test with and without concurrency
 @pytest.mark.parametrize("concurrency", [1, 25])
 @pytest.mark.asyncio
-async def test_async_eval_runner_status_updates(mock_eval_runner, concurrency):
+async def test_async_eval_runner_status_updates(
+    mock_eval_runner, concurrency, make_jobs
+):
     # Real async testing!
 
     job_count = 50
-    # Job objects are not the right type, but since we're mocking run_job, it doesn't matter
-    jobs = [{} for _ in range(job_count)]
+    jobs = make_jobs(job_count)
 
-    # Mock collect_tasks to return our fake jobs
-    mock_eval_runner.collect_tasks = lambda: jobs
+    # Mock job_source to return our fake jobs
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
 
     # Mock run_job to return True immediately
     mock_eval_runner.run_job = AsyncMock(return_value=True)
 
-    # Expect the status updates in order, and 1 for each job
+    # Expect the status updates in order, and 1 for each job (no coalescing with progress_interval=0)
     expected_compelted_count = 0
-    async for progress in mock_eval_runner.run(concurrency=concurrency):
+    async for progress in mock_eval_runner.run(
+        concurrency=concurrency, progress_interval=0
+    ):
         assert progress.complete == expected_compelted_count
         expected_compelted_count += 1
         assert progress.errors == 0
@@ -639,3 +697,1745 @@ async def test_run_job_evaluator_error(
 
     assert success is False
     assert len(mock_eval_config.runs()) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_job_rate_limit_error(
+    mock_eval_runner, mock_task, data_source, mock_run_config, mock_eval_config
+):
+    task_run = TaskRun(
+        parent=mock_task,
+        input="test input",
+        input_source=data_source,
+        output=TaskOutput(output="test output"),
+    )
+    task_run.save_to_file()
+    job = EvalJob(
+        item=task_run,
+        task_run_config=mock_run_config,
+        type="task_run_eval",
+        eval_config=mock_eval_config,
+    )
+
+    class RateLimitedEvaluator(BaseEval):
+        async def run_task_and_eval(self, input_text):
+            raise litellm.RateLimitError(
+                message="slow down",
+                llm_provider="openai",
+                model="gpt-4",
+                response=httpx.Response(
+                    status_code=429,
+                    headers={"retry-after": "3"},
+                    request=httpx.Request("POST", "https://example.com"),
+                ),
+            )
+
+    # Rate limits are raised for the runner to retry, not counted as errors
+    with (
+        patch(
+            "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+            return_value=lambda *args: RateLimitedEvaluator(*args),
+        ),
+        pytest.raises(RateLimitedError) as exc_info,
+    ):
+        await mock_eval_runner.run_job(job)
+    assert exc_info.value.retry_after == 3.0
+
+
+@pytest.mark.asyncio
+async def test_run_retries_rate_limited_jobs(mock_eval_runner, mock_eval_config):
+    jobs = [
+        EvalJob(
+            item=MagicMock(id=str(i)),
+            type="eval_config_eval",
+            eval_config=mock_eval_config,
+        )
+        for i in range(10)
+    ]
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+
+    attempts: Dict[int, int] = {}
+
+    async def run_job(job):
+        attempts[id(job)] = attempts.get(id(job), 0) + 1
+        # Every job is rate limited on its first attempt
+        if attempts[id(job)] == 1:
+            raise RateLimitedError("slow down", retry_after=0.0)
+        return True
+
+    mock_eval_runner.run_job = run_job
+
+    progress = [p async for p in mock_eval_runner.run(concurrency=4)]
+    assert progress[-1].complete == 10
+    assert progress[-1].errors == 0
+    assert all(count == 2 for count in attempts.values())
+
+
+@pytest.mark.asyncio
+async def test_run_rate_limit_retries_exhausted(mock_eval_runner, mock_eval_config):
+    jobs = [
+        EvalJob(
+            item=MagicMock(id=str(i)),
+            type="eval_config_eval",
+            eval_config=mock_eval_config,
+        )
+        for i in range(3)
+    ]
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    mock_eval_runner.run_job = AsyncMock(
+        side_effect=RateLimitedError("slow down", retry_after=0.0)
+    )
+
+    progress = [
+        p async for p in mock_eval_runner.run(concurrency=2, max_rate_limit_retries=2)
+    ]
+    assert progress[-1].complete == 0
+    assert progress[-1].errors == 3
+    # First attempt and 2 retries for each job
+    assert mock_eval_runner.run_job.call_count == 9
+
+
+@pytest.mark.asyncio
+async def test_run_respects_fixed_concurrency(mock_eval_runner, mock_eval_config):
+    jobs = [
+        EvalJob(
+            item=MagicMock(id=str(i)),
+            type="eval_config_eval",
+            eval_config=mock_eval_config,
+        )
+        for i in range(12)
+    ]
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    in_flight = 0
+    max_in_flight = 0
+
+    async def run_job(job):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return True
+
+    mock_eval_runner.run_job = run_job
+    progress = [
+        p async for p in mock_eval_runner.run(concurrency=3, adaptive_concurrency=False)
+    ]
+    assert progress[-1].complete == 12
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_retries_releases_slots_when_cancelled(mock_eval_runner):
+    first = AIMDConcurrencyLimiter(ConcurrencyBounds(min=1, max=4))
+    second = AIMDConcurrencyLimiter(ConcurrencyBounds(min=1, max=1))
+    held_epoch = await second.acquire()
+    call = AsyncMock(return_value=True)
+
+    task = asyncio.create_task(
+        mock_eval_runner.call_with_rate_limit_retries(call, [first, second], 0)
+    )
+    # Holds a slot of the first limiter, waiting on the second
+    while first.in_flight == 0:
+        await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert first.in_flight == 0
+    call.assert_not_called()
+    await second.release(held_epoch, RequestOutcome.success)
+    assert second.in_flight == 0
+
+
+def test_build_concurrency_limiters(mock_eval_runner):
+    limiters = mock_eval_runner.build_concurrency_limiters(
+        concurrency=10,
+        adaptive_concurrency=True,
+        provider_concurrency_bounds={"openai": ConcurrencyBounds(min=2, max=5)},
+    )
+    # Judge and task both use openai in the fixtures
+    assert set(limiters.keys()) == {"openai"}
+    assert limiters["openai"].concurrency == 5
+    assert limiters["openai"].bounds.max == 5
+
+
+@pytest.fixture
+def multi_eval_config_runner(mock_eval, mock_eval_config, mock_run_config):
+    eval_configs = [mock_eval_config]
+    for i in range(2):
+        eval_config = EvalConfig(
+            name=f"judge {i}",
+            model_name="claude_3_5_sonnet",
+            model_provider="anthropic",
+            parent=mock_eval,
+            properties={"eval_steps": ["step1"]},
+        )
+        eval_config.save_to_file()
+        eval_configs.append(eval_config)
+    return EvalRunner(
+        eval_configs=eval_configs,
+        run_configs=[mock_run_config],
+        eval_run_type="task_run_eval",
+    )
+
+
+def test_group_jobs(multi_eval_config_runner, mock_task, data_source):
+    for i in range(2):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    jobs = multi_eval_config_runner.collect_tasks()
+    assert len(jobs) == 6
+    units = list(multi_eval_config_runner.group_jobs(jobs))
+    assert len(units) == 2
+    for unit in units:
+        assert isinstance(unit, EvalJobGroup)
+        assert len(unit.jobs) == 3
+        assert {job.eval_config.id for job in unit.jobs} == {
+            eval_config.id for eval_config in multi_eval_config_runner.eval_configs
+        }
+        assert all(job.item.id == unit.item.id for job in unit.jobs)
+
+    # Single jobs and eval_config_eval jobs aren't grouped
+    assert list(multi_eval_config_runner.group_jobs(jobs[:1])) == jobs[:1]
+    config_eval_jobs = [
+        EvalJob(item=job.item, type="eval_config_eval", eval_config=job.eval_config)
+        for job in jobs
+    ]
+    assert (
+        list(multi_eval_config_runner.group_jobs(config_eval_jobs)) == config_eval_jobs
+    )
+
+
+@pytest.mark.asyncio
+async def test_task_run_eval_generates_output_once(
+    multi_eval_config_runner, mock_task, data_source
+):
+    for i in range(3):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    run_task_inputs = []
+
+    class FanOutEvaluator(BaseEval):
+        async def run_task(self, input):
+            run_task_inputs.append(input)
+            await asyncio.sleep(0.01)
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output=f"generated for {input}"),
+            )
+
+        async def run_task_and_eval(self, input_text):
+            raise ValueError("Should generate output once, then only run evals")
+
+        async def run_eval(self, task_run):
+            return {"accuracy": 1.0}, None
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: FanOutEvaluator(*args),
+    ):
+        progress = [p async for p in multi_eval_config_runner.run(concurrency=4)]
+
+    assert progress[-1].total == 9
+    assert progress[-1].complete == 9
+    assert progress[-1].errors == 0
+    # One generation per dataset item, not one per eval config
+    assert sorted(run_task_inputs) == ["input 0", "input 1", "input 2"]
+
+    for eval_config in multi_eval_config_runner.eval_configs:
+        eval_runs = eval_config.runs()
+        assert len(eval_runs) == 3
+        for eval_run in eval_runs:
+            assert eval_run.output == f"generated for {eval_run.input}"
+            assert eval_run.scores == {"accuracy": 1.0}
+            assert eval_run.eval_config_eval is False
+
+
+@pytest.mark.asyncio
+async def test_task_run_eval_generation_error_fails_group(
+    multi_eval_config_runner, mock_task, data_source
+):
+    TaskRun(
+        parent=mock_task,
+        input="input",
+        input_source=data_source,
+        output=TaskOutput(output="output"),
+    ).save_to_file()
+
+    class FailingEvaluator(BaseEval):
+        async def run_task(self, input):
+            raise ValueError("generation failed")
+
+        async def run_eval(self, task_run):
+            raise AssertionError("Eval shouldn't run without output")
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: FailingEvaluator(*args),
+    ):
+        progress = [p async for p in multi_eval_config_runner.run()]
+
+    assert progress[-1].complete == 0
+    assert progress[-1].errors == 3
+    for eval_config in multi_eval_config_runner.eval_configs:
+        assert len(eval_config.runs()) == 0
+
+
+@pytest.mark.asyncio
+async def test_run_job_with_generated_run_validates_scores(
+    mock_eval_runner, mock_task, data_source, mock_run_config, mock_eval_config
+):
+    task_run = TaskRun(
+        parent=mock_task,
+        input="test input",
+        input_source=data_source,
+        output=TaskOutput(output="test output"),
+    )
+    task_run.save_to_file()
+    job = EvalJob(
+        item=task_run,
+        task_run_config=mock_run_config,
+        type="task_run_eval",
+        eval_config=mock_eval_config,
+    )
+    generated_run = TaskRun(
+        input="test input",
+        input_source=data_source,
+        output=TaskOutput(output="generated output"),
+    )
+
+    class InvalidScoresEvaluator(BaseEval):
+        async def run_eval(self, task_run):
+            return {"not_a_score": 1.0}, None
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: InvalidScoresEvaluator(*args),
+    ):
+        assert await mock_eval_runner.run_job(job, generated_run) is False
+    assert len(mock_eval_config.runs()) == 0
+
+
+@pytest.mark.asyncio
+async def test_evaluators_reused_within_run(
+    multi_eval_config_runner, mock_task, data_source
+):
+    for i in range(4):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    class CountingEvaluator(BaseEval):
+        async def run_task(self, input):
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output="generated"),
+            )
+
+        async def run_eval(self, task_run):
+            return {"accuracy": 1.0}, None
+
+    created = []
+
+    def create_evaluator(*args):
+        created.append(args)
+        return CountingEvaluator(*args)
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=create_evaluator,
+    ):
+        progress = [p async for p in multi_eval_config_runner.run(concurrency=4)]
+        assert progress[-1].complete == 12
+        # One evaluator per eval config/run config pair, not one per job
+        assert len(created) == 3
+        assert multi_eval_config_runner.evaluators == {}
+
+        # A new run starts with fresh evaluators
+        for eval_config in multi_eval_config_runner.eval_configs:
+            for eval_run in eval_config.runs():
+                eval_run.delete()
+        progress = [p async for p in multi_eval_config_runner.run(concurrency=4)]
+        assert progress[-1].complete == 12
+        assert len(created) == 6
+
+
+@pytest.mark.asyncio
+async def test_judge_cache_used_unless_disabled(
+    multi_eval_config_runner, mock_task, data_source, tmp_path
+):
+    for i in range(4):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    judge_calls = []
+
+    class CachingEvaluator(BaseEval):
+        async def run_task(self, input):
+            # Every item generates the same output
+            return TaskRun(
+                input="same input",
+                input_source=data_source,
+                output=TaskOutput(output="generated"),
+            )
+
+        def judge_cache_key(self, task_run):
+            return f"{self.eval_config.id}:{task_run.input}:{task_run.output.output}"
+
+        async def run_eval(self, task_run):
+            judge_calls.append(task_run)
+            return {"accuracy": 1.0}, {"thinking": "cached"}
+
+    cache = JudgeCache(tmp_path / "judge_cache.sqlite")
+    with (
+        patch(
+            "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+            return_value=CachingEvaluator,
+        ),
+        patch(
+            "kiln_ai.adapters.eval.eval_runner.JudgeCache.shared",
+            return_value=cache,
+        ),
+    ):
+        progress = [
+            p
+            async for p in multi_eval_config_runner.run(
+                concurrency=1, adaptive_concurrency=False
+            )
+        ]
+        assert progress[-1].complete == 12
+        # Identical judge requests only sent once per eval config
+        assert len(judge_calls) == 3
+        assert multi_eval_config_runner.judge_cache is None
+        for eval_config in multi_eval_config_runner.eval_configs:
+            for eval_run in eval_config.runs():
+                assert eval_run.intermediate_outputs == {"thinking": "cached"}
+                eval_run.delete()
+
+        # Opted out: every job calls the judge
+        judge_calls.clear()
+        progress = [
+            p
+            async for p in multi_eval_config_runner.run(
+                concurrency=1, adaptive_concurrency=False, use_judge_cache=False
+            )
+        ]
+        assert progress[-1].complete == 12
+        assert len(judge_calls) == 12
+    cache.close()
+
+
+def test_plan_tasks_counts_without_building_jobs(
+    multi_eval_config_runner, mock_task, data_source, mock_run_config
+):
+    task_runs = []
+    for i in range(3):
+        task_run = TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        )
+        task_run.save_to_file()
+        task_runs.append(task_run)
+
+    # The first item is fully run for every eval config, the second for one
+    for index, eval_config in enumerate(multi_eval_config_runner.eval_configs):
+        for task_run in task_runs[: 2 if index == 0 else 1]:
+            EvalRun(
+                parent=eval_config,
+                task_run_config_id=mock_run_config.id,
+                dataset_id=task_run.id,
+                eval_config_eval=False,
+                scores={"accuracy": 1.0},
+                input="input",
+                output="output",
+            ).save_to_file()
+
+    plan = multi_eval_config_runner.plan_tasks()
+    assert plan.total == 5
+    # Fully run items aren't revisited when generating jobs
+    assert len(plan.item_paths) == 2
+
+    jobs = list(multi_eval_config_runner.iter_tasks(plan))
+    assert len(jobs) == plan.total
+    assert jobs == multi_eval_config_runner.collect_tasks()
+    assert {job.item.id for job in jobs} == {task_runs[1].id, task_runs[2].id}
+
+    total, job_iterator = multi_eval_config_runner.job_source()
+    assert total == 5
+    assert len(list(job_iterator)) == 5
+
+
+@pytest.mark.asyncio
+async def test_run_streams_jobs_lazily(mock_eval_runner, make_jobs):
+    job_count = 100
+    generated = 0
+
+    def generate_jobs():
+        nonlocal generated
+        for job in make_jobs(job_count):
+            generated += 1
+            yield job
+
+    mock_eval_runner.job_source = lambda: (job_count, generate_jobs())
+    generated_at_first_job = None
+
+    async def run_job(job):
+        nonlocal generated_at_first_job
+        if generated_at_first_job is None:
+            generated_at_first_job = generated
+        return True
+
+    mock_eval_runner.run_job = run_job
+    progress = [
+        p async for p in mock_eval_runner.run(concurrency=2, adaptive_concurrency=False)
+    ]
+    assert progress[-1].complete == job_count
+    assert progress[-1].total == job_count
+    # Work starts before all jobs are generated, which stay bounded by the queue
+    assert generated_at_first_job is not None
+    assert generated_at_first_job < job_count
+
+
+@pytest.mark.asyncio
+async def test_run_job_generation_error(mock_eval_runner, make_jobs):
+    def generate_jobs():
+        # Jobs are passed on once the next dataset item starts, so the first is run before the error
+        yield from make_jobs(2, type="eval_config_eval")
+        raise ValueError("failed to load dataset item")
+
+    mock_eval_runner.job_source = lambda: (3, generate_jobs())
+    mock_eval_runner.run_job = AsyncMock(return_value=True)
+
+    with pytest.raises(ValueError, match="failed to load dataset item"):
+        async for _ in mock_eval_runner.run(concurrency=2):
+            pass
+    assert mock_eval_runner.run_job.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_run_coalesces_progress(mock_eval_runner, make_jobs):
+    job_count = 200
+    jobs = make_jobs(job_count)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+
+    async def run_job(job):
+        await asyncio.sleep(0.001)
+        return True
+
+    mock_eval_runner.run_job = run_job
+
+    progress = [p async for p in mock_eval_runner.run(progress_interval=60)]
+    # Initial status, and the final exact count. Everything in between is coalesced.
+    assert [p.complete for p in progress] == [0, job_count]
+    assert progress[-1].total == job_count
+    assert progress[-1].errors == 0
+
+
+@pytest.mark.asyncio
+async def test_run_progress_interval(mock_eval_runner, make_jobs):
+    jobs = make_jobs(10)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+
+    async def run_job(job):
+        await asyncio.sleep(0.02)
+        return True
+
+    mock_eval_runner.run_job = run_job
+
+    progress = []
+    async for p in mock_eval_runner.run(
+        concurrency=1, adaptive_concurrency=False, progress_interval=0.05
+    ):
+        progress.append(p)
+    completes = [p.complete for p in progress]
+    # Some intermediate updates, fewer than one per job, ending with the exact count
+    assert 2 < len(progress) < 11
+    assert completes == sorted(completes)
+    assert completes[-1] == 10
+
+
+@pytest.mark.asyncio
+async def test_run_worker_error_raised(mock_eval_runner, make_jobs):
+    jobs = make_jobs(5)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    # Errors escaping the retry wrapper fail the run instead of hanging it
+    mock_eval_runner.run_job_with_retries = AsyncMock(
+        side_effect=RuntimeError("worker crashed")
+    )
+
+    with pytest.raises(RuntimeError, match="worker crashed"):
+        async for _ in mock_eval_runner.run(concurrency=1):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_run_saves_results_with_writer(
+    multi_eval_config_runner, mock_task, data_source
+):
+    TaskRun(
+        parent=mock_task,
+        input="input",
+        input_source=data_source,
+        output=TaskOutput(output="output"),
+    ).save_to_file()
+
+    class SimpleEvaluator(BaseEval):
+        async def run_task(self, input):
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output="generated"),
+            )
+
+        async def run_eval(self, task_run):
+            return {"accuracy": 1.0}, None
+
+    writers = []
+    original_run_job = multi_eval_config_runner.run_job
+
+    async def run_job(job, generated_run=None):
+        # Workers hand results to the writer, rather than saving inline
+        writers.append(multi_eval_config_runner.eval_run_writer)
+        return await original_run_job(job, generated_run)
+
+    multi_eval_config_runner.run_job = run_job
+    with (
+        patch(
+            "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+            return_value=lambda *args: SimpleEvaluator(*args),
+        ),
+        patch.object(EvalRun, "save_to_file") as mock_inline_save,
+    ):
+        progress = [p async for p in multi_eval_config_runner.run()]
+
+    assert progress[-1].complete == 3
+    assert all(writer is not None for writer in writers)
+    assert multi_eval_config_runner.eval_run_writer is None
+    mock_inline_save.assert_not_called()
+    for eval_config in multi_eval_config_runner.eval_configs:
+        assert len(eval_config.runs()) == 1
+
+
+@pytest.mark.asyncio
+async def test_run_counts_failed_writes_as_errors(
+    mock_eval_runner, mock_eval_config, make_jobs
+):
+    jobs = make_jobs(4)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+
+    async def run_job(job):
+        # Not saveable: no path
+        mock_eval_runner.eval_run_writer.submit(KilnBaseModel())
+        return True
+
+    mock_eval_runner.run_job = run_job
+    progress = [p async for p in mock_eval_runner.run()]
+    assert progress[-1].complete == 0
+    assert progress[-1].errors == 4
+
+
+@pytest.mark.asyncio
+async def test_run_flushes_writer_when_closed_early(mock_eval_runner, make_jobs):
+    jobs = make_jobs(10)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    writers = []
+
+    async def run_job(job):
+        writers.append(mock_eval_runner.eval_run_writer)
+        return True
+
+    mock_eval_runner.run_job = run_job
+    run = mock_eval_runner.run(progress_interval=0)
+    await run.__anext__()
+    await run.__anext__()
+    # The client goes away mid run
+    await run.aclose()
+
+    assert writers
+    assert writers[0].closed
+    assert mock_eval_runner.eval_run_writer is None
+
+
+@pytest.mark.asyncio
+async def test_sequential_stopping(
+    mock_task, mock_eval, mock_eval_config, mock_run_config, data_source
+):
+    better_run_config = TaskRunConfig(
+        name="better",
+        run_config_properties=RunConfigProperties(
+            model_name="gpt-4",
+            model_provider_name="openai",
+            prompt_id="simple_chain_of_thought_prompt_builder",
+        ),
+        parent=mock_task,
+    )
+    better_run_config.save_to_file()
+    runner = EvalRunner(
+        eval_configs=[mock_eval_config],
+        run_configs=[mock_run_config, better_run_config],
+        eval_run_type="task_run_eval",
+    )
+    for i in range(100):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    evaluated_inputs = []
+
+    class ScoringEvaluator(BaseEval):
+        async def run_task(self, input):
+            evaluated_inputs.append(input)
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output="generated"),
+            )
+
+        async def run_eval(self, task_run):
+            # The better run config clearly scores higher, with some noise
+            noise = (int(task_run.input.split()[-1]) % 10) / 100
+            if self.run_config.prompt_id == "simple_chain_of_thought_prompt_builder":
+                return {"accuracy": 0.8 + noise}, None
+            return {"accuracy": 0.2 + noise}, None
+
+    settings = SequentialStopping(min_items=5, seed=7)
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=ScoringEvaluator,
+    ):
+        progress = [
+            p
+            async for p in runner.run(
+                concurrency=1,
+                adaptive_concurrency=False,
+                use_judge_cache=False,
+                sequential_stopping=settings,
+            )
+        ]
+    assert progress[0].total == 200
+    final = progress[-1]
+    assert final.stopped_early
+    # min_items per run config, plus the few jobs already queued when it settled
+    assert 10 <= final.complete < 30
+    assert final.total == final.complete
+    assert len(evaluated_inputs) == final.complete
+    # Items in a random order, not dataset order
+    assert evaluated_inputs[::2] != sorted(evaluated_inputs[::2])
+
+    tracker = runner.sequential_tracker
+    assert tracker is not None
+    assert tracker.ranking(mock_eval_config.id, "accuracy") == [
+        better_run_config.id,
+        mock_run_config.id,
+    ]
+    saved_runs = mock_eval_config.runs()
+    assert len(saved_runs) == final.complete
+
+    # A later run starts from the saved results: already settled, so nothing runs
+    evaluated_inputs.clear()
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=ScoringEvaluator,
+    ):
+        progress = [
+            p
+            async for p in runner.run(
+                concurrency=1, use_judge_cache=False, sequential_stopping=settings
+            )
+        ]
+    assert evaluated_inputs == []
+    assert progress[-1].stopped_early
+    assert progress[-1].complete == 0
+
+
+@pytest.mark.asyncio
+async def test_sequential_stopping_requires_task_run_eval(mock_eval_config):
+    runner = EvalRunner(
+        eval_configs=[mock_eval_config],
+        run_configs=None,
+        eval_run_type="eval_config_eval",
+    )
+    with pytest.raises(ValueError, match="task_run_eval"):
+        async for _ in runner.run(sequential_stopping=SequentialStopping()):
+            pass
+
+
+class UsageReportingAdapter:
+    """
+    Stands in for a model adapter: generates output, reporting token usage like a provider response.
+    """
+
+    def __init__(self, data_source: DataSource):
+        self.data_source = data_source
+
+    async def invoke(self, input):
+        await asyncio.sleep(0.01)
+        record_response_usage(
+            SimpleNamespace(
+                usage=SimpleNamespace(prompt_tokens=100, completion_tokens=40)
+            )
+        )
+        return TaskRun(
+            input=input,
+            input_source=self.data_source,
+            output=TaskOutput(output=f"generated for {input}"),
+        )
+
+
+@pytest.mark.asyncio
+async def test_run_records_telemetry(
+    multi_eval_config_runner, mock_task, mock_run_config, data_source
+):
+    for i in range(2):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+    adapter = UsageReportingAdapter(data_source)
+
+    class TelemetryEvaluator(BaseEval):
+        def run_adapter(self):
+            return adapter
+
+        async def run_eval(self, task_run):
+            record_response_usage(
+                SimpleNamespace(
+                    usage=SimpleNamespace(prompt_tokens=300, completion_tokens=5)
+                )
+            )
+            return {"accuracy": 1.0}, None
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: TelemetryEvaluator(*args),
+    ):
+        progress = [
+            p
+            async for p in multi_eval_config_runner.run(
+                concurrency=2, use_judge_cache=False
+            )
+        ]
+
+    # Not in the initial update, always in the final one
+    assert progress[0].telemetry is None
+    telemetry = progress[-1].telemetry
+    assert telemetry is not None
+    assert telemetry.elapsed_seconds > 0
+
+    run_config_telemetry = telemetry.run_configs[str(mock_run_config.id)]
+    assert run_config_telemetry.jobs == 6
+    assert run_config_telemetry.errors == 0
+    assert run_config_telemetry.wall_time.count == 6
+    assert run_config_telemetry.queue_wait.count == 6
+    # Output is generated once per dataset item, shared by the 3 eval configs
+    assert run_config_telemetry.task.latency.count == 2
+    assert run_config_telemetry.task.latency.min >= 0.01
+    assert run_config_telemetry.task.prompt_tokens.sum == 200
+    assert run_config_telemetry.task.completion_tokens.sum == 80
+    assert run_config_telemetry.judge.latency.count == 6
+    assert run_config_telemetry.judge.prompt_tokens.sum == 1800
+
+    assert telemetry.eval_configs.keys() == {
+        str(eval_config.id) for eval_config in multi_eval_config_runner.eval_configs
+    }
+    for eval_config_telemetry in telemetry.eval_configs.values():
+        assert eval_config_telemetry.jobs == 2
+        assert eval_config_telemetry.judge.completion_tokens.sum == 10
+
+    # Persisted beside each eval config
+    for eval_config in multi_eval_config_runner.eval_configs:
+        persisted = EvalConfigTelemetry.for_eval_config(eval_config)
+        assert persisted.totals.jobs == 2
+        assert persisted.run_configs[str(mock_run_config.id)].judge.latency.count == 2
+    assert multi_eval_config_runner.telemetry is not None
+
+
+@pytest.mark.asyncio
+async def test_run_telemetry_interval(mock_eval_runner, make_jobs):
+    jobs = make_jobs(10)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+
+    async def run_job(job):
+        await asyncio.sleep(0.02)
+        return True
+
+    mock_eval_runner.run_job = run_job
+
+    progress = [
+        p
+        async for p in mock_eval_runner.run(
+            concurrency=1,
+            adaptive_concurrency=False,
+            progress_interval=0,
+            telemetry_interval=0.05,
+        )
+    ]
+    assert [p.complete for p in progress] == list(range(11))
+    with_telemetry = [p for p in progress if p.telemetry is not None]
+    # Some updates include telemetry, fewer than one per job, ending with the final update
+    assert 1 < len(with_telemetry) < 10
+    assert with_telemetry[-1] is progress[-1]
+
+    # Telemetry only in the final update
+    progress = [
+        p
+        async for p in mock_eval_runner.run(
+            concurrency=1, progress_interval=0, telemetry_interval=60
+        )
+    ]
+    assert [p.telemetry is not None for p in progress] == [False] * 10 + [True]
+
+
+@pytest.mark.asyncio
+async def test_run_telemetry_counts_errors_and_cache_hits(
+    mock_eval_runner, mock_task, mock_eval_config, data_source, tmp_path
+):
+    for i in range(3):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+    adapter = UsageReportingAdapter(data_source)
+    judge_calls = 0
+
+    class FlakyEvaluator(BaseEval):
+        def run_adapter(self):
+            return adapter
+
+        def judge_cache_key(self, task_run):
+            # Inputs 1 and 2 are judged identically
+            return "input 0" if task_run.input == "input 0" else "same judge request"
+
+        async def run_eval(self, task_run):
+            nonlocal judge_calls
+            judge_calls += 1
+            if task_run.input == "input 0":
+                raise ValueError("judge failed")
+            return {"accuracy": 1.0}, None
+
+    cache = JudgeCache(tmp_path / "judge_cache.sqlite")
+    with (
+        patch.object(JudgeCache, "shared", return_value=cache),
+        patch(
+            "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+            return_value=lambda *args: FlakyEvaluator(*args),
+        ),
+    ):
+        progress = [
+            p
+            async for p in mock_eval_runner.run(
+                concurrency=1, adaptive_concurrency=False
+            )
+        ]
+
+    assert progress[-1].complete == 2
+    assert progress[-1].errors == 1
+    telemetry = progress[-1].telemetry
+    assert telemetry is not None
+    eval_config_telemetry = telemetry.eval_configs[str(mock_eval_config.id)]
+    assert eval_config_telemetry.jobs == 3
+    assert eval_config_telemetry.errors == 1
+    # The identical judge request is judged once, then served from the cache. The failed judge call has no latency.
+    assert judge_calls == 2
+    assert eval_config_telemetry.judge_cache_hits == 1
+    assert eval_config_telemetry.judge.latency.count == 1
+    assert eval_config_telemetry.task.latency.count == 3
+
+
+@pytest.mark.parametrize("max_concurrency_per_config", [None, 1])
+@pytest.mark.asyncio
+async def test_run_schedules_run_configs_fairly(
+    mock_eval_runner,
+    mock_task,
+    mock_eval_config,
+    mock_run_config,
+    max_concurrency_per_config,
+):
+    slow_run_config = TaskRunConfig(
+        name="slow",
+        run_config_properties=RunConfigProperties(
+            model_name="gpt-4",
+            model_provider_name="openai",
+            prompt_id="simple_prompt_builder",
+        ),
+        parent=mock_task,
+    )
+    slow_run_config.save_to_file()
+    # Item-major, as iter_tasks generates them
+    jobs = [
+        EvalJob(
+            item=MagicMock(id=str(i)),
+            type="task_run_eval",
+            eval_config=mock_eval_config,
+            task_run_config=run_config,
+        )
+        for i in range(50)
+        for run_config in [mock_run_config, slow_run_config]
+    ]
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    running: Counter = Counter()
+    max_running: Counter = Counter()
+    finished: Counter = Counter()
+
+    async def run_job(job):
+        run_config_id = job.task_run_config.id
+        running[run_config_id] += 1
+        max_running[run_config_id] = max(
+            max_running[run_config_id], running[run_config_id]
+        )
+        await asyncio.sleep(0.02 if run_config_id == slow_run_config.id else 0.001)
+        running[run_config_id] -= 1
+        finished[run_config_id] += 1
+        return True
+
+    mock_eval_runner.run_job = run_job
+    run = mock_eval_runner.run(
+        concurrency=4,
+        adaptive_concurrency=False,
+        progress_interval=0,
+        max_concurrency_per_config=max_concurrency_per_config,
+    )
+    async for progress in run:
+        if progress.complete is not None and progress.complete >= 20:
+            break
+    await run.aclose()
+
+    # The slow run config holds at most its share of the workers
+    cap = max_concurrency_per_config or 2
+    assert max_running[slow_run_config.id] <= cap
+    assert max_running[mock_run_config.id] <= cap
+    # Stopped part way, both run configs have a comparable number of results: the fast one can't run more than a few jobs ahead
+    assert finished[slow_run_config.id] > 0
+    assert abs(finished[mock_run_config.id] - finished[slow_run_config.id]) <= 4 + cap
+
+
+@pytest.fixture
+def second_eval_config(mock_task):
+    # A second eval of the same task, only including dataset items tagged "second"
+    eval = Eval(
+        name="second",
+        eval_set_filter_id="tag::second",
+        eval_configs_filter_id="tag::second",
+        output_scores=[
+            EvalOutputScore(
+                name="Accuracy",
+                instruction="Check if the output is accurate",
+                type=TaskOutputRatingType.pass_fail,
+            ),
+        ],
+        parent=mock_task,
+    )
+    eval.save_to_file()
+    eval_config = EvalConfig(
+        name="second judge",
+        model_name="gpt-4",
+        model_provider="openai",
+        parent=eval,
+        properties={"eval_steps": ["step1"]},
+    )
+    eval_config.save_to_file()
+    eval.current_config_id = eval_config.id
+    eval.save_to_file()
+    return eval_config
+
+
+@pytest.fixture
+def batch_runner(mock_eval_config, second_eval_config, mock_run_config):
+    return EvalBatchRunner(
+        eval_configs=[mock_eval_config, second_eval_config],
+        run_configs=[mock_run_config],
+        eval_run_type="task_run_eval",
+    )
+
+
+def save_tagged_items(mock_task, data_source) -> list[TaskRun]:
+    items = []
+    for i in range(3):
+        item = TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+            tags=["second"] if i == 0 else [],
+        )
+        item.save_to_file()
+        items.append(item)
+    return items
+
+
+def test_batch_runner_validation(
+    mock_eval_config, second_eval_config, mock_run_config, batch_runner
+):
+    # A plain runner is for a single eval
+    with pytest.raises(
+        ValueError, match="All eval configs must have the same parent eval"
+    ):
+        EvalRunner(
+            eval_configs=[mock_eval_config, second_eval_config],
+            run_configs=[mock_run_config],
+            eval_run_type="task_run_eval",
+        )
+
+    assert [eval.id for eval in batch_runner.evals] == [
+        mock_eval_config.parent_eval().id,
+        second_eval_config.parent_eval().id,
+    ]
+    assert (
+        batch_runner.evals_by_eval_config[second_eval_config.id].id
+        == second_eval_config.parent_eval().id
+    )
+
+    # Evals of another task can't be batched
+    other_task = Task(name="other", instruction="do the other thing")
+    other_eval_config = EvalConfig(
+        name="other",
+        model_name="gpt-4",
+        model_provider="openai",
+        properties={"eval_steps": ["step1"]},
+        parent=Eval(
+            name="other",
+            eval_set_filter_id="all",
+            eval_configs_filter_id="all",
+            output_scores=[
+                EvalOutputScore(name="Accuracy", type=TaskOutputRatingType.pass_fail)
+            ],
+            parent=other_task,
+        ),
+    )
+    with pytest.raises(ValueError, match="All evals must be for the same task"):
+        EvalBatchRunner(
+            eval_configs=[mock_eval_config, other_eval_config],
+            run_configs=None,
+            eval_run_type="eval_config_eval",
+        )
+
+
+def test_batch_runner_plans_each_eval_with_its_filter(
+    batch_runner, mock_task, data_source, mock_eval_config, second_eval_config
+):
+    items = save_tagged_items(mock_task, data_source)
+
+    jobs = batch_runner.collect_tasks()
+    # All 3 items for the first eval, only the tagged one for the second
+    assert sorted((job.eval_config.id, job.item.id) for job in jobs) == sorted(
+        [(mock_eval_config.id, item.id) for item in items]
+        + [(second_eval_config.id, items[0].id)]
+    )
+    assert batch_runner.plan_tasks().total == 4
+
+    # Items already run for an eval are skipped for that eval only
+    EvalRun(
+        parent=second_eval_config,
+        task_run_config_id=batch_runner.run_configs[0].id,
+        dataset_id=items[0].id,
+        input="input 0",
+        output="output 0",
+        scores={"accuracy": 1.0},
+    ).save_to_file()
+    plan = batch_runner.plan_tasks()
+    assert plan.total == 3
+    assert len(plan.item_paths) == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_runner_shares_generated_output(
+    batch_runner, mock_task, data_source, mock_eval_config, second_eval_config
+):
+    items = save_tagged_items(mock_task, data_source)
+    run_task_inputs = []
+
+    class FanOutEvaluator(BaseEval):
+        async def run_task(self, input):
+            run_task_inputs.append(input)
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output=f"generated for {input}"),
+            )
+
+        async def run_eval(self, task_run):
+            return {"accuracy": 1.0}, None
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: FanOutEvaluator(*args),
+    ):
+        progress = [p async for p in batch_runner.run(concurrency=4)]
+
+    assert progress[-1].total == 4
+    assert progress[-1].complete == 4
+    assert progress[-1].errors == 0
+    # One generation per dataset item, shared by both evals
+    assert sorted(run_task_inputs) == ["input 0", "input 1", "input 2"]
+    assert len(mock_eval_config.runs()) == 3
+    second_runs = second_eval_config.runs()
+    assert [run.dataset_id for run in second_runs] == [items[0].id]
+    assert second_runs[0].output == "generated for input 0"
+
+
+def test_batch_runner_for_evals(
+    mock_eval, mock_eval_config, second_eval_config, mock_run_config
+):
+    second_eval = second_eval_config.parent_eval()
+
+    # The first eval has no current eval config: skipped
+    runner = EvalBatchRunner.for_evals(
+        [mock_eval, second_eval], [mock_run_config], "task_run_eval"
+    )
+    assert [config.id for config in runner.eval_configs] == [second_eval_config.id]
+
+    # Evaluating eval configs runs all of them
+    runner = EvalBatchRunner.for_evals(
+        [mock_eval, second_eval], None, "eval_config_eval"
+    )
+    assert {config.id for config in runner.eval_configs} == {
+        mock_eval_config.id,
+        second_eval_config.id,
+    }
+
+    with pytest.raises(ValueError, match="No eval configs"):
+        EvalBatchRunner.for_evals([mock_eval], [mock_run_config], "task_run_eval")
+
+
+@pytest.mark.asyncio
+async def test_batch_runner_sequential_stopping_requires_single_eval(batch_runner):
+    with pytest.raises(ValueError, match="single eval"):
+        async for _ in batch_runner.run(sequential_stopping=SequentialStopping()):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_run_in_batch_mode(
+    mock_eval_runner, mock_task, mock_eval_config, data_source, tmp_path
+):
+    for i in range(3):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output=f"output {i}"),
+        ).save_to_file()
+
+    async def responder(body):
+        content = body["messages"][-1]["content"]
+        return {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 1,
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f"batched {content}"},
+                }
+            ],
+        }
+
+    class BatchedEvaluator(BaseEval):
+        # Calls the model through the batch session, as the adapters do in batch mode
+        async def run_task(self, input):
+            session = current_batch_session()
+            assert session is not None
+            response = await session.complete(
+                {
+                    "model": "openai/gpt-4",
+                    "messages": [{"role": "user", "content": input}],
+                }
+            )
+            return TaskRun(
+                input=input,
+                input_source=data_source,
+                output=TaskOutput(output=response.choices[0].message.content),
+            )
+
+        async def run_eval(self, task_run):
+            session = current_batch_session()
+            assert session is not None
+            await session.complete(
+                {
+                    "model": "openai/gpt-4",
+                    "messages": [{"role": "user", "content": task_run.output.output}],
+                }
+            )
+            return {"accuracy": 1.0}, None
+
+    transport = LocalBatchTransport(tmp_path / "batches", responder=responder)
+    limiters = mock_eval_runner.build_concurrency_limiters(
+        5, True, None, BatchSession(transport, max_batch_size=100)
+    )
+    # Batched providers run a full batch of jobs at once
+    assert limiters["openai"].concurrency == 100
+    assert not limiters["openai"].adaptive
+
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: BatchedEvaluator(*args),
+    ):
+        async with BatchSession(
+            transport, flush_interval=0.05, poll_interval=0
+        ) as session:
+            progress = [
+                p
+                async for p in mock_eval_runner.run(
+                    batch=session, use_judge_cache=False
+                )
+            ]
+
+    assert progress[-1].complete == 3
+    assert progress[-1].errors == 0
+    # One batch for all task outputs, then one for all judge calls
+    assert len(session.batch_ids) == 2
+    eval_runs = mock_eval_config.runs()
+    assert sorted(eval_run.output for eval_run in eval_runs) == [
+        f"batched input {i}" for i in range(3)
+    ]
+    # Outside the run, calls aren't batched
+    assert current_batch_session() is None
+
+
+class FlakyEvaluator(BaseEval):
+    # Generation fails for inputs starting with "bad", and the first attempt at inputs starting with "flaky"
+    attempts: Counter = Counter()
+
+    async def run_task(self, input):
+        FlakyEvaluator.attempts[input] += 1
+        if input.startswith("bad") or (
+            input.startswith("flaky") and FlakyEvaluator.attempts[input] == 1
+        ):
+            raise ValueError(f"generation failed for {input}")
+        return TaskRun(
+            input=input,
+            input_source=DataSource(
+                type=DataSourceType.synthetic,
+                properties={
+                    "model_name": "gpt-4",
+                    "model_provider": "openai",
+                    "adapter_name": "test_adapter",
+                },
+            ),
+            output=TaskOutput(output=f"generated for {input}"),
+        )
+
+    async def run_eval(self, task_run):
+        return {"accuracy": 1.0}, None
+
+
+async def run_with_flaky_evaluator(runner, **kwargs):
+    FlakyEvaluator.attempts = Counter()
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: FlakyEvaluator(*args),
+    ):
+        return [p async for p in runner.run(**kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_run_journals_jobs(
+    mock_eval_runner, mock_task, mock_eval_config, mock_run_config, data_source
+):
+    items = {}
+    for input in ["good", "bad"]:
+        item = TaskRun(
+            parent=mock_task,
+            input=input,
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        )
+        item.save_to_file()
+        items[input] = item
+
+    progress = await run_with_flaky_evaluator(mock_eval_runner)
+    assert progress[-1].complete == 1
+    assert progress[-1].errors == 1
+    assert mock_eval_runner.journal is None
+
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        [run] = journal.runs()
+        assert run.state == RunState.finished
+        assert run.spec == mock_eval_runner.run_spec()
+        assert journal.interrupted_runs() == []
+
+        jobs = {job.dataset_id: job for job in journal.jobs(mock_eval_config.id)}
+        done = jobs[items["good"].id]
+        assert done.state == JobState.done
+        assert done.run_config_id == mock_run_config.id
+        assert done.attempts == 1
+        failed = jobs[items["bad"].id]
+        assert failed.state == JobState.failed
+        assert failed.attempts == 1
+        assert failed.last_error is not None
+        assert "generation failed for bad" in failed.last_error
+        assert failed.run_id == run.id
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_retries_failed_jobs(
+    mock_eval_runner, mock_task, mock_eval_config, data_source
+):
+    for input in ["flaky", "bad"]:
+        TaskRun(
+            parent=mock_task,
+            input=input,
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        ).save_to_file()
+
+    progress = await run_with_flaky_evaluator(
+        mock_eval_runner, max_job_attempts=3, job_retry_backoff=0.0
+    )
+    assert progress[-1].complete == 1
+    assert progress[-1].errors == 1
+    assert FlakyEvaluator.attempts == {"flaky": 2, "bad": 3}
+
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        jobs = journal.jobs(mock_eval_config.id)
+        assert {(job.state, job.attempts) for job in jobs} == {
+            (JobState.done, 2),
+            (JobState.failed, 3),
+        }
+        # Not waiting to retry: out of attempts
+        assert all(job.retry_at is None for job in jobs)
+    finally:
+        journal.close()
+
+    with pytest.raises(ValueError, match="max_job_attempts"):
+        async for _ in mock_eval_runner.run(max_job_attempts=0):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_run_journal_records_stopped_run(mock_eval_runner, mock_task, make_jobs):
+    jobs = make_jobs(10)
+    mock_eval_runner.job_source = lambda: (len(jobs), iter(jobs))
+    mock_eval_runner.run_job = AsyncMock(return_value=True)
+
+    run = mock_eval_runner.run(progress_interval=0)
+    await run.__anext__()
+    await run.__anext__()
+    # The client goes away mid run
+    await run.aclose()
+
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        assert [run.state for run in journal.runs()] == [RunState.stopped]
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_journal_records_interrupted_run(
+    mock_eval_runner, mock_task, data_source
+):
+    for i in range(10):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        ).save_to_file()
+    mock_eval_runner.run_job = AsyncMock(return_value=True)
+
+    run = mock_eval_runner.run(progress_interval=0)
+    await run.__anext__()
+    await run.__anext__()
+    # The app shuts down mid run
+    set_shutting_down(True)
+    try:
+        await run.aclose()
+    finally:
+        set_shutting_down(False)
+
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        assert [run.state for run in journal.runs()] == [RunState.interrupted]
+        assert len(journal.interrupted_runs()) == 1
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_journals_done_once_saved(
+    mock_eval_runner, mock_task, mock_eval_config, data_source
+):
+    items = {}
+    for input in ["saved", "unsaved"]:
+        item = TaskRun(
+            parent=mock_task,
+            input=input,
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        )
+        item.save_to_file()
+        items[input] = item
+
+    save_to_file = EvalRun.save_to_file
+
+    def failing_save(self):
+        if self.input == "unsaved":
+            raise OSError("disk full")
+        save_to_file(self)
+
+    # Batch saves fail, then each eval run is saved on its own: one fails
+    with (
+        patch.object(KilnBaseModel, "save_all_to_file", side_effect=OSError("full")),
+        patch.object(EvalRun, "save_to_file", failing_save),
+    ):
+        progress = await run_with_flaky_evaluator(mock_eval_runner)
+    assert progress[-1].complete == 1
+    assert progress[-1].errors == 1
+
+    journal = EvalJobJournal.for_task(mock_task)
+    assert journal is not None
+    try:
+        jobs = {job.dataset_id: job for job in journal.jobs(mock_eval_config.id)}
+        assert jobs[items["saved"].id].state == JobState.done
+        # Not done: the next run (or a resume) runs it again
+        unsaved = jobs[items["unsaved"].id]
+        assert unsaved.state == JobState.failed
+        assert unsaved.last_error == "Failed to save eval run: disk full"
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_run_without_journal(mock_eval_runner, mock_task, make_jobs):
+    mock_eval_runner.job_source = lambda: (1, iter(make_jobs(1)))
+    mock_eval_runner.run_job = AsyncMock(return_value=True)
+
+    progress = [p async for p in mock_eval_runner.run(use_journal=False)]
+    assert progress[-1].complete == 1
+    journal_path = EvalJobJournal.journal_path(mock_task)
+    assert journal_path is not None
+    assert not journal_path.exists()
+
+
+def test_from_run_spec(mock_eval_runner, mock_task, batch_runner):
+    spec = mock_eval_runner.run_spec()
+    runner = EvalRunner.from_run_spec(mock_task, spec)
+    assert type(runner) is EvalRunner
+    assert runner.run_spec() == spec
+
+    # Eval configs of several evals
+    runner = EvalRunner.from_run_spec(mock_task, batch_runner.run_spec())
+    assert isinstance(runner, EvalBatchRunner)
+    assert runner.run_spec() == batch_runner.run_spec()
+
+    spec = EvalRunSpec(
+        eval_config_ids=[str(mock_eval_runner.eval_configs[0].id)],
+        run_config_ids=None,
+        eval_run_type="eval_config_eval",
+    )
+    assert EvalRunner.from_run_spec(mock_task, spec).run_configs is None
+
+    with pytest.raises(ValueError, match="Eval configs not found: missing"):
+        EvalRunner.from_run_spec(
+            mock_task, spec.model_copy(update={"eval_config_ids": ["missing"]})
+        )
+    with pytest.raises(ValueError, match="Run configs not found: missing"):
+        EvalRunner.from_run_spec(
+            mock_task,
+            mock_eval_runner.run_spec().model_copy(
+                update={"run_config_ids": ["missing"]}
+            ),
+        )
+
+
+def start_shared_run(runner) -> tuple[EvalJobJournal, str]:
+    journal = EvalJobJournal.for_task(runner.task)
+    assert journal is not None
+    return journal, journal.start_run(runner.run_spec())
+
+
+@pytest.mark.asyncio
+async def test_workers_share_a_run_with_leases(
+    mock_eval, mock_eval_config, mock_run_config, mock_task, data_source
+):
+    for i in range(6):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        ).save_to_file()
+    runners = [
+        EvalRunner([mock_eval_config], [mock_run_config], "task_run_eval")
+        for _ in range(2)
+    ]
+    journal, run_id = start_shared_run(runners[0])
+
+    FlakyEvaluator.attempts = Counter()
+    with patch(
+        "kiln_ai.adapters.eval.eval_runner.eval_adapter_from_type",
+        return_value=lambda *args: FlakyEvaluator(*args),
+    ):
+        progress = await asyncio.gather(
+            *[
+                collect_progress(
+                    runner.run(concurrency=2, lease=JobLease(run_id=run_id))
+                )
+                for runner in runners
+            ]
+        )
+
+    # Each job ran once, by one of the workers
+    assert FlakyEvaluator.attempts == {f"input {i}": 1 for i in range(6)}
+    assert sum(worker_progress[-1].complete for worker_progress in progress) == 6
+    assert len(mock_eval_config.runs()) == 6
+    try:
+        assert journal.run_job_counts(run_id) == {JobState.done: 6}
+        # The coordinator ends the run, not its workers
+        assert journal.run(run_id).state == RunState.running  # type: ignore
+    finally:
+        journal.close()
+
+
+async def collect_progress(run) -> list[EvalProgress]:
+    return [progress async for progress in run]
+
+
+@pytest.mark.asyncio
+async def test_worker_takes_over_jobs_of_stopped_worker(
+    mock_eval_runner, mock_eval_config, mock_run_config, mock_task, data_source
+):
+    items = []
+    for i in range(2):
+        item = TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+        )
+        item.save_to_file()
+        items.append(item)
+    journal, run_id = start_shared_run(mock_eval_runner)
+    # Another worker holds the first item's job, then dies: its lease expires shortly
+    held_key = job_key(mock_eval_config.id, mock_run_config.id, items[0].id)
+    journal.claim([held_key], run_id, "dead_worker", 0.2)
+
+    progress = await run_with_flaky_evaluator(
+        mock_eval_runner, lease=JobLease(run_id=run_id, poll_interval=0.05)
+    )
+    assert progress[-1].complete == 2
+    assert FlakyEvaluator.attempts == {"input 0": 1, "input 1": 1}
+    try:
+        jobs = {job.dataset_id: job for job in journal.jobs(mock_eval_config.id)}
+        assert jobs[items[0].id].state == JobState.done
+        # The dead worker's attempt, and ours
+        assert jobs[items[0].id].attempts == 2
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_lease_validation(mock_eval_runner):
+    lease = JobLease(run_id="missing")
+    with pytest.raises(ValueError, match="not found"):
+        async for _ in mock_eval_runner.run(lease=lease):
+            pass
+    with pytest.raises(ValueError, match="requires the job journal"):
+        async for _ in mock_eval_runner.run(lease=lease, use_journal=False):
+            pass
+    with pytest.raises(ValueError, match="Sequential stopping"):
+        async for _ in mock_eval_runner.run(
+            lease=lease, sequential_stopping=SequentialStopping()
+        ):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_sample_run_then_full_run(
+    mock_eval_config, mock_run_config, mock_task, data_source
+):
+    for i in range(12):
+        TaskRun(
+            parent=mock_task,
+            input=f"input {i}",
+            input_source=data_source,
+            output=TaskOutput(output="output"),
+            tags=["short"] if i < 8 else ["long"],
+        ).save_to_file()
+    sample = EvalSample(size=3, seed=7)
+    runner = EvalRunner(
+        [mock_eval_config], [mock_run_config], "task_run_eval", sample=sample
+    )
+
+    plan = runner.plan_tasks()
+    assert plan.total == 3
+    sampled_inputs = {TaskRun.load_from_file(path).input for path in plan.item_paths}
+    # Both tags are represented
+    tags = {int(input.split()[1]) < 8 for input in sampled_inputs}
+    assert tags == {True, False}
+    # Deterministic
+    assert runner.plan_tasks().item_paths == plan.item_paths
+
+    progress = await run_with_flaky_evaluator(runner)
+    assert progress[-1].complete == 3
+    # The sample is run: nothing left in it
+    assert runner.plan_tasks().total == 0
+
+    # Extending to the full set skips the sampled items
+    full_runner = EvalRunner([mock_eval_config], [mock_run_config], "task_run_eval")
+    assert full_runner.plan_tasks().total == 9
+    await run_with_flaky_evaluator(full_runner)
+    assert set(FlakyEvaluator.attempts) == {f"input {i}" for i in range(12)} - (
+        sampled_inputs
+    )
+    assert len(mock_eval_config.runs()) == 12
+
+    # Resumed runs keep their sample
+    assert runner.run_spec().sample == sample
+    resumed = EvalRunner.from_run_spec(mock_task, runner.run_spec())
+    assert resumed.sample == sample
+
+
+def test_batch_runner_samples_each_eval(
+    batch_runner, mock_task, data_source, second_eval_config
+):
+    save_tagged_items(mock_task, data_source)
+    batch_runner.sample = EvalSample(size=1)
+    plan = batch_runner.plan_tasks()
+    # One item for each eval, within its own filter
+    assert plan.total == 2
+    second_eval_id = second_eval_config.parent_eval().id
+    for path in plan.item_paths:
+        item = TaskRun.load_from_file(path)
+        if plan.filters[second_eval_id](item):
+            assert "second" in item.tags
@@ -1,12 +1,16 @@
 import math
 import pickle
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from litellm.types.utils import ChatCompletionTokenLogprob, ChoiceLogprobs, TopLogprob
 
 from kiln_ai.adapters.eval.g_eval import TOKEN_TO_SCORE_MAP, GEval, GEvalTask
+from kiln_ai.adapters.eval.judge_cache import JudgeCache
 from kiln_ai.adapters.eval.test_g_eval_data import serialized_run_output
-from kiln_ai.adapters.ml_model_list import built_in_models
+from kiln_ai.adapters.ml_model_list import StructuredOutputMode, built_in_models
 from kiln_ai.adapters.model_adapters.base_adapter import RunOutput
+from kiln_ai.adapters.model_adapters.litellm_adapter import LiteLlmAdapter
 from kiln_ai.adapters.test_prompt_adaptors import get_all_models_and_providers
 from kiln_ai.datamodel import (
     DataSource,
@@ -320,6 +324,75 @@ def test_metric_offsets_invalid(test_eval_config, test_run_config):
         g_eval.metric_offsets(raw_output, metrics)
 
 
+def test_metric_offsets_prefixed_names(test_eval_config, test_run_config):
+    g_eval = GEval(test_eval_config, test_run_config)
+    raw_output = '{"score_detail": 4, "score": 5}'
+
+    offsets = g_eval.metric_offsets(raw_output, ["score", "score_detail"])
+    assert offsets == {"score_detail": 1, "score": 20}
+    assert g_eval.metric_search_ranges(raw_output, offsets) == {
+        "score_detail": (13, 20),
+        "score": (25, len(raw_output)),
+    }
+    assert g_eval.metric_offsets(raw_output, []) == {}
+
+
+def logprobs_run_output(tokens: list[tuple[str, list[tuple[str, float]]]]):
+    return RunOutput(
+        output={},
+        output_logprobs=ChoiceLogprobs(
+            content=[
+                ChatCompletionTokenLogprob(
+                    token=token,
+                    logprob=0.0,
+                    top_logprobs=[
+                        TopLogprob(token=top_token, logprob=logprob)
+                        for top_token, logprob in top_logprobs
+                    ],
+                )
+                for token, top_logprobs in tokens
+            ]
+        ),
+        intermediate_outputs={},
+    )
+
+
+def test_token_start_offsets(test_eval_config, test_run_config):
+    g_eval = GEval(test_eval_config, test_run_config)
+    run_output = logprobs_run_output(
+        [('{"', []), ("score", []), ('": ', []), ("5", []), ("}", [])]
+    )
+    assert g_eval.token_start_offsets(run_output).tolist() == [0, 2, 7, 10, 11]
+    assert g_eval.token_start_offsets(logprobs_run_output([])).tolist() == []
+
+
+def test_build_g_eval_score_per_metric_ranges(test_eval_config, test_run_config):
+    g_eval = GEval(test_eval_config, test_run_config)
+    run_output = logprobs_run_output(
+        [
+            ('{"', []),
+            ("a", []),
+            ('": ', []),
+            ("4", [("4", math.log(0.5)), ("5", math.log(0.5))]),
+            (', "', []),
+            ("b", []),
+            ('": "', []),
+            ("pass", [("pass", math.log(0.75)), ("fail", math.log(0.25))]),
+            ('"}', []),
+        ]
+    )
+    run_output.output = {"a": 4, "b": "pass"}
+    assert g_eval.build_g_eval_score(run_output) == {
+        "a": pytest.approx(4.5),
+        "b": pytest.approx(0.75),
+    }
+
+    # No rating token in the range of "a": the rating of "b" isn't used for it
+    run_output.output_logprobs.content[3].token = "x"
+    with pytest.raises(ValueError, match="No score found for metric: a"):
+        g_eval.build_g_eval_score(run_output)
+
+
 @pytest.mark.parametrize(
     "token_string,expected_score",
     [
@@ -496,3 +569,131 @@ async def test_all_built_in_models_logprobs_geval(
         model_name,
         provider_name.value,
     )
+
+
+def test_adapters_built_once(test_eval_config, test_run_config):
+    g_eval = GEval(test_eval_config, test_run_config)
+    with patch(
+        "kiln_ai.adapters.eval.g_eval.adapter_for_task", return_value=MagicMock()
+    ) as mock_judge_adapter_for_task:
+        judge_adapter = g_eval.judge_adapter()
+        assert g_eval.judge_adapter() is judge_adapter
+    mock_judge_adapter_for_task.assert_called_once()
+    assert (
+        mock_judge_adapter_for_task.call_args.kwargs["base_adapter_config"].top_logprobs
+        == 10
+    )
+
+    with patch(
+        "kiln_ai.adapters.eval.base_eval.adapter_for_task", return_value=MagicMock()
+    ) as mock_run_adapter_for_task:
+        run_adapter = g_eval.run_adapter()
+        assert g_eval.run_adapter() is run_adapter
+    mock_run_adapter_for_task.assert_called_once()
+
+    # No run config, no run adapter
+    with pytest.raises(ValueError, match="Run config is required"):
+        GEval(test_eval_config, None).run_adapter()
+
+
+@pytest.fixture
+def mock_openai_key():
+    with (
+        patch("kiln_ai.adapters.adapter_registry.Config") as registry_config,
+        patch("kiln_ai.adapters.provider_tools.Config") as provider_config,
+    ):
+        registry_config.shared.return_value.open_ai_api_key = "test-openai-key"
+        provider_config.shared.return_value.open_ai_api_key = "test-openai-key"
+        yield
+
+
+def test_judge_cache_key(
+    mock_openai_key, test_eval_config, test_run_config, test_task_run
+):
+    g_eval = GEval(test_eval_config, test_run_config)
+    key = g_eval.judge_cache_key(test_task_run)
+    assert key is not None
+
+    # The judge only sees the output text: an identical output from another run is the same request
+    same_output_run = test_task_run.model_copy(deep=True)
+    same_output_run.id = None
+    same_output_run.output.id = None
+    same_output_run.output.source.properties["model_name"] = "gpt_4o"
+    assert "Why did the chicken" in g_eval.judge_input(same_output_run)
+    assert g_eval.judge_cache_key(same_output_run) == key
+
+    different_output_run = test_task_run.model_copy(deep=True)
+    different_output_run.output.output = "A different joke"
+    assert g_eval.judge_cache_key(different_output_run) != key
+
+    # A new evaluator for the same config makes the same requests
+    assert (
+        GEval(test_eval_config, test_run_config).judge_cache_key(test_task_run) == key
+    )
+
+    # Changing the judge's steps, scoring method or model changes the request
+    changed_steps = test_eval_config.model_copy(deep=True)
+    changed_steps.properties["eval_steps"] = ["Is the joke funny?"]
+    assert GEval(changed_steps, test_run_config).judge_cache_key(test_task_run) != key
+
+    llm_as_judge = test_eval_config.model_copy(deep=True)
+    llm_as_judge.config_type = EvalConfigType.llm_as_judge
+    assert GEval(llm_as_judge, test_run_config).judge_cache_key(test_task_run) != key
+
+    other_model = test_eval_config.model_copy(deep=True)
+    other_model.model_name = "gpt_4o"
+    assert GEval(other_model, test_run_config).judge_cache_key(test_task_run) != key
+
+    # Provider settings change the request too
+    other_mode = GEval(test_eval_config, test_run_config)
+    adapter = other_mode.judge_adapter()
+    adapter._model_provider = adapter.model_provider().model_copy(
+        update={"structured_output_mode": StructuredOutputMode.json_instructions}
+    )
+    assert other_mode.judge_cache_key(test_task_run) != key
+    other_options = GEval(test_eval_config, test_run_config)
+    adapter = other_options.judge_adapter()
+    assert isinstance(adapter, LiteLlmAdapter)
+    adapter._additional_body_options["temperature"] = "0.2"
+    assert other_options.judge_cache_key(test_task_run) != key
+
+    # Credentials don't
+    other_credentials = GEval(test_eval_config, test_run_config)
+    adapter = other_credentials.judge_adapter()
+    assert isinstance(adapter, LiteLlmAdapter)
+    adapter._additional_body_options["api_key"] = "rotated"
+    assert other_credentials.judge_cache_key(test_task_run) == key
+
+
+@pytest.mark.asyncio
+async def test_run_eval_cached(
+    mock_openai_key, tmp_path, test_eval_config, test_run_config, test_task_run
+):
+    g_eval = GEval(test_eval_config, test_run_config)
+    scores = {"appropriateness": 1.0, "topic_alignment": 4.5, "overall_rating": 4.0}
+    intermediate_outputs = {"chain_of_thought": "thinking"}
+    g_eval.run_eval = AsyncMock(return_value=(scores, intermediate_outputs))
+
+    # No cache: always calls the judge
+    assert await g_eval.run_eval_cached(test_task_run) == (scores, intermediate_outputs)
+    assert await g_eval.run_eval_cached(test_task_run) == (scores, intermediate_outputs)
+    assert g_eval.run_eval.call_count == 2
+
+    g_eval.run_eval.reset_mock()
+    cache = JudgeCache(tmp_path / "judge_cache.sqlite")
+    g_eval.judge_cache = cache
+    for _ in range(3):
+        assert await g_eval.run_eval_cached(test_task_run) == (
+            scores,
+            intermediate_outputs,
+        )
+    g_eval.run_eval.assert_called_once()
+
+    # Invalid scores are raised, and not cached
+    other_run = test_task_run.model_copy(deep=True)
+    other_run.output.output = "A different joke"
+    g_eval.run_eval = AsyncMock(return_value=({"overall_rating": 4.0}, None))
+    with pytest.raises(Exception):
+        await g_eval.run_eval_cached(other_run)
+    assert len(cache) == 1
+    cache.close()
@@ -0,0 +1,372 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from kiln_ai.adapters.eval.job_journal import (
+    JOURNAL_FILE_NAME,
+    EvalJobJournal,
+    EvalRunSpec,
+    JobState,
+    JournalWriter,
+    RunState,
+    job_key,
+)
+from kiln_ai.datamodel import Task
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = EvalJobJournal(tmp_path / JOURNAL_FILE_NAME)
+    yield journal
+    journal.close()
+
+
+@pytest.fixture
+def spec():
+    return EvalRunSpec(
+        eval_config_ids=["ec1"], run_config_ids=["rc1"], eval_run_type="task_run_eval"
+    )
+
+
+def test_journal_for_task(tmp_path):
+    assert EvalJobJournal.for_task(Task(name="test", instruction="test")) is None
+    task = Task(name="test", instruction="test", path=tmp_path / "task.kiln")
+    journal = EvalJobJournal.for_task(task)
+    assert journal is not None
+    assert journal.path == tmp_path / JOURNAL_FILE_NAME
+
+
+def test_job_key():
+    assert job_key("ec1", "rc1", "item1") == ("ec1", "rc1", "item1")
+    assert job_key("ec1", None, "item1") == ("ec1", "", "item1")
+
+
+def test_runs(journal, spec):
+    finished = journal.start_run(spec)
+    interrupted = journal.start_run(spec)
+    journal.end_run(finished, RunState.finished)
+
+    runs = journal.runs()
+    assert [run.id for run in runs] == [finished, interrupted]
+    assert runs[0].state == RunState.finished
+    assert runs[0].spec == spec
+    assert [run.id for run in journal.interrupted_runs()] == [interrupted]
+
+    journal.end_run(interrupted, RunState.resumed)
+    assert journal.interrupted_runs() == []
+
+    # Cancelled by a shutdown
+    shut_down = journal.start_run(spec)
+    journal.end_run(shut_down, RunState.interrupted)
+    assert [run.id for run in journal.interrupted_runs()] == [shut_down]
+
+
+def test_leased_runs_not_interrupted(journal, spec):
+    # A shared run, with its coordinator still renewing the run's lease
+    leased = journal.start_run(spec, lease_seconds=60)
+    assert journal.run(leased).lease_expires > time.time()
+    # A shared run whose coordinator died, while a worker still holds a job
+    orphaned = journal.start_run(spec, lease_seconds=-1)
+    journal.claim([job_key("ec1", "rc1", "1")], orphaned, "worker1", 60)
+    # A shared run whose coordinator and workers all died
+    expired = journal.start_run(spec, lease_seconds=-1)
+    journal.claim([job_key("ec1", "rc1", "2")], expired, "worker2", -1)
+    assert [run.id for run in journal.interrupted_runs()] == [expired]
+
+    journal.renew_run_lease(expired, 60)
+    assert journal.interrupted_runs() == []
+    # Only running runs are renewed
+    journal.end_run(leased, RunState.finished)
+    journal.renew_run_lease(leased, 60)
+    assert journal.run(leased).state == RunState.finished
+
+
+def test_job_states(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(3)]
+
+    journal.mark_pending(keys, run_id)
+    assert {job.state for job in journal.jobs("ec1")} == {JobState.pending}
+
+    journal.mark_in_flight(keys, run_id)
+    journal.mark_done(keys[:1])
+    journal.mark_failed(keys[1:2], "boom", retry_at=123.0)
+
+    jobs = {job.dataset_id: job for job in journal.jobs("ec1")}
+    assert jobs["0"].state == JobState.done
+    assert jobs["0"].attempts == 1
+    assert jobs["1"].state == JobState.failed
+    assert jobs["1"].last_error == "boom"
+    assert jobs["1"].retry_at == 123.0
+    assert jobs["1"].run_config_id == "rc1"
+    assert jobs["2"].state == JobState.in_flight
+    assert jobs["2"].run_id == run_id
+
+    # Retried: the attempt count carries over, and success clears the error
+    journal.mark_in_flight(keys[1:2], run_id)
+    journal.mark_done(keys[1:2])
+    retried = journal.jobs("ec1", JobState.done)
+    assert {job.dataset_id: job.attempts for job in retried} == {"0": 1, "1": 2}
+    assert all(job.last_error is None for job in retried)
+    assert journal.jobs("other_eval_config") == []
+
+
+def test_end_run_releases_in_flight_jobs(journal, spec):
+    run_id = journal.start_run(spec)
+    other_run_id = journal.start_run(spec)
+    journal.mark_in_flight([job_key("ec1", "rc1", "1")], run_id)
+    journal.mark_in_flight([job_key("ec1", "rc1", "2")], other_run_id)
+
+    journal.end_run(run_id, RunState.stopped)
+
+    states = {job.dataset_id: job.state for job in journal.jobs("ec1")}
+    assert states == {"1": JobState.pending, "2": JobState.in_flight}
+
+
+def test_eval_config_eval_jobs(journal, spec):
+    run_id = journal.start_run(spec)
+    journal.mark_in_flight([job_key("ec1", None, "1")], run_id)
+    journal.mark_failed([job_key("ec1", None, "1")], "boom")
+    [job] = journal.jobs("ec1", JobState.failed)
+    assert job.run_config_id is None
+    assert job.retry_at is None
+
+
+def test_shared_across_connections(tmp_path, spec):
+    path = tmp_path / JOURNAL_FILE_NAME
+    writer = EvalJobJournal(path)
+    reader = EvalJobJournal(path)
+    try:
+        run_id = writer.start_run(spec)
+        writer.mark_pending([job_key("ec1", "rc1", "1")], run_id)
+        assert [run.id for run in reader.interrupted_runs()] == [run_id]
+        assert len(reader.jobs("ec1")) == 1
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_errors_logged_not_raised(tmp_path, spec, caplog):
+    # A directory where the database should be: sqlite can't open it
+    path = tmp_path / JOURNAL_FILE_NAME
+    path.mkdir()
+    journal = EvalJobJournal(path)
+    journal.start_run(spec)
+    journal.mark_done([job_key("ec1", "rc1", "1")])
+    assert journal.runs() == []
+    assert journal.jobs("ec1") == []
+    assert "Eval job journal" in caplog.text
+
+
+def test_invalid_runs_skipped(journal, spec):
+    journal.start_run(spec)
+    connection = sqlite3.connect(journal.path)
+    connection.execute(
+        "INSERT INTO eval_runs (id, spec, state, started_at, updated_at) VALUES ('bad', '{}', 'running', 0, 0)"
+    )
+    connection.commit()
+    connection.close()
+    assert len(journal.runs()) == 1
+
+
+def test_claim(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(3)]
+    journal.mark_pending(keys, run_id)
+
+    claimed, held = journal.claim(keys[:2], run_id, "worker1", 60)
+    assert claimed == keys[:2]
+    assert held == []
+    # Held by worker1: worker2 gets only the unclaimed job
+    claimed, held = journal.claim(keys, run_id, "worker2", 60)
+    assert claimed == keys[2:]
+    assert held == keys[:2]
+
+    jobs = {job.dataset_id: job for job in journal.jobs("ec1")}
+    assert jobs["0"].state == JobState.in_flight
+    assert jobs["0"].attempts == 1
+    assert jobs["0"].run_id == run_id
+
+    # Settled jobs aren't claimed again in the run
+    journal.mark_done(keys[:1])
+    journal.mark_failed(keys[1:2], "boom")
+    assert journal.claim(keys[:2], run_id, "worker2", 60) == ([], [])
+
+    # A later run claims them again (eg their results were deleted)
+    next_run_id = journal.start_run(spec)
+    claimed, _ = journal.claim(keys[:2], next_run_id, "worker2", 60)
+    assert claimed == keys[:2]
+
+
+def test_claim_keeps_lease_while_retrying(journal, spec):
+    run_id = journal.start_run(spec)
+    key = job_key("ec1", "rc1", "1")
+    journal.claim([key], run_id, "worker1", 60)
+    journal.mark_failed([key], "boom", retry_at=time.time() + 10)
+    assert journal.claim([key], run_id, "worker2", 60) == ([], [key])
+
+
+def test_expired_lease_claimed(journal, spec):
+    run_id = journal.start_run(spec)
+    key = job_key("ec1", "rc1", "1")
+    # worker1 died holding the job
+    journal.claim([key], run_id, "worker1", -1)
+    claimed, _ = journal.claim([key], run_id, "worker2", 60)
+    assert claimed == [key]
+    assert journal.jobs("ec1")[0].attempts == 2
+
+
+def test_renew_and_release_leases(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(2)]
+    journal.claim(keys, run_id, "worker1", -1)
+    journal.renew_leases("worker1", 60)
+    assert journal.claim(keys, run_id, "worker2", 60) == ([], keys)
+
+    journal.mark_done(keys[:1])
+    journal.release_leases("worker1")
+    states = {job.dataset_id: job.state for job in journal.jobs("ec1")}
+    assert states == {"0": JobState.done, "1": JobState.pending}
+    assert journal.claim(keys, run_id, "worker2", 60) == (keys[1:], [])
+
+
+def test_mark_pending_keeps_jobs_of_the_run(journal, spec):
+    run_id = journal.start_run(spec)
+    key = job_key("ec1", "rc1", "1")
+    journal.mark_pending([key], run_id)
+    journal.claim([key], run_id, "worker1", 60)
+    # Another worker of the run queues the same job
+    journal.mark_pending([key], run_id)
+    assert journal.jobs("ec1")[0].state == JobState.in_flight
+
+
+def test_run_job_counts(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(4)]
+    journal.mark_pending(keys, run_id)
+    journal.claim(keys[:3], run_id, "worker1", 60)
+    journal.mark_done(keys[:1])
+    journal.mark_failed(keys[1:2], "boom")
+    journal.mark_failed(keys[2:3], "boom", retry_at=time.time() + 10)
+    assert journal.run_job_counts(run_id) == {
+        JobState.done: 1,
+        JobState.failed: 1,
+        JobState.in_flight: 1,
+        JobState.pending: 1,
+    }
+    assert journal.run(run_id) is not None
+    assert journal.run("missing") is None
+    assert journal.run_job_counts("missing") == {}
+
+
+def test_migrates_journal_without_leases(tmp_path, spec):
+    path = tmp_path / JOURNAL_FILE_NAME
+    connection = sqlite3.connect(path)
+    connection.execute(
+        """
+        CREATE TABLE eval_jobs (
+            eval_config_id TEXT NOT NULL,
+            run_config_id TEXT NOT NULL,
+            dataset_id TEXT NOT NULL,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            retry_at REAL,
+            run_id TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (eval_config_id, run_config_id, dataset_id)
+        )
+        """
+    )
+    connection.execute(
+        """
+        CREATE TABLE eval_runs (
+            id TEXT PRIMARY KEY,
+            spec TEXT NOT NULL,
+            state TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        "INSERT INTO eval_jobs (eval_config_id, run_config_id, dataset_id, state, updated_at) VALUES ('ec1', 'rc1', '1', 'failed', 0)"
+    )
+    connection.commit()
+    connection.close()
+
+    journal = EvalJobJournal(path)
+    try:
+        run_id = journal.start_run(spec)
+        claimed, _ = journal.claim([job_key("ec1", "rc1", "1")], run_id, "worker", 60)
+        assert len(claimed) == 1
+        journal.renew_run_lease(run_id, 60)
+        run = journal.run(run_id)
+        assert run is not None and run.lease_expires is not None
+    finally:
+        journal.close()
+
+
+@pytest.mark.asyncio
+async def test_journal_writer(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(4)]
+    writer = JournalWriter(journal)
+    writer.mark_pending(keys, run_id)
+    writer.mark_in_flight(keys[:2], run_id)
+    writer.mark_in_flight(keys[2:3], run_id)
+    writer.mark_done(keys[:1])
+    writer.mark_failed(keys[1:2], "boom")
+    # Claims are applied after the writes before them
+    claimed, held = await writer.claim(keys[3:], run_id, "worker1", 60)
+    assert claimed == keys[3:]
+    assert held == []
+    writer.close()
+
+    jobs = {job.dataset_id: job for job in journal.jobs("ec1")}
+    assert {id: job.state for id, job in jobs.items()} == {
+        "0": JobState.done,
+        "1": JobState.failed,
+        "2": JobState.in_flight,
+        "3": JobState.in_flight,
+    }
+    assert jobs["1"].last_error == "boom"
+
+    # Written immediately once closed
+    writer.mark_done(keys[2:3])
+    assert journal.jobs("ec1", JobState.done)[-1].dataset_id == "2"
+    writer.close()
+
+
+def test_journal_writer_batches(journal, spec):
+    run_id = journal.start_run(spec)
+    keys = [job_key("ec1", "rc1", str(i)) for i in range(10)]
+    calls = []
+    mark_in_flight = journal.mark_in_flight
+
+    def record_mark_in_flight(keys, run_id):
+        calls.append(len(keys))
+        mark_in_flight(keys, run_id)
+
+    mark_pending = journal.mark_pending
+    release = threading.Event()
+
+    def held_mark_pending(keys, run_id):
+        # Hold the writer thread, so the writes back up behind it
+        release.wait(timeout=5)
+        mark_pending(keys, run_id)
+
+    journal.mark_in_flight = record_mark_in_flight
+    journal.mark_pending = held_mark_pending
+    writer = JournalWriter(journal)
+    writer.mark_pending(keys, run_id)
+    for key in keys:
+        writer.mark_in_flight([key], run_id)
+    release.set()
+    writer.close()
+
+    assert sum(calls) == 10
+    assert len(calls) < 10
+    assert len(journal.jobs("ec1", JobState.in_flight)) == 10
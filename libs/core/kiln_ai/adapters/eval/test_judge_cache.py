@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+
+import pytest
+
+from kiln_ai.adapters.eval.judge_cache import JudgeCache, judge_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = JudgeCache(tmp_path / "cache" / "judge_cache.sqlite")
+    yield cache
+    cache.close()
+
+
+def test_judge_cache_key():
+    key = judge_cache_key({"model_name": "gpt_4o", "user_message": "hi"})
+    assert len(key) == 64
+    # Order independent, content dependent
+    assert key == judge_cache_key({"user_message": "hi", "model_name": "gpt_4o"})
+    assert key != judge_cache_key({"model_name": "gpt_4o", "user_message": "hi!"})
+
+
+def test_get_and_put(cache):
+    assert cache.get("a") is None
+    cache.put("a", {"overall_rating": 4.5}, {"chain_of_thought": "thinking"})
+    cache.put("b", {"overall_rating": 1.0}, None)
+    assert cache.get("a") == ({"overall_rating": 4.5}, {"chain_of_thought": "thinking"})
+    assert cache.get("b") == ({"overall_rating": 1.0}, None)
+    assert len(cache) == 2
+
+    # Replacing a result doesn't double count its size
+    size = cache.size_bytes
+    cache.put("b", {"overall_rating": 1.0}, None)
+    assert cache.size_bytes == size
+
+    cache.clear()
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_persists_across_instances(tmp_path):
+    path = tmp_path / "judge_cache.sqlite"
+    first = JudgeCache(path)
+    first.put("a", {"score": 1.0}, None)
+    first.close()
+
+    second = JudgeCache(path)
+    assert second.get("a") == ({"score": 1.0}, None)
+    second.close()
+
+
+def test_lru_eviction(tmp_path):
+    cache = JudgeCache(tmp_path / "judge_cache.sqlite")
+
+    def put(i: int):
+        # Equal sized entries
+        cache.put(f"key_{i:02}", {"score": 1.0}, {"thinking": "x" * 50})
+
+    put(0)
+    # Room for 10 entries. Evicts down to 90%: 9 entries.
+    cache.max_bytes = cache.size_bytes * 10
+    for i in range(1, 10):
+        put(i)
+    assert len(cache) == 10
+    # Use the oldest, so it's no longer least recently used
+    assert cache.get("key_00") is not None
+
+    put(10)
+    assert len(cache) == 9
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.get("key_00") is not None
+    assert cache.get("key_01") is None
+    assert cache.get("key_02") is None
+    assert cache.get("key_10") is not None
+    cache.close()
+
+    with pytest.raises(ValueError, match="max_bytes"):
+        JudgeCache(tmp_path / "other.sqlite", max_bytes=0)
+
+
+def test_corrupt_cache_ignored(tmp_path):
+    path = tmp_path / "judge_cache.sqlite"
+    path.write_bytes(b"not a sqlite database" * 100)
+    cache = JudgeCache(path)
+    # Reads miss, writes are dropped, nothing raises
+    assert cache.get("a") is None
+    cache.put("a", {"score": 1.0}, None)
+    assert cache.get("a") is None
+
+
+def test_bad_row_ignored(cache):
+    cache.put("a", {"score": 1.0}, None)
+    cache.close()
+    connection = sqlite3.connect(cache.path)
+    connection.execute("UPDATE judge_results SET result = 'not json'")
+    connection.commit()
+    connection.close()
+    assert cache.get("a") is None
+
+
+def test_thread_safe(cache):
+    def worker(n: int):
+        for i in range(50):
+            cache.put(f"{n}_{i}", {"score": float(i)}, None)
+            assert cache.get(f"{n}_{i}") == ({"score": float(i)}, None)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 200
+
+
+def test_shared_default_path(tmp_path):
+    # conftest points settings at tmp_path, so the shared cache lives there too
+    assert JudgeCache.default_path() == tmp_path / "cache" / "judge_cache.sqlite"
@@ -0,0 +1,86 @@
+from collections import Counter
+
+import pytest
+
+from kiln_ai.adapters.eval.sampling import EvalSample
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    TaskOutput,
+    TaskOutputRating,
+    TaskRun,
+)
+
+
+def items(strata: dict[str, int]) -> list[tuple[str, tuple]]:
+    # strata name -> item count
+    return [
+        (f"{name}_{i}", (name,)) for name, count in strata.items() for i in range(count)
+    ]
+
+
+def test_validation():
+    with pytest.raises(ValueError, match="size"):
+        EvalSample(size=0)
+
+
+def test_sample_is_deterministic():
+    dataset = items({"a": 50, "b": 30, "c": 20})
+    sample = EvalSample(size=10, seed=1)
+    sampled = sample.sample(dataset)
+    assert len(sampled) == 10
+    assert sample.sample(list(reversed(dataset))) == sampled
+    assert EvalSample(size=10, seed=2).sample(dataset) != sampled
+
+
+def test_sample_is_proportional():
+    sampled = EvalSample(size=10).sample(items({"a": 50, "b": 30, "c": 20}))
+    counts = Counter(item_id.split("_")[0] for item_id in sampled)
+    assert counts == {"a": 5, "b": 3, "c": 2}
+
+
+def test_small_strata_represented():
+    sampled = EvalSample(size=10).sample(items({"a": 97, "b": 2, "c": 1}))
+    counts = Counter(item_id.split("_")[0] for item_id in sampled)
+    assert counts["b"] >= 1
+    assert counts["c"] == 1
+    assert sum(counts.values()) == 10
+
+
+def test_more_strata_than_sample():
+    sampled = EvalSample(size=2).sample(items({"a": 5, "b": 3, "c": 1, "d": 1}))
+    # The largest strata get the items
+    assert {item_id.split("_")[0] for item_id in sampled} == {"a", "b"}
+
+
+def test_small_dataset_fully_sampled():
+    dataset = items({"a": 3, "b": 2})
+    assert EvalSample(size=10).sample(dataset) == {item_id for item_id, _ in dataset}
+
+
+def test_stratum_of():
+    data_source = DataSource(
+        type=DataSourceType.human, properties={"created_by": "test"}
+    )
+    task_run = TaskRun(
+        input="x" * 100,
+        input_source=data_source,
+        tags=["b", "a"],
+        output=TaskOutput(
+            output="output",
+            source=data_source,
+            rating=TaskOutputRating(type="five_star", value=4),
+        ),
+    )
+    assert EvalSample(size=1).stratum_of(task_run) == (
+        ("a", "b"),
+        ("five_star", 4.0),
+        6,
+    )
+    assert EvalSample(size=1, strata=("input_length",)).stratum_of(task_run) == (6,)
+
+    task_run.output.rating = None
+    task_run.input = ""
+    assert EvalSample(size=1, strata=("rating", "input_length")).stratum_of(
+        task_run
+    ) == (None, 0)
@@ -0,0 +1,209 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Iterator, List
+
+import pytest
+
+from kiln_ai.adapters.eval.scheduler import FairJobScheduler
+
+
+def item_major(items: int, keys: List[str]) -> Iterator[tuple[int, str]]:
+    for item in range(items):
+        for key in keys:
+            yield (item, key)
+
+
+async def run_workers(
+    scheduler: FairJobScheduler,
+    worker_count: int,
+    durations: Dict[str, float],
+    on_start=None,
+) -> List[tuple[int, str]]:
+    finished = []
+
+    async def worker():
+        while True:
+            job = await scheduler.next()
+            if job is None:
+                return
+            try:
+                if on_start is not None:
+                    on_start(job)
+                await asyncio.sleep(durations[job.key])
+                finished.append(job.job)
+            finally:
+                scheduler.done(job)
+
+    await asyncio.gather(*[worker() for _ in range(worker_count)])
+    return finished
+
+
+def test_validation():
+    with pytest.raises(ValueError, match="worker_count"):
+        FairJobScheduler(iter([]), key=str, worker_count=0, max_lead=1)
+    with pytest.raises(ValueError, match="max_lead"):
+        FairJobScheduler(iter([]), key=str, worker_count=1, max_lead=0)
+    with pytest.raises(ValueError, match="max_concurrency_per_key"):
+        FairJobScheduler(
+            iter([]), key=str, worker_count=1, max_lead=1, max_concurrency_per_key=0
+        )
+    with pytest.raises(ValueError, match="item_id"):
+        FairJobScheduler(
+            iter([]), key=str, worker_count=1, max_lead=1, should_stop=lambda: False
+        )
+
+
+@pytest.mark.asyncio
+async def test_runs_every_job():
+    scheduler = FairJobScheduler(
+        item_major(20, ["a", "b", "c"]),
+        key=lambda job: job[1],
+        worker_count=4,
+        max_lead=2,
+    )
+    finished = await run_workers(scheduler, 4, {"a": 0, "b": 0, "c": 0})
+    assert sorted(finished) == sorted(item_major(20, ["a", "b", "c"]))
+    assert scheduler.exhausted
+    assert scheduler.buffered_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_key_stays_balanced_and_capped():
+    scheduler = FairJobScheduler(
+        item_major(30, ["fast", "slow"]),
+        key=lambda job: job[1],
+        worker_count=6,
+        max_lead=3,
+        buffer_size=12,
+    )
+    max_running: Counter = Counter()
+    max_imbalance = 0
+    max_buffered = 0
+
+    def on_start(job):
+        nonlocal max_imbalance, max_buffered
+        # At the tail a key out of jobs gives its share of the workers to the others
+        if not scheduler.exhausted:
+            for key, running in scheduler.running.items():
+                max_running[key] = max(max_running[key], running)
+        started = scheduler.started
+        max_imbalance = max(
+            max_imbalance, abs(started.get("fast", 0) - started.get("slow", 0))
+        )
+        max_buffered = max(max_buffered, scheduler.buffered_count())
+
+    finished = await run_workers(
+        scheduler, 6, {"fast": 0.001, "slow": 0.01}, on_start=on_start
+    )
+    assert len(finished) == 60
+    # Neither key holds more than its share of the workers
+    assert max_running["slow"] <= 3
+    assert max_running["fast"] <= 3
+    # The fast key can't run ahead: started counts stay within max_lead
+    assert max_imbalance <= 3
+    assert max_buffered <= 12
+
+
+@pytest.mark.asyncio
+async def test_unused_share_goes_to_keys_with_work_left():
+    # Key "a" has 2 jobs, "b" has many: once "a" is done, "b" gets every worker
+    jobs = [(0, "a"), (0, "b"), (1, "a")] + [(i, "b") for i in range(1, 20)]
+    scheduler = FairJobScheduler(
+        iter(jobs), key=lambda job: job[1], worker_count=4, max_lead=100
+    )
+    max_running_b = 0
+
+    def on_start(job):
+        nonlocal max_running_b
+        max_running_b = max(max_running_b, scheduler.running.get("b", 0))
+
+    await run_workers(scheduler, 4, {"a": 0.001, "b": 0.005}, on_start=on_start)
+    assert max_running_b == 4
+
+
+@pytest.mark.asyncio
+async def test_fixed_concurrency_cap():
+    scheduler = FairJobScheduler(
+        item_major(10, ["a"]),
+        key=lambda job: job[1],
+        worker_count=5,
+        max_lead=100,
+        max_concurrency_per_key=2,
+    )
+    max_running = 0
+
+    def on_start(job):
+        nonlocal max_running
+        max_running = max(max_running, scheduler.running["a"])
+
+    finished = await run_workers(scheduler, 5, {"a": 0.002}, on_start=on_start)
+    assert len(finished) == 10
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_round_robin_order():
+    scheduler = FairJobScheduler(
+        item_major(3, ["a", "b", "c"]),
+        key=lambda job: job[1],
+        worker_count=1,
+        max_lead=100,
+    )
+    finished = await run_workers(scheduler, 1, {"a": 0, "b": 0, "c": 0})
+    assert [key for _, key in finished] == ["a", "b", "c"] * 3
+
+
+@pytest.mark.asyncio
+async def test_pulls_lazily():
+    pulled = 0
+
+    def jobs():
+        nonlocal pulled
+        for job in item_major(100, ["a", "b"]):
+            pulled += 1
+            yield job
+
+    scheduler = FairJobScheduler(
+        jobs(), key=lambda job: job[1], worker_count=2, max_lead=2, buffer_size=4
+    )
+    first = await scheduler.next()
+    assert first is not None
+    assert first.queued_at > 0
+    assert pulled < 10
+
+
+@pytest.mark.asyncio
+async def test_should_stop_between_items():
+    stop = False
+    scheduler = FairJobScheduler(
+        item_major(10, ["a", "b"]),
+        key=lambda job: job[1],
+        worker_count=1,
+        max_lead=100,
+        should_stop=lambda: stop,
+        item_id=lambda job: job[0],
+    )
+    finished = []
+    while True:
+        job = await scheduler.next()
+        if job is None:
+            break
+        finished.append(job.job)
+        scheduler.done(job)
+        if len(finished) == 3:
+            stop = True
+    # The item in progress when it stopped is finished, no later items start
+    assert finished == [(0, "a"), (0, "b"), (1, "a"), (1, "b")]
+
+
+@pytest.mark.asyncio
+async def test_source_error_raised():
+    def jobs():
+        yield (0, "a")
+        raise ValueError("failed to load dataset item")
+
+    scheduler = FairJobScheduler(
+        jobs(), key=lambda job: job[1], worker_count=2, max_lead=1
+    )
+    with pytest.raises(ValueError, match="failed to load dataset item"):
+        await run_workers(scheduler, 2, {"a": 0})
@@ -0,0 +1,154 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from kiln_ai.adapters.eval.sequential import (
+    RunningStats,
+    SequentialStopping,
+    SequentialTracker,
+    cs_rho,
+)
+
+
+def test_settings_validation():
+    with pytest.raises(ValueError, match="confidence"):
+        SequentialStopping(confidence=1.0)
+    with pytest.raises(ValueError, match="target_ci_width"):
+        SequentialStopping(target_ci_width=0)
+    with pytest.raises(ValueError, match="min_items"):
+        SequentialStopping(min_items=1)
+
+
+def test_shuffled_reproducible_with_seed():
+    items = list(range(100))
+    shuffled = SequentialStopping(seed=42).shuffled(items)
+    assert shuffled != items
+    assert sorted(shuffled) == items
+    assert SequentialStopping(seed=42).shuffled(items) == shuffled
+    assert items == list(range(100))
+
+
+def test_running_stats():
+    rng = random.Random(1)
+    values = [rng.uniform(1, 5) for _ in range(50)]
+    stats = RunningStats()
+    rho = cs_rho(0.05, 100)
+    assert math.isinf(stats.cs_half_width(0.05, rho))
+    for value in values:
+        stats.add(value)
+    assert stats.count == 50
+    assert stats.mean == pytest.approx(statistics.mean(values))
+    assert stats.variance == pytest.approx(statistics.variance(values))
+    # Valid at every count, so wider than a fixed-sample CI at the same level
+    fixed_sample_half_width = 1.96 * statistics.stdev(values) / math.sqrt(50)
+    half_width = stats.cs_half_width(0.05, rho)
+    assert fixed_sample_half_width < half_width < 2 * fixed_sample_half_width
+    # Narrower for a larger error budget
+    assert stats.cs_half_width(0.1, rho) < half_width
+
+
+def tracker(**settings) -> SequentialTracker:
+    return SequentialTracker(
+        SequentialStopping(**settings),
+        eval_config_ids=["ec1"],
+        run_config_ids=["a", "b"],
+        score_keys=["overall_rating"],
+    )
+
+
+def test_ranking_settled_when_intervals_separate():
+    t = tracker(min_items=5)
+    rng = random.Random(0)
+    # a is clearly better than b, but not until both have min_items results
+    for i in range(5):
+        t.record("ec1", "a", {"overall_rating": 4.5 + rng.uniform(-0.2, 0.2)})
+        assert not t.settled()
+        t.record("ec1", "b", {"overall_rating": 2.0 + rng.uniform(-0.2, 0.2)})
+    assert t.settled()
+    assert t.ranking("ec1", "overall_rating") == ["a", "b"]
+    interval = t.interval("ec1", "overall_rating", "a")
+    assert interval.count == 5
+    assert interval.low < interval.mean < interval.high
+
+
+def test_close_configs_not_settled():
+    t = tracker(min_items=5)
+    rng = random.Random(0)
+    for _ in range(50):
+        t.record("ec1", "a", {"overall_rating": rng.choice([1.0, 5.0])})
+        t.record("ec1", "b", {"overall_rating": rng.choice([1.0, 5.0])})
+    assert not t.settled()
+
+
+def test_target_ci_width():
+    t = tracker(min_items=5, target_ci_width=1.0)
+    rng = random.Random(0)
+    for _ in range(5):
+        t.record("ec1", "a", {"overall_rating": 3.0 + rng.uniform(-0.1, 0.1)})
+        t.record("ec1", "b", {"overall_rating": 3.0 + rng.uniform(-0.1, 0.1)})
+    # Overlapping, but precise enough
+    assert t.settled()
+
+
+def test_single_run_config_needs_target_width():
+    t = SequentialTracker(
+        SequentialStopping(min_items=2),
+        eval_config_ids=["ec1"],
+        run_config_ids=["a"],
+        score_keys=["overall_rating"],
+    )
+    for _ in range(10):
+        t.record("ec1", "a", {"overall_rating": 3.0})
+    assert not t.settled()
+
+
+def test_every_score_must_settle():
+    t = SequentialTracker(
+        SequentialStopping(min_items=3),
+        eval_config_ids=["ec1"],
+        run_config_ids=["a", "b"],
+        score_keys=["accuracy", "overall_rating"],
+    )
+    for i in range(10):
+        t.record("ec1", "a", {"accuracy": 0.9 + i * 0.001, "overall_rating": 3.0})
+        t.record("ec1", "b", {"accuracy": 0.1 + i * 0.001, "overall_rating": 3.0})
+    assert t.score_settled("ec1", "accuracy")
+    assert not t.score_settled("ec1", "overall_rating")
+    assert not t.settled()
+
+    # Only comparing on a subset of scores
+    t = SequentialTracker(
+        SequentialStopping(min_items=3, score_keys=("accuracy",)),
+        eval_config_ids=["ec1"],
+        run_config_ids=["a", "b"],
+        score_keys=["accuracy", "overall_rating"],
+    )
+    for i in range(10):
+        t.record("ec1", "a", {"accuracy": 0.9 + i * 0.001, "overall_rating": 3.0})
+        t.record("ec1", "b", {"accuracy": 0.1 + i * 0.001, "overall_rating": 3.0})
+        # Unknown configs are ignored
+        t.record("other", "a", {"accuracy": 0.0})
+        t.record("ec1", "c", {"accuracy": 0.0})
+    assert t.settled()
+
+
+def test_optional_stopping_error_rate():
+    # Identical run configs: any settled ranking is an error. Checking after every result (as the runner does) must not push the error rate past 1 - confidence.
+    rng = random.Random(0)
+    runs = 200
+    false_settles = 0
+    for _ in range(runs):
+        t = tracker(min_items=10)
+        for _ in range(300):
+            t.record(
+                "ec1", "a", {"overall_rating": rng.choice([1.0, 2.0, 3.0, 4.0, 5.0])}
+            )
+            t.record(
+                "ec1", "b", {"overall_rating": rng.choice([1.0, 2.0, 3.0, 4.0, 5.0])}
+            )
+            if t.settled():
+                false_settles += 1
+                break
+    assert false_settles / runs <= 0.05
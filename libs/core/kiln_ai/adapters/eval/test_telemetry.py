@@ -0,0 +1,264 @@
+import asyncio
+import multiprocessing
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from kiln_ai.adapters.eval.telemetry import (
+    DURATION_BUCKETS_SECONDS,
+    ConfigTelemetry,
+    EvalConfigTelemetry,
+    EvalRunTelemetry,
+    Histogram,
+    JobModelCalls,
+    measure_model_call,
+    record_judge_cache_hit,
+    recording_model_calls,
+)
+from kiln_ai.adapters.token_usage import TokenUsage, record_response_usage
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalConfigType, EvalOutputScore
+from kiln_ai.datamodel.task_output import TaskOutputRatingType
+
+
+@pytest.fixture
+def eval_config(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Test instruction", parent=project)
+    task.save_to_file()
+    eval = Eval(
+        name="Test Eval",
+        parent=task,
+        eval_set_filter_id="tag::eval_set",
+        eval_configs_filter_id="tag::golden",
+        output_scores=[
+            EvalOutputScore(name="accuracy", type=TaskOutputRatingType.five_star),
+        ],
+    )
+    eval.save_to_file()
+    eval_config = EvalConfig(
+        name="Test Eval Config",
+        parent=eval,
+        config_type=EvalConfigType.g_eval,
+        properties={"eval_steps": ["step1"]},
+        model_name="gpt_4o",
+        model_provider="openai",
+    )
+    eval_config.save_to_file()
+    return eval_config
+
+
+def response(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    )
+
+
+def test_histogram_record_and_merge():
+    histogram = Histogram.with_bounds([1.0, 10.0])
+    for value in [0.5, 1.0, 5.0, 50.0]:
+        histogram.record(value)
+    # Bounds are inclusive, the last bucket is overflow
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == 56.5
+    assert (histogram.min, histogram.max) == (0.5, 50.0)
+    assert histogram.mean() == pytest.approx(14.125)
+
+    other = Histogram.with_bounds([1.0, 10.0])
+    other.record(0.1)
+    histogram.merge(other)
+    assert histogram.counts == [3, 1, 1]
+    assert histogram.min == 0.1
+
+    with pytest.raises(ValueError, match="different bounds"):
+        histogram.merge(Histogram.with_bounds([1.0]))
+
+
+def test_histogram_quantile():
+    histogram = Histogram.with_bounds(DURATION_BUCKETS_SECONDS)
+    assert histogram.quantile(0.5) is None
+    assert histogram.mean() is None
+
+    for _ in range(90):
+        histogram.record(0.3)
+    for _ in range(10):
+        histogram.record(400.0)
+    # Interpolated within the bucket, whose edges are clamped to the values seen: (0.3, 0.5] and (300, 400]
+    assert histogram.quantile(0.0) == 0.3
+    assert histogram.quantile(0.45) == pytest.approx(0.4)
+    assert histogram.quantile(0.9) == pytest.approx(0.5)
+    assert histogram.quantile(0.95) == pytest.approx(350.0)
+    assert histogram.quantile(1.0) == 400.0
+
+    # A single value is estimated exactly
+    histogram = Histogram.with_bounds(DURATION_BUCKETS_SECONDS)
+    histogram.record(0.7)
+    assert histogram.quantile(0.5) == 0.7
+
+
+@pytest.mark.asyncio
+async def test_measure_model_call():
+    calls = JobModelCalls()
+    with recording_model_calls(calls):
+        with measure_model_call("task"):
+            await asyncio.sleep(0.01)
+            record_response_usage(response(100, 20))
+        with measure_model_call("judge"):
+            record_response_usage(response(300, 5))
+            record_response_usage(response(10, 1))
+        record_judge_cache_hit()
+
+        # Failed calls count tokens, but not latency
+        with pytest.raises(RuntimeError):
+            with measure_model_call("judge"):
+                record_response_usage(response(1, 1))
+                raise RuntimeError("invalid judge output")
+
+    assert calls.task_latency is not None and calls.task_latency >= 0.01
+    assert calls.task_usage == TokenUsage(
+        prompt_tokens=100, completion_tokens=20, calls=1, reported_calls=1
+    )
+    assert calls.judge_latency is not None
+    assert calls.judge_usage == TokenUsage(
+        prompt_tokens=311, completion_tokens=7, calls=3, reported_calls=3
+    )
+    assert calls.judge_cache_hits == 1
+
+
+def test_measure_model_call_without_recording():
+    # Outside a recorded job, measuring is a no-op
+    with measure_model_call("task"):
+        record_response_usage(response(1, 1))
+    record_judge_cache_hit()
+
+
+def test_run_telemetry_snapshot():
+    telemetry = EvalRunTelemetry()
+    telemetry.record_job("ec1", "rc1", True, wall_time=2.0, queue_wait=0.1)
+    telemetry.record_job("ec1", "rc2", False, wall_time=4.0, queue_wait=0.2)
+    telemetry.record_job("ec2", "rc1", True, wall_time=1.0, queue_wait=0.3)
+    telemetry.record_model_calls(
+        "ec1",
+        "rc1",
+        JobModelCalls(
+            task_latency=1.5,
+            task_usage=TokenUsage(
+                prompt_tokens=50, completion_tokens=10, calls=1, reported_calls=1
+            ),
+            judge_latency=0.5,
+            judge_usage=TokenUsage(calls=1),
+        ),
+    )
+    telemetry.record_model_calls("ec2", "rc1", JobModelCalls(judge_cache_hits=1))
+
+    snapshot = telemetry.snapshot()
+    assert snapshot.elapsed_seconds >= 0
+    assert snapshot.eval_configs.keys() == {"ec1", "ec2"}
+    assert snapshot.run_configs.keys() == {"rc1", "rc2"}
+
+    ec1 = snapshot.eval_configs["ec1"]
+    assert (ec1.jobs, ec1.errors) == (2, 1)
+    assert ec1.wall_time.sum == 6.0
+    assert ec1.task.latency.count == 1
+    assert ec1.task.prompt_tokens.sum == 50
+    assert ec1.judge.latency.sum == 0.5
+    # The provider didn't report the judge's usage
+    assert ec1.judge.prompt_tokens.count == 0
+
+    rc1 = snapshot.run_configs["rc1"]
+    assert rc1.jobs == 2
+    assert rc1.queue_wait.sum == pytest.approx(0.4)
+    assert rc1.judge_cache_hits == 1
+    # Cache hits don't call the judge
+    assert rc1.judge.latency.count == 1
+
+    # Snapshots are copies
+    telemetry.record_job("ec1", "rc1", True, wall_time=1.0, queue_wait=0.1)
+    assert snapshot.eval_configs["ec1"].jobs == 2
+    assert telemetry.snapshot().eval_configs["ec1"].jobs == 3
+
+
+def test_eval_config_eval_has_no_run_configs():
+    telemetry = EvalRunTelemetry()
+    telemetry.record_job("ec1", None, True, wall_time=1.0, queue_wait=0.0)
+    snapshot = telemetry.snapshot()
+    assert snapshot.eval_configs["ec1"].jobs == 1
+    assert snapshot.run_configs == {}
+
+
+def test_persist_accumulates_across_runs(eval_config):
+    assert EvalConfigTelemetry.for_eval_config(eval_config).totals.jobs == 0
+
+    for _ in range(2):
+        telemetry = EvalRunTelemetry()
+        telemetry.record_job(eval_config.id, "rc1", True, 1.0, 0.0)
+        telemetry.record_job(eval_config.id, None, False, 3.0, 0.0)
+        # Other eval configs aren't saved with this one
+        telemetry.record_job("other", "rc1", True, 1.0, 0.0)
+        telemetry.save([eval_config])
+
+    path = EvalConfigTelemetry.telemetry_path(eval_config)
+    assert path is not None and path.exists()
+    persisted = EvalConfigTelemetry.for_eval_config(eval_config)
+    assert (persisted.totals.jobs, persisted.totals.errors) == (4, 2)
+    assert persisted.totals.wall_time.sum == 8.0
+    assert persisted.run_configs.keys() == {"rc1"}
+    assert persisted.run_configs["rc1"].jobs == 2
+
+
+def test_persist_recovers_from_invalid_file(eval_config):
+    path = EvalConfigTelemetry.telemetry_path(eval_config)
+    assert path is not None
+    path.write_text("not json")
+    assert EvalConfigTelemetry.for_eval_config(eval_config).totals.jobs == 0
+
+    # Written with different bucket bounds: replaced rather than merged
+    stale = EvalConfigTelemetry(
+        totals=ConfigTelemetry(wall_time=Histogram.with_bounds([1.0]), jobs=5)
+    )
+    stale._save(path)
+    EvalConfigTelemetry.add_run(eval_config, {"rc1": ConfigTelemetry(jobs=1)})
+    assert EvalConfigTelemetry.for_eval_config(eval_config).totals.jobs == 1
+
+
+def add_runs(eval_config_path: Path, runs: int) -> None:
+    # Runs in a separate process, like a distributed eval worker
+    eval_config = EvalConfig.load_from_file(eval_config_path)
+    for _ in range(runs):
+        EvalConfigTelemetry.add_run(eval_config, {"rc1": ConfigTelemetry(jobs=1)})
+
+
+def test_concurrent_processes_never_lose_totals(eval_config):
+    assert eval_config.path is not None
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=add_runs, args=(eval_config.path, 20)) for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    add_runs(eval_config.path, 20)
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    persisted = EvalConfigTelemetry.for_eval_config(eval_config)
+    assert persisted.totals.jobs == 80
+    assert persisted.run_configs["rc1"].jobs == 80
+
+
+def test_unsaved_eval_config():
+    eval_config = EvalConfig(
+        name="Test Eval Config",
+        config_type=EvalConfigType.g_eval,
+        properties={"eval_steps": ["step1"]},
+        model_name="gpt_4o",
+        model_provider="openai",
+    )
+    assert EvalConfigTelemetry.telemetry_path(eval_config) is None
+    EvalConfigTelemetry.add_run(eval_config, {None: ConfigTelemetry(jobs=1)})
+    assert EvalConfigTelemetry.for_eval_config(eval_config).totals.jobs == 0
@@ -1,7 +1,7 @@
 import json
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Literal, Tuple
+from typing import Any, Dict, Literal, Tuple
 
 from kiln_ai.adapters.ml_model_list import KilnModelProvider, StructuredOutputMode
 from kiln_ai.adapters.parsers.json_parser import parse_json_string
@@ -160,6 +160,15 @@ class BaseAdapter(metaclass=ABCMeta):
     def has_structured_output(self) -> bool:
         return self.output_schema is not None
 
+    def request_settings(self) -> Dict[str, Any]:
+        """
+        The settings which shape this adapter's model requests, besides the prompt and input: the model provider's settings (model ID, structured output mode, reasoning and routing options) and request options like logprobs. For keying caches of model results, so excludes credentials.
+        """
+        return {
+            "model_provider": self.model_provider().model_dump(mode="json"),
+            "top_logprobs": self.base_adapter_config.top_logprobs,
+        }
+
     @abstractmethod
     def adapter_name(self) -> str:
         pass
@@ -4,6 +4,7 @@ import litellm
 from litellm.types.utils import ChoiceLogprobs, Choices, ModelResponse
 
 import kiln_ai.datamodel as datamodel
+from kiln_ai.adapters.batch.batch_session import current_batch_session
 from kiln_ai.adapters.ml_model_list import (
     KilnModelProvider,
     ModelProviderName,
@@ -18,10 +19,19 @@ from kiln_ai.adapters.model_adapters.base_adapter import (
 from kiln_ai.adapters.model_adapters.litellm_config import (
     LiteLlmConfig,
 )
+from kiln_ai.adapters.rate_limiter import (
+    estimate_request_tokens,
+    response_total_tokens,
+    shared_rate_limiter,
+)
+from kiln_ai.adapters.token_usage import record_response_usage
 from kiln_ai.datamodel import PromptGenerators, PromptId
 from kiln_ai.datamodel.task import RunConfig
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
 
+# Additional body options holding credentials, rather than settings for the request
+CREDENTIAL_BODY_OPTIONS = {"api_key", "aws_access_key_id", "aws_secret_access_key"}
+
 
 class LiteLlmAdapter(BaseAdapter):
     def __init__(
@@ -77,7 +87,7 @@ class LiteLlmAdapter(BaseAdapter):
             completion_kwargs = await self.build_completion_kwargs(
                 provider, messages, None
             )
-            cot_response = await litellm.acompletion(**completion_kwargs)
+            cot_response = await self.acompletion(completion_kwargs)
             if (
                 not isinstance(cot_response, ModelResponse)
                 or not cot_response.choices
@@ -102,7 +112,7 @@ class LiteLlmAdapter(BaseAdapter):
         completion_kwargs = await self.build_completion_kwargs(
             provider, messages, self.base_adapter_config.top_logprobs
         )
-        response = await litellm.acompletion(**completion_kwargs)
+        response = await self.acompletion(completion_kwargs)
 
         if not isinstance(response, ModelResponse):
             raise RuntimeError(f"Expected ModelResponse, got {type(response)}.")
@@ -168,9 +178,50 @@ class LiteLlmAdapter(BaseAdapter):
             output_logprobs=logprobs,
         )
 
+    async def acompletion(self, completion_kwargs: dict[str, Any]) -> Any:
+        """
+        Call the model, waiting on the shared rate limiter for this provider/model first (if a budget is configured). The response's token usage is recorded for any track_token_usage() block we're in.
+
+        In batch mode (a using_batch_session() block whose transport supports this provider), the call is sent in the session's next batch instead. Batch APIs have their own limits, so the rate limiter doesn't apply.
+        """
+        batch_session = current_batch_session()
+        if batch_session is not None and batch_session.accepts(
+            self.run_config.model_provider_name
+        ):
+            response = await batch_session.complete(completion_kwargs)
+            record_response_usage(response)
+            return response
+
+        limiter = shared_rate_limiter(
+            self.run_config.model_provider_name, self.run_config.model_name
+        )
+        if limiter is None:
+            response = await litellm.acompletion(**completion_kwargs)
+            record_response_usage(response)
+            return response
+
+        estimated_tokens = estimate_request_tokens(completion_kwargs)
+        await limiter.acquire(estimated_tokens)
+        response = await litellm.acompletion(**completion_kwargs)
+        limiter.record_usage(estimated_tokens, response_total_tokens(response))
+        record_response_usage(response)
+        return response
+
     def adapter_name(self) -> str:
         return "kiln_openai_compatible_adapter"
 
+    def request_settings(self) -> dict[str, Any]:
+        # The endpoint and extra body options are sent with every request. Credentials in the body don't change results.
+        return {
+            **super().request_settings(),
+            "base_url": self._api_base,
+            "additional_body_options": {
+                key: value
+                for key, value in self._additional_body_options.items()
+                if key not in CREDENTIAL_BODY_OPTIONS
+            },
+        }
+
     async def response_format_options(self) -> dict[str, Any]:
         # Unstructured if task isn't structured
         if not self.has_structured_output():
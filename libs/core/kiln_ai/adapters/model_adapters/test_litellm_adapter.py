@@ -1,5 +1,5 @@
 import json
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
 
@@ -9,6 +9,8 @@ from kiln_ai.adapters.model_adapters.litellm_adapter import LiteLlmAdapter
 from kiln_ai.adapters.model_adapters.litellm_config import (
     LiteLlmConfig,
 )
+from kiln_ai.adapters.rate_limiter import RateLimiter, RateLimits
+from kiln_ai.adapters.token_usage import TokenUsage, track_token_usage
 from kiln_ai.datamodel import Project, Task
 
 
@@ -405,3 +407,70 @@ async def test_build_completion_kwargs(
     # Verify extra body is included
     for key, value in extra_body.items():
         assert kwargs[key] == value
+
+
+@pytest.mark.asyncio
+async def test_acompletion_without_rate_limit(config, mock_task):
+    adapter = LiteLlmAdapter(config=config, kiln_task=mock_task)
+    with (
+        patch(
+            "kiln_ai.adapters.model_adapters.litellm_adapter.shared_rate_limiter",
+            return_value=None,
+        ) as mock_shared_rate_limiter,
+        patch("litellm.acompletion", new_callable=AsyncMock) as mock_acompletion,
+    ):
+        mock_acompletion.return_value = "response"
+        assert await adapter.acompletion({"messages": []}) == "response"
+
+    mock_shared_rate_limiter.assert_called_once_with("openrouter", "test-model")
+    mock_acompletion.assert_awaited_once_with(messages=[])
+
+
+@pytest.mark.asyncio
+async def test_acompletion_acquires_rate_limit(config, mock_task):
+    adapter = LiteLlmAdapter(config=config, kiln_task=mock_task)
+    limiter = RateLimiter(RateLimits(tokens_per_minute=1000))
+    response = MagicMock()
+    response.usage.total_tokens = 50
+    messages = [{"role": "user", "content": "a" * 40}]
+
+    with (
+        patch(
+            "kiln_ai.adapters.model_adapters.litellm_adapter.shared_rate_limiter",
+            return_value=limiter,
+        ),
+        patch.object(limiter, "acquire", wraps=limiter.acquire) as mock_acquire,
+        patch.object(
+            limiter, "record_usage", wraps=limiter.record_usage
+        ) as mock_record_usage,
+        patch("litellm.acompletion", new_callable=AsyncMock) as mock_acompletion,
+    ):
+        mock_acompletion.return_value = response
+        assert await adapter.acompletion({"messages": messages}) is response
+
+    mock_acquire.assert_awaited_once_with(11)
+    mock_record_usage.assert_called_once_with(11, 50)
+
+
+@pytest.mark.asyncio
+async def test_acompletion_records_token_usage(config, mock_task):
+    adapter = LiteLlmAdapter(config=config, kiln_task=mock_task)
+    response = MagicMock()
+    response.usage.prompt_tokens = 30
+    response.usage.completion_tokens = 12
+
+    with (
+        patch(
+            "kiln_ai.adapters.model_adapters.litellm_adapter.shared_rate_limiter",
+            return_value=None,
+        ),
+        patch("litellm.acompletion", new_callable=AsyncMock) as mock_acompletion,
+    ):
+        mock_acompletion.return_value = response
+        with track_token_usage() as usage:
+            await adapter.acompletion({"messages": []})
+            await adapter.acompletion({"messages": []})
+
+    assert usage == TokenUsage(
+        prompt_tokens=60, completion_tokens=24, calls=2, reported_calls=2
+    )
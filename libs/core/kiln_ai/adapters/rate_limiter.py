@@ -0,0 +1,265 @@
+"""
+Process-wide rate limiting for model provider calls.
+
+Evals, synthetic data generation, repairs and single runs all call providers through model adapters. Without coordination, running several of these at once exceeds the requests-per-minute (RPM) and tokens-per-minute (TPM) limits of the provider account. Every adapter call acquires from a shared limiter first.
+
+Budgets are configured in the `rate_limits` setting, keyed by provider or by provider and model:
+
+    rate_limits:
+      openai:
+        requests_per_minute: 500
+      openai/gpt_4o:
+        requests_per_minute: 100
+        tokens_per_minute: 30000
+
+The most specific key wins: a `provider/model` entry gives that model its own budget, while a `provider` entry is one budget shared by all other models of that provider. Calls without a configured budget aren't limited.
+
+Each budget is a pair of token buckets (capacity is one minute of budget, refilling continuously). Waiters are served strictly first-in first-out, so a large request isn't starved by a stream of small ones, and no caller can barge ahead of another.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+from kiln_ai.utils.config import Config
+
+# Rough characters per token, for estimating request size before we have the provider's usage numbers
+CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """
+    Budgets for one provider or model. None means unlimited.
+    """
+
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+
+    def __post_init__(self):
+        for name in ("requests_per_minute", "tokens_per_minute"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be greater than 0")
+
+    @property
+    def unlimited(self) -> bool:
+        return self.requests_per_minute is None and self.tokens_per_minute is None
+
+    @classmethod
+    def from_settings(cls, settings: Mapping[str, Any]) -> "RateLimits":
+        return cls(
+            requests_per_minute=settings.get("requests_per_minute"),
+            tokens_per_minute=settings.get("tokens_per_minute"),
+        )
+
+
+class TokenBucket:
+    """
+    A bucket holding up to one minute of budget, refilling continuously. Not thread safe: guarded by the owning RateLimiter's lock.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float]):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until_available(self, amount: float) -> float:
+        # A request larger than the whole bucket proceeds once the bucket is full, rather than never
+        amount = min(amount, self.capacity)
+        self._refill()
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        # Level may go negative (debt) when usage exceeds the estimate, delaying later requests
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """
+    Limits requests and tokens per minute for one budget. Safe to share across threads and event loops.
+
+    Usage:
+        await limiter.acquire(estimated_tokens)
+        response = ... make request ...
+        limiter.record_usage(estimated_tokens, actual_tokens)
+    """
+
+    def __init__(self, limits: RateLimits, clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._requests = (
+            TokenBucket(limits.requests_per_minute, clock)
+            if limits.requests_per_minute is not None
+            else None
+        )
+        self._tokens = (
+            TokenBucket(limits.tokens_per_minute, clock)
+            if limits.tokens_per_minute is not None
+            else None
+        )
+        # FIFO queue of waiters. Only the head waiter checks the buckets, then hands off to the next.
+        self._waiters: deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    @property
+    def queue_length(self) -> int:
+        return len(self._waiters)
+
+    def _seconds_until_available(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.seconds_until_available(1))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.seconds_until_available(tokens))
+        return wait
+
+    def _consume(self, tokens: int) -> None:
+        if self._requests is not None:
+            self._requests.consume(1)
+        if self._tokens is not None:
+            self._tokens.consume(tokens)
+
+    def _wake_head(self) -> None:
+        # Must hold the lock. Wakes the next waiter, skipping any whose event loop has closed.
+        while self._waiters:
+            loop, future = self._waiters[0]
+            try:
+                loop.call_soon_threadsafe(_set_future_result, future)
+                return
+            except RuntimeError:
+                self._waiters.popleft()
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until the budget allows one request using about `tokens` tokens, then consume it.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            self._waiters.append(waiter)
+            is_head = self._waiters[0] is waiter
+        try:
+            if not is_head:
+                await waiter[1]
+            while True:
+                with self._lock:
+                    wait = self._seconds_until_available(tokens)
+                    if wait <= 0:
+                        self._consume(tokens)
+                        return
+                await asyncio.sleep(wait)
+        finally:
+            # Leave the queue (on success or cancellation), and pass the turn on if it was ours
+            with self._lock:
+                was_head = bool(self._waiters) and self._waiters[0] is waiter
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                if was_head:
+                    self._wake_head()
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int | None) -> None:
+        """
+        Correct the token bucket once the provider reports how many tokens a request actually used.
+        """
+        if self._tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens.consume(actual_tokens - estimated_tokens)
+
+
+def _set_future_result(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiterRegistry:
+    """
+    The process-wide set of limiters, one per configured budget. Budgets are read from the `rate_limits` setting on each lookup, so changes apply to new requests without a restart.
+    """
+
+    _shared_instance: "RateLimiterRegistry | None" = None
+
+    def __init__(self, config: Config | None = None):
+        self._config = config
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    @classmethod
+    def shared(cls) -> "RateLimiterRegistry":
+        if cls._shared_instance is None:
+            cls._shared_instance = cls()
+        return cls._shared_instance
+
+    def _settings(self) -> Mapping[str, Any]:
+        config = self._config or Config.shared()
+        return config.rate_limits or {}
+
+    def limiter_for(
+        self, provider: str | None, model: str | None
+    ) -> RateLimiter | None:
+        """
+        The limiter for a provider and model, or None if no budget is configured.
+        """
+        if not provider:
+            return None
+        settings = self._settings()
+        if not settings:
+            return None
+
+        key = f"{provider}/{model}" if model else None
+        if key is None or key not in settings:
+            key = provider
+        limit_settings = settings.get(key)
+        if not limit_settings:
+            return None
+
+        limits = RateLimits.from_settings(limit_settings)
+        if limits.unlimited:
+            return None
+
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None or limiter.limits != limits:
+                # New budget, or the setting changed. Requests already waiting on the old limiter finish there.
+                limiter = RateLimiter(limits)
+                self._limiters[key] = limiter
+            return limiter
+
+
+def shared_rate_limiter(provider: str | None, model: str | None) -> RateLimiter | None:
+    return RateLimiterRegistry.shared().limiter_for(provider, model)
+
+
+def estimate_request_tokens(completion_kwargs: Mapping[str, Any]) -> int:
+    """
+    Estimate the tokens a completion request will use: its messages, plus max_tokens when set. Only needs to be roughly right, usage is reconciled after the response.
+    """
+    chars = 0
+    for message in completion_kwargs.get("messages") or []:
+        content = message.get("content") if isinstance(message, Mapping) else None
+        if isinstance(content, str):
+            chars += len(content)
+    tokens = chars // CHARS_PER_TOKEN + 1
+    max_tokens = completion_kwargs.get("max_tokens")
+    if isinstance(max_tokens, int):
+        tokens += max_tokens
+    return tokens
+
+
+def response_total_tokens(response: Any) -> int | None:
+    usage = getattr(response, "usage", None)
+    total_tokens = getattr(usage, "total_tokens", None)
+    return total_tokens if isinstance(total_tokens, int) else None
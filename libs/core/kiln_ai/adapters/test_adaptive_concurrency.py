@@ -0,0 +1,160 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import litellm
+import pytest
+
+from kiln_ai.adapters.adaptive_concurrency import (
+    AIMDConcurrencyLimiter,
+    ConcurrencyBounds,
+    RateLimitedError,
+    RequestOutcome,
+    concurrency_bounds_for_provider,
+    rate_limit_error_from_exception,
+    retry_after_seconds,
+)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds({"retry-after": "12"}) == 12.0
+    assert retry_after_seconds({"retry-after": "-5"}) == 0.0
+    assert retry_after_seconds({"retry-after-ms": "1500"}) == 1.5
+    assert retry_after_seconds({"retry-after": "not a date"}) is None
+
+    http_date = formatdate(time.time() + 30, usegmt=True)
+    assert retry_after_seconds({"retry-after": http_date}) == pytest.approx(30, abs=2)
+
+
+def test_rate_limit_error_from_litellm_error():
+    error = litellm.RateLimitError(
+        message="slow down",
+        llm_provider="openai",
+        model="gpt-4o",
+        response=httpx.Response(
+            status_code=429,
+            headers={"retry-after": "7"},
+            request=httpx.Request("POST", "https://example.com"),
+        ),
+    )
+    rate_limit_error = rate_limit_error_from_exception(error)
+    assert rate_limit_error is not None
+    assert rate_limit_error.retry_after == 7.0
+
+
+def test_rate_limit_error_from_exception_types():
+    class OverloadedError(Exception):
+        status_code = 529
+
+    assert rate_limit_error_from_exception(OverloadedError()) is not None
+    assert rate_limit_error_from_exception(asyncio.TimeoutError()) is not None
+    assert rate_limit_error_from_exception(ValueError("nope")) is None
+
+    existing = RateLimitedError("already", retry_after=3.0)
+    assert rate_limit_error_from_exception(existing) is existing
+
+    # Wrapped errors are found through the exception chain
+    try:
+        try:
+            raise OverloadedError()
+        except OverloadedError as e:
+            raise ValueError("wrapped") from e
+    except ValueError as wrapped:
+        assert rate_limit_error_from_exception(wrapped) is not None
+
+
+def test_concurrency_bounds():
+    assert concurrency_bounds_for_provider("ollama").max == 4
+    assert concurrency_bounds_for_provider("openai").max == 64
+    with pytest.raises(ValueError):
+        ConcurrencyBounds(min=0, max=4)
+    with pytest.raises(ValueError):
+        ConcurrencyBounds(min=5, max=4)
+
+
+@pytest.mark.asyncio
+async def test_limiter_additive_increase():
+    limiter = AIMDConcurrencyLimiter(ConcurrencyBounds(min=1, max=4), initial=2)
+    assert limiter.concurrency == 2
+    # ~+1 per window of successes: 2 -> 2.5 -> 2.9 -> 3.24
+    for _ in range(3):
+        epoch = await limiter.acquire()
+        await limiter.release(epoch, RequestOutcome.success)
+    assert limiter.concurrency == 3
+
+    # Capped at max
+    for _ in range(100):
+        epoch = await limiter.acquire()
+        await limiter.release(epoch, RequestOutcome.success)
+    assert limiter.concurrency == 4
+
+    # Other errors don't change the limit
+    epoch = await limiter.acquire()
+    await limiter.release(epoch, RequestOutcome.error)
+    assert limiter.concurrency == 4
+
+
+@pytest.mark.asyncio
+async def test_limiter_multiplicative_decrease_once_per_wave():
+    limiter = AIMDConcurrencyLimiter(ConcurrencyBounds(min=2, max=64), initial=32)
+    epochs = [await limiter.acquire() for _ in range(8)]
+    # A burst of errors from the same wave of requests only halves once
+    for epoch in epochs:
+        await limiter.release(epoch, RequestOutcome.rate_limited)
+    assert limiter.concurrency == 16
+
+    # Requests started after the decrease can decrease again, down to min
+    for _ in range(5):
+        epoch = await limiter.acquire()
+        await limiter.release(epoch, RequestOutcome.rate_limited)
+    assert limiter.concurrency == 2
+
+
+@pytest.mark.asyncio
+async def test_limiter_non_adaptive():
+    limiter = AIMDConcurrencyLimiter(
+        ConcurrencyBounds(min=1, max=8), initial=3, adaptive=False
+    )
+    epoch = await limiter.acquire()
+    await limiter.release(epoch, RequestOutcome.rate_limited)
+    for _ in range(10):
+        epoch = await limiter.acquire()
+        await limiter.release(epoch, RequestOutcome.success)
+    assert limiter.concurrency == 3
+
+
+@pytest.mark.asyncio
+async def test_limiter_limits_in_flight():
+    limiter = AIMDConcurrencyLimiter(
+        ConcurrencyBounds(min=1, max=2), initial=2, adaptive=False
+    )
+    in_flight = 0
+    max_in_flight = 0
+
+    async def request():
+        nonlocal in_flight, max_in_flight
+        epoch = await limiter.acquire()
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        await limiter.release(epoch, RequestOutcome.success)
+
+    await asyncio.gather(*[request() for _ in range(10)])
+    assert max_in_flight == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_honors_retry_after():
+    limiter = AIMDConcurrencyLimiter(ConcurrencyBounds(min=1, max=4), initial=4)
+    epoch = await limiter.acquire()
+    await limiter.release(epoch, RequestOutcome.rate_limited, retry_after=0.2)
+
+    start = time.monotonic()
+    epoch = await limiter.acquire()
+    assert time.monotonic() - start >= 0.15
+    await limiter.release(epoch, RequestOutcome.success)
@@ -0,0 +1,208 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from kiln_ai.adapters.rate_limiter import (
+    RateLimiter,
+    RateLimiterRegistry,
+    RateLimits,
+    TokenBucket,
+    estimate_request_tokens,
+    response_total_tokens,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def registry_with_settings(settings: dict) -> RateLimiterRegistry:
+    config = MagicMock()
+    config.rate_limits = settings
+    return RateLimiterRegistry(config=config)
+
+
+def test_rate_limits_validation():
+    assert RateLimits().unlimited
+    assert not RateLimits(requests_per_minute=10).unlimited
+    with pytest.raises(ValueError, match="requests_per_minute"):
+        RateLimits(requests_per_minute=0)
+    with pytest.raises(ValueError, match="tokens_per_minute"):
+        RateLimits(tokens_per_minute=-1)
+
+
+def test_token_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    assert bucket.seconds_until_available(60) == 0.0
+    bucket.consume(60)
+    assert bucket.seconds_until_available(1) == pytest.approx(1.0)
+
+    # Refills continuously, capped at capacity
+    clock.now = 30.0
+    assert bucket.seconds_until_available(30) == 0.0
+    clock.now = 1000.0
+    bucket.consume(0)
+    assert bucket.level == 60
+
+    # Oversized requests wait for a full bucket, not forever
+    bucket.consume(10)
+    assert bucket.seconds_until_available(1000) == pytest.approx(10.0)
+
+    # Debt from underestimates delays later requests
+    bucket.consume(110)
+    assert bucket.seconds_until_available(1) == pytest.approx(61.0)
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute():
+    # The bucket only refills when the fake clock moves, however long the burst takes
+    clock = FakeClock()
+    limiter = RateLimiter(RateLimits(requests_per_minute=600), clock)
+    # Full bucket allows a burst, then 10 requests per second
+    for _ in range(600):
+        await limiter.acquire()
+    request = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.15)
+    assert not request.done()
+
+    clock.now = 0.1
+    await asyncio.wait_for(request, timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute_and_usage():
+    limiter = RateLimiter(RateLimits(tokens_per_minute=6000))
+    await limiter.acquire(100)
+    # Actual usage was the whole budget: the next request waits for refill (100 tokens/s)
+    limiter.record_usage(100, 6000)
+    start = time.monotonic()
+    await limiter.acquire(10)
+    assert time.monotonic() - start >= 0.08
+
+    # Unknown usage keeps the estimate
+    limiter.record_usage(10, None)
+
+
+@pytest.mark.asyncio
+async def test_fifo_fairness():
+    limiter = RateLimiter(RateLimits(tokens_per_minute=6000))
+    await limiter.acquire(6000)
+    order = []
+
+    async def request(name: str, tokens: int):
+        await limiter.acquire(tokens)
+        order.append(name)
+
+    # A large request queued first isn't overtaken by small ones, even though they'd fit sooner
+    big = asyncio.create_task(request("big", 20))
+    await asyncio.sleep(0)
+    small = [asyncio.create_task(request(f"small_{i}", 1)) for i in range(3)]
+    await asyncio.gather(big, *small)
+    assert order == ["big", "small_0", "small_1", "small_2"]
+    assert limiter.queue_length == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_passes_turn():
+    limiter = RateLimiter(RateLimits(requests_per_minute=600))
+    for _ in range(600):
+        await limiter.acquire()
+
+    head = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    second = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queue_length == 2
+
+    head.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await head
+    await asyncio.wait_for(second, timeout=2)
+    assert limiter.queue_length == 0
+
+
+def test_shared_across_event_loops():
+    limiter = RateLimiter(RateLimits(requests_per_minute=600))
+    asyncio.run(limiter.acquire())
+    completed = []
+
+    def worker():
+        async def run():
+            for _ in range(5):
+                await limiter.acquire()
+            completed.append(True)
+
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(completed) == 4
+    assert limiter.queue_length == 0
+
+
+def test_registry_lookup():
+    registry = registry_with_settings(
+        {
+            "openai": {"requests_per_minute": 100},
+            "openai/gpt_4o": {"tokens_per_minute": 1000},
+            "groq": {},
+        }
+    )
+    provider_limiter = registry.limiter_for("openai", "gpt_4o_mini")
+    assert provider_limiter is not None
+    assert provider_limiter.limits == RateLimits(requests_per_minute=100)
+    # Models without their own entry share the provider budget
+    assert registry.limiter_for("openai", "gpt_4_1") is provider_limiter
+
+    model_limiter = registry.limiter_for("openai", "gpt_4o")
+    assert model_limiter is not None
+    assert model_limiter is not provider_limiter
+    assert model_limiter.limits == RateLimits(tokens_per_minute=1000)
+    assert registry.limiter_for("openai", "gpt_4o") is model_limiter
+
+    assert registry.limiter_for("groq", "llama") is None
+    assert registry.limiter_for("anthropic", "claude") is None
+    assert registry.limiter_for(None, None) is None
+    assert registry_with_settings({}).limiter_for("openai", "gpt_4o") is None
+
+
+def test_registry_picks_up_setting_changes():
+    settings = {"openai": {"requests_per_minute": 100}}
+    registry = registry_with_settings(settings)
+    limiter = registry.limiter_for("openai", "gpt_4o")
+    settings["openai"] = {"requests_per_minute": 200}
+    new_limiter = registry.limiter_for("openai", "gpt_4o")
+    assert new_limiter is not limiter
+    assert new_limiter is not None
+    assert new_limiter.limits.requests_per_minute == 200
+
+
+def test_estimate_request_tokens():
+    kwargs = {
+        "messages": [
+            {"role": "system", "content": "a" * 40},
+            {"role": "user", "content": "b" * 40},
+            {"role": "user", "content": [{"type": "image_url"}]},
+        ]
+    }
+    assert estimate_request_tokens(kwargs) == 21
+    assert estimate_request_tokens({**kwargs, "max_tokens": 100}) == 121
+    assert estimate_request_tokens({}) == 1
+
+
+def test_response_total_tokens():
+    response = MagicMock()
+    response.usage.total_tokens = 42
+    assert response_total_tokens(response) == 42
+    assert response_total_tokens(object()) is None
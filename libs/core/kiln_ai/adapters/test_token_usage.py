@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from kiln_ai.adapters.token_usage import (
+    TokenUsage,
+    record_response_usage,
+    track_token_usage,
+)
+
+
+def response(prompt_tokens=None, completion_tokens=None):
+    return SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    )
+
+
+def test_add_response():
+    usage = TokenUsage()
+    usage.add_response(response(10, 5))
+    usage.add_response(response(completion_tokens=3))
+    # No usage reported
+    usage.add_response(SimpleNamespace())
+    usage.add_response(response())
+    assert usage == TokenUsage(
+        prompt_tokens=10, completion_tokens=8, calls=4, reported_calls=2
+    )
+
+
+def test_add():
+    usage = TokenUsage(prompt_tokens=1, completion_tokens=2, calls=1, reported_calls=1)
+    usage.add(TokenUsage(prompt_tokens=3, completion_tokens=4, calls=2))
+    assert usage == TokenUsage(
+        prompt_tokens=4, completion_tokens=6, calls=3, reported_calls=1
+    )
+
+
+def test_record_outside_tracking_is_ignored():
+    record_response_usage(response(10, 5))
+
+
+def test_nested_tracking_counts_innermost():
+    with track_token_usage() as outer:
+        record_response_usage(response(1, 1))
+        with track_token_usage() as inner:
+            record_response_usage(response(10, 10))
+        record_response_usage(response(2, 2))
+    record_response_usage(response(100, 100))
+    assert (outer.prompt_tokens, outer.calls) == (3, 2)
+    assert (inner.prompt_tokens, inner.calls) == (10, 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_tracked_separately():
+    async def call(tokens: int) -> TokenUsage:
+        with track_token_usage() as usage:
+            for _ in range(3):
+                await asyncio.sleep(0)
+                record_response_usage(response(tokens, tokens))
+        return usage
+
+    usages = await asyncio.gather(call(1), call(10))
+    assert [usage.prompt_tokens for usage in usages] == [3, 30]
+
+    # Tasks started within a tracked block count towards it
+    async def model_call():
+        record_response_usage(response(5, 5))
+
+    with track_token_usage() as usage:
+        await asyncio.gather(model_call(), model_call())
+    assert usage.prompt_tokens == 10
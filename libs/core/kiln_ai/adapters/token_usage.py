@@ -0,0 +1,68 @@
+"""
+Token usage of model calls, from the `usage` field of provider responses.
+
+Callers measure the usage of a block of code with track_token_usage(): every model call the adapters make inside it (in the same async task, or tasks started from it) is added to the returned TokenUsage. This lets callers like the eval runner attribute spend to a job, without threading usage through every adapter and evaluator API.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Model calls made, and how many of them reported usage. Providers don't always report it.
+    calls: int = 0
+    reported_calls: int = 0
+
+    def add_response(self, response: Any) -> None:
+        self.calls += 1
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if not isinstance(prompt_tokens, int) and not isinstance(
+            completion_tokens, int
+        ):
+            return
+        self.reported_calls += 1
+        if isinstance(prompt_tokens, int):
+            self.prompt_tokens += prompt_tokens
+        if isinstance(completion_tokens, int):
+            self.completion_tokens += completion_tokens
+
+    def add(self, other: "TokenUsage") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.calls += other.calls
+        self.reported_calls += other.reported_calls
+
+
+# The usage being tracked in the current context, if any
+_current_usage: ContextVar[TokenUsage | None] = ContextVar(
+    "kiln_token_usage", default=None
+)
+
+
+@contextmanager
+def track_token_usage() -> Iterator[TokenUsage]:
+    """
+    Track the token usage of model calls made within the block. Nested blocks only count towards the innermost.
+    """
+    usage = TokenUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def record_response_usage(response: Any) -> None:
+    """
+    Add a model response's usage to the usage being tracked, if any. Called by adapters for each model call.
+    """
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_response(response)
@@ -5,13 +5,16 @@ import shutil
 import uuid
 from abc import ABCMeta
 from builtins import classmethod
+from contextlib import AbstractContextManager, ExitStack, nullcontext
 from datetime import datetime
+from functools import cache
 from pathlib import Path
 from typing import (
     Any,
     Dict,
     List,
     Optional,
+    Sequence,
     Type,
     TypeVar,
 )
@@ -20,6 +23,7 @@ from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
+    TypeAdapter,
     ValidationError,
     ValidationInfo,
     computed_field,
@@ -165,6 +169,80 @@ class KilnBaseModel(BaseModel):
         ModelCache.shared().set_model(path, m, mtime_ns)
         return m
 
+    @classmethod
+    def field_names(cls) -> set[str]:
+        """The names of all serialized fields, including computed fields."""
+        return set(cls.model_fields.keys()) | set(cls.model_computed_fields.keys())
+
+    @classmethod
+    def load_fields_from_file(
+        cls, path: Path | str, fields: set[str]
+    ) -> Dict[str, Any]:
+        """Load a subset of a model's fields from a file, in JSON serializable form.
+
+        Equivalent to load_from_file(path).model_dump(mode="json", include=fields), but only the requested fields are validated and serialized. Much faster than loading the full model when we don't need its large fields (outputs, intermediate outputs, etc).
+
+        Each field is validated on its own (nested models, including format upgrades, are validated as usual), so model level validators of this class don't run. Use load_from_file for anything you'll edit or save.
+
+        Args:
+            path (Path): Path to the model file
+            fields (set[str]): The top level fields to load
+
+        Returns:
+            Dict[str, Any]: field name -> JSON serializable value
+
+        Raises:
+            ValueError: If a field is not a field of this model
+        """
+        if isinstance(path, str):
+            path = Path(path)
+        unknown_fields = fields - cls.field_names()
+        if unknown_fields:
+            raise ValueError(
+                f"Unknown fields for {cls.__name__}: {', '.join(sorted(unknown_fields))}"
+            )
+
+        # If we already have the model, serializing from it is cheapest
+        cached_model = ModelCache.shared().get_model(path, cls, readonly=True)
+        if cached_model is not None:
+            return cached_model.model_dump(mode="json", include=fields)
+
+        with open(path, "r", encoding="utf-8") as file:
+            parsed_json = json.load(file)
+        if parsed_json.get("model_type") != cls.type_name():
+            raise ValueError(
+                f"Cannot load from file because the model type is incorrect. Expected {cls.type_name()}, got {parsed_json.get('model_type')}. "
+                f"Class: {cls.__name__}, path: {path}"
+            )
+
+        result: Dict[str, Any] = {}
+        # Same field order as model_dump
+        ordered_fields = [
+            field
+            for field in [*cls.model_fields, *cls.model_computed_fields]
+            if field in fields
+        ]
+        for field in ordered_fields:
+            if field == "path":
+                # Not persisted, it's where we loaded the file from
+                result[field] = str(path)
+            elif field in cls.model_computed_fields:
+                result[field] = parsed_json.get(field)
+            elif field in parsed_json:
+                # Validate (which runs any format upgrades) and serialize just this field
+                adapter = _field_type_adapter(cls, field)
+                value = adapter.validate_python(
+                    parsed_json[field], context={"loading_from_file": True}
+                )
+                result[field] = adapter.dump_python(value, mode="json")
+            else:
+                field_info = cls.model_fields[field]
+                default = field_info.get_default(call_default_factory=True)
+                result[field] = _field_type_adapter(cls, field).dump_python(
+                    default, mode="json"
+                )
+        return result
+
     def loaded_from_file(self, info: ValidationInfo | None = None) -> bool:
         # Two methods of indicated it's loaded from file:
         # 1) info.context.get("loading_from_file") -> During actual loading, before we can set _loaded_from_file
@@ -206,6 +284,53 @@ class KilnBaseModel(BaseModel):
         # This ensures everything in cache is loaded from disk, and the cache perfectly reflects what's on disk
         ModelCache.shared().invalidate(path)
 
+    @staticmethod
+    def save_all_to_file(models: Sequence["KilnBaseModel"]) -> None:
+        """Save many models in one pass. Same result as calling save_to_file on each.
+
+        All paths are checked before anything is written, and each folder is created once. Classes which keep derived data up to date when saving (see track_save_all) update it once for the whole batch.
+
+        Raises:
+            ValueError: If the path of any model is not set (nothing is saved)
+        """
+        paths: List[Path] = []
+        for model in models:
+            path = model.build_path()
+            if path is None:
+                raise ValueError(
+                    f"Cannot save to file because 'path' is not set. Class: {model.__class__.__name__}, "
+                    f"id: {getattr(model, 'id', None)}, path: {path}"
+                )
+            paths.append(path)
+
+        models_by_class: Dict[Type[KilnBaseModel], List[KilnBaseModel]] = {}
+        for model in models:
+            models_by_class.setdefault(type(model), []).append(model)
+
+        created_folders: set[Path] = set()
+        model_cache = ModelCache.shared()
+        with ExitStack() as stack:
+            for model_class, class_models in models_by_class.items():
+                stack.enter_context(model_class.track_save_all(class_models))
+            for model, path in zip(models, paths):
+                if path.parent not in created_folders:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    created_folders.add(path.parent)
+                json_data = model.model_dump_json(indent=2, exclude={"path"})
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write(json_data)
+                model.path = path
+                model_cache.invalidate(path)
+
+    @classmethod
+    def track_save_all(
+        cls, models: Sequence["KilnBaseModel"]
+    ) -> AbstractContextManager[None]:
+        """
+        Wraps save_all_to_file writing a batch of models of this class. save_all_to_file doesn't call save_to_file, so classes which override save_to_file to keep derived data up to date must override this too, updating it once per batch.
+        """
+        return nullcontext()
+
     def delete(self) -> None:
         if self.path is None:
             raise ValueError("Cannot delete model because path is not set")
@@ -376,6 +501,18 @@ class KilnParentedModel(KilnBaseModel, metaclass=ABCMeta):
             children.append(item)
         return children
 
+    @classmethod
+    def all_children_fields_of_parent_path(
+        cls: Type[PT], parent_path: Path | None, fields: set[str]
+    ) -> list[Dict[str, Any]]:
+        """
+        Load a subset of fields of all children, in JSON serializable form. See load_fields_from_file.
+        """
+        return [
+            cls.load_fields_from_file(child_path, fields)
+            for child_path in cls.iterate_children_paths_of_parent_path(parent_path)
+        ]
+
     @classmethod
     def from_id_and_parent_path(
         cls: Type[PT], id: str, parent_path: Path | None
@@ -399,6 +536,53 @@ class KilnParentedModel(KilnBaseModel, metaclass=ABCMeta):
                     return child
         return None
 
+    @classmethod
+    def from_ids_and_parent_path(
+        cls: Type[PT], ids: set[str], parent_path: Path | None
+    ) -> Dict[str, PT]:
+        """
+        Find many children by ID, in one pass over the parent's folder. Much faster than calling from_id_and_parent_path for each ID.
+
+        Folder names start with the ID, so we first load only the files in folders matching a requested ID. The in-file ID is still the source of truth: if some IDs aren't found that way (for example, a folder was renamed), we fall back to checking the in-file ID of every other child.
+
+        Returns:
+            Dict[str, PT]: ID -> model, for the IDs found
+        """
+        if parent_path is None or not ids:
+            return {}
+
+        child_paths = list(cls.iterate_children_paths_of_parent_path(parent_path))
+        found: Dict[str, PT] = {}
+
+        def check(child_path: Path) -> None:
+            child = cls.load_from_file(child_path)
+            if child.id in ids and child.id not in found:
+                found[child.id] = child
+
+        # Fast path: folder names are "{id}" or "{id} - {name}"
+        unchecked_paths: list[Path] = []
+        for child_path in child_paths:
+            folder_id = child_path.parent.name.split(" - ", 1)[0]
+            if folder_id in ids:
+                check(child_path)
+            else:
+                unchecked_paths.append(child_path)
+
+        if len(found) < len(ids):
+            for child_path in unchecked_paths:
+                child_id = ModelCache.shared().get_model_id(child_path, cls)
+                if child_id is None or (child_id in ids and child_id not in found):
+                    check(child_path)
+                if len(found) == len(ids):
+                    break
+        return found
+
+
+@cache
+def _field_type_adapter(cls: Type[KilnBaseModel], field: str) -> TypeAdapter:
+    # Building a TypeAdapter is slow, so reuse them for every file we load
+    return TypeAdapter(cls.model_fields[field].annotation)
+
 
 # Parent create methods for all child relationships
 # You must pass in parent_of in the subclass definition, defining the child relationships
@@ -8,12 +8,14 @@ from typing import TYPE_CHECKING
 
 from pydantic import BaseModel, Field, model_validator
 
-from kiln_ai.datamodel.basemodel import NAME_FIELD, KilnParentedModel
+from kiln_ai.datamodel.basemodel import ID_TYPE, NAME_FIELD, KilnParentedModel
 from kiln_ai.datamodel.dataset_filters import (
     DatasetFilter,
     DatasetFilterId,
     dataset_filter_from_id,
 )
+from kiln_ai.datamodel.task_run import TaskRun
+from kiln_ai.utils.near_duplicates import near_duplicate_clusters
 
 if TYPE_CHECKING:
     from kiln_ai.datamodel.task import Task
@@ -57,6 +59,21 @@ Train80Test10Val10SplitDefinition: list[DatasetSplitDefinition] = [
 ]
 
 
+def near_duplicate_run_clusters(
+    task_runs: list[TaskRun], threshold: float = 0.8
+) -> list[list[ID_TYPE]]:
+    """
+    Find clusters of task runs with near-duplicate inputs, using MinHash + LSH.
+
+    Returns:
+        list[list[ID_TYPE]]: clusters of task run IDs, each with at least 2 members.
+    """
+    clusters = near_duplicate_clusters(
+        [task_run.input for task_run in task_runs], threshold=threshold
+    )
+    return [[task_runs[index].id for index in cluster] for cluster in clusters]
+
+
 class DatasetSplit(KilnParentedModel):
     """
     A collection of task runs, with optional splits (train, test, validation).
@@ -98,12 +115,17 @@ class DatasetSplit(KilnParentedModel):
         splits: list[DatasetSplitDefinition],
         filter_id: DatasetFilterId = "all",
         description: str | None = None,
+        near_duplicate_threshold: float | None = None,
     ):
         """
         Build a dataset split from a task.
+
+        If near_duplicate_threshold is set, task runs with near-duplicate inputs are kept in the same split, so they don't leak between train and test.
         """
         filter = dataset_filter_from_id(filter_id)
-        split_contents = cls.build_split_contents(task, splits, filter)
+        split_contents = cls.build_split_contents(
+            task, splits, filter, near_duplicate_threshold
+        )
         return cls(
             parent=task,
             name=name,
@@ -119,11 +141,16 @@ class DatasetSplit(KilnParentedModel):
         task: "Task",
         splits: list[DatasetSplitDefinition],
         filter: DatasetFilter,
+        near_duplicate_threshold: float | None = None,
     ) -> dict[str, list[str]]:
-        valid_ids = []
-        for task_run in task.runs():
-            if filter(task_run):
-                valid_ids.append(task_run.id)
+        valid_runs = [task_run for task_run in task.runs() if filter(task_run)]
+
+        if near_duplicate_threshold is not None:
+            return cls.build_clustered_split_contents(
+                valid_runs, splits, near_duplicate_threshold
+            )
+
+        valid_ids = [task_run.id for task_run in valid_runs]
 
         # Shuffle and split by split percentage
         random.shuffle(valid_ids)
@@ -144,6 +171,46 @@ class DatasetSplit(KilnParentedModel):
 
         return split_contents
 
+    @classmethod
+    def build_clustered_split_contents(
+        cls,
+        task_runs: list[TaskRun],
+        splits: list[DatasetSplitDefinition],
+        near_duplicate_threshold: float,
+    ) -> dict[str, list[str]]:
+        """
+        Split task runs, keeping each cluster of near-duplicate inputs inside one split.
+
+        Clusters (and remaining single runs) are shuffled, then each is assigned to the split furthest below its target size. Split sizes are approximate when clusters are large.
+        """
+        clustered_ids = near_duplicate_run_clusters(task_runs, near_duplicate_threshold)
+        in_cluster = {id for cluster in clustered_ids for id in cluster}
+        groups: list[list[ID_TYPE]] = clustered_ids + [
+            [task_run.id] for task_run in task_runs if task_run.id not in in_cluster
+        ]
+        random.shuffle(groups)
+
+        total = len(task_runs)
+        targets = [round(total * split.percentage) for split in splits[:-1]]
+        if splits:
+            # Last split gets all remaining items (for rounding)
+            targets.append(total - sum(targets))
+
+        split_contents: dict[str, list[str]] = {split.name: [] for split in splits}
+        for group in groups:
+            if not splits:
+                break
+            deficits = [
+                targets[i] - len(split_contents[split.name])
+                for i, split in enumerate(splits)
+            ]
+            target_split = splits[deficits.index(max(deficits))]
+            split_contents[target_split.name].extend(
+                [id for id in group if id is not None]
+            )
+
+        return split_contents
+
     def parent_task(self) -> "Task | None":
         # inline import to avoid circular import
         from kiln_ai.datamodel import Task
@@ -1,6 +1,6 @@
 import json
 from enum import Enum
-from typing import TYPE_CHECKING, Any, Dict, List, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Union
 
 from pydantic import BaseModel, Field, model_validator
 from typing_extensions import Self
@@ -8,11 +8,13 @@ from typing_extensions import Self
 from kiln_ai.datamodel.basemodel import (
     ID_TYPE,
     NAME_FIELD,
+    KilnBaseModel,
     KilnParentedModel,
     KilnParentModel,
 )
 from kiln_ai.datamodel.datamodel_enums import TaskOutputRatingType
 from kiln_ai.datamodel.dataset_filters import DatasetFilterId
+from kiln_ai.datamodel.eval_score_summary import EvalScoreSummary
 from kiln_ai.datamodel.json_schema import string_to_json_key
 from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
 
@@ -116,6 +118,21 @@ class EvalRun(KilnParentedModel):
             raise ValueError("parent must be an EvalConfig")
         return self.parent  # type: ignore
 
+    def save_to_file(self) -> None:
+        # Keep the eval config's score summary up to date, without rescanning all runs
+        with EvalScoreSummary.track_runs_change([self]):
+            super().save_to_file()
+
+    @classmethod
+    def track_save_all(cls, models: Sequence[KilnBaseModel]):
+        return EvalScoreSummary.track_runs_change(
+            [model for model in models if isinstance(model, EvalRun)]
+        )
+
+    def delete(self) -> None:
+        with EvalScoreSummary.track_runs_change([self], deleting=True):
+            super().delete()
+
     @model_validator(mode="after")
     def validate_eval_run_types(self) -> Self:
         if self.eval_config_eval and self.task_run_config_id is not None:
@@ -0,0 +1,608 @@
+"""
+Materialized scores of an eval config's runs, for the eval score summaries.
+
+Summarizing an eval config by loading every eval run is O(runs) file loads, each parsing the run's full input, output and intermediate outputs. Instead we persist a small SQLite database beside the eval config with just what the summaries need, updated incrementally (a few rows per eval run) as eval runs are saved and deleted:
+
+- runs: the dataset item, run config and scores of each eval run
+- items: the eval run counted for each run config and dataset item. Each dataset item is counted once per run config, even if it has several eval runs (the eval run with the lowest ID is counted), matching how the summaries always treated duplicates.
+- totals and item_counts: running sums and counts per run config and score, over the counted eval runs
+
+Reading the mean scores is O(run configs × scores), plus an indexed lookup per dataset item in the eval set.
+
+The summary is a cache of what's on disk: if it's missing, unreadable, or the runs folder was changed outside of Kiln (detected by the runs folder mtime), it's rebuilt from a full scan. Updates run in a transaction which checks the mtime, so several processes can update one summary. The mtime only detects changes on filesystems with fine-grained timestamps: on others summaries aren't persisted, and are built from a full scan on each read.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Sequence, Set, Tuple
+
+from pydantic import BaseModel
+
+from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.model_cache import ModelCache
+
+if TYPE_CHECKING:
+    from kiln_ai.datamodel.eval import EvalConfig, EvalRun, EvalScores
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE_NAME = "eval_score_summary.sqlite"
+
+# The fields of an eval run we load to build a summary
+SUMMARY_FIELDS = {"id", "dataset_id", "task_run_config_id", "scores"}
+
+
+class SummarizedEvalRun(BaseModel):
+    dataset_id: ID_TYPE
+    task_run_config_id: ID_TYPE | None = None
+    scores: Dict[str, float]
+
+
+class RunConfigScores(BaseModel):
+    """
+    Summary of a run config's eval runs, over the dataset items in the eval set.
+    """
+
+    # score key -> mean score, for scores with at least one result
+    mean_scores: Dict[str, float]
+    # Dataset items in the eval set with an eval run for this run config
+    dataset_item_count: int
+    # Of those, items whose eval run is missing one or more scores
+    incomplete_count: int
+
+
+class EvalScoreSummary:
+    """
+    The scores of an eval config's runs. Persisted beside the eval config, or in memory when path is None.
+
+    Safe to share across threads. Close it when done (or use it as a context manager).
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def __enter__(self) -> "EvalScoreSummary":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @classmethod
+    def summary_path(cls, eval_config: "EvalConfig") -> Path | None:
+        if eval_config.path is None:
+            return None
+        return eval_config.path.parent / SUMMARY_FILE_NAME
+
+    @classmethod
+    def persistence_enabled(cls) -> bool:
+        # Stale summaries are detected by the runs folder mtime, which needs fine-grained timestamps (see ModelCache)
+        return ModelCache.shared().fine_grained_timestamps
+
+    @classmethod
+    def runs_folder_mtime(cls, eval_config: "EvalConfig") -> int | None:
+        # inline import to avoid circular import
+        from kiln_ai.datamodel.eval import EvalRun
+
+        if eval_config.path is None:
+            return None
+        try:
+            return (
+                (eval_config.path.parent / EvalRun.relationship_name())
+                .stat()
+                .st_mtime_ns
+            )
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def for_eval_config(cls, eval_config: "EvalConfig") -> "EvalScoreSummary":
+        """
+        The summary for an eval config. Rebuilds it from a full scan if missing or stale.
+        """
+        path = cls.summary_path(eval_config)
+        if path is None or not cls.persistence_enabled():
+            # Not persisted, compute in memory
+            return cls.build(eval_config)
+
+        summary = cls(path)
+        try:
+            if not summary._is_current(cls.runs_folder_mtime(eval_config)):
+                summary._rebuild(eval_config)
+            return summary
+        except sqlite3.Error as e:
+            logger.warning(f"Eval score summary unavailable, scanning eval runs: {e}")
+            summary.close()
+            if not isinstance(e, sqlite3.OperationalError):
+                # Not a valid database: drop it, so it's rebuilt on next read
+                path.unlink(missing_ok=True)
+            return cls.build(eval_config)
+
+    @classmethod
+    def build(cls, eval_config: "EvalConfig") -> "EvalScoreSummary":
+        """
+        Build an in-memory summary from a full scan of the eval config's runs.
+        """
+        summary = cls()
+        with summary._transaction() as connection:
+            for run_id, run in _scan(eval_config):
+                _add(connection, run_id, run)
+        return summary
+
+    def _rebuild(self, eval_config: "EvalConfig") -> None:
+        # The mtime from before the scan: a change during it leaves the summary stale (rebuilt again), never wrongly current
+        runs_folder_mtime = self.runs_folder_mtime(eval_config)
+        runs = _scan(eval_config)
+        with self._transaction() as connection:
+            for table in ["runs", "items", "totals", "item_counts"]:
+                connection.execute(f"DELETE FROM {table}")
+            for run_id, run in runs:
+                _add(connection, run_id, run)
+            _set_runs_folder_mtime(connection, runs_folder_mtime)
+
+    @classmethod
+    @contextmanager
+    def track_runs_change(cls, runs: Sequence["EvalRun"], deleting: bool = False):
+        """
+        Context manager wrapping a save or delete of eval runs (one, or a batch), which incrementally updates the persisted summaries of their eval configs.
+
+        Only updates existing summaries. If there isn't one, it's built on next read.
+        """
+        if not cls.persistence_enabled():
+            yield
+            return
+
+        changes: List[Tuple["EvalConfig", List["EvalRun"], int | None]] = []
+        for eval_config, config_runs in _runs_by_eval_config(runs):
+            path = cls.summary_path(eval_config)
+            if path is None or not path.exists():
+                continue
+            changes.append(
+                (eval_config, config_runs, cls.runs_folder_mtime(eval_config))
+            )
+
+        yield
+
+        for eval_config, config_runs, mtime_before in changes:
+            cls.record_runs_change(eval_config, config_runs, deleting, mtime_before)
+
+    @classmethod
+    def record_runs_change(
+        cls,
+        eval_config: "EvalConfig",
+        runs: Sequence["EvalRun"],
+        deleting: bool,
+        runs_folder_mtime_before: int | None,
+    ) -> None:
+        """
+        Incrementally update the persisted summary for eval runs that were saved (created or overwritten) or deleted.
+
+        runs_folder_mtime_before is the runs folder mtime before the change. If the summary doesn't match it, something else changed the runs folder and we mark the summary stale, to be rebuilt.
+        """
+        path = cls.summary_path(eval_config)
+        if path is None:
+            return
+
+        summary = cls(path)
+        try:
+            with summary._transaction() as connection:
+                if not _is_current(connection, runs_folder_mtime_before):
+                    _mark_stale(connection)
+                    return
+                for run in runs:
+                    if run.id is None:
+                        continue
+                    _remove(connection, run.id)
+                    if not deleting:
+                        _add(connection, run.id, _summarize(run))
+                _set_runs_folder_mtime(connection, cls.runs_folder_mtime(eval_config))
+        except Exception as e:
+            # Summaries are a cache. Never block saving a run: mark it stale so it's rebuilt on next read.
+            logger.warning(f"Failed to update eval score summary, will rebuild: {e}")
+            summary._invalidate()
+        finally:
+            summary.close()
+
+    def _invalidate(self) -> None:
+        try:
+            with self._transaction() as connection:
+                _mark_stale(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to mark eval score summary stale: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Must hold the lock. Opened on first use.
+        if self._connection is None:
+            if self.path is None:
+                connection = sqlite3.connect(":memory:", check_same_thread=False)
+            else:
+                connection = sqlite3.connect(
+                    self.path, timeout=30, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            try:
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS state (
+                        id INTEGER PRIMARY KEY CHECK (id = 0),
+                        runs_folder_mtime_ns INTEGER
+                    );
+                    CREATE TABLE IF NOT EXISTS runs (
+                        run_id TEXT PRIMARY KEY,
+                        dataset_id TEXT NOT NULL,
+                        run_config_id TEXT,
+                        scores TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS runs_item ON runs (run_config_id, dataset_id, run_id);
+                    CREATE TABLE IF NOT EXISTS items (
+                        run_config_id TEXT NOT NULL,
+                        dataset_id TEXT NOT NULL,
+                        run_id TEXT NOT NULL,
+                        scores TEXT NOT NULL,
+                        PRIMARY KEY (run_config_id, dataset_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS items_dataset ON items (dataset_id);
+                    CREATE TABLE IF NOT EXISTS totals (
+                        run_config_id TEXT NOT NULL,
+                        score_key TEXT NOT NULL,
+                        sum REAL NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (run_config_id, score_key)
+                    );
+                    CREATE TABLE IF NOT EXISTS item_counts (
+                        run_config_id TEXT PRIMARY KEY,
+                        count INTEGER NOT NULL
+                    );
+                    CREATE TEMP TABLE IF NOT EXISTS eval_set (dataset_id TEXT PRIMARY KEY);
+                    """
+                )
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Immediate: take the write lock before reading, so read-modify-writes from other processes can't interleave
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+
+    def _is_current(self, runs_folder_mtime: int | None) -> bool:
+        with self._lock:
+            return _is_current(self._connect(), runs_folder_mtime)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add(self, run_id: str, run: SummarizedEvalRun) -> None:
+        """
+        Add an eval run to the summary, replacing any previous version of it.
+        """
+        with self._transaction() as connection:
+            _add(connection, run_id, run)
+
+    def remove(self, run_id: str) -> None:
+        """
+        Remove an eval run from the summary.
+        """
+        with self._transaction() as connection:
+            _remove(connection, run_id)
+
+    def dataset_ids_by_run_config(self) -> Dict[ID_TYPE | None, Set[ID_TYPE]]:
+        """
+        task_run_config_id -> the dataset items with an eval run for that run config. The run config is None for eval runs of the eval config itself (mode "eval_config_eval").
+        """
+        dataset_ids: Dict[ID_TYPE | None, Set[ID_TYPE]] = {}
+        with self._lock:
+            for run_config_id, dataset_id in self._connect().execute(
+                "SELECT DISTINCT run_config_id, dataset_id FROM runs"
+            ):
+                dataset_ids.setdefault(run_config_id, set()).add(dataset_id)
+        return dataset_ids
+
+    def run_config_scores(
+        self,
+        dataset_ids: Set[ID_TYPE],
+        score_keys: List[str],
+    ) -> Dict[str, RunConfigScores]:
+        """
+        Mean scores of each run config over the given dataset items (the eval set).
+
+        Starts from the running totals, and only visits eval runs for dataset items outside the eval set (to subtract them), or when some eval runs are missing scores.
+        """
+        with self._lock:
+            connection = self._connect()
+            _set_eval_set(connection, dataset_ids)
+
+            totals: Dict[str, Dict[str, Tuple[float, int]]] = {}
+            for run_config_id, score_key, total, count in connection.execute(
+                "SELECT run_config_id, score_key, sum, count FROM totals"
+            ):
+                totals.setdefault(run_config_id, {})[score_key] = (total, count)
+            item_counts: Dict[str, int] = dict(
+                connection.execute("SELECT run_config_id, count FROM item_counts")
+            )
+            eval_set_item_counts: Dict[str, int] = dict(
+                connection.execute(
+                    "SELECT items.run_config_id, COUNT(*) FROM eval_set JOIN items ON items.dataset_id = eval_set.dataset_id GROUP BY items.run_config_id"
+                )
+            )
+
+            results: Dict[str, RunConfigScores] = {}
+            for run_config_id, all_item_count in item_counts.items():
+                run_config_totals = totals.get(run_config_id, {})
+                sums = {
+                    key: run_config_totals[key][0]
+                    for key in score_keys
+                    if key in run_config_totals
+                }
+                counts = {
+                    key: run_config_totals[key][1]
+                    for key in score_keys
+                    if key in run_config_totals
+                }
+
+                item_count = eval_set_item_counts.get(run_config_id, 0)
+                if item_count < all_item_count:
+                    for (scores_json,) in connection.execute(
+                        "SELECT scores FROM items WHERE run_config_id = ? AND dataset_id NOT IN (SELECT dataset_id FROM eval_set)",
+                        (run_config_id,),
+                    ):
+                        scores = json.loads(scores_json)
+                        for key in score_keys:
+                            if key in scores:
+                                sums[key] -= scores[key]
+                                counts[key] -= 1
+
+                # Every counted eval run has every score, unless some score's count is short
+                incomplete_count = 0
+                if any(counts.get(key, 0) < item_count for key in score_keys):
+                    for scores in _eval_set_item_scores(connection, run_config_id):
+                        if any(key not in scores for key in score_keys):
+                            incomplete_count += 1
+
+                results[run_config_id] = RunConfigScores(
+                    mean_scores={
+                        key: sums[key] / counts[key]
+                        for key in score_keys
+                        if counts.get(key, 0) > 0
+                    },
+                    dataset_item_count=item_count,
+                    incomplete_count=incomplete_count,
+                )
+            return results
+
+    def run_config_item_scores(
+        self,
+        run_config_id: str,
+        dataset_ids: Set[ID_TYPE],
+        score_keys: List[str],
+    ) -> Dict[str, List[float]]:
+        """
+        score key -> the score of each dataset item in the eval set (the same eval runs counted by run_config_scores). For per-item statistics like confidence intervals.
+        """
+        item_scores: Dict[str, List[float]] = {key: [] for key in score_keys}
+        with self._lock:
+            connection = self._connect()
+            _set_eval_set(connection, dataset_ids)
+            for scores in _eval_set_item_scores(connection, run_config_id):
+                for key in score_keys:
+                    if key in scores:
+                        item_scores[key].append(scores[key])
+        return item_scores
+
+    def scores_by_dataset_id(self) -> Dict[ID_TYPE, Dict[str, float]]:
+        """
+        The scores for each dataset item, from any eval run of this eval config (the lowest eval run ID when there are several). For comparing eval scores to human ratings.
+        """
+        with self._lock:
+            # SQLite takes the bare columns from the row with the MIN
+            return {
+                dataset_id: json.loads(scores_json)
+                for dataset_id, scores_json, _ in self._connect().execute(
+                    "SELECT dataset_id, scores, MIN(run_id) FROM runs GROUP BY dataset_id"
+                )
+            }
+
+
+def _scan(eval_config: "EvalConfig") -> List[Tuple[str, SummarizedEvalRun]]:
+    # All of the eval config's runs, loading only the fields we need from each
+    # inline import to avoid circular import
+    from kiln_ai.datamodel.eval import EvalRun
+
+    return [
+        (
+            fields["id"],
+            SummarizedEvalRun(
+                dataset_id=fields["dataset_id"],
+                task_run_config_id=fields["task_run_config_id"],
+                scores=fields["scores"],
+            ),
+        )
+        for fields in EvalRun.all_children_fields_of_parent_path(
+            eval_config.path, SUMMARY_FIELDS
+        )
+    ]
+
+
+def _is_current(connection: sqlite3.Connection, runs_folder_mtime: int | None) -> bool:
+    row = connection.execute(
+        "SELECT runs_folder_mtime_ns FROM state WHERE id = 0"
+    ).fetchone()
+    return row is not None and row[0] == runs_folder_mtime
+
+
+def _set_runs_folder_mtime(
+    connection: sqlite3.Connection, runs_folder_mtime: int | None
+) -> None:
+    # A missing runs folder is a NULL mtime
+    connection.execute(
+        "INSERT OR REPLACE INTO state (id, runs_folder_mtime_ns) VALUES (0, ?)",
+        (runs_folder_mtime,),
+    )
+
+
+def _mark_stale(connection: sqlite3.Connection) -> None:
+    # No state row: rebuilt on next read
+    connection.execute("DELETE FROM state")
+
+
+def _add(connection: sqlite3.Connection, run_id: str, run: SummarizedEvalRun) -> None:
+    _remove(connection, run_id)
+    scores_json = json.dumps(run.scores)
+    run_config_id = run.task_run_config_id
+    connection.execute(
+        "INSERT INTO runs (run_id, dataset_id, run_config_id, scores) VALUES (?, ?, ?, ?)",
+        (run_id, run.dataset_id, run_config_id, scores_json),
+    )
+    if run_config_id is None:
+        # Not for a run config, so not in the totals
+        return
+
+    # Totals count one eval run per dataset item: the lowest ID
+    counted = connection.execute(
+        "SELECT run_id, scores FROM items WHERE run_config_id = ? AND dataset_id = ?",
+        (run_config_id, run.dataset_id),
+    ).fetchone()
+    if counted is None:
+        _add_to_item_count(connection, run_config_id, 1)
+    elif run_id < counted[0]:
+        _add_to_totals(connection, run_config_id, json.loads(counted[1]), -1)
+    else:
+        return
+    connection.execute(
+        "INSERT OR REPLACE INTO items (run_config_id, dataset_id, run_id, scores) VALUES (?, ?, ?, ?)",
+        (run_config_id, run.dataset_id, run_id, scores_json),
+    )
+    _add_to_totals(connection, run_config_id, run.scores, 1)
+
+
+def _remove(connection: sqlite3.Connection, run_id: str) -> None:
+    row = connection.execute(
+        "SELECT dataset_id, run_config_id FROM runs WHERE run_id = ?", (run_id,)
+    ).fetchone()
+    if row is None:
+        return
+    dataset_id, run_config_id = row
+    connection.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+    if run_config_id is None:
+        return
+
+    counted = connection.execute(
+        "SELECT run_id, scores FROM items WHERE run_config_id = ? AND dataset_id = ?",
+        (run_config_id, dataset_id),
+    ).fetchone()
+    if counted is None or counted[0] != run_id:
+        return
+    _add_to_totals(connection, run_config_id, json.loads(counted[1]), -1)
+
+    # Count the item's next lowest eval run, if any
+    next_run = connection.execute(
+        "SELECT run_id, scores FROM runs WHERE run_config_id = ? AND dataset_id = ? ORDER BY run_id LIMIT 1",
+        (run_config_id, dataset_id),
+    ).fetchone()
+    if next_run is None:
+        connection.execute(
+            "DELETE FROM items WHERE run_config_id = ? AND dataset_id = ?",
+            (run_config_id, dataset_id),
+        )
+        _add_to_item_count(connection, run_config_id, -1)
+        return
+    connection.execute(
+        "UPDATE items SET run_id = ?, scores = ? WHERE run_config_id = ? AND dataset_id = ?",
+        (next_run[0], next_run[1], run_config_id, dataset_id),
+    )
+    _add_to_totals(connection, run_config_id, json.loads(next_run[1]), 1)
+
+
+def _add_to_totals(
+    connection: sqlite3.Connection,
+    run_config_id: str,
+    scores: "EvalScores",
+    delta: int,
+) -> None:
+    connection.executemany(
+        "INSERT INTO totals (run_config_id, score_key, sum, count) VALUES (?, ?, ?, ?) ON CONFLICT (run_config_id, score_key) DO UPDATE SET sum = sum + excluded.sum, count = count + excluded.count",
+        [
+            (run_config_id, score_key, score * delta, delta)
+            for score_key, score in scores.items()
+        ],
+    )
+    if delta < 0:
+        connection.execute(
+            "DELETE FROM totals WHERE run_config_id = ? AND count <= 0",
+            (run_config_id,),
+        )
+
+
+def _add_to_item_count(
+    connection: sqlite3.Connection, run_config_id: str, delta: int
+) -> None:
+    connection.execute(
+        "INSERT INTO item_counts (run_config_id, count) VALUES (?, ?) ON CONFLICT (run_config_id) DO UPDATE SET count = count + excluded.count",
+        (run_config_id, delta),
+    )
+    if delta < 0:
+        connection.execute(
+            "DELETE FROM item_counts WHERE run_config_id = ? AND count <= 0",
+            (run_config_id,),
+        )
+
+
+def _set_eval_set(connection: sqlite3.Connection, dataset_ids: Set[ID_TYPE]) -> None:
+    # A temp table of the eval set's dataset ids, to join against
+    connection.execute("DELETE FROM eval_set")
+    connection.executemany(
+        "INSERT OR IGNORE INTO eval_set (dataset_id) VALUES (?)",
+        [(dataset_id,) for dataset_id in dataset_ids],
+    )
+    # Temp tables only: commits without locking the database
+    connection.commit()
+
+
+def _eval_set_item_scores(
+    connection: sqlite3.Connection, run_config_id: str
+) -> Iterator[Dict[str, float]]:
+    # The counted scores of each dataset item in the eval set, for a run config
+    for (scores_json,) in connection.execute(
+        "SELECT items.scores FROM eval_set JOIN items ON items.dataset_id = eval_set.dataset_id WHERE items.run_config_id = ? ORDER BY items.dataset_id",
+        (run_config_id,),
+    ):
+        yield json.loads(scores_json)
+
+
+def _summarize(run: "EvalRun") -> SummarizedEvalRun:
+    return SummarizedEvalRun(
+        dataset_id=run.dataset_id,
+        task_run_config_id=run.task_run_config_id,
+        scores=run.scores,
+    )
+
+
+def _runs_by_eval_config(
+    runs: Sequence["EvalRun"],
+) -> List[Tuple["EvalConfig", List["EvalRun"]]]:
+    grouped: Dict[int, Tuple["EvalConfig", List["EvalRun"]]] = {}
+    for run in runs:
+        eval_config = run.parent_eval_config()
+        if eval_config is None:
+            continue
+        grouped.setdefault(id(eval_config), (eval_config, []))[1].append(run)
+    return list(grouped.values())
@@ -42,6 +42,13 @@ class ModelCache:
             cls._shared_instance = cls()
         return cls._shared_instance
 
+    @property
+    def fine_grained_timestamps(self) -> bool:
+        """
+        Whether file mtimes are fine-grained enough to detect changes (if not, caching is disabled). Other caches validated by mtime should check this too.
+        """
+        return self._enabled
+
     def _is_cache_valid(self, path: Path, cached_mtime_ns: int) -> bool:
         try:
             current_mtime_ns = path.stat().st_mtime_ns
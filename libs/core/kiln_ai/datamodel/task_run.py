@@ -1,12 +1,13 @@
 import json
-from typing import TYPE_CHECKING, Dict, List, Union
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Sequence, Union
 
 import jsonschema
 import jsonschema.exceptions
 from pydantic import Field, ValidationInfo, model_validator
 from typing_extensions import Self
 
-from kiln_ai.datamodel.basemodel import KilnParentedModel
+from kiln_ai.datamodel.basemodel import KilnBaseModel, KilnParentedModel
 from kiln_ai.datamodel.json_schema import validate_schema
 from kiln_ai.datamodel.strict_mode import strict_mode
 from kiln_ai.datamodel.task_output import DataSource, TaskOutput
@@ -65,6 +66,44 @@ class TaskRun(KilnParentedModel):
             return None
         return self.parent  # type: ignore
 
+    def save_to_file(self) -> None:
+        # inline import to avoid circular import
+        from kiln_ai.datamodel.task_run_index import TaskRunIndex
+        from kiln_ai.datamodel.task_run_stats import TaskRunStats
+
+        # Keep the task's aggregate run stats and run index up to date, without rescanning all runs
+        with (
+            TaskRunStats.track_runs_change([self]),
+            TaskRunIndex.track_runs_change([self]),
+        ):
+            super().save_to_file()
+
+    @classmethod
+    @contextmanager
+    def track_save_all(cls, models: Sequence[KilnBaseModel]):
+        # inline import to avoid circular import
+        from kiln_ai.datamodel.task_run_index import TaskRunIndex
+        from kiln_ai.datamodel.task_run_stats import TaskRunStats
+
+        # Same as save_to_file, once for the whole batch
+        runs = [model for model in models if isinstance(model, TaskRun)]
+        with (
+            TaskRunStats.track_runs_change(runs),
+            TaskRunIndex.track_runs_change(runs),
+        ):
+            yield
+
+    def delete(self) -> None:
+        # inline import to avoid circular import
+        from kiln_ai.datamodel.task_run_index import TaskRunIndex
+        from kiln_ai.datamodel.task_run_stats import TaskRunStats
+
+        with (
+            TaskRunStats.track_runs_change([self], deleting=True),
+            TaskRunIndex.track_runs_change([self], deleting=True),
+        ):
+            super().delete()
+
     @model_validator(mode="after")
     def validate_input_format(self, info: ValidationInfo) -> Self:
         # Don't validate if loading from file (not new). Too slow.
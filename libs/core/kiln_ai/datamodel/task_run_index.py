@@ -0,0 +1,355 @@
+"""
+Materialized dataset filter membership and ratings of a task's runs, for the eval score summaries.
+
+The summaries need the runs in an eval's dataset filter (its eval set), and for comparing eval configs their human ratings. Finding those by loading every task run is O(runs) file loads, each parsing and validating the run's full input and output. Instead we persist a small SQLite database beside the task, updated incrementally (a few rows per run) as task runs are saved and deleted:
+
+- runs: the human rating of each run
+- tags: the tags of each run, for tag filters
+- members: the runs matching each static dataset filter
+
+Reading the runs in a filter is an indexed query, and ratings are only read for those runs.
+
+The index is a cache of what's on disk: if it's missing, unreadable, the static filters changed, or the runs folder was changed outside of Kiln (detected by the runs folder mtime), it's rebuilt from a full scan. Updates run in a transaction which checks the mtime, so several processes can update one index. The mtime only detects changes on filesystems with fine-grained timestamps: on others the index isn't persisted, and is built from a full scan on each read.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.dataset_filters import DatasetFilterId, static_dataset_filters
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.task_output import TaskOutputRating
+from kiln_ai.datamodel.task_run import TaskRun
+from kiln_ai.datamodel.task_run_stats import runs_by_task
+
+if TYPE_CHECKING:
+    from kiln_ai.datamodel.task import Task
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE_NAME = "task_run_index.sqlite"
+
+# The static filters materialized in the index. If they change, the index is rebuilt.
+STATIC_FILTER_IDS = json.dumps(sorted(id.value for id in static_dataset_filters))
+
+
+class TaskRunIndex:
+    """
+    The dataset filter membership and ratings of a task's runs. Persisted beside the task, or in memory when path is None.
+
+    Safe to share across threads. Close it when done (or use it as a context manager).
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+
+    def __enter__(self) -> "TaskRunIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @classmethod
+    def index_path(cls, task: "Task") -> Path | None:
+        if task.path is None:
+            return None
+        return task.path.parent / INDEX_FILE_NAME
+
+    @classmethod
+    def persistence_enabled(cls) -> bool:
+        # A stale index is detected by the runs folder mtime, which needs fine-grained timestamps (see ModelCache)
+        return ModelCache.shared().fine_grained_timestamps
+
+    @classmethod
+    def runs_folder_mtime(cls, task: "Task") -> int | None:
+        if task.path is None:
+            return None
+        try:
+            return (task.path.parent / TaskRun.relationship_name()).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def for_task(cls, task: "Task") -> "TaskRunIndex":
+        """
+        The index of a task's runs. Rebuilds it from a full scan if missing or stale.
+        """
+        path = cls.index_path(task)
+        if path is None or not cls.persistence_enabled():
+            # Not persisted, compute in memory
+            return cls.build(task)
+
+        index = cls(path)
+        try:
+            if not index._is_current(cls.runs_folder_mtime(task)):
+                index._rebuild(task)
+            return index
+        except sqlite3.Error as e:
+            logger.warning(f"Task run index unavailable, scanning task runs: {e}")
+            index.close()
+            if not isinstance(e, sqlite3.OperationalError):
+                # Not a valid database: drop it, so it's rebuilt on next read
+                path.unlink(missing_ok=True)
+            return cls.build(task)
+
+    @classmethod
+    def build(cls, task: "Task") -> "TaskRunIndex":
+        """
+        Build an in-memory index from a full scan of the task's runs.
+        """
+        index = cls()
+        with index._transaction() as connection:
+            for run in task.runs(readonly=True):
+                _add(connection, run)
+        return index
+
+    def _rebuild(self, task: "Task") -> None:
+        # The mtime from before the scan: a change during it leaves the index stale (rebuilt again), never wrongly current
+        runs_folder_mtime = self.runs_folder_mtime(task)
+        runs = task.runs(readonly=True)
+        with self._transaction() as connection:
+            for table in ["runs", "tags", "members"]:
+                connection.execute(f"DELETE FROM {table}")
+            for run in runs:
+                _add(connection, run)
+            _set_state(connection, runs_folder_mtime)
+
+    @classmethod
+    @contextmanager
+    def track_runs_change(cls, runs: Sequence[TaskRun], deleting: bool = False):
+        """
+        Context manager wrapping a save or delete of task runs (one, or a batch), which incrementally updates the persisted indexes of their tasks.
+
+        Only updates existing indexes. If there isn't one, it's built on next read.
+        """
+        if not cls.persistence_enabled():
+            yield
+            return
+
+        changes: List[Tuple["Task", List[TaskRun], int | None]] = []
+        for task, task_runs in runs_by_task(runs):
+            path = cls.index_path(task)
+            if path is None or not path.exists():
+                continue
+            changes.append((task, task_runs, cls.runs_folder_mtime(task)))
+
+        yield
+
+        for task, task_runs, mtime_before in changes:
+            cls.record_runs_change(task, task_runs, deleting, mtime_before)
+
+    @classmethod
+    def record_runs_change(
+        cls,
+        task: "Task",
+        runs: Sequence[TaskRun],
+        deleting: bool,
+        runs_folder_mtime_before: int | None,
+    ) -> None:
+        """
+        Incrementally update the persisted index for task runs that were saved (created or overwritten) or deleted.
+
+        runs_folder_mtime_before is the runs folder mtime before the change. If the index doesn't match it, something else changed the runs folder and we mark the index stale, to be rebuilt.
+        """
+        path = cls.index_path(task)
+        if path is None:
+            return
+
+        index = cls(path)
+        try:
+            with index._transaction() as connection:
+                if not _is_current(connection, runs_folder_mtime_before):
+                    _mark_stale(connection)
+                    return
+                for run in runs:
+                    if run.id is None:
+                        continue
+                    if deleting:
+                        _remove(connection, run.id)
+                    else:
+                        _add(connection, run)
+                _set_state(connection, cls.runs_folder_mtime(task))
+        except Exception as e:
+            # The index is a cache. Never block saving a run: mark it stale so it's rebuilt on next read.
+            logger.warning(f"Failed to update task run index, will rebuild: {e}")
+            index._invalidate()
+        finally:
+            index.close()
+
+    def _invalidate(self) -> None:
+        try:
+            with self._transaction() as connection:
+                _mark_stale(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to mark task run index stale: {e}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Must hold the lock. Opened on first use.
+        if self._connection is None:
+            if self.path is None:
+                connection = sqlite3.connect(":memory:", check_same_thread=False)
+            else:
+                connection = sqlite3.connect(
+                    self.path, timeout=30, check_same_thread=False
+                )
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            try:
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS state (
+                        id INTEGER PRIMARY KEY CHECK (id = 0),
+                        runs_folder_mtime_ns INTEGER,
+                        static_filter_ids TEXT NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS runs (
+                        run_id TEXT PRIMARY KEY,
+                        rating TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS tags (
+                        tag TEXT NOT NULL,
+                        run_id TEXT NOT NULL,
+                        PRIMARY KEY (tag, run_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS tags_run ON tags (run_id);
+                    CREATE TABLE IF NOT EXISTS members (
+                        filter_id TEXT NOT NULL,
+                        run_id TEXT NOT NULL,
+                        PRIMARY KEY (filter_id, run_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS members_run ON members (run_id);
+                    """
+                )
+            except sqlite3.Error:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Immediate: take the write lock before reading, so read-modify-writes from other processes can't interleave
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+
+    def _is_current(self, runs_folder_mtime: int | None) -> bool:
+        with self._lock:
+            return _is_current(self._connect(), runs_folder_mtime)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add(self, run: TaskRun) -> None:
+        """
+        Add a task run to the index, replacing any previous version of it.
+        """
+        with self._transaction() as connection:
+            _add(connection, run)
+
+    def run_ids(self, filter_id: DatasetFilterId) -> Set[ID_TYPE]:
+        """
+        The IDs of the task runs in a dataset filter. Same result as applying dataset_filter_from_id(filter_id) to every run.
+
+        Raises:
+            ValueError: If the filter ID is invalid
+        """
+        with self._lock:
+            connection = self._connect()
+            if filter_id.startswith("tag::") and len(filter_id) > 5:
+                rows: Iterable[Tuple[str]] = connection.execute(
+                    "SELECT run_id FROM tags WHERE tag = ?", (filter_id[5:],)
+                )
+            elif filter_id in static_dataset_filters:
+                rows = connection.execute(
+                    "SELECT run_id FROM members WHERE filter_id = ?", (filter_id,)
+                )
+            else:
+                raise ValueError(f"Invalid dataset filter ID: {filter_id}")
+            return {run_id for (run_id,) in rows}
+
+    def ratings(self, run_ids: Set[ID_TYPE]) -> Dict[ID_TYPE, TaskOutputRating | None]:
+        """
+        run ID -> the human rating of its output (None if unrated), for the given runs that are in the index.
+        """
+        ratings: Dict[ID_TYPE, TaskOutputRating | None] = {}
+        with self._lock:
+            connection = self._connect()
+            for run_id in run_ids:
+                row = connection.execute(
+                    "SELECT rating FROM runs WHERE run_id = ?", (run_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                ratings[run_id] = (
+                    TaskOutputRating.model_validate_json(row[0])
+                    if row[0] is not None
+                    else None
+                )
+        return ratings
+
+
+def _is_current(connection: sqlite3.Connection, runs_folder_mtime: int | None) -> bool:
+    row = connection.execute(
+        "SELECT runs_folder_mtime_ns, static_filter_ids FROM state WHERE id = 0"
+    ).fetchone()
+    return (
+        row is not None and row[0] == runs_folder_mtime and row[1] == STATIC_FILTER_IDS
+    )
+
+
+def _set_state(connection: sqlite3.Connection, runs_folder_mtime: int | None) -> None:
+    # A missing runs folder is a NULL mtime
+    connection.execute(
+        "INSERT OR REPLACE INTO state (id, runs_folder_mtime_ns, static_filter_ids) VALUES (0, ?, ?)",
+        (runs_folder_mtime, STATIC_FILTER_IDS),
+    )
+
+
+def _mark_stale(connection: sqlite3.Connection) -> None:
+    # No state row: rebuilt on next read
+    connection.execute("DELETE FROM state")
+
+
+def _add(connection: sqlite3.Connection, run: TaskRun) -> None:
+    if run.id is None:
+        return
+    _remove(connection, run.id)
+    rating = run.output.rating if run.output else None
+    connection.execute(
+        "INSERT INTO runs (run_id, rating) VALUES (?, ?)",
+        (run.id, rating.model_dump_json() if rating is not None else None),
+    )
+    connection.executemany(
+        "INSERT OR IGNORE INTO tags (tag, run_id) VALUES (?, ?)",
+        [(tag, run.id) for tag in run.tags],
+    )
+    connection.executemany(
+        "INSERT INTO members (filter_id, run_id) VALUES (?, ?)",
+        [
+            (filter_id.value, run.id)
+            for filter_id, dataset_filter in static_dataset_filters.items()
+            if dataset_filter(run)
+        ],
+    )
+
+
+def _remove(connection: sqlite3.Connection, run_id: str) -> None:
+    for table in ["runs", "tags", "members"]:
+        connection.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
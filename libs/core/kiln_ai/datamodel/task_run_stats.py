@@ -0,0 +1,306 @@
+"""
+Aggregate counts of a task's runs (by rating, tag, model, input source and repair state).
+
+Computing these by loading every run is O(runs). Instead we persist the counts in a small JSON file beside the task, and update them incrementally as task runs are saved and deleted. Reading the stats is O(buckets).
+
+The stats file is a cache of what's on disk: if it's missing, unreadable, or the runs folder was changed outside of Kiln (detected by the runs folder mtime), it's rebuilt from a full scan. The mtime only detects changes on filesystems with fine-grained timestamps: on others stats aren't persisted, and are built from a full scan on each read.
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from kiln_ai.datamodel.datamodel_enums import TaskOutputRatingType
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.datamodel.task_run import TaskRun
+from kiln_ai.utils.file_lock import exclusive_file_lock
+
+if TYPE_CHECKING:
+    from kiln_ai.datamodel.task import Task
+
+logger = logging.getLogger(__name__)
+
+# Read-modify-write of stats files must not interleave. This lock covers threads of this process, and a lock file other processes.
+_stats_lock = threading.Lock()
+
+UNKNOWN_BUCKET = "unknown"
+UNRATED_BUCKET = "unrated"
+
+
+class TaskRunStatDimension(str, Enum):
+    """The dimensions we count task runs by."""
+
+    rating = "rating"
+    tag = "tag"
+    model_name = "model_name"
+    input_source = "input_source"
+    repair_state = "repair_state"
+
+
+def repair_status_display_name(run: TaskRun) -> str:
+    """
+    A user facing description of the repair state of a run.
+    """
+    if run.repair_instructions:
+        return "Repaired"
+    elif run.output and not run.output.rating:
+        return "Rating needed"
+    elif not run.output or not run.output.output:
+        return "No output"
+    elif (
+        run.output.rating
+        and run.output.rating.value == 5.0
+        and run.output.rating.type == TaskOutputRatingType.five_star
+    ):
+        return "No repair needed"
+    elif run.output.rating and run.output.rating.type != TaskOutputRatingType.five_star:
+        return "Unknown"
+    elif run.output.output:
+        return "Repair needed"
+    return "Unknown"
+
+
+def run_model_name(run: TaskRun) -> str | None:
+    model_name = (
+        run.output.source.properties.get("model_name")
+        if run.output and run.output.source and run.output.source.properties
+        else None
+    )
+    if not isinstance(model_name, str):
+        return None
+    return model_name
+
+
+def run_stat_buckets(run: TaskRun) -> Dict[TaskRunStatDimension, List[str]]:
+    """
+    The buckets a run is counted in, for each dimension. A run is counted once per tag.
+    """
+    rating = run.output.rating if run.output else None
+    rating_bucket = UNRATED_BUCKET
+    if rating is not None and rating.value is not None:
+        rating_bucket = f"{rating.type.value}:{rating.value:g}"
+
+    return {
+        TaskRunStatDimension.rating: [rating_bucket],
+        TaskRunStatDimension.tag: sorted(set(run.tags)),
+        TaskRunStatDimension.model_name: [run_model_name(run) or UNKNOWN_BUCKET],
+        TaskRunStatDimension.input_source: [
+            run.input_source.type.value if run.input_source else UNKNOWN_BUCKET
+        ],
+        TaskRunStatDimension.repair_state: [repair_status_display_name(run)],
+    }
+
+
+def runs_by_task(runs: Sequence[TaskRun]) -> List[Tuple["Task", List[TaskRun]]]:
+    """
+    Group runs by their parent task, skipping runs without one.
+    """
+    grouped: Dict[int, Tuple["Task", List[TaskRun]]] = {}
+    for run in runs:
+        task = run.parent_task()
+        if task is None:
+            continue
+        grouped.setdefault(id(task), (task, []))[1].append(run)
+    return list(grouped.values())
+
+
+def _load_previous(run: TaskRun) -> TaskRun | None:
+    # The saved version of a run, which a save overwrites or a delete removes
+    run_path = run.build_path()
+    if run_path is None or not run_path.exists():
+        return None
+    return TaskRun.load_from_file(run_path, readonly=True)
+
+
+class TaskRunStats(BaseModel):
+    """
+    Counts of a task's runs, by dimension and bucket.
+
+    Example: counts["tag"]["needs_review"] == 12
+    """
+
+    v: int = Field(default=1, description="Schema version of the stats file.")
+    total: int = Field(default=0, description="The number of runs in the task.")
+    counts: Dict[TaskRunStatDimension, Dict[str, int]] = Field(
+        default_factory=lambda: {dimension: {} for dimension in TaskRunStatDimension},
+        description="dimension -> bucket -> count of runs in that bucket.",
+    )
+    runs_folder_mtime_ns: int | None = Field(
+        default=None,
+        description="The mtime of the runs folder when last updated. Used to detect runs added or removed outside of Kiln.",
+    )
+
+    @classmethod
+    def stats_path(cls, task: "Task") -> Path | None:
+        if task.path is None:
+            return None
+        return task.path.parent / "task_run_stats.json"
+
+    @classmethod
+    def persistence_enabled(cls) -> bool:
+        # Stale stats are detected by the runs folder mtime, which needs fine-grained timestamps (see ModelCache)
+        return ModelCache.shared().fine_grained_timestamps
+
+    @classmethod
+    def runs_folder_mtime(cls, task: "Task") -> int | None:
+        if task.path is None:
+            return None
+        try:
+            return (task.path.parent / TaskRun.relationship_name()).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def for_task(cls, task: "Task") -> "TaskRunStats":
+        """
+        Load the stats for a task. Rebuilds them from a full scan if missing or stale.
+        """
+        path = cls.stats_path(task)
+        if path is None or not cls.persistence_enabled():
+            # Not persisted, compute in memory
+            return cls.build(task)
+
+        with cls._locked(path):
+            stats = cls._load(path)
+            if stats is None or stats.runs_folder_mtime_ns != cls.runs_folder_mtime(
+                task
+            ):
+                stats = cls.build(task)
+                stats._save(path)
+            return stats
+
+    @classmethod
+    def build(cls, task: "Task") -> "TaskRunStats":
+        """
+        Build stats from a full scan of the task's runs.
+        """
+        stats = cls(runs_folder_mtime_ns=cls.runs_folder_mtime(task))
+        for run in task.runs(readonly=True):
+            stats.apply(run, 1)
+        return stats
+
+    @classmethod
+    @contextmanager
+    def track_runs_change(cls, runs: Sequence[TaskRun], deleting: bool = False):
+        """
+        Context manager wrapping a save or delete of runs (one, or a batch), which incrementally updates the persisted stats of their tasks.
+
+        Only updates existing stats files. If there isn't one, it's built on next read.
+        """
+        if not cls.persistence_enabled():
+            yield
+            return
+
+        # task -> the (previous, current) version of each changed run, and the runs folder mtime before the change
+        changes: List[
+            Tuple["Task", List[Tuple[TaskRun | None, TaskRun | None]], int | None]
+        ] = []
+        for task, task_runs in runs_by_task(runs):
+            path = cls.stats_path(task)
+            if path is None or not path.exists():
+                continue
+            runs_folder_mtime_before = cls.runs_folder_mtime(task)
+            try:
+                task_changes = [
+                    (_load_previous(run), None if deleting else run)
+                    for run in task_runs
+                ]
+            except Exception as e:
+                logger.warning(
+                    f"Failed to load previous run for stats, will rebuild: {e}"
+                )
+                cls._invalidate(path)
+                continue
+            changes.append((task, task_changes, runs_folder_mtime_before))
+
+        yield
+
+        for task, task_changes, runs_folder_mtime_before in changes:
+            cls.record_runs_change(task, task_changes, runs_folder_mtime_before)
+
+    @classmethod
+    def record_runs_change(
+        cls,
+        task: "Task",
+        changes: Sequence[Tuple[TaskRun | None, TaskRun | None]],
+        runs_folder_mtime_before: int | None,
+    ) -> None:
+        """
+        Incrementally update the persisted stats for runs that were saved, created or deleted. Each change is (previous, current): previous -> current for a save, None -> current for a create, and previous -> None for a delete.
+
+        runs_folder_mtime_before is the runs folder mtime before the changes. If the stats don't match it, something else changed the runs folder and we drop the stats to be rebuilt.
+        """
+        path = cls.stats_path(task)
+        if path is None:
+            return
+
+        with cls._locked(path):
+            try:
+                stats = cls._load(path)
+                if stats is None:
+                    return
+                if stats.runs_folder_mtime_ns != runs_folder_mtime_before:
+                    cls._invalidate(path)
+                    return
+                for previous, current in changes:
+                    if previous is not None:
+                        stats.apply(previous, -1)
+                    if current is not None:
+                        stats.apply(current, 1)
+                stats.runs_folder_mtime_ns = cls.runs_folder_mtime(task)
+                stats._save(path)
+            except Exception as e:
+                # Stats are a cache. Never block saving a run: drop the file so it's rebuilt on next read.
+                logger.warning(f"Failed to update task run stats, will rebuild: {e}")
+                cls._invalidate(path)
+
+    @classmethod
+    @contextmanager
+    def _locked(cls, path: Path):
+        # Excludes other threads and processes (eg eval workers sharing the project). Not reentrant.
+        with _stats_lock, exclusive_file_lock(path.with_suffix(".lock")):
+            yield
+
+    @classmethod
+    def _invalidate(cls, path: Path) -> None:
+        # Atomic, so needs no lock
+        path.unlink(missing_ok=True)
+
+    def apply(self, run: TaskRun, delta: int) -> None:
+        """
+        Add (delta=1) or remove (delta=-1) a run from the counts.
+        """
+        self.total += delta
+        for dimension, buckets in run_stat_buckets(run).items():
+            dimension_counts = self.counts.setdefault(dimension, {})
+            for bucket in buckets:
+                count = dimension_counts.get(bucket, 0) + delta
+                if count > 0:
+                    dimension_counts[bucket] = count
+                else:
+                    dimension_counts.pop(bucket, None)
+
+    @classmethod
+    def _load(cls, path: Path) -> "TaskRunStats | None":
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                return cls.model_validate(json.load(file))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Invalid task run stats file, will rebuild: {e}")
+            return None
+
+    def _save(self, path: Path) -> None:
+        # Write and rename, so readers never see a partial file
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.model_dump_json(indent=2))
+        os.replace(tmp_path, path)
@@ -196,6 +196,47 @@ def test_serialize_child(tmp_path):
     assert data["name"] == "Name2"
 
 
+def test_save_all_to_file(tmp_path):
+    parent = BaseParentExample(path=tmp_path)
+    children = [DefaultParentedModel(parent=parent, name=f"Name {i}") for i in range(3)]
+    expected_paths = [child.build_path() for child in children]
+
+    KilnBaseModel.save_all_to_file(children)
+
+    for child, expected_path in zip(children, expected_paths):
+        assert child.path == expected_path
+        with open(child.path, "r") as file:
+            data = json.load(file)
+        assert data["id"] == child.id
+        assert data["name"] == child.name
+
+    # Same files as saving one at a time
+    for child in children:
+        assert DefaultParentedModel.load_from_file(child.path).id == child.id
+
+    KilnBaseModel.save_all_to_file([])
+
+
+def test_save_all_to_file_checks_paths_first(tmp_path):
+    parent = BaseParentExample(path=tmp_path)
+    saveable = DefaultParentedModel(parent=parent, name="Saveable")
+    orphan = DefaultParentedModel(name="Orphan")
+
+    with pytest.raises(ValueError, match="path"):
+        KilnBaseModel.save_all_to_file([saveable, orphan])
+    # Nothing saved
+    assert saveable.path is None
+    assert not saveable.build_path().exists()
+
+
+def test_save_all_to_file_invalidates_cache(tmp_path, tmp_model_cache):
+    models = [KilnBaseModel(path=tmp_path / f"model_{i}.kiln") for i in range(2)]
+    tmp_model_cache.invalidate = MagicMock()
+    KilnBaseModel.save_all_to_file(models)
+    for model in models:
+        tmp_model_cache.invalidate.assert_any_call(model.path)
+
+
 def test_save_to_set_location(tmp_path):
     # Keeps the OG path if parent and path are both set
     parent = BaseParentExample(path=tmp_path)
@@ -479,6 +520,129 @@ def test_from_id_and_parent_path_without_parent():
     assert not_found is None
 
 
+def test_from_ids_and_parent_path(test_base_parented_file):
+    parent = BaseParentExample.load_from_file(test_base_parented_file)
+    children = [DefaultParentedModel(parent=parent, name=f"Child{i}") for i in range(5)]
+    for child in children:
+        child.save_to_file()
+
+    ids = {children[1].id, children[3].id, "nonexistent"}
+    with patch.object(
+        DefaultParentedModel,
+        "load_from_file",
+        wraps=DefaultParentedModel.load_from_file,
+    ) as mock_load:
+        found = DefaultParentedModel.from_ids_and_parent_path(
+            ids, test_base_parented_file
+        )
+    assert set(found.keys()) == {children[1].id, children[3].id}
+    assert found[children[1].id].name == "Child1"
+    assert found[children[3].id].name == "Child3"
+    # Matching folders loaded, then a full pass looking for the missing ID
+    assert mock_load.call_count == 5
+
+    # All found by folder name: only the matching files are loaded
+    with patch.object(
+        DefaultParentedModel,
+        "load_from_file",
+        wraps=DefaultParentedModel.load_from_file,
+    ) as mock_load:
+        found = DefaultParentedModel.from_ids_and_parent_path(
+            {children[0].id, children[4].id}, test_base_parented_file
+        )
+    assert set(found.keys()) == {children[0].id, children[4].id}
+    assert mock_load.call_count == 2
+
+
+def test_from_ids_and_parent_path_renamed_folder(test_base_parented_file):
+    parent = BaseParentExample.load_from_file(test_base_parented_file)
+    child = DefaultParentedModel(parent=parent, name="Child")
+    child.save_to_file()
+    other = DefaultParentedModel(parent=parent, name="Other")
+    other.save_to_file()
+
+    # The in-file ID is the source of truth, not the folder name
+    renamed_folder = child.path.parent.parent / "renamed"
+    child.path.parent.rename(renamed_folder)
+
+    found = DefaultParentedModel.from_ids_and_parent_path(
+        {child.id}, test_base_parented_file
+    )
+    assert list(found.keys()) == [child.id]
+    assert found[child.id].path == renamed_folder / "default_parented_model.kiln"
+
+
+def test_from_ids_and_parent_path_empty():
+    assert DefaultParentedModel.from_ids_and_parent_path({"any-id"}, None) == {}
+
+
+def test_load_fields_from_file(test_base_parented_file):
+    parent = BaseParentExample.load_from_file(test_base_parented_file)
+    child = DefaultParentedModel(parent=parent, name="Child")
+    child.save_to_file()
+
+    fields = {"id", "name", "created_at", "path", "model_type"}
+    loaded = DefaultParentedModel.load_fields_from_file(child.path, fields)
+    assert loaded == child.model_dump(mode="json", include=fields)
+    # Same order as model_dump
+    assert list(loaded.keys()) == list(
+        child.model_dump(mode="json", include=fields).keys()
+    )
+
+
+def test_load_fields_from_file_default_for_missing_field(test_base_parented_file):
+    # Older files may not have newer fields
+    loaded = BaseParentExample.load_fields_from_file(
+        test_base_parented_file, {"v", "name"}
+    )
+    assert loaded == {"v": 1, "name": None}
+
+
+def test_load_fields_from_file_errors(test_base_file, test_base_parented_file):
+    with pytest.raises(ValueError, match="Unknown fields for KilnBaseModel: nope"):
+        KilnBaseModel.load_fields_from_file(test_base_file, {"id", "nope"})
+    with pytest.raises(ValueError, match="model type is incorrect"):
+        KilnBaseModel.load_fields_from_file(test_base_parented_file, {"id"})
+
+
+def test_load_fields_from_file_with_cache(test_base_file, tmp_model_cache):
+    model = KilnBaseModel.load_from_file(test_base_file)
+    with patch("builtins.open") as mock_open:
+        loaded = KilnBaseModel.load_fields_from_file(test_base_file, {"id"})
+        mock_open.assert_not_called()
+    assert loaded == {"id": model.id}
+
+
+def test_load_fields_upgrades_nested_models(tmp_path):
+    # Old format requirement ratings are upgraded when loading the output field
+    task = Task(name="Test Task", instruction="Test", path=tmp_path / "task.kiln")
+    task.save_to_file()
+    run = TaskRun(
+        parent=task,
+        input="input",
+        output={
+            "output": "output",
+            "source": {"type": "human", "properties": {"created_by": "me"}},
+        },
+    )
+    run.save_to_file()
+    with open(run.path, "r") as file:
+        data = json.load(file)
+    data["output"]["rating"] = {
+        "value": 4.0,
+        "type": "five_star",
+        "requirement_ratings": {"req1": 5.0},
+    }
+    with open(run.path, "w") as file:
+        json.dump(data, file)
+
+    loaded = TaskRun.all_children_fields_of_parent_path(task.path, {"output"})
+    assert len(loaded) == 1
+    assert loaded[0]["output"]["rating"]["requirement_ratings"] == {
+        "req1": {"value": 5.0, "type": "five_star"}
+    }
+
+
 class MockAdapter(BaseAdapter):
     """Implementation of BaseAdapter for testing"""
 
@@ -17,6 +17,7 @@ from kiln_ai.datamodel.dataset_split import (
     AllSplitDefinition,
     Train60Test20Val20SplitDefinition,
     Train80Test20SplitDefinition,
+    near_duplicate_run_clusters,
 )
 from kiln_ai.datamodel.test_dataset_filters import (
     AllDatasetFilter,
@@ -353,3 +354,85 @@ def test_tag_dataset_filter(sample_task_runs):
 
     assert num_tagged == 6
     assert num_untagged == 4
+
+
+@pytest.fixture
+def near_duplicate_task_runs(sample_task):
+    # 4 groups of 5 runs each. Runs in a group have near-duplicate inputs.
+    base_inputs = [
+        "Write a short poem about the ocean waves crashing on the rocky shore at night",
+        "Summarize the quarterly earnings report for the board of directors meeting tomorrow",
+        "Translate the following customer support email from French into plain English please",
+        "Explain how photosynthesis works to a curious ten year old student in class",
+    ]
+    task_runs = []
+    for group, base_input in enumerate(base_inputs):
+        for variant in range(5):
+            task_run = TaskRun(
+                parent=sample_task,
+                input=base_input + ("!" * variant),
+                input_source=DataSource(
+                    type=DataSourceType.human,
+                    properties={"created_by": "test-user"},
+                ),
+                output=TaskOutput(
+                    output=f"output_{group}_{variant}",
+                    source=DataSource(
+                        type=DataSourceType.human,
+                        properties={"created_by": "test-user"},
+                    ),
+                ),
+            )
+            task_run.save_to_file()
+            task_runs.append(task_run)
+    return task_runs
+
+
+def test_near_duplicate_run_clusters(near_duplicate_task_runs):
+    clusters = near_duplicate_run_clusters(near_duplicate_task_runs)
+    assert len(clusters) == 4
+    expected = [
+        sorted(run.id for run in near_duplicate_task_runs[i : i + 5])
+        for i in range(0, 20, 5)
+    ]
+    assert sorted(sorted(cluster) for cluster in clusters) == sorted(expected)
+
+
+def test_dataset_split_keeps_near_duplicates_together(
+    sample_task, near_duplicate_task_runs
+):
+    dataset = DatasetSplit.from_task(
+        "Split Name",
+        sample_task,
+        Train80Test20SplitDefinition,
+        near_duplicate_threshold=0.8,
+    )
+
+    # Each near-duplicate cluster lands entirely in one split
+    run_to_split = {
+        run_id: split_name
+        for split_name, ids in dataset.split_contents.items()
+        for run_id in ids
+    }
+    assert len(run_to_split) == len(near_duplicate_task_runs)
+    for i in range(0, 20, 5):
+        group_splits = {
+            run_to_split[run.id] for run in near_duplicate_task_runs[i : i + 5]
+        }
+        assert len(group_splits) == 1
+
+    # With 4 equal clusters, the best 80/20 split is 3 clusters to train, 1 to test
+    assert len(dataset.split_contents["train"]) == 15
+    assert len(dataset.split_contents["test"]) == 5
+
+
+def test_dataset_split_near_duplicates_singletons(sample_task, sample_task_runs):
+    # No near-duplicates: behaves like a normal split
+    dataset = DatasetSplit.from_task(
+        "Split Name",
+        sample_task,
+        Train80Test20SplitDefinition,
+        near_duplicate_threshold=0.8,
+    )
+    assert len(dataset.split_contents["train"]) == 8
+    assert len(dataset.split_contents["test"]) == 2
@@ -0,0 +1,351 @@
+import os
+import sqlite3
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import Project, Task
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+from kiln_ai.datamodel.eval import (
+    Eval,
+    EvalConfig,
+    EvalConfigType,
+    EvalOutputScore,
+    EvalRun,
+)
+from kiln_ai.datamodel.eval_score_summary import EvalScoreSummary, SummarizedEvalRun
+from kiln_ai.datamodel.task_output import TaskOutputRatingType
+from kiln_ai.datamodel.write_behind import WriteBehindWriter
+
+
+@pytest.fixture(autouse=True)
+def persisted_summaries():
+    # Persist summaries, whatever the timestamp granularity of the test filesystem
+    with patch.object(EvalScoreSummary, "persistence_enabled", return_value=True):
+        yield
+
+
+@pytest.fixture
+def eval_config(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Test instruction", parent=project)
+    task.save_to_file()
+    eval = Eval(
+        name="Test Eval",
+        parent=task,
+        eval_set_filter_id="tag::eval_set",
+        eval_configs_filter_id="tag::golden",
+        output_scores=[
+            EvalOutputScore(name="accuracy", type=TaskOutputRatingType.five_star),
+            EvalOutputScore(name="relevance", type=TaskOutputRatingType.five_star),
+        ],
+    )
+    eval.save_to_file()
+    eval_config = EvalConfig(
+        name="Test Eval Config",
+        parent=eval,
+        config_type=EvalConfigType.g_eval,
+        properties={"eval_steps": ["step1"]},
+        model_name="gpt_4o",
+        model_provider="openai",
+    )
+    eval_config.save_to_file()
+    return eval_config
+
+
+def make_run(
+    eval_config: EvalConfig,
+    dataset_id: str,
+    run_config_id: str | None,
+    accuracy: float,
+    relevance: float = 3.0,
+) -> EvalRun:
+    return EvalRun(
+        parent=eval_config,
+        dataset_id=dataset_id,
+        task_run_config_id=run_config_id,
+        eval_config_eval=run_config_id is None,
+        input="input",
+        output="output",
+        scores={"accuracy": accuracy, "relevance": relevance},
+    )
+
+
+def summarized(
+    dataset_id: str, run_config_id: str | None, **scores: float
+) -> SummarizedEvalRun:
+    return SummarizedEvalRun(
+        dataset_id=dataset_id, task_run_config_id=run_config_id, scores=scores
+    )
+
+
+SCORE_KEYS = ["accuracy", "relevance"]
+
+
+def summary_contents(summary: EvalScoreSummary) -> dict:
+    # Everything the summary answers, over every dataset item it has
+    dataset_ids = set().union(*summary.dataset_ids_by_run_config().values())
+    return {
+        "dataset_ids": summary.dataset_ids_by_run_config(),
+        "scores": summary.scores_by_dataset_id(),
+        "run_config_scores": summary.run_config_scores(dataset_ids, SCORE_KEYS),
+    }
+
+
+def stored_summary(eval_config: EvalConfig) -> EvalScoreSummary:
+    # The persisted summary as is, without checking it's current
+    path = EvalScoreSummary.summary_path(eval_config)
+    assert path is not None and path.exists()
+    return EvalScoreSummary(path)
+
+
+def assert_matches_full_scan(eval_config: EvalConfig):
+    with (
+        stored_summary(eval_config) as summary,
+        EvalScoreSummary.build(eval_config) as rebuilt,
+    ):
+        assert summary._is_current(EvalScoreSummary.runs_folder_mtime(eval_config))
+        assert summary_contents(summary) == summary_contents(rebuilt)
+
+
+def test_build_and_persist(eval_config):
+    make_run(eval_config, "d1", "rc1", 4.0).save_to_file()
+    make_run(eval_config, "d2", "rc1", 2.0).save_to_file()
+    make_run(eval_config, "d1", "rc2", 5.0).save_to_file()
+    make_run(eval_config, "d1", None, 1.0).save_to_file()
+
+    path = EvalScoreSummary.summary_path(eval_config)
+    assert path is not None
+    assert not path.exists()
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert path.exists()
+        assert summary.dataset_ids_by_run_config() == {
+            "rc1": {"d1", "d2"},
+            "rc2": {"d1"},
+            None: {"d1"},
+        }
+
+        # Eval config evals (no run config) aren't in the run config scores
+        scores = summary.run_config_scores({"d1", "d2"}, SCORE_KEYS)
+        assert scores.keys() == {"rc1", "rc2"}
+        assert scores["rc1"].mean_scores == {"accuracy": 3.0, "relevance": 3.0}
+        assert scores["rc1"].dataset_item_count == 2
+        assert scores["rc1"].incomplete_count == 0
+        assert scores["rc2"].mean_scores == {"accuracy": 5.0, "relevance": 3.0}
+        assert scores["rc2"].dataset_item_count == 1
+
+    # Read back without rebuilding
+    with patch.object(
+        EvalScoreSummary, "_rebuild", side_effect=AssertionError("Should not rebuild")
+    ):
+        with EvalScoreSummary.for_eval_config(eval_config) as summary:
+            assert len(summary.scores_by_dataset_id()) == 2
+
+
+def test_incremental_save_and_delete(eval_config):
+    first = make_run(eval_config, "d1", "rc1", 4.0)
+    first.save_to_file()
+    # Create the summary, so later saves update it
+    EvalScoreSummary.for_eval_config(eval_config).close()
+
+    # From here on, updates must be incremental: fail if we rescan the runs
+    with patch.object(
+        EvalScoreSummary, "_rebuild", side_effect=AssertionError("Should not rebuild")
+    ):
+        second = make_run(eval_config, "d2", "rc1", 2.0)
+        second.save_to_file()
+        with EvalScoreSummary.for_eval_config(eval_config) as summary:
+            scores = summary.run_config_scores({"d1", "d2"}, ["accuracy"])
+            assert scores["rc1"].mean_scores == {"accuracy": 3.0}
+        assert_matches_full_scan(eval_config)
+
+        # Overwriting replaces the previous scores
+        second.scores = {"accuracy": 5.0, "relevance": 3.0}
+        second.save_to_file()
+        with EvalScoreSummary.for_eval_config(eval_config) as summary:
+            scores = summary.run_config_scores({"d1", "d2"}, ["accuracy"])
+            assert scores["rc1"].mean_scores == {"accuracy": 4.5}
+        assert_matches_full_scan(eval_config)
+
+        first.delete()
+        with EvalScoreSummary.for_eval_config(eval_config) as summary:
+            scores = summary.run_config_scores({"d1", "d2"}, ["accuracy"])
+            assert scores["rc1"].mean_scores == {"accuracy": 5.0}
+            assert scores["rc1"].dataset_item_count == 1
+        assert_matches_full_scan(eval_config)
+
+
+def test_batch_save_updates_summary(eval_config):
+    make_run(eval_config, "d0", "rc1", 1.0).save_to_file()
+    EvalScoreSummary.for_eval_config(eval_config).close()
+
+    runs = [make_run(eval_config, f"d{i}", "rc1", 2.0) for i in range(1, 11)]
+    with WriteBehindWriter(batch_size=4) as writer:
+        for run in runs:
+            writer.submit(run)
+    assert writer.saved == 10
+
+    with stored_summary(eval_config) as summary:
+        scores = summary.run_config_scores({f"d{i}" for i in range(11)}, ["accuracy"])
+        assert scores["rc1"].dataset_item_count == 11
+        assert scores["rc1"].mean_scores == {"accuracy": pytest.approx(21.0 / 11)}
+    assert_matches_full_scan(eval_config)
+
+    # Batches of other models are unaffected
+    KilnBaseModel.save_all_to_file(
+        [KilnBaseModel(path=eval_config.path.parent / "other.kiln")]
+    )
+
+
+def test_duplicates_count_lowest_run_id():
+    summary = EvalScoreSummary()
+    summary.add("b", summarized("d1", "rc1", accuracy=2.0))
+    summary.add("a", summarized("d1", "rc1", accuracy=4.0))
+    summary.add("c", summarized("d1", "rc1", accuracy=5.0))
+    # One item, counted with the lowest id's scores
+    scores = summary.run_config_scores({"d1"}, ["accuracy"])
+    assert scores["rc1"].dataset_item_count == 1
+    assert scores["rc1"].mean_scores == {"accuracy": 4.0}
+    assert summary.scores_by_dataset_id() == {"d1": {"accuracy": 4.0}}
+
+    # Removing the counted run counts the next lowest
+    summary.remove("a")
+    assert summary.run_config_scores({"d1"}, ["accuracy"])["rc1"].mean_scores == {
+        "accuracy": 2.0
+    }
+    summary.remove("c")
+    summary.remove("b")
+    # Removing a run that isn't there is a no-op
+    summary.remove("b")
+    assert summary.dataset_ids_by_run_config() == {}
+    assert summary.run_config_scores({"d1"}, ["accuracy"]) == {}
+
+
+def test_run_config_scores_excluded_and_incomplete():
+    summary = EvalScoreSummary()
+    summary.add("1", summarized("d1", "rc1", accuracy=4.0, relevance=2.0))
+    summary.add("2", summarized("d2", "rc1", accuracy=2.0))
+    # Not in the eval set
+    summary.add("3", summarized("d3", "rc1", accuracy=1.0, relevance=1.0))
+    summary.add("4", summarized("d1", "rc2", other=1.0))
+
+    scores = summary.run_config_scores({"d1", "d2"}, SCORE_KEYS)
+    assert scores["rc1"].mean_scores == {"accuracy": 3.0, "relevance": 2.0}
+    assert scores["rc1"].dataset_item_count == 2
+    assert scores["rc1"].incomplete_count == 1
+    assert scores["rc2"].mean_scores == {}
+    assert scores["rc2"].dataset_item_count == 1
+    assert scores["rc2"].incomplete_count == 1
+
+    # Excluding an item entirely leaves the run config with no items
+    scores = summary.run_config_scores({"d3"}, ["accuracy"])
+    assert scores["rc2"].dataset_item_count == 0
+    assert scores["rc1"].mean_scores == {"accuracy": 1.0}
+
+
+def test_rebuilds_when_changed_outside_kiln(eval_config):
+    make_run(eval_config, "d1", "rc1", 4.0).save_to_file()
+    EvalScoreSummary.for_eval_config(eval_config).close()
+
+    # Remove a run without going through Kiln, and make sure the mtime moves
+    runs_folder = eval_config.path.parent / EvalRun.relationship_name()
+    time.sleep(0.01)
+    for run_folder in runs_folder.iterdir():
+        for file in run_folder.iterdir():
+            file.unlink()
+        run_folder.rmdir()
+    os.utime(runs_folder, ns=(time.time_ns(), time.time_ns()))
+
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert summary.dataset_ids_by_run_config() == {}
+
+    # Saving a run when the summary doesn't match the runs folder marks it stale, rather than updating it
+    path = EvalScoreSummary.summary_path(eval_config)
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE state SET runs_folder_mtime_ns = 1")
+    make_run(eval_config, "d2", "rc1", 2.0).save_to_file()
+    with stored_summary(eval_config) as summary:
+        assert not summary._is_current(1)
+        assert summary.dataset_ids_by_run_config() == {}
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert summary.dataset_ids_by_run_config() == {"rc1": {"d2"}}
+    assert_matches_full_scan(eval_config)
+
+
+def test_corrupt_summary_rebuilt(eval_config):
+    make_run(eval_config, "d1", "rc1", 4.0).save_to_file()
+    path = EvalScoreSummary.summary_path(eval_config)
+    assert path is not None
+    path.write_text("not a database")
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert summary.dataset_ids_by_run_config() == {"rc1": {"d1"}}
+    # Dropped, and rebuilt on the next read
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert summary.dataset_ids_by_run_config() == {"rc1": {"d1"}}
+    assert_matches_full_scan(eval_config)
+
+
+def test_coarse_timestamps_not_persisted(eval_config):
+    # Without fine-grained timestamps the mtime can't detect changes: every read is a full scan
+    with patch.object(EvalScoreSummary, "persistence_enabled", return_value=False):
+        make_run(eval_config, "d1", "rc1", 4.0).save_to_file()
+        with EvalScoreSummary.for_eval_config(eval_config) as summary:
+            assert summary.dataset_ids_by_run_config() == {"rc1": {"d1"}}
+        assert summary.path is None
+        path = EvalScoreSummary.summary_path(eval_config)
+        assert path is not None and not path.exists()
+
+
+def test_unsaved_eval_config():
+    eval_config = EvalConfig(
+        name="Test Eval Config",
+        config_type=EvalConfigType.g_eval,
+        properties={"eval_steps": ["step1"]},
+        model_name="gpt_4o",
+        model_provider="openai",
+    )
+    assert EvalScoreSummary.summary_path(eval_config) is None
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert summary.dataset_ids_by_run_config() == {}
+
+
+def test_run_config_item_scores():
+    summary = EvalScoreSummary()
+    summary.add("1", summarized("d1", "rc1", accuracy=4.0, relevance=2.0))
+    summary.add("0", summarized("d1", "rc1", accuracy=5.0, relevance=1.0))
+    summary.add("2", summarized("d2", "rc1", accuracy=2.0))
+    summary.add("3", summarized("d3", "rc1", accuracy=1.0))
+
+    item_scores = summary.run_config_item_scores("rc1", {"d1", "d2"}, SCORE_KEYS)
+    # The same eval runs as the totals: lowest id per item, eval set only
+    assert sorted(item_scores["accuracy"]) == [2.0, 5.0]
+    assert item_scores["relevance"] == [1.0]
+    assert summary.run_config_item_scores("rc2", {"d1"}, ["accuracy"]) == {
+        "accuracy": []
+    }
+
+
+def test_concurrent_workers_never_lose_runs(eval_config):
+    make_run(eval_config, "d0", "rc1", 1.0).save_to_file()
+    EvalScoreSummary.for_eval_config(eval_config).close()
+
+    # Workers (threads here, processes or machines in a distributed run) each update the summary through their own connection
+    def worker(worker_id: int):
+        for i in range(10):
+            make_run(eval_config, f"d{worker_id}-{i}", "rc1", 2.0).save_to_file()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The summary is either current and complete, or marked stale: never current but missing a run
+    with stored_summary(eval_config) as summary:
+        if summary._is_current(EvalScoreSummary.runs_folder_mtime(eval_config)):
+            assert_matches_full_scan(eval_config)
+    with EvalScoreSummary.for_eval_config(eval_config) as summary:
+        assert len(summary.dataset_ids_by_run_config()["rc1"]) == 41
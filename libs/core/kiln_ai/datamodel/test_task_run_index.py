@@ -0,0 +1,230 @@
+import shutil
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskOutputRating,
+    TaskOutputRatingType,
+    TaskRun,
+)
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+from kiln_ai.datamodel.dataset_filters import dataset_filter_from_id
+from kiln_ai.datamodel.task_run_index import TaskRunIndex
+
+
+@pytest.fixture(autouse=True)
+def persisted_index():
+    # Persist the index, whatever the timestamp granularity of the test filesystem
+    with patch.object(TaskRunIndex, "persistence_enabled", return_value=True):
+        yield
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Test instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def make_run(
+    task: Task, rating: float | None = None, tags: list[str] | None = None
+) -> TaskRun:
+    return TaskRun(
+        parent=task,
+        input="test input",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "test-user"}
+        ),
+        output=TaskOutput(
+            output="test output",
+            source=DataSource(
+                type=DataSourceType.human, properties={"created_by": "test-user"}
+            ),
+            rating=TaskOutputRating(value=rating, type=TaskOutputRatingType.five_star)
+            if rating is not None
+            else None,
+        ),
+        tags=tags or [],
+    )
+
+
+def run_ids(task: Task, filter_id: str) -> set:
+    with TaskRunIndex.for_task(task) as index:
+        return index.run_ids(filter_id)
+
+
+def stale_index(task: Task) -> None:
+    # Force a stale mtime, as coarse filesystem timestamps may not have changed
+    path = TaskRunIndex.index_path(task)
+    assert path is not None
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE state SET runs_folder_mtime_ns = 0")
+    connection.close()
+
+
+def test_build_and_persist(task):
+    high = make_run(task, rating=5.0, tags=["eval_set"])
+    high.save_to_file()
+    low = make_run(task, rating=1.0)
+    low.save_to_file()
+
+    assert run_ids(task, "all") == {high.id, low.id}
+    path = TaskRunIndex.index_path(task)
+    assert path is not None and path.exists()
+
+    # Reads the persisted index, without loading runs
+    with patch.object(Task, "runs", side_effect=AssertionError("scanned runs")):
+        assert run_ids(task, "high_rating") == {high.id}
+        assert run_ids(task, "tag::eval_set") == {high.id}
+
+
+def test_run_ids_match_dataset_filters(task):
+    runs = [
+        make_run(task, rating=5.0, tags=["a"]),
+        make_run(task, rating=3.0, tags=["a", "b"]),
+        make_run(task, tags=["b"]),
+    ]
+    for run in runs:
+        run.save_to_file()
+
+    for filter_id in ["all", "high_rating", "thinking_model", "tag::a", "tag::b"]:
+        dataset_filter = dataset_filter_from_id(filter_id)
+        expected = {run.id for run in runs if dataset_filter(run)}
+        assert run_ids(task, filter_id) == expected
+
+
+def test_invalid_filter_id(task):
+    with TaskRunIndex.for_task(task) as index:
+        with pytest.raises(ValueError, match="Invalid dataset filter ID"):
+            index.run_ids("unknown")
+
+
+def test_ratings(task):
+    rated = make_run(task, rating=4.0)
+    rated.save_to_file()
+    unrated = make_run(task)
+    unrated.save_to_file()
+
+    with TaskRunIndex.for_task(task) as index:
+        ratings = index.ratings({rated.id, unrated.id, "missing"})
+    assert ratings == {rated.id: rated.output.rating, unrated.id: None}
+
+
+def test_incremental_updates(task):
+    run = make_run(task, rating=5.0)
+    run.save_to_file()
+    assert run_ids(task, "tag::eval_set") == set()
+
+    with patch.object(Task, "runs", side_effect=AssertionError("scanned runs")):
+        # Tag change updates filter membership
+        run.tags = ["eval_set"]
+        run.save_to_file()
+        assert run_ids(task, "tag::eval_set") == {run.id}
+
+        # Rating change updates ratings and static filter membership
+        run.output.rating = TaskOutputRating(
+            value=1.0, type=TaskOutputRatingType.five_star
+        )
+        run.save_to_file()
+        assert run_ids(task, "high_rating") == set()
+        with TaskRunIndex.for_task(task) as index:
+            assert index.ratings({run.id}) == {run.id: run.output.rating}
+
+        other = make_run(task)
+        other.save_to_file()
+        assert run_ids(task, "all") == {run.id, other.id}
+
+        run.delete()
+        assert run_ids(task, "all") == {other.id}
+        assert run_ids(task, "tag::eval_set") == set()
+
+
+def test_save_all_updates_index(task):
+    run = make_run(task, rating=5.0)
+    run.save_to_file()
+    assert run_ids(task, "all") == {run.id}
+
+    # A batch of new and overwritten runs, as written by the eval runner's write-behind writer
+    run.tags = ["eval_set"]
+    other = make_run(task, tags=["eval_set"])
+    with patch.object(Task, "runs", side_effect=AssertionError("scanned runs")):
+        KilnBaseModel.save_all_to_file([run, other])
+        assert run_ids(task, "all") == {run.id, other.id}
+        assert run_ids(task, "tag::eval_set") == {run.id, other.id}
+        assert run_ids(task, "high_rating") == {run.id}
+
+
+def test_rebuild_on_external_change(task):
+    run = make_run(task, tags=["eval_set"])
+    run.save_to_file()
+    make_run(task).save_to_file()
+    assert len(run_ids(task, "all")) == 2
+
+    # Remove a run outside of Kiln, simulating a git pull or manual delete
+    assert run.path is not None
+    shutil.rmtree(run.path.parent)
+    stale_index(task)
+
+    assert len(run_ids(task, "all")) == 1
+    assert run_ids(task, "tag::eval_set") == set()
+
+
+def test_save_after_external_change_marks_stale(task):
+    run = make_run(task)
+    run.save_to_file()
+    assert run_ids(task, "all") == {run.id}
+    stale_index(task)
+
+    # The index doesn't match the runs folder, so isn't updated incrementally: rebuilt on next read
+    other = make_run(task)
+    other.save_to_file()
+    path = TaskRunIndex.index_path(task)
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT COUNT(*) FROM state").fetchone()[0] == 0
+    connection.close()
+
+    assert run_ids(task, "all") == {run.id, other.id}
+
+
+def test_invalid_index_file_rebuilt(task):
+    run = make_run(task)
+    run.save_to_file()
+    path = TaskRunIndex.index_path(task)
+    assert path is not None
+    path.write_text("not a database" * 100)
+
+    assert run_ids(task, "all") == {run.id}
+    assert run_ids(task, "all") == {run.id}
+
+
+def test_unsaved_task():
+    task = Task(name="Test Task", instruction="Test instruction")
+    assert run_ids(task, "all") == set()
+    assert TaskRunIndex.index_path(task) is None
+
+
+def test_coarse_timestamps_not_persisted(task):
+    make_run(task).save_to_file()
+    assert len(run_ids(task, "all")) == 1
+
+    # Without fine-grained timestamps the mtime can't detect changes: every read is a full scan, and saves don't touch the index
+    with patch.object(TaskRunIndex, "persistence_enabled", return_value=False):
+        make_run(task).save_to_file()
+        assert len(run_ids(task, "all")) == 2
+        with TaskRunIndex.for_task(task) as index:
+            assert index.path is None
+
+    path = TaskRunIndex.index_path(task)
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 1
+    connection.close()
@@ -0,0 +1,282 @@
+import json
+import shutil
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskOutputRating,
+    TaskOutputRatingType,
+    TaskRun,
+)
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+from kiln_ai.datamodel.task_run_stats import (
+    TaskRunStatDimension,
+    TaskRunStats,
+    repair_status_display_name,
+    run_stat_buckets,
+)
+from kiln_ai.utils.file_lock import exclusive_file_lock
+
+
+@pytest.fixture(autouse=True)
+def persisted_stats():
+    # Persist stats, whatever the timestamp granularity of the test filesystem
+    with patch.object(TaskRunStats, "persistence_enabled", return_value=True):
+        yield
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Test instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def make_run(
+    task: Task,
+    rating: float | None = None,
+    tags: list[str] | None = None,
+    model_name: str | None = "gpt_4o",
+    input_source: DataSourceType = DataSourceType.human,
+) -> TaskRun:
+    # Human outputs have no model name
+    output_source = DataSource(
+        type=DataSourceType.human, properties={"created_by": "test-user"}
+    )
+    if model_name is not None:
+        output_source = DataSource(
+            type=DataSourceType.synthetic,
+            properties={
+                "adapter_name": "test_adapter",
+                "model_name": model_name,
+                "model_provider": "openai",
+                "prompt_id": "simple_prompt_builder",
+            },
+        )
+    return TaskRun(
+        parent=task,
+        input="test input",
+        input_source=DataSource(
+            type=input_source,
+            properties={"created_by": "test-user"}
+            if input_source == DataSourceType.human
+            else {
+                "adapter_name": "test_adapter",
+                "model_name": "gpt_4o",
+                "model_provider": "openai",
+                "prompt_id": "simple_prompt_builder",
+            },
+        ),
+        output=TaskOutput(
+            output="test output",
+            source=output_source,
+            rating=TaskOutputRating(value=rating, type=TaskOutputRatingType.five_star)
+            if rating is not None
+            else None,
+        ),
+        tags=tags or [],
+    )
+
+
+def test_run_stat_buckets(task):
+    run = make_run(task, rating=5.0, tags=["b", "a", "a"])
+    buckets = run_stat_buckets(run)
+    assert buckets[TaskRunStatDimension.rating] == ["five_star:5"]
+    assert buckets[TaskRunStatDimension.tag] == ["a", "b"]
+    assert buckets[TaskRunStatDimension.model_name] == ["gpt_4o"]
+    assert buckets[TaskRunStatDimension.input_source] == ["human"]
+    assert buckets[TaskRunStatDimension.repair_state] == ["No repair needed"]
+
+    run = make_run(task, model_name=None)
+    buckets = run_stat_buckets(run)
+    assert buckets[TaskRunStatDimension.rating] == ["unrated"]
+    assert buckets[TaskRunStatDimension.tag] == []
+    assert buckets[TaskRunStatDimension.model_name] == ["unknown"]
+    assert buckets[TaskRunStatDimension.repair_state] == ["Rating needed"]
+
+
+def test_repair_status_display_name(task):
+    assert repair_status_display_name(make_run(task)) == "Rating needed"
+    assert repair_status_display_name(make_run(task, rating=5.0)) == "No repair needed"
+    assert repair_status_display_name(make_run(task, rating=3.0)) == "Repair needed"
+
+
+def test_for_task_builds_and_persists(task):
+    make_run(task, rating=5.0, tags=["a"]).save_to_file()
+    make_run(task, rating=1.0, tags=["a", "b"]).save_to_file()
+    make_run(task, input_source=DataSourceType.synthetic).save_to_file()
+
+    stats = TaskRunStats.for_task(task)
+    assert stats.total == 3
+    assert stats.counts[TaskRunStatDimension.tag] == {"a": 2, "b": 1}
+    assert stats.counts[TaskRunStatDimension.rating] == {
+        "five_star:5": 1,
+        "five_star:1": 1,
+        "unrated": 1,
+    }
+    assert stats.counts[TaskRunStatDimension.input_source] == {
+        "human": 2,
+        "synthetic": 1,
+    }
+    assert stats.counts[TaskRunStatDimension.model_name] == {"gpt_4o": 3}
+
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None and stats_path.exists()
+    with open(stats_path) as f:
+        assert json.load(f)["total"] == 3
+
+
+def test_incremental_updates(task):
+    run = make_run(task, tags=["a"])
+    run.save_to_file()
+    assert TaskRunStats.for_task(task).total == 1
+
+    # From here on, updates must be incremental: fail if we rescan the runs
+    with patch.object(
+        TaskRunStats, "build", side_effect=AssertionError("Should not rebuild")
+    ):
+        # Add
+        run2 = make_run(task, rating=5.0, tags=["b"])
+        run2.save_to_file()
+        stats = TaskRunStats.for_task(task)
+        assert stats.total == 2
+        assert stats.counts[TaskRunStatDimension.tag] == {"a": 1, "b": 1}
+
+        # Edit: rating and tags change, counts move between buckets
+        run.output.rating = TaskOutputRating(
+            value=2.0, type=TaskOutputRatingType.five_star
+        )
+        run.tags = ["b"]
+        run.save_to_file()
+        stats = TaskRunStats.for_task(task)
+        assert stats.total == 2
+        assert stats.counts[TaskRunStatDimension.tag] == {"b": 2}
+        assert stats.counts[TaskRunStatDimension.rating] == {
+            "five_star:2": 1,
+            "five_star:5": 1,
+        }
+        assert stats.counts[TaskRunStatDimension.repair_state] == {
+            "Repair needed": 1,
+            "No repair needed": 1,
+        }
+
+        # Delete
+        run2.delete()
+        stats = TaskRunStats.for_task(task)
+        assert stats.total == 1
+        assert stats.counts[TaskRunStatDimension.tag] == {"b": 1}
+        assert stats.counts[TaskRunStatDimension.rating] == {"five_star:2": 1}
+
+    # Incremental result matches a full rebuild
+    assert TaskRunStats.build(task) == TaskRunStats.for_task(task)
+
+
+def test_save_all_updates_stats_once(task):
+    run = make_run(task, rating=5.0, tags=["a"])
+    run.save_to_file()
+    assert TaskRunStats.for_task(task).total == 1
+
+    # A batch of new and overwritten runs, as written by the eval runner's write-behind writer
+    run.tags = ["b"]
+    runs = [run, make_run(task, tags=["b"]), make_run(task, tags=["c"])]
+    with (
+        patch.object(Task, "runs", side_effect=AssertionError("scanned runs")),
+        patch.object(
+            TaskRunStats, "_save", autospec=True, side_effect=TaskRunStats._save
+        ) as save,
+    ):
+        KilnBaseModel.save_all_to_file(runs)
+    assert save.call_count == 1
+
+    stats = TaskRunStats.for_task(task)
+    assert stats.total == 3
+    assert stats.counts[TaskRunStatDimension.tag] == {"b": 2, "c": 1}
+    assert TaskRunStats.build(task) == stats
+
+
+def test_stats_file_not_created_on_save(task):
+    make_run(task).save_to_file()
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None
+    assert not stats_path.exists()
+
+
+def test_rebuild_on_external_change(task):
+    run = make_run(task)
+    run.save_to_file()
+    make_run(task).save_to_file()
+    assert TaskRunStats.for_task(task).total == 2
+
+    # Remove a run outside of Kiln, simulating a git pull or manual delete
+    assert run.path is not None
+    shutil.rmtree(run.path.parent)
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None
+    # Force a stale mtime, as coarse filesystem timestamps may not have changed
+    with open(stats_path) as f:
+        data = json.load(f)
+    data["runs_folder_mtime_ns"] = 0
+    with open(stats_path, "w") as f:
+        json.dump(data, f)
+
+    assert TaskRunStats.for_task(task).total == 1
+
+
+def test_invalid_stats_file_rebuilt(task):
+    make_run(task).save_to_file()
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None
+    stats_path.write_text("not json")
+    assert TaskRunStats.for_task(task).total == 1
+
+
+def test_unsaved_task(tmp_path):
+    task = Task(name="Test Task", instruction="Test instruction")
+    stats = TaskRunStats.for_task(task)
+    assert stats.total == 0
+    assert TaskRunStats.stats_path(task) is None
+
+
+def test_coarse_timestamps_not_persisted(task):
+    make_run(task).save_to_file()
+    assert TaskRunStats.for_task(task).total == 1
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None and stats_path.exists()
+
+    # Without fine-grained timestamps the mtime can't detect changes: every read is a full scan, and saves don't touch the file
+    with patch.object(TaskRunStats, "persistence_enabled", return_value=False):
+        make_run(task).save_to_file()
+        assert TaskRunStats.for_task(task).total == 2
+        with open(stats_path) as f:
+            assert json.load(f)["total"] == 1
+
+
+def test_updates_wait_for_other_processes(task):
+    make_run(task).save_to_file()
+    assert TaskRunStats.for_task(task).total == 1
+    stats_path = TaskRunStats.stats_path(task)
+    assert stats_path is not None
+
+    # Another process (eg an eval worker) holding the lock: our update waits for it, then applies on top of its write
+    saved = threading.Event()
+
+    def save():
+        make_run(task).save_to_file()
+        saved.set()
+
+    with exclusive_file_lock(stats_path.with_suffix(".lock")):
+        thread = threading.Thread(target=save)
+        thread.start()
+        assert not saved.wait(0.2)
+    thread.join()
+    assert saved.is_set()
+    assert TaskRunStats.for_task(task).total == 2
@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+from kiln_ai.datamodel.write_behind import WriteBehindWriter
+
+
+def make_models(tmp_path, count: int, prefix: str = "model"):
+    return [KilnBaseModel(path=tmp_path / f"{prefix}_{i}.kiln") for i in range(count)]
+
+
+def test_writes_all_models(tmp_path):
+    models = make_models(tmp_path, 25)
+    with WriteBehindWriter(batch_size=4) as writer:
+        for model in models:
+            writer.submit(model)
+    assert writer.closed
+    assert writer.saved == 25
+    assert writer.failed == 0
+    for model in models:
+        assert KilnBaseModel.load_from_file(model.path).id == model.id
+
+
+def test_batches_backlog(tmp_path):
+    models = make_models(tmp_path, 10)
+    batch_sizes = []
+    original_save_all = KilnBaseModel.save_all_to_file
+    release = threading.Event()
+
+    def save_all(batch):
+        # Hold the first batch, so the rest back up behind it
+        release.wait(timeout=5)
+        batch_sizes.append(len(batch))
+        original_save_all(batch)
+
+    with patch.object(KilnBaseModel, "save_all_to_file", side_effect=save_all):
+        writer = WriteBehindWriter(batch_size=4)
+        for model in models:
+            writer.submit(model)
+        release.set()
+        writer.close()
+
+    assert sum(batch_sizes) == 10
+    assert max(batch_sizes) == 4
+    assert len(batch_sizes) < 10
+
+
+def test_flush(tmp_path):
+    models = make_models(tmp_path, 5)
+    writer = WriteBehindWriter()
+    for model in models:
+        writer.submit(model)
+    writer.flush()
+    assert all(model.path.exists() for model in models)
+    assert writer.saved == 5
+    writer.close()
+    # Safe to close twice
+    writer.close()
+
+
+def test_failed_saves_counted(tmp_path):
+    good = make_models(tmp_path, 3)
+    bad = KilnBaseModel()
+    with WriteBehindWriter() as writer:
+        writer.submit(good[0])
+        writer.submit(bad)
+        writer.submit(good[1])
+        writer.submit(good[2])
+    # One bad model doesn't lose the rest of its batch
+    assert writer.saved == 3
+    assert writer.failed == 1
+    assert all(model.path.exists() for model in good)
+
+
+def test_submit_after_close_saves_inline(tmp_path):
+    writer = WriteBehindWriter()
+    writer.close()
+    model = make_models(tmp_path, 1)[0]
+    writer.submit(model)
+    assert model.path.exists()
+    assert writer.saved == 1
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError, match="batch_size"):
+        WriteBehindWriter(batch_size=0)
+
+
+def test_saved_callbacks(tmp_path):
+    good = make_models(tmp_path, 2)
+    bad = KilnBaseModel()
+    results = {}
+
+    def on_saved(name):
+        def callback(error):
+            # Called once the model is on disk
+            if error is None:
+                assert models[name].path.exists()
+            results[name] = error
+
+        return callback
+
+    models = {"good_0": good[0], "bad": bad, "good_1": good[1]}
+    with WriteBehindWriter() as writer:
+        for name, model in models.items():
+            writer.submit(model, on_saved=on_saved(name))
+        # A failing callback doesn't stop the writer
+        writer.submit(make_models(tmp_path, 1, "other")[0], on_saved=lambda _: 1 / 0)
+    assert results["good_0"] is None
+    assert results["good_1"] is None
+    assert isinstance(results["bad"], Exception)
+    assert writer.saved == 3
@@ -0,0 +1,153 @@
+"""
+Write-behind persistence for datamodel objects.
+
+Saving a model is a blocking file write. In async code (like the eval runner) that stalls the event loop and every request in flight on it. The WriteBehindWriter takes models from async code without blocking, and saves them on a dedicated thread, in batches (KilnBaseModel.save_all_to_file).
+
+Models submitted are written in order. close() (or leaving the context manager) writes everything submitted before returning, so a run that finishes or is cancelled doesn't lose results. A model can be submitted with a callback, called (on the writer thread) once it's saved or failed to save, for work that must only happen once a model is on disk.
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, List, Tuple
+
+from kiln_ai.datamodel.basemodel import KilnBaseModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_BATCH_SIZE = 100
+
+# Called once a model is saved (with None), or failed to save (with the error)
+SavedCallback = Callable[[Exception | None], None]
+_Submitted = Tuple[KilnBaseModel, SavedCallback | None]
+
+
+class WriteBehindWriter:
+    """
+    Saves models on a background thread, in batches.
+
+    Usage:
+        with WriteBehindWriter() as writer:
+            writer.submit(model)
+        # All submitted models are saved here
+
+    Counts of saved and failed models are available in `saved` and `failed` (failures are logged, and don't stop the writer).
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self.saved = 0
+        self.failed = 0
+        self._queue: queue.Queue[_Submitted | None] = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="kiln-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "WriteBehindWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(
+        self, model: KilnBaseModel, on_saved: SavedCallback | None = None
+    ) -> None:
+        """
+        Queue a model to be saved. Never blocks, unless the writer is closed: then the model is saved immediately, so late results aren't lost.
+
+        on_saved is called once the model is saved (with None) or failed to save (with the error), on the writer thread.
+        """
+        with self._lock:
+            if not self._closed:
+                self._queue.put((model, on_saved))
+                return
+        self._save_batch([(model, on_saved)])
+
+    def flush(self) -> None:
+        """
+        Block until every model submitted so far is saved.
+        """
+        self._queue.join()
+
+    def close(self) -> None:
+        """
+        Save everything submitted, and stop the writer thread. Safe to call more than once.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            # Block for the first model, then take whatever else is waiting (up to a batch): batches grow with the backlog, without adding latency
+            batch: List[_Submitted] = []
+            item = self._queue.get()
+            taken = 1
+            if item is None:
+                stopping = True
+            else:
+                batch.append(item)
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+            try:
+                if batch:
+                    self._save_batch(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+    def _save_batch(self, batch: List[_Submitted]) -> None:
+        try:
+            KilnBaseModel.save_all_to_file([model for model, _ in batch])
+            with self._lock:
+                self.saved += len(batch)
+            for _, on_saved in batch:
+                _notify(on_saved, None)
+            return
+        except Exception:
+            # Fall back to saving one at a time, so one bad model doesn't lose the rest of the batch
+            pass
+        for model, on_saved in batch:
+            try:
+                model.save_to_file()
+                with self._lock:
+                    self.saved += 1
+                _notify(on_saved, None)
+            except Exception as e:
+                logger.error(
+                    f"Error saving {model.__class__.__name__} {getattr(model, 'id', None)}: {e}"
+                )
+                with self._lock:
+                    self.failed += 1
+                _notify(on_saved, e)
+
+
+def _notify(on_saved: SavedCallback | None, error: Exception | None) -> None:
+    if on_saved is None:
+        return
+    try:
+        on_saved(error)
+    except Exception as e:
+        # A failing callback mustn't stop the writer, or count its model as failed
+        logger.error(f"Error in write-behind saved callback: {e}")
@@ -0,0 +1,532 @@
+"""
+Export a task's runs, and eval runs with their scores, to a single columnar file for offline analysis with dataframe tools (pandas, polars, DuckDB).
+
+Formats:
+- Arrow IPC or Parquet, when pyarrow is installed.
+- NumPy .npz otherwise. See `read_npz_export` for loading it.
+
+Exports stream: runs are loaded one at a time (bypassing the model cache) and written in chunks, so memory is bounded by the chunk size, not the number of runs.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Type, TypeVar
+
+import numpy as np
+
+from kiln_ai.datamodel import Task, TaskRun
+from kiln_ai.datamodel.basemodel import KilnParentedModel
+from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalRun
+from kiln_ai.utils.exhaustive_error import raise_exhaustive_enum_error
+
+DEFAULT_CHUNK_SIZE = 1000
+# Suffix of the arrays holding string columns in .npz exports (utf-8 bytes and row offsets into them)
+NPZ_STRING_DATA_SUFFIX = ".data"
+NPZ_STRING_OFFSETS_SUFFIX = ".offsets"
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+T = TypeVar("T", bound=KilnParentedModel)
+Row = Dict[str, Any]
+
+
+class ColumnarExportFormat(str, Enum):
+    """
+    The file format of a columnar export.
+    """
+
+    ARROW = "arrow"
+    PARQUET = "parquet"
+    NPZ = "npz"
+
+
+class ColumnType(str, Enum):
+    STRING = "string"
+    FLOAT = "float"
+    BOOL = "bool"
+    TIMESTAMP = "timestamp"
+
+
+@dataclass
+class Column:
+    name: str
+    type: ColumnType
+
+
+TASK_RUN_COLUMNS: List[Column] = [
+    Column("id", ColumnType.STRING),
+    Column("created_at", ColumnType.TIMESTAMP),
+    Column("created_by", ColumnType.STRING),
+    Column("input", ColumnType.STRING),
+    Column("input_source_type", ColumnType.STRING),
+    Column("output", ColumnType.STRING),
+    Column("output_source_type", ColumnType.STRING),
+    Column("model_name", ColumnType.STRING),
+    Column("model_provider", ColumnType.STRING),
+    Column("prompt_id", ColumnType.STRING),
+    Column("rating_type", ColumnType.STRING),
+    Column("rating_value", ColumnType.FLOAT),
+    Column("requirement_ratings", ColumnType.STRING),
+    Column("repair_instructions", ColumnType.STRING),
+    Column("repaired_output", ColumnType.STRING),
+    Column("intermediate_outputs", ColumnType.STRING),
+    Column("tags", ColumnType.STRING),
+]
+
+EVAL_RUN_COLUMNS: List[Column] = [
+    Column("id", ColumnType.STRING),
+    Column("created_at", ColumnType.TIMESTAMP),
+    Column("eval_id", ColumnType.STRING),
+    Column("eval_name", ColumnType.STRING),
+    Column("eval_config_id", ColumnType.STRING),
+    Column("eval_config_name", ColumnType.STRING),
+    Column("eval_config_eval", ColumnType.BOOL),
+    Column("task_run_config_id", ColumnType.STRING),
+    Column("dataset_id", ColumnType.STRING),
+    Column("input", ColumnType.STRING),
+    Column("output", ColumnType.STRING),
+    Column("intermediate_outputs", ColumnType.STRING),
+]
+
+# Eval scores are exported as one float column per score key, with this prefix
+SCORE_COLUMN_PREFIX = "score."
+
+
+def pyarrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def default_export_format() -> ColumnarExportFormat:
+    """
+    Arrow if pyarrow is installed, otherwise NumPy .npz.
+    """
+    if pyarrow_available():
+        return ColumnarExportFormat.ARROW
+    return ColumnarExportFormat.NPZ
+
+
+def _json_or_none(value: Any) -> str | None:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False)
+
+
+def task_run_row(run: TaskRun) -> Row:
+    output_source = run.output.source if run.output else None
+    output_properties = output_source.properties if output_source else {}
+    rating = run.output.rating if run.output else None
+    return {
+        "id": run.id,
+        "created_at": run.created_at,
+        "created_by": run.created_by,
+        "input": run.input,
+        "input_source_type": run.input_source.type.value if run.input_source else None,
+        "output": run.output.output if run.output else None,
+        "output_source_type": output_source.type.value if output_source else None,
+        "model_name": output_properties.get("model_name"),
+        "model_provider": output_properties.get("model_provider"),
+        "prompt_id": output_properties.get("prompt_id"),
+        "rating_type": rating.type.value if rating else None,
+        "rating_value": rating.value if rating else None,
+        "requirement_ratings": _json_or_none(
+            {
+                str(requirement_id): requirement_rating.model_dump(mode="json")
+                for requirement_id, requirement_rating in rating.requirement_ratings.items()
+            }
+            if rating and rating.requirement_ratings
+            else None
+        ),
+        "repair_instructions": run.repair_instructions,
+        "repaired_output": run.repaired_output.output if run.repaired_output else None,
+        "intermediate_outputs": _json_or_none(run.intermediate_outputs),
+        "tags": _json_or_none(run.tags),
+    }
+
+
+def eval_run_row(eval: Eval, eval_config: EvalConfig, run: EvalRun) -> Row:
+    row: Row = {
+        "id": run.id,
+        "created_at": run.created_at,
+        "eval_id": eval.id,
+        "eval_name": eval.name,
+        "eval_config_id": eval_config.id,
+        "eval_config_name": eval_config.name,
+        "eval_config_eval": run.eval_config_eval,
+        "task_run_config_id": run.task_run_config_id,
+        "dataset_id": run.dataset_id,
+        "input": run.input,
+        "output": run.output,
+        "intermediate_outputs": _json_or_none(run.intermediate_outputs),
+    }
+    for key, score in run.scores.items():
+        row[SCORE_COLUMN_PREFIX + key] = score
+    return row
+
+
+def _load_uncached(cls: Type[T], path: Path) -> T:
+    # Like load_from_file, but doesn't fill the model cache, so memory doesn't grow with the number of runs exported
+    with open(path, "r", encoding="utf-8") as file:
+        model = cls.model_validate(json.load(file), context={"loading_from_file": True})
+    model.path = path
+    return model
+
+
+def _iterate_children(cls: Type[T], parent_path: Path | None) -> Iterator[T]:
+    for child_path in cls.iterate_children_paths_of_parent_path(parent_path):
+        yield _load_uncached(cls, child_path)
+
+
+def _chunked(rows: Iterable[Row], chunk_size: int) -> Iterator[List[Row]]:
+    chunk: List[Row] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ColumnarWriter(ABC):
+    """
+    Writes rows to a columnar file, one chunk at a time. Use as a context manager.
+    """
+
+    def __init__(self, path: Path, columns: List[Column]):
+        self.path = path
+        self.columns = columns
+        self.row_count = 0
+
+    def write_chunk(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        self._write_columns(
+            {
+                column.name: [row.get(column.name) for row in rows]
+                for column in self.columns
+            },
+            len(rows),
+        )
+        self.row_count += len(rows)
+
+    @abstractmethod
+    def _write_columns(self, columns: Dict[str, List[Any]], length: int) -> None:
+        """
+        Write a chunk of rows, as a list of values for each column.
+        """
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Complete the file.
+        """
+        pass
+
+    def abort(self) -> None:
+        """Close without completing the file, and remove it."""
+        try:
+            self.close()
+        finally:
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _ArrowWriter(ColumnarWriter):
+    def __init__(self, path: Path, columns: List[Column], parquet: bool):
+        super().__init__(path, columns)
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [pa.field(column.name, self._arrow_type(column.type)) for column in columns]
+        )
+        if parquet:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+        else:
+            self._writer = pa.ipc.new_file(str(path), self.schema)
+
+    def _arrow_type(self, column_type: ColumnType):
+        pa = self._pa
+        match column_type:
+            case ColumnType.STRING:
+                return pa.string()
+            case ColumnType.FLOAT:
+                return pa.float64()
+            case ColumnType.BOOL:
+                return pa.bool_()
+            case ColumnType.TIMESTAMP:
+                return pa.timestamp("us")
+            case _:
+                raise_exhaustive_enum_error(column_type)
+
+    def _write_columns(self, columns: Dict[str, List[Any]], length: int) -> None:
+        batch = self._pa.record_batch(
+            [columns[field.name] for field in self.schema], schema=self.schema
+        )
+        self._writer.write_table(self._pa.Table.from_batches([batch]))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+@dataclass
+class _SpooledArray:
+    dtype: np.dtype
+    spool: IO[bytes]
+    length: int = 0
+
+
+class _NpzWriter(ColumnarWriter):
+    """
+    Writes a .npz file without holding the columns in memory.
+
+    Each column is spooled to a temporary file as chunks arrive. On close, we know the final lengths, so we can write the .npy headers and stream the spooled data into the archive.
+
+    Strings are stored Arrow style: all values as utf-8 bytes in `{name}.data` (uint8), and `{name}.offsets` (int64, length+1) marking where each value starts and ends. Nulls are stored as empty strings, and null floats as NaN.
+    """
+
+    def __init__(self, path: Path, columns: List[Column]):
+        super().__init__(path, columns)
+        self._spool_dir: str | None = tempfile.mkdtemp(prefix="kiln_export_")
+        self._arrays: Dict[str, _SpooledArray] = {}
+        self._string_offsets: Dict[str, int] = {}
+        for column in columns:
+            if column.type == ColumnType.STRING:
+                self._add_array(
+                    column.name + NPZ_STRING_DATA_SUFFIX, np.dtype(np.uint8)
+                )
+                self._add_array(
+                    column.name + NPZ_STRING_OFFSETS_SUFFIX, np.dtype(np.int64)
+                )
+                self._append(column.name + NPZ_STRING_OFFSETS_SUFFIX, np.zeros(1))
+                self._string_offsets[column.name] = 0
+            else:
+                self._add_array(column.name, self._numpy_dtype(column.type))
+
+    def _numpy_dtype(self, column_type: ColumnType) -> np.dtype:
+        match column_type:
+            case ColumnType.FLOAT:
+                return np.dtype(np.float64)
+            case ColumnType.BOOL:
+                return np.dtype(np.bool_)
+            case ColumnType.TIMESTAMP:
+                return np.dtype("datetime64[us]")
+            case ColumnType.STRING:
+                raise ValueError("String columns are stored as data and offsets")
+            case _:
+                raise_exhaustive_enum_error(column_type)
+
+    def _add_array(self, name: str, dtype: np.dtype) -> None:
+        spool = open(os.path.join(self._spool_dir, f"{len(self._arrays)}.bin"), "wb")
+        self._arrays[name] = _SpooledArray(dtype=dtype, spool=spool)
+
+    def _append(self, name: str, values: np.ndarray) -> None:
+        array = self._arrays[name]
+        array.spool.write(np.ascontiguousarray(values, dtype=array.dtype).tobytes())
+        array.length += len(values)
+
+    def _write_columns(self, columns: Dict[str, List[Any]], length: int) -> None:
+        for column in self.columns:
+            values = columns[column.name]
+            match column.type:
+                case ColumnType.STRING:
+                    encoded = [
+                        value.encode("utf-8") if value is not None else b""
+                        for value in values
+                    ]
+                    lengths = np.fromiter(
+                        (len(value) for value in encoded), dtype=np.int64, count=length
+                    )
+                    offsets = self._string_offsets[column.name] + np.cumsum(lengths)
+                    data = self._arrays[column.name + NPZ_STRING_DATA_SUFFIX]
+                    data.spool.write(b"".join(encoded))
+                    data.length += int(lengths.sum())
+                    self._append(column.name + NPZ_STRING_OFFSETS_SUFFIX, offsets)
+                    if length > 0:
+                        self._string_offsets[column.name] = int(offsets[-1])
+                case ColumnType.FLOAT:
+                    self._append(
+                        column.name,
+                        np.array(
+                            [np.nan if value is None else value for value in values],
+                            dtype=np.float64,
+                        ),
+                    )
+                case ColumnType.BOOL:
+                    self._append(
+                        column.name, np.array([bool(value) for value in values])
+                    )
+                case ColumnType.TIMESTAMP:
+                    self._append(
+                        column.name,
+                        np.array(
+                            [
+                                np.datetime64(value, "us")
+                                if isinstance(value, datetime)
+                                else np.datetime64("NaT")
+                                for value in values
+                            ],
+                            dtype="datetime64[us]",
+                        ),
+                    )
+                case _:
+                    raise_exhaustive_enum_error(column.type)
+
+    def close(self) -> None:
+        if self._spool_dir is None:
+            return
+        try:
+            for array in self._arrays.values():
+                array.spool.close()
+            with zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED) as archive:
+                for name, array in self._arrays.items():
+                    with (
+                        archive.open(f"{name}.npy", "w", force_zip64=True) as member,
+                        open(array.spool.name, "rb") as source,
+                    ):
+                        np.lib.format.write_array_header_2_0(
+                            member,
+                            {
+                                "descr": np.lib.format.dtype_to_descr(array.dtype),
+                                "fortran_order": False,
+                                "shape": (array.length,),
+                            },
+                        )
+                        shutil.copyfileobj(source, member, _COPY_BLOCK_SIZE)
+        finally:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+
+
+def columnar_writer(
+    path: Path, columns: List[Column], format: ColumnarExportFormat
+) -> ColumnarWriter:
+    match format:
+        case ColumnarExportFormat.ARROW | ColumnarExportFormat.PARQUET:
+            if not pyarrow_available():
+                raise ValueError(
+                    f"The {format.value} export format requires pyarrow. Install it with `pip install pyarrow`, or use the npz format."
+                )
+            return _ArrowWriter(
+                path, columns, parquet=format == ColumnarExportFormat.PARQUET
+            )
+        case ColumnarExportFormat.NPZ:
+            return _NpzWriter(path, columns)
+        case _:
+            raise_exhaustive_enum_error(format)
+
+
+def _write_rows(
+    rows: Iterable[Row],
+    path: Path | str,
+    columns: List[Column],
+    format: ColumnarExportFormat | None,
+    chunk_size: int,
+) -> int:
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    with columnar_writer(
+        Path(path), columns, format or default_export_format()
+    ) as writer:
+        for chunk in _chunked(rows, chunk_size):
+            writer.write_chunk(chunk)
+        return writer.row_count
+
+
+def export_task_runs(
+    task: Task,
+    path: Path | str,
+    format: ColumnarExportFormat | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    filter: Callable[[TaskRun], bool] | None = None,
+) -> int:
+    """
+    Export all runs of a task to a columnar file, one row per run (columns: TASK_RUN_COLUMNS).
+
+    Returns the number of rows written.
+    """
+    runs: Iterable[TaskRun] = _iterate_children(TaskRun, task.path)
+    if filter is not None:
+        runs = (run for run in runs if filter(run))
+    return _write_rows(
+        (task_run_row(run) for run in runs), path, TASK_RUN_COLUMNS, format, chunk_size
+    )
+
+
+def eval_run_columns(evals: List[Eval]) -> List[Column]:
+    """
+    EVAL_RUN_COLUMNS, plus a float column for each score defined by any of the evals.
+    """
+    score_keys: List[str] = []
+    for eval in evals:
+        for output_score in eval.output_scores:
+            if output_score.json_key() not in score_keys:
+                score_keys.append(output_score.json_key())
+    return EVAL_RUN_COLUMNS + [
+        Column(SCORE_COLUMN_PREFIX + key, ColumnType.FLOAT) for key in score_keys
+    ]
+
+
+def export_eval_runs(
+    task: Task,
+    path: Path | str,
+    format: ColumnarExportFormat | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Export all eval runs of all evals of a task to a columnar file, one row per eval run with a column per score (`score.{json_key}`, null/NaN when an eval doesn't produce that score).
+
+    Returns the number of rows written.
+    """
+    evals = task.evals(readonly=True)
+
+    def rows() -> Iterator[Row]:
+        for eval in evals:
+            for eval_config in eval.configs(readonly=True):
+                for run in _iterate_children(EvalRun, eval_config.path):
+                    yield eval_run_row(eval, eval_config, run)
+
+    return _write_rows(rows(), path, eval_run_columns(evals), format, chunk_size)
+
+
+def read_npz_export(path: Path | str) -> Dict[str, np.ndarray]:
+    """
+    Load a .npz export into a column name -> array dict, which can be passed to `pandas.DataFrame`.
+
+    String columns are decoded to object arrays of str. Loads everything into memory.
+    """
+    columns: Dict[str, np.ndarray] = {}
+    with np.load(path, allow_pickle=False) as npz:
+        for name in npz.files:
+            if name.endswith(NPZ_STRING_OFFSETS_SUFFIX):
+                continue
+            if name.endswith(NPZ_STRING_DATA_SUFFIX):
+                column_name = name[: -len(NPZ_STRING_DATA_SUFFIX)]
+                data = npz[name].tobytes()
+                offsets = npz[column_name + NPZ_STRING_OFFSETS_SUFFIX]
+                values = np.empty(len(offsets) - 1, dtype=object)
+                for i in range(len(values)):
+                    values[i] = data[offsets[i] : offsets[i + 1]].decode("utf-8")
+                columns[column_name] = values
+            else:
+                columns[name] = npz[name]
+    return columns
@@ -128,6 +128,11 @@ class Config:
                 default_lambda=lambda: [],
                 sensitive_keys=["api_key"],
             ),
+            # Requests/tokens per minute budgets, keyed by provider or "provider/model". See adapters/rate_limiter.py
+            "rate_limits": ConfigProperty(
+                dict,
+                default_lambda=lambda: {},
+            ),
         }
         self._settings = self.load_settings()
 
@@ -0,0 +1,54 @@
+"""
+An exclusive lock on a file, held across processes.
+
+For read-modify-write of small files shared by several processes (eg eval workers sharing a project). Uses the OS's advisory locks: flock on macOS and Linux, and msvcrt locking on Windows. On network filesystems these only exclude other machines if the filesystem supports them.
+"""
+
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+@contextmanager
+def exclusive_file_lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on path (created if missing) while in the context, waiting for other holders first.
+
+    Not reentrant: each acquisition opens the file, so nesting locks of one path in one process deadlocks.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as lock_file:
+        _lock(lock_file.fileno())
+        try:
+            yield
+        finally:
+            _unlock(lock_file.fileno())
+
+
+if sys.platform == "win32":
+    import msvcrt
+    import os
+
+    def _lock(fd: int) -> None:
+        # Lock the first byte. LK_LOCK gives up after 10 attempts a second apart, so keep trying.
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
@@ -0,0 +1,308 @@
+"""
+Near-duplicate detection for text using MinHash signatures and locality sensitive hashing (LSH).
+
+Pairwise comparison of dataset items is O(n^2), which isn't feasible on large synthetic datasets. Instead we:
+
+1) Break each text into word shingles (n-grams), and hash them (vectorized with NumPy).
+2) Build a MinHash signature for each text, which estimates Jaccard similarity of the shingle sets.
+3) Split signatures into bands, and bucket texts which share an identical band. Only texts sharing a bucket are compared.
+4) Verify candidates using the estimated Jaccard similarity, and join verified pairs into clusters.
+
+This runs in roughly linear time in the number of texts.
+"""
+
+import re
+import zlib
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Multiplier for the polynomial rolling hash of shingles and band keys (wraps in uint64)
+_POLY_BASE = np.uint64(1099511628211)
+# Buckets larger than this compare members to the first member only, instead of all pairs
+_MAX_PAIRWISE_BUCKET_SIZE = 64
+
+_PUNCTUATION_REGEX = re.compile(r"[^\w\s]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, and remove punctuation and extra whitespace, so trivial formatting changes don't hide duplicates."""
+    return " ".join(_PUNCTUATION_REGEX.sub(" ", text.lower()).split())
+
+
+class _WordHasher:
+    """Stable 32 bit hashes for words, cached since vocabularies are much smaller than corpora."""
+
+    def __init__(self):
+        self.cache: dict[str, int] = {}
+
+    def hash_words(self, words: List[str]) -> List[int]:
+        cache = self.cache
+        for word in words:
+            if word not in cache:
+                cache[word] = zlib.crc32(word.encode("utf-8"))
+        return [cache[word] for word in words]
+
+
+def _shingle_hashes_from_words(
+    word_hashes: np.ndarray, doc_lengths: np.ndarray, shingle_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash the word n-grams of many documents at once.
+
+    word_hashes is the concatenated word hashes of all documents, and doc_lengths the number of words in each (each at least shingle_size, padded by the caller).
+
+    Returns the shingle hashes, and the start offset of each document's shingles.
+    """
+    total = len(word_hashes)
+    # Polynomial hash of every window in the concatenated array, including windows spanning 2 documents (removed below)
+    window_count = total - shingle_size + 1
+    hashes = np.zeros(window_count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for offset in range(shingle_size):
+            hashes = hashes * _POLY_BASE + word_hashes[offset : offset + window_count]
+    hashes = (hashes ^ (hashes >> np.uint64(32))) & _MAX_HASH
+
+    # Keep windows that start inside a document and end in the same document
+    doc_starts = np.concatenate([[0], np.cumsum(doc_lengths)[:-1]])
+    shingle_counts = doc_lengths - shingle_size + 1
+    doc_index = np.repeat(np.arange(len(doc_lengths)), shingle_counts)
+    within_doc = np.arange(len(doc_index)) - np.repeat(
+        np.concatenate([[0], np.cumsum(shingle_counts)[:-1]]), shingle_counts
+    )
+    keep = doc_starts[doc_index] + within_doc
+    shingle_starts = np.concatenate([[0], np.cumsum(shingle_counts)[:-1]])
+    return hashes[keep], shingle_starts
+
+
+def shingle_hashes(text: str, shingle_size: int = 3) -> np.ndarray:
+    """
+    Hash all word shingles (word n-grams) of a text to 32 bit values (as uint64).
+
+    Texts with fewer words than the shingle size are treated as a single shingle.
+    """
+    hashes, _ = _batch_shingle_hashes([text], shingle_size, _WordHasher())
+    return hashes
+
+
+def _batch_shingle_hashes(
+    texts: Sequence[str], shingle_size: int, word_hasher: _WordHasher
+) -> Tuple[np.ndarray, np.ndarray]:
+    return _shingle_hashes_from_docs(
+        [_doc_word_hashes(text, shingle_size, word_hasher) for text in texts],
+        shingle_size,
+    )
+
+
+def _doc_word_hashes(
+    text: str, shingle_size: int, word_hasher: _WordHasher
+) -> List[int]:
+    doc_words = word_hasher.hash_words(normalize_text(text).split(" "))
+    # Pad short texts so they produce a single shingle
+    if len(doc_words) < shingle_size:
+        doc_words.extend([0] * (shingle_size - len(doc_words)))
+    return doc_words
+
+
+def _shingle_hashes_from_docs(
+    docs: Sequence[List[int]], shingle_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    word_hashes: List[int] = []
+    doc_lengths = np.empty(len(docs), dtype=np.int64)
+    for i, doc_words in enumerate(docs):
+        word_hashes.extend(doc_words)
+        doc_lengths[i] = len(doc_words)
+    return _shingle_hashes_from_words(
+        np.array(word_hashes, dtype=np.uint64), doc_lengths, shingle_size
+    )
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Multiply-shift hashing: h(x) = (a*x + b) >> 32 with odd 64 bit a. Cheaper than a modulo prime, and as good for MinHash.
+    generator = np.random.default_rng(seed)
+    max_value = np.iinfo(np.uint64).max
+    a = generator.integers(1, max_value, size=num_perm, dtype=np.uint64, endpoint=True)
+    b = generator.integers(0, max_value, size=num_perm, dtype=np.uint64, endpoint=True)
+    return a | np.uint64(1), b
+
+
+def _permute(shingles: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # (num_perm, shingles) layout, so the per document min reduces over contiguous memory
+    with np.errstate(over="ignore"):
+        return (a[:, None] * shingles[None, :] + b[:, None]) >> np.uint64(32)
+
+
+def minhash_signatures(
+    texts: Sequence[str],
+    num_perm: int = 128,
+    shingle_size: int = 3,
+    seed: int = 1,
+    max_batch_shingles: int = 2**15,
+) -> np.ndarray:
+    """
+    Build a MinHash signature for each text.
+
+    Texts are processed in batches of at most max_batch_shingles shingles, so numpy does the heavy lifting while memory stays bounded however long the texts are: each batch permutes num_perm x max_batch_shingles uint64 values (32 MiB by default). A text with more shingles than that is processed alone, in chunks.
+
+    Returns:
+        np.ndarray: a (len(texts), num_perm) uint32 array. The fraction of equal values in 2 rows estimates the Jaccard similarity of the 2 texts.
+    """
+    if max_batch_shingles < 1:
+        raise ValueError("max_batch_shingles must be at least 1")
+
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    word_hasher = _WordHasher()
+    batch: List[List[int]] = []
+    batch_start = 0
+    batch_shingles = 0
+    for i, text in enumerate(texts):
+        doc_words = _doc_word_hashes(text, shingle_size, word_hasher)
+        doc_shingles = len(doc_words) - shingle_size + 1
+        if batch and batch_shingles + doc_shingles > max_batch_shingles:
+            _sign_batch(
+                batch, shingle_size, a, b, max_batch_shingles, signatures[batch_start:i]
+            )
+            batch, batch_start, batch_shingles = [], i, 0
+        batch.append(doc_words)
+        batch_shingles += doc_shingles
+    if batch:
+        _sign_batch(
+            batch, shingle_size, a, b, max_batch_shingles, signatures[batch_start:]
+        )
+    return signatures
+
+
+def _sign_batch(
+    docs: List[List[int]],
+    shingle_size: int,
+    a: np.ndarray,
+    b: np.ndarray,
+    max_batch_shingles: int,
+    out: np.ndarray,
+) -> None:
+    shingles, shingle_starts = _shingle_hashes_from_docs(docs, shingle_size)
+    if len(shingles) <= max_batch_shingles:
+        out[:] = np.minimum.reduceat(_permute(shingles, a, b), shingle_starts, axis=1).T
+        return
+
+    # A single text over the budget: the min of the mins of each chunk of its shingles
+    out[0] = np.iinfo(np.uint32).max
+    for chunk_start in range(0, len(shingles), max_batch_shingles):
+        chunk = shingles[chunk_start : chunk_start + max_batch_shingles]
+        out[0] = np.minimum(out[0], _permute(chunk, a, b).min(axis=1))
+
+
+def lsh_parameters(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick the number of bands and rows per band, so the LSH candidate threshold (1/bands)^(1/rows) is closest to the target threshold.
+    """
+    if threshold <= 0.0 or threshold > 1.0:
+        raise ValueError("Threshold must be greater than 0 and at most 1")
+
+    best: Tuple[int, int] = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if error < best_error:
+            best = (bands, rows)
+            best_error = error
+    return best
+
+
+def _band_keys(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    # Hash each band of each signature to a single uint64 key: (n, bands)
+    banded = signatures[:, : bands * rows].reshape(len(signatures), bands, rows)
+    powers = _POLY_BASE ** np.arange(rows, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return banded.astype(np.uint64) @ powers
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parents = list(range(size))
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parents[root] != root:
+            root = self.parents[root]
+        # Path compression
+        while self.parents[item] != root:
+            self.parents[item], item = root, self.parents[item]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parents[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def near_duplicate_clusters(
+    texts: Sequence[str],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    shingle_size: int = 3,
+    seed: int = 1,
+) -> List[List[int]]:
+    """
+    Find clusters of near-duplicate texts.
+
+    Args:
+        texts: the texts to compare.
+        threshold: the estimated Jaccard similarity of shingles at which 2 texts are considered duplicates (0-1].
+        num_perm: the number of MinHash permutations. More is more accurate, but slower and uses more memory.
+        shingle_size: the number of words in each shingle.
+        seed: seed for the MinHash permutations, so results are repeatable.
+
+    Returns:
+        List[List[int]]: clusters of indexes into texts, each with at least 2 members. Clusters are transitive: A~B and B~C puts A, B and C in one cluster.
+    """
+    if len(texts) < 2:
+        return []
+
+    bands, rows = lsh_parameters(threshold, num_perm)
+    signatures = minhash_signatures(texts, num_perm, shingle_size, seed)
+    keys = _band_keys(signatures, bands, rows)
+    union_find = _UnionFind(len(texts))
+
+    for band in range(bands):
+        band_keys = keys[:, band]
+        order = np.argsort(band_keys, kind="stable")
+        sorted_keys = band_keys[order]
+        # Bucket boundaries: runs of equal keys in the sorted order
+        boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(sorted_keys)]])
+        multi = np.flatnonzero(ends - starts > 1)
+        for bucket in multi:
+            members = order[starts[bucket] : ends[bucket]]
+            _union_verified(union_find, signatures, members, threshold)
+
+    clusters: dict[int, List[int]] = {}
+    for index in range(len(texts)):
+        clusters.setdefault(union_find.find(index), []).append(index)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def _union_verified(
+    union_find: _UnionFind,
+    signatures: np.ndarray,
+    members: np.ndarray,
+    threshold: float,
+) -> None:
+    # Band collisions are candidates. Verify with the estimated Jaccard similarity of the full signature.
+    member_signatures = signatures[members]
+    if len(members) <= _MAX_PAIRWISE_BUCKET_SIZE:
+        similarity = (
+            member_signatures[:, None, :] == member_signatures[None, :, :]
+        ).mean(axis=2)
+        left, right = np.nonzero(np.triu(similarity >= threshold, k=1))
+    else:
+        # Large buckets are usually many copies of the same text. Avoid O(size^2) by comparing to the first member.
+        similarity = (member_signatures == member_signatures[0]).mean(axis=1)
+        right = np.flatnonzero(similarity[1:] >= threshold) + 1
+        left = np.zeros_like(right)
+    for i, j in zip(left.tolist(), right.tolist()):
+        union_find.union(int(members[i]), int(members[j]))
@@ -0,0 +1,240 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from kiln_ai.datamodel import (
+    DataSource,
+    DataSourceType,
+    Project,
+    Task,
+    TaskOutput,
+    TaskOutputRating,
+    TaskOutputRatingType,
+    TaskRun,
+)
+from kiln_ai.datamodel.eval import Eval, EvalConfig, EvalOutputScore, EvalRun
+from kiln_ai.datamodel.model_cache import ModelCache
+from kiln_ai.utils.columnar_export import (
+    ColumnarExportFormat,
+    columnar_writer,
+    default_export_format,
+    export_eval_runs,
+    export_task_runs,
+    pyarrow_available,
+    read_npz_export,
+)
+
+
+@pytest.fixture
+def task(tmp_path):
+    project = Project(name="Test Project", path=tmp_path / "project.kiln")
+    project.save_to_file()
+    task = Task(name="Test Task", instruction="Test instruction", parent=project)
+    task.save_to_file()
+    return task
+
+
+def make_run(task: Task, index: int, rating: float | None = None) -> TaskRun:
+    run = TaskRun(
+        parent=task,
+        input=f"input {index} ✓",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "test-user"}
+        ),
+        output=TaskOutput(
+            output=f"output {index}",
+            source=DataSource(
+                type=DataSourceType.synthetic,
+                properties={
+                    "adapter_name": "test_adapter",
+                    "model_name": "gpt_4o",
+                    "model_provider": "openai",
+                    "prompt_id": "simple_prompt_builder",
+                },
+            ),
+            rating=TaskOutputRating(value=rating, type=TaskOutputRatingType.five_star)
+            if rating is not None
+            else None,
+        ),
+        tags=[f"tag_{index % 2}"],
+    )
+    run.save_to_file()
+    return run
+
+
+@pytest.fixture
+def eval_with_runs(task):
+    eval = Eval(
+        name="Test Eval",
+        eval_set_filter_id="all",
+        eval_configs_filter_id="all",
+        output_scores=[
+            EvalOutputScore(name="Accuracy", type=TaskOutputRatingType.pass_fail),
+            EvalOutputScore(name="Overall", type=TaskOutputRatingType.five_star),
+        ],
+        parent=task,
+    )
+    eval.save_to_file()
+    eval_config = EvalConfig(
+        name="Test Config",
+        model_name="gpt-4",
+        model_provider="openai",
+        properties={"eval_steps": ["step1"]},
+        parent=eval,
+    )
+    eval_config.save_to_file()
+    for i in range(3):
+        EvalRun(
+            parent=eval_config,
+            dataset_id=f"item_{i}",
+            task_run_config_id="run_config_1",
+            input=f"input {i}",
+            output=f"output {i}",
+            scores={"accuracy": float(i % 2), "overall": 1.0 + i},
+        ).save_to_file()
+    return eval, eval_config
+
+
+def sort_by_id(columns: dict) -> dict:
+    order = np.argsort(columns["id"])
+    return {name: values[order] for name, values in columns.items()}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+def test_export_task_runs_npz(task, tmp_path, chunk_size):
+    runs = [make_run(task, i, rating=5.0 if i == 0 else None) for i in range(5)]
+    path = tmp_path / "runs.npz"
+
+    count = export_task_runs(
+        task, path, format=ColumnarExportFormat.NPZ, chunk_size=chunk_size
+    )
+    assert count == 5
+
+    columns = sort_by_id(read_npz_export(path))
+    runs.sort(key=lambda run: run.id)
+    assert list(columns["id"]) == [run.id for run in runs]
+    assert list(columns["input"]) == [run.input for run in runs]
+    assert list(columns["output"]) == [run.output.output for run in runs]
+    assert list(columns["model_name"]) == ["gpt_4o"] * 5
+    assert [json.loads(tags) for tags in columns["tags"]] == [run.tags for run in runs]
+    # Null strings are empty, null floats are NaN
+    assert list(columns["repair_instructions"]) == [""] * 5
+    expected_ratings = [
+        run.output.rating.value if run.output.rating else np.nan for run in runs
+    ]
+    np.testing.assert_array_equal(columns["rating_value"], expected_ratings)
+    assert columns["created_at"].dtype == np.dtype("datetime64[us]")
+    assert columns["created_at"][0] == np.datetime64(runs[0].created_at, "us")
+
+
+def test_export_task_runs_filter(task, tmp_path):
+    for i in range(4):
+        make_run(task, i)
+    path = tmp_path / "runs.npz"
+    count = export_task_runs(
+        task,
+        path,
+        format=ColumnarExportFormat.NPZ,
+        filter=lambda run: "tag_0" in run.tags,
+    )
+    assert count == 2
+    assert len(read_npz_export(path)["id"]) == 2
+
+
+def test_export_empty_task(task, tmp_path):
+    path = tmp_path / "runs.npz"
+    assert export_task_runs(task, path, format=ColumnarExportFormat.NPZ) == 0
+    columns = read_npz_export(path)
+    assert len(columns["id"]) == 0
+    assert len(columns["rating_value"]) == 0
+
+
+def test_export_does_not_fill_model_cache(task, tmp_path):
+    for i in range(3):
+        make_run(task, i)
+    with patch.object(ModelCache, "set_model") as mock_set_model:
+        export_task_runs(task, tmp_path / "runs.npz", format=ColumnarExportFormat.NPZ)
+    # Only the parent task may be cached, not the runs
+    cached_types = {type(call.args[1]) for call in mock_set_model.call_args_list}
+    assert TaskRun not in cached_types
+
+
+def test_export_eval_runs_npz(task, eval_with_runs, tmp_path):
+    eval, _ = eval_with_runs
+    path = tmp_path / "eval_runs.npz"
+
+    count = export_eval_runs(task, path, format=ColumnarExportFormat.NPZ, chunk_size=2)
+    assert count == 3
+
+    columns = read_npz_export(path)
+    order = np.argsort(columns["dataset_id"])
+    columns = {name: values[order] for name, values in columns.items()}
+    assert list(columns["dataset_id"]) == ["item_0", "item_1", "item_2"]
+    assert list(columns["eval_id"]) == [eval.id] * 3
+    assert list(columns["eval_config_name"]) == ["Test Config"] * 3
+    assert list(columns["eval_config_eval"]) == [False] * 3
+    np.testing.assert_array_equal(columns["score.accuracy"], [0.0, 1.0, 0.0])
+    np.testing.assert_array_equal(columns["score.overall"], [1.0, 2.0, 3.0])
+
+
+def test_failed_export_removes_file(task, tmp_path):
+    make_run(task, 0)
+    path = tmp_path / "runs.npz"
+    with patch(
+        "kiln_ai.utils.columnar_export.task_run_row", side_effect=ValueError("boom")
+    ):
+        with pytest.raises(ValueError, match="boom"):
+            export_task_runs(task, path, format=ColumnarExportFormat.NPZ)
+    assert not path.exists()
+
+
+def test_invalid_chunk_size(task, tmp_path):
+    with pytest.raises(ValueError, match="chunk_size"):
+        export_task_runs(task, tmp_path / "runs.npz", chunk_size=0)
+
+
+def test_arrow_requires_pyarrow(tmp_path):
+    with patch("kiln_ai.utils.columnar_export.pyarrow_available", return_value=False):
+        assert default_export_format() == ColumnarExportFormat.NPZ
+        with pytest.raises(ValueError, match="requires pyarrow"):
+            columnar_writer(tmp_path / "runs.arrow", [], ColumnarExportFormat.ARROW)
+
+
+@pytest.mark.skipif(not pyarrow_available(), reason="pyarrow not installed")
+@pytest.mark.parametrize(
+    "format", [ColumnarExportFormat.ARROW, ColumnarExportFormat.PARQUET]
+)
+def test_export_arrow_formats(task, eval_with_runs, tmp_path, format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    for i in range(3):
+        make_run(task, i)
+
+    runs_path = tmp_path / f"runs.{format.value}"
+    eval_runs_path = tmp_path / f"eval_runs.{format.value}"
+    assert export_task_runs(task, runs_path, format=format, chunk_size=2) == 3
+    assert export_eval_runs(task, eval_runs_path, format=format, chunk_size=2) == 3
+
+    def read(path):
+        if format == ColumnarExportFormat.PARQUET:
+            return pq.read_table(path)
+        return pa.ipc.open_file(path).read_all()
+
+    runs_table = read(runs_path)
+    assert runs_table.num_rows == 3
+    assert sorted(runs_table.column("output").to_pylist()) == [
+        "output 0",
+        "output 1",
+        "output 2",
+    ]
+    assert runs_table.column("rating_value").null_count == 3
+
+    eval_runs_table = read(eval_runs_path)
+    assert sorted(eval_runs_table.column("score.overall").to_pylist()) == [
+        1.0,
+        2.0,
+        3.0,
+    ]
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from kiln_ai.utils.file_lock import exclusive_file_lock
+
+
+def test_exclusive_file_lock(tmp_path):
+    path = tmp_path / "nested" / "file.lock"
+    events = []
+    acquired = threading.Event()
+
+    def holder():
+        with exclusive_file_lock(path):
+            acquired.set()
+            time.sleep(0.1)
+            events.append("holder released")
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    acquired.wait()
+    # Each acquisition opens the file, so this waits like another process would
+    with exclusive_file_lock(path):
+        events.append("waiter acquired")
+    thread.join()
+
+    assert events == ["holder released", "waiter acquired"]
+    assert path.exists()
+
+
+def test_released_on_error(tmp_path):
+    path = tmp_path / "file.lock"
+    try:
+        with exclusive_file_lock(path):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    with exclusive_file_lock(path):
+        pass
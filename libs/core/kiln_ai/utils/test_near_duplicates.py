@@ -0,0 +1,145 @@
+import random
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from kiln_ai.utils import near_duplicates
+from kiln_ai.utils.near_duplicates import (
+    lsh_parameters,
+    minhash_signatures,
+    near_duplicate_clusters,
+    normalize_text,
+    shingle_hashes,
+)
+
+
+def test_normalize_text():
+    assert normalize_text("  Hello,   World!!\n") == "hello world"
+    assert normalize_text("") == ""
+
+
+def test_shingle_hashes():
+    # 4 words -> 2 word 3-grams
+    hashes = shingle_hashes("one two three four")
+    assert len(hashes) == 2
+    assert hashes.dtype == np.uint64
+    assert np.all(hashes <= 0xFFFFFFFF)
+
+    # Short texts are a single shingle
+    assert len(shingle_hashes("one")) == 1
+    assert len(shingle_hashes("")) == 1
+
+    # Stable across calls, and formatting insensitive
+    assert np.array_equal(
+        shingle_hashes("one two three four"), shingle_hashes("One, two  three four!")
+    )
+
+
+def test_minhash_signatures_batches_match_single():
+    texts = [f"text number {i} with a few words in it" for i in range(10)] + ["a"]
+    batched = minhash_signatures(texts, max_batch_shingles=20)
+    single = np.stack([minhash_signatures([text])[0] for text in texts])
+    assert batched.shape == (len(texts), 128)
+    assert batched.dtype == np.uint32
+    assert np.array_equal(batched, single)
+
+
+def test_minhash_signatures_batch_by_shingles():
+    words = [f"word{i}" for i in range(1000)]
+    # Long texts (about 500 and 1000 shingles) around short ones
+    texts = [
+        " ".join(words[:500]),
+        "a short text",
+        " ".join(words),
+        "another short text",
+        " ".join(reversed(words)),
+    ]
+    permuted_sizes = []
+    permute = near_duplicates._permute
+
+    def recording_permute(shingles, a, b):
+        permuted_sizes.append(len(shingles))
+        return permute(shingles, a, b)
+
+    with patch.object(near_duplicates, "_permute", side_effect=recording_permute):
+        chunked = minhash_signatures(texts, max_batch_shingles=300)
+
+    # Memory is bounded by the shingle budget, however long the texts
+    assert permuted_sizes and max(permuted_sizes) <= 300
+    assert sum(permuted_sizes) == 498 + 1 + 998 + 1 + 998
+    unchunked = minhash_signatures(texts, max_batch_shingles=10_000)
+    assert np.array_equal(chunked, unchunked)
+
+    with pytest.raises(ValueError, match="max_batch_shingles"):
+        minhash_signatures(texts, max_batch_shingles=0)
+
+
+def test_minhash_estimates_jaccard():
+    words = [f"word{i}" for i in range(200)]
+    text_a = " ".join(words[:100])
+    text_b = " ".join(words[10:110])
+    signatures = minhash_signatures([text_a, text_a, text_b], num_perm=256)
+    assert np.mean(signatures[0] == signatures[1]) == 1.0
+    # 3-gram Jaccard: 88 shared shingles of 108 total ~= 0.81
+    estimate = np.mean(signatures[0] == signatures[2])
+    assert estimate == pytest.approx(88 / 108, abs=0.1)
+
+
+@pytest.mark.parametrize(
+    "threshold,num_perm",
+    [(0.5, 128), (0.8, 128), (0.9, 64), (1.0, 32)],
+)
+def test_lsh_parameters(threshold, num_perm):
+    bands, rows = lsh_parameters(threshold, num_perm)
+    assert bands * rows <= num_perm
+    assert (1.0 / bands) ** (1.0 / rows) == pytest.approx(threshold, abs=0.1)
+
+
+def test_lsh_parameters_invalid():
+    with pytest.raises(ValueError):
+        lsh_parameters(0.0, 128)
+    with pytest.raises(ValueError):
+        lsh_parameters(1.5, 128)
+
+
+def test_near_duplicate_clusters():
+    texts = [
+        "The quick brown fox jumps over the lazy dog",
+        "Completely unrelated sentence about spreadsheets and taxes",
+        "the quick brown fox jumps over the lazy dog!",
+        "Another unrelated sentence, this one about gardening",
+        "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG",
+    ]
+    assert near_duplicate_clusters(texts) == [[0, 2, 4]]
+
+
+def test_near_duplicate_clusters_small_inputs():
+    assert near_duplicate_clusters([]) == []
+    assert near_duplicate_clusters(["only one"]) == []
+
+
+def test_near_duplicate_clusters_transitive():
+    words = [f"word{i}" for i in range(100)]
+    a = " ".join(words[:50])
+    b = " ".join(words[2:52])
+    c = " ".join(words[4:54])
+    clusters = near_duplicate_clusters([a, b, c], threshold=0.85)
+    assert clusters == [[0, 1, 2]]
+
+
+def test_near_duplicate_clusters_large_bucket():
+    # More copies than the pairwise bucket limit
+    texts = ["the same templated synthetic input"] * 100 + ["something else"]
+    assert near_duplicate_clusters(texts) == [list(range(100))]
+
+
+def test_near_duplicate_clusters_random_corpus():
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(2000)]
+    texts = [" ".join(rng.choices(vocabulary, k=30)) for _ in range(500)]
+    # Append a near-duplicate of the first 20 texts
+    texts += [text + " extra" for text in texts[:20]]
+
+    clusters = near_duplicate_clusters(texts)
+    assert sorted(clusters) == [[i, 500 + i] for i in range(20)]
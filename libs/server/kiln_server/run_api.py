@@ -5,7 +5,8 @@ from asyncio import Lock
 from datetime import datetime
 from typing import Any, Dict
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
 from kiln_ai.adapters.adapter_registry import adapter_for_task
 from kiln_ai.adapters.ml_model_list import ModelProviderName
 from kiln_ai.adapters.model_adapters.base_adapter import AdapterConfig
@@ -13,10 +14,10 @@ from kiln_ai.datamodel import (
     PromptId,
     Task,
     TaskOutputRating,
-    TaskOutputRatingType,
     TaskRun,
 )
-from kiln_ai.datamodel.basemodel import ID_TYPE
+from kiln_ai.datamodel.basemodel import ID_TYPE, KilnBaseModel
+from kiln_ai.datamodel.task_run_stats import TaskRunStats, repair_status_display_name
 from kiln_ai.utils.dataset_import import (
     DatasetFileImporter,
     DatasetImportFormat,
@@ -83,26 +84,7 @@ class RunSummary(BaseModel):
 
     @classmethod
     def repair_status_display_name(cls, run: TaskRun) -> str:
-        if run.repair_instructions:
-            return "Repaired"
-        elif run.output and not run.output.rating:
-            return "Rating needed"
-        elif not run.output or not run.output.output:
-            return "No output"
-        elif (
-            run.output.rating
-            and run.output.rating.value == 5.0
-            and run.output.rating.type == TaskOutputRatingType.five_star
-        ):
-            return "No repair needed"
-        elif (
-            run.output.rating
-            and run.output.rating.type != TaskOutputRatingType.five_star
-        ):
-            return "Unknown"
-        elif run.output.output:
-            return "Repair needed"
-        return "Unknown"
+        return repair_status_display_name(run)
 
     @classmethod
     def from_run(cls, run: TaskRun) -> "RunSummary":
@@ -128,12 +110,38 @@ class RunSummary(BaseModel):
         )
 
 
+class BatchGetRunsResponse(BaseModel):
+    runs: list[TaskRun]
+    missing_run_ids: list[str]
+
+
 class BulkUploadResponse(BaseModel):
     success: bool
     filename: str
     imported_count: int
 
 
+FIELDS_QUERY = Query(
+    default=None,
+    description="Comma separated list of fields to return (sparse fieldset), for example 'id,created_at,tags'. The id is always included. Only the requested fields are loaded and serialized.",
+)
+
+
+def parse_fields_param(model: type[KilnBaseModel], fields: str) -> set[str]:
+    """
+    Parse a comma separated fields query param, checking each is a field of the model.
+    """
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown_fields = requested - model.field_names()
+    if unknown_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}",
+        )
+    # Always include the ID, so results can be matched to other requests
+    return requested | {"id"}
+
+
 def run_from_id(project_id: str, task_id: str, run_id: str) -> TaskRun:
     task, run = task_and_run_from_id(project_id, task_id, run_id)
     return run
@@ -163,9 +171,21 @@ def connect_run_api(app: FastAPI):
         run = run_from_id(project_id, task_id, run_id)
         run.delete()
 
-    @app.get("/api/projects/{project_id}/tasks/{task_id}/runs")
-    async def get_runs(project_id: str, task_id: str) -> list[TaskRun]:
+    @app.get(
+        "/api/projects/{project_id}/tasks/{task_id}/runs",
+        response_model=list[TaskRun],
+    )
+    async def get_runs(
+        project_id: str, task_id: str, fields: str | None = FIELDS_QUERY
+    ) -> list[TaskRun] | JSONResponse:
         task = task_from_id(project_id, task_id)
+        if fields is not None:
+            # Partial runs don't match the TaskRun response model, so return them directly
+            return JSONResponse(
+                TaskRun.all_children_fields_of_parent_path(
+                    task.path, parse_fields_param(TaskRun, fields)
+                )
+            )
         return list(task.runs(readonly=True))
 
     @app.get("/api/projects/{project_id}/tasks/{task_id}/runs_summaries")
@@ -179,14 +199,38 @@ def connect_run_api(app: FastAPI):
             run_summaries.append(summary)
         return run_summaries
 
+    @app.get("/api/projects/{project_id}/tasks/{task_id}/runs_stats")
+    async def get_runs_stats(project_id: str, task_id: str) -> TaskRunStats:
+        task = task_from_id(project_id, task_id)
+        # Incrementally maintained as runs are saved/deleted, so this doesn't load every run
+        return TaskRunStats.for_task(task)
+
+    @app.post("/api/projects/{project_id}/tasks/{task_id}/runs/batch_get")
+    async def batch_get_runs(
+        project_id: str, task_id: str, run_ids: list[str]
+    ) -> BatchGetRunsResponse:
+        task = task_from_id(project_id, task_id)
+        # One pass over the runs folder, instead of a scan per ID
+        runs_by_id = TaskRun.from_ids_and_parent_path(set(run_ids), task.path)
+        runs: list[TaskRun] = []
+        missing_run_ids: list[str] = []
+        for run_id in dict.fromkeys(run_ids):
+            run = runs_by_id.get(run_id)
+            if run is not None:
+                runs.append(run)
+            else:
+                missing_run_ids.append(run_id)
+        return BatchGetRunsResponse(runs=runs, missing_run_ids=missing_run_ids)
+
     @app.post("/api/projects/{project_id}/tasks/{task_id}/runs/delete")
     async def delete_runs(project_id: str, task_id: str, run_ids: list[str]):
         task = task_from_id(project_id, task_id)
+        runs_by_id = TaskRun.from_ids_and_parent_path(set(run_ids), task.path)
         failed_runs: list[str] = []
         last_error: Exception | None = None
         for run_id in run_ids:
             try:
-                run = TaskRun.from_id_and_parent_path(run_id, task.path)
+                run = runs_by_id.get(run_id)
                 if run:
                     run.delete()
                 else:
@@ -589,6 +589,45 @@ async def test_get_runs_empty(client, task_run_setup):
     assert len(result) == 0
 
 
+@pytest.mark.asyncio
+async def test_get_runs_with_fields(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.get(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs",
+            params={"fields": "tags, created_at"},
+        )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result) == 1
+    # id is always included
+    assert set(result[0].keys()) == {"id", "created_at", "tags"}
+    assert result[0]["id"] == task_run.id
+    assert result[0]["tags"] == task_run.tags
+    assert result[0]["created_at"] == task_run.created_at.isoformat()
+
+
+@pytest.mark.asyncio
+async def test_get_runs_with_unknown_fields(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.get(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs",
+            params={"fields": "id,not_a_field"},
+        )
+
+    assert response.status_code == 400
+    assert response.json()["message"] == "Unknown fields: not_a_field"
+
+
 @pytest.mark.asyncio
 async def test_get_runs_task_not_found(client):
     with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
@@ -778,6 +817,74 @@ async def test_get_runs_summaries_task_not_found(client):
     assert response.json()["message"] == "Task not found"
 
 
+@pytest.mark.asyncio
+async def test_get_runs_stats_success(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.get(f"/api/projects/{project.id}/tasks/{task.id}/runs_stats")
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["total"] == 1
+    assert result["counts"]["model_name"] == {"gpt_4o": 1}
+    assert result["counts"]["repair_state"] == {"Rating needed": 1}
+    assert result["counts"]["rating"] == {"unrated": 1}
+
+
+@pytest.mark.asyncio
+async def test_get_runs_stats_task_not_found(client):
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.side_effect = HTTPException(
+            status_code=404, detail="Task not found"
+        )
+        response = client.get(
+            "/api/projects/project1-id/tasks/non_existent_task_id/runs_stats"
+        )
+
+    assert response.status_code == 404
+    assert response.json()["message"] == "Task not found"
+
+
+@pytest.mark.asyncio
+async def test_batch_get_runs(client, task_run_setup):
+    project = task_run_setup["project"]
+    task = task_run_setup["task"]
+    task_run = task_run_setup["task_run"]
+
+    second_run = TaskRun(
+        parent=task,
+        input="Test input 2",
+        input_source=DataSource(
+            type=DataSourceType.human, properties={"created_by": "Test User"}
+        ),
+        output=TaskOutput(
+            output="Test output 2",
+            source=DataSource(
+                type=DataSourceType.human,
+                properties={"created_by": "Test User"},
+            ),
+        ),
+    )
+    second_run.save_to_file()
+
+    with patch("kiln_server.run_api.task_from_id") as mock_task_from_id:
+        mock_task_from_id.return_value = task
+        response = client.post(
+            f"/api/projects/{project.id}/tasks/{task.id}/runs/batch_get",
+            json=[second_run.id, "non_existent_run_id", task_run.id, second_run.id],
+        )
+
+    assert response.status_code == 200
+    result = response.json()
+    # Request order, without duplicates
+    assert [run["id"] for run in result["runs"]] == [second_run.id, task_run.id]
+    assert result["runs"][0]["output"]["output"] == "Test output 2"
+    assert result["missing_run_ids"] == ["non_existent_run_id"]
+
+
 @pytest.mark.asyncio
 async def test_delete_multiple_runs_success(client, task_run_setup):
     project = task_run_setup["project"]